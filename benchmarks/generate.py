@@ -0,0 +1,148 @@
+# Blender add-on to import and export 3MF files.
+# Copyright (C) 2020 Ghostkeeper
+# Copyright (C) 2025 Jack (modernization for Blender 4.2+)
+# This add-on is free software; you can redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation; either version 2 of the License, or (at your option) any later
+# version.
+# This add-on is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this program; if not, write to the Free
+# Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+# <pep8 compliant>
+
+"""
+Generates synthetic 3MF archives of any size to benchmark the add-on with.
+
+This module doesn't need Blender, nor the add-on itself, so that the same archives can be generated anywhere.
+"""
+
+import collections  # For namedtuple.
+import io  # To write the model document as text to the archive.
+import math  # To lay out the vertices in a grid.
+import os.path  # To measure the size of the archive.
+import zipfile  # To write the 3MF archives, which are secretly zip archives.
+from typing import Iterator, Tuple
+
+import numpy  # To generate the mesh data in bulk.
+
+# IDE and Documentation support.
+__all__ = [
+    "Parameters",
+    "generate_3mf",
+    "grid_mesh",
+]
+
+# The dimensions of a synthetic 3MF archive.
+# - vertices: The number of vertices of each object.
+# - objects: The number of different objects, each with its own mesh.
+# - instances: The number of build items that place each object.
+# - materials: The number of different materials that the triangles of each object cycle through.
+# - metadata_size: The number of bytes of metadata text in the document.
+Parameters = collections.namedtuple("Parameters", ["vertices", "objects", "instances", "materials", "metadata_size"])
+Parameters.__new__.__defaults__ = (1000, 1, 1, 1, 0)
+
+CHUNK_SIZE = 10000  # Number of vertices or triangles to format at a time.
+
+CONTENT_TYPES = """<?xml version="1.0" encoding="UTF-8"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml" />
+<Default Extension="model" ContentType="application/vnd.ms-package.3dmanufacturing-3dmodel+xml" />
+</Types>"""
+RELS = """<?xml version="1.0" encoding="UTF-8"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Target="/3D/3dmodel.model" Id="rel0" \
+Type="http://schemas.microsoft.com/3dmanufacturing/2013/01/3dmodel" />
+</Relationships>"""
+MODEL_NAMESPACE = "http://schemas.microsoft.com/3dmanufacturing/core/2015/02"
+
+
+def grid_mesh(vertex_count: int, offset: float = 0) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    """
+    Creates a flat, square-ish grid with a number of vertices.
+
+    Every complete cell of the grid consists of two triangles, so there are about twice as many triangles as vertices.
+    :param vertex_count: The number of vertices in the grid.
+    :param offset: The height of the grid, to make the meshes of different objects different.
+    :return: An array with the coordinates of each vertex in its rows, and an array with the vertex indices of each
+    triangle in its rows.
+    """
+    width = max(2, math.ceil(math.sqrt(vertex_count)))
+    indices = numpy.arange(vertex_count)
+    vertices = numpy.empty((vertex_count, 3), dtype=numpy.float64)
+    vertices[:, 0] = (indices % width) * 0.5
+    vertices[:, 1] = (indices // width) * 0.5
+    vertices[:, 2] = offset
+
+    # The bottom left corner of each cell whose top right corner exists.
+    corners = indices[(indices % width < width - 1) & (indices + width + 1 < vertex_count)]
+    triangles = numpy.empty((len(corners) * 2, 3), dtype=numpy.int64)
+    triangles[0::2] = numpy.stack([corners, corners + 1, corners + width + 1], axis=1)
+    triangles[1::2] = numpy.stack([corners, corners + width + 1, corners + width], axis=1)
+    return vertices, triangles
+
+
+def model_document(parameters: Parameters) -> Iterator[str]:
+    """
+    Generates the 3dmodel.model document of a synthetic 3MF archive, in pieces.
+    :param parameters: The dimensions of the archive.
+    :return: A sequence of pieces of XML text, which together form the document.
+    """
+    yield f'<?xml version="1.0" encoding="UTF-8"?>\n<model xmlns="{MODEL_NAMESPACE}" unit="millimeter">\n'
+    yield '<metadata name="Title">Benchmark</metadata>\n'
+    if parameters.metadata_size > 0:
+        yield f'<metadata name="Description">{"x" * parameters.metadata_size}</metadata>\n'
+    yield "<resources>\n"
+    has_materials = parameters.materials > 0
+    if has_materials:
+        yield '<basematerials id="1">'
+        for index in range(parameters.materials):
+            yield f'<base name="Material {index}" displaycolor="#{index * 2654435761 % 0x1000000:06X}" />'
+        yield "</basematerials>\n"
+
+    for object_index in range(parameters.objects):
+        vertices, triangles = grid_mesh(parameters.vertices, object_index)
+        objectid = object_index + 2  # The material group has ID 1.
+        material = ' pid="1" pindex="0"' if has_materials else ""
+        yield f'<object id="{objectid}" type="model"{material}><mesh><vertices>'
+        for start in range(0, len(vertices), CHUNK_SIZE):
+            chunk = vertices[start:start + CHUNK_SIZE]
+            yield ('<vertex x="%.4f" y="%.4f" z="%.4f" />' * len(chunk)) % tuple(chunk.ravel().tolist())
+        yield "</vertices><triangles>"
+        for start in range(0, len(triangles), CHUNK_SIZE):
+            chunk = triangles[start:start + CHUNK_SIZE]
+            if parameters.materials > 1:  # Cycle through the materials.
+                values = numpy.empty((len(chunk), 4), dtype=numpy.int64)
+                values[:, :3] = chunk
+                values[:, 3] = numpy.arange(start, start + len(chunk)) % parameters.materials
+                template = '<triangle v1="%d" v2="%d" v3="%d" p1="%d" />'
+            else:
+                values = chunk
+                template = '<triangle v1="%d" v2="%d" v3="%d" />'
+            yield (template * len(values)) % tuple(values.ravel().tolist())
+        yield "</triangles></mesh></object>\n"
+    yield "</resources>\n<build>\n"
+
+    for object_index in range(parameters.objects):
+        for instance in range(parameters.instances):
+            transform = f"1 0 0 0 1 0 0 0 1 {instance * 10} {object_index * 10} 0"
+            yield f'<item objectid="{object_index + 2}" transform="{transform}" />\n'
+    yield "</build>\n</model>\n"
+
+
+def generate_3mf(path: str, parameters: Parameters) -> int:
+    """
+    Writes a synthetic 3MF archive.
+    :param path: The file to write the archive to.
+    :param parameters: The dimensions of the archive.
+    :return: The size of the archive, in bytes.
+    """
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=6) as archive:
+        archive.writestr("[Content_Types].xml", CONTENT_TYPES)
+        archive.writestr("_rels/.rels", RELS)
+        with archive.open("3D/3dmodel.model", "w", force_zip64=True) as f:
+            stream = io.TextIOWrapper(f, encoding="UTF-8", newline="")
+            for piece in model_document(parameters):
+                stream.write(piece)
+            stream.detach()
+    return os.path.getsize(path)
@@ -0,0 +1,384 @@
+# Blender add-on to import and export 3MF files.
+# Copyright (C) 2020 Ghostkeeper
+# Copyright (C) 2025 Jack (modernization for Blender 4.2+)
+# This add-on is free software; you can redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation; either version 2 of the License, or (at your option) any later
+# version.
+# This add-on is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this program; if not, write to the Free
+# Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+# <pep8 compliant>
+
+"""
+Runs the benchmarks of the add-on on synthetic 3MF archives, and writes the results to a JSON file.
+
+Without Blender, the benchmarks run against the mocks of the Blender API that the unit tests use. Only the stages that
+don't need Blender are measured then: reading the archive, parsing the model and formatting the exported model.
+    python benchmarks/run_benchmarks.py --vertices 10000 100000
+
+Inside Blender, the complete import and export operators are measured as well.
+    blender --background --python benchmarks/run_benchmarks.py -- --vertices 10000 100000
+
+Each parameter can be given multiple values. Every combination of values becomes a case to benchmark. The results of
+an earlier run can be compared with through `--compare`.
+"""
+
+import argparse  # To parse the parameters of the benchmarks.
+import datetime  # To record when the benchmarks ran.
+import io  # To write the exported model to the archive as text, and to discard formatted models.
+import itertools  # To make every combination of parameters.
+import json  # To write the results.
+import os  # To find the size of files.
+import os.path  # To find the add-on and the mocks.
+import platform  # To record what the benchmarks ran on.
+import subprocess  # To find the commit that is being benchmarked.
+import sys  # To find the add-on and to read the command line of Blender.
+import tempfile  # To write the archives to.
+import time  # To measure how long each stage takes.
+import tracemalloc  # To measure how much memory each stage needs.
+import xml.etree.ElementTree  # To parse the model like the non-streaming importer does, and to build exported models.
+import zipfile  # To write exported models to.
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    import resource  # To measure the peak memory usage of the process. Not available on Windows.
+except ImportError:
+    resource = None
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+try:
+    import bpy  # Only available when running inside Blender.
+except ImportError:
+    bpy = None
+if bpy is None:
+    import test  # Installs the mocks of the Blender API, and makes the operators instantiable.
+
+import numpy  # To create the mesh data and transformations to export.
+
+from benchmarks.generate import Parameters, generate_3mf, grid_mesh
+import io_mesh_3mf.compression  # To compress exported models the way the exporter does.
+import io_mesh_3mf.import_3mf  # To read archives.
+import io_mesh_3mf.model_reader  # To read archives the way the worker processes do.
+import io_mesh_3mf.model_writer  # To format exported models.
+from io_mesh_3mf.constants import MODEL_LOCATION, MODEL_MIMETYPE, MODEL_NAMESPACE
+
+RESULTS_FORMAT = 2  # Version of the structure of the results file. Increase when it changes incompatibly.
+
+
+def peak_rss() -> Optional[int]:
+    """
+    Get the peak memory usage of this process so far.
+
+    This is a high-water mark of the whole process, which never decreases. It can't tell how much memory a stage uses
+    by itself, only by how much the stage raised it.
+    :return: The largest resident set size of the process, in bytes, or `None` if this platform can't measure it.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # Linux reports kibibytes, macOS reports bytes.
+
+
+def measure(function: Callable[[], Optional[int]], repeat: int, trace_memory: bool,
+            setup: Optional[Callable[[], None]] = None) -> Dict[str, Any]:
+    """
+    Measures one stage of a benchmark.
+    :param function: The stage to measure. It may return the size of its output, in bytes.
+    :param repeat: How often to run the stage. The fastest run counts.
+    :param trace_memory: Whether to run the stage once more while tracing the memory that it allocates.
+    :param setup: Something to do before each run of the stage, which doesn't count towards its time.
+    :return: The fastest time of the stage in seconds, how much the stage raised the peak memory usage of the process,
+    the peak memory allocated by the stage if traced, and the size of its output.
+    """
+    times = []
+    output_size = None
+    rss_before = peak_rss()
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        output_size = function()
+        times.append(time.perf_counter() - start)
+    rss_after = peak_rss()
+    result = {
+        "seconds": min(times),
+        "rss_growth": rss_after - rss_before if rss_after is not None else None,
+        "traced_peak": None,
+        "output_size": output_size,
+    }
+    if trace_memory:
+        if setup is not None:
+            setup()
+        tracemalloc.start()
+        try:
+            function()
+            result["traced_peak"] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def new_importer() -> io_mesh_3mf.import_3mf.Importer:
+    """
+    Creates an importer with the state that it normally sets up when it imports files.
+    :return: An importer.
+    """
+    importer = io_mesh_3mf.import_3mf.create_importer(use_streaming=False, processes=1)
+    importer.reset_state()
+    return importer
+
+
+def read_objects(path: str) -> None:
+    """
+    Reads the materials and objects of an archive the way the importer does without streaming.
+    :param path: The archive to read.
+    """
+    importer = new_importer()
+    for model_file in importer.read_archive(path).get(MODEL_MIMETYPE, []):
+        root = xml.etree.ElementTree.ElementTree(file=model_file).getroot()
+        importer.read_materials(root)
+        importer.read_objects(root)
+
+
+class CountingStream(io.TextIOBase):
+    """
+    A text stream that discards everything written to it, only counting how many characters were written.
+    """
+
+    def __init__(self) -> None:
+        """
+        Creates a stream that hasn't had anything written to it yet.
+        """
+        super().__init__()
+        self.size = 0
+
+    def writable(self) -> bool:
+        """
+        Tells that this stream can be written to.
+        :return: Always `True`.
+        """
+        return True
+
+    def write(self, text: str) -> int:
+        """
+        Counts the characters of some text, and discards it.
+        :param text: The text to write.
+        :return: The number of characters that were written.
+        """
+        self.size += len(text)
+        return len(text)
+
+
+def build_model(parameters: Parameters) -> Tuple[io_mesh_3mf.model_writer.ModelWriter, xml.etree.ElementTree.Element]:
+    """
+    Builds the model of the synthetic archive with the model writer, the way the exporter does without Blender objects.
+    :param parameters: The dimensions of the archive.
+    :return: The model writer that holds the bodies of the mesh elements, and the root element of the document.
+    """
+    writer = io_mesh_3mf.model_writer.ModelWriter()
+    writer.coordinate_precision = 4
+    writer.element_bodies = {}
+
+    root = xml.etree.ElementTree.Element(f"{{{MODEL_NAMESPACE}}}model")
+    resources_element = xml.etree.ElementTree.SubElement(root, f"{{{MODEL_NAMESPACE}}}resources")
+    build_element = xml.etree.ElementTree.SubElement(root, f"{{{MODEL_NAMESPACE}}}build")
+    for object_index in range(parameters.objects):
+        vertices, triangles = grid_mesh(parameters.vertices, object_index)
+        objectid = object_index + 2
+        materials = numpy.arange(len(triangles), dtype=numpy.int32) % max(parameters.materials, 1)
+        overrides = numpy.where(materials == 0, -1, materials)  # The first material is the one of the object.
+        writer.write_mesh_object(
+            resources_element, objectid, vertices.astype(numpy.float32), triangles.astype(numpy.int32), overrides)
+        for instance in range(parameters.instances):
+            transformation = numpy.identity(4)
+            transformation[:3, 3] = (instance * 10, object_index * 10, 0)
+            writer.write_build_item(build_element, objectid, transformation)
+    return writer, root
+
+
+def format_model(parameters: Parameters) -> int:
+    """
+    Formats the model of the synthetic archive with only the model writer, discarding the formatted document.
+    :param parameters: The dimensions of the archive.
+    :return: The size of the formatted document, in characters.
+    """
+    writer, root = build_model(parameters)
+    stream = CountingStream()
+    writer.write_document(stream, root)
+    return stream.size
+
+
+def write_model(path: str, parameters: Parameters) -> int:
+    """
+    Formats the model of the synthetic archive with the model writer and compresses it into an archive, the way the
+    exporter does.
+    :param path: The file to write the archive to.
+    :param parameters: The dimensions of the archive.
+    :return: The size of the written archive, in bytes.
+    """
+    writer, root = build_model(parameters)
+    policy = io_mesh_3mf.compression.CompressionPolicy("DEFLATED", io_mesh_3mf.compression.DEFAULT_COMPRESSION_LEVEL)
+    with zipfile.ZipFile(path, "w") as archive:
+        policy.configure(archive)
+        with policy.open(archive, MODEL_LOCATION, force_zip64=True) as f:
+            stream = io.TextIOWrapper(f, encoding="UTF-8", newline="")
+            writer.write_document(stream, root)
+            stream.detach()
+    return os.path.getsize(path)
+
+
+def benchmark_mocked(path: str, output_path: str, parameters: Parameters, repeat: int,
+                     trace_memory: bool) -> Dict[str, Dict[str, Any]]:
+    """
+    Benchmarks the stages of importing and exporting that don't need Blender.
+    :param path: The synthetic archive to import.
+    :param output_path: The file to export to.
+    :param parameters: The dimensions of the synthetic archive.
+    :param repeat: How often to run each stage.
+    :param trace_memory: Whether to trace the memory that each stage allocates.
+    :return: The measurements of each stage.
+    """
+    def read_archive() -> None:
+        new_importer().read_archive(path)
+
+    def parse_streaming() -> None:
+        io_mesh_3mf.model_reader.prepare_archive(path)
+
+    return {
+        "read_archive": measure(read_archive, repeat, trace_memory),
+        "parse_streaming": measure(parse_streaming, repeat, trace_memory),
+        "read_objects": measure(lambda: read_objects(path), repeat, trace_memory),
+        "format_model": measure(lambda: format_model(parameters), repeat, trace_memory),
+        "write_model": measure(lambda: write_model(output_path, parameters), repeat, trace_memory),
+    }
+
+
+def benchmark_blender(path: str, output_path: str, repeat: int, trace_memory: bool) -> Dict[str, Dict[str, Any]]:
+    """
+    Benchmarks the import and export operators in Blender.
+    :param path: The synthetic archive to import.
+    :param output_path: The file to export to.
+    :param repeat: How often to run each stage.
+    :param trace_memory: Whether to trace the memory that each stage allocates.
+    :return: The measurements of each stage.
+    """
+    def clean_scene() -> None:
+        bpy.ops.wm.read_homefile(use_empty=True)
+
+    def import_archive() -> None:
+        bpy.ops.import_mesh.threemf(filepath=path)
+
+    def export_archive() -> int:
+        bpy.ops.export_mesh.threemf(filepath=output_path)
+        return os.path.getsize(output_path)
+
+    results = {"import": measure(import_archive, repeat, trace_memory, clean_scene)}
+    # The scene now contains the imported objects, ready to export.
+    results["export"] = measure(export_archive, repeat, trace_memory)
+    return results
+
+
+def current_commit() -> Optional[str]:
+    """
+    Finds the commit of the add-on that is being benchmarked.
+    :return: The hash of the commit, or `None` if it can't be found.
+    """
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=PROJECT_ROOT, stderr=subprocess.DEVNULL, text=True).strip()
+    except (EnvironmentError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    """
+    Compares the times of the stages of two runs of the benchmarks.
+    :param results: The results of this run.
+    :param baseline: The results of the run to compare with.
+    :return: A line of text for each stage that was measured in both runs.
+    """
+    baseline_cases = {json.dumps(case["parameters"], sort_keys=True): case for case in baseline["cases"]}
+    lines = []
+    for case in results["cases"]:
+        key = json.dumps(case["parameters"], sort_keys=True)
+        if key not in baseline_cases:
+            continue
+        for stage, measurement in case["stages"].items():
+            if stage not in baseline_cases[key]["stages"]:
+                continue
+            before = baseline_cases[key]["stages"][stage]["seconds"]
+            after = measurement["seconds"]
+            ratio = after / before if before > 0 else float("inf")
+            lines.append(f"{key} {stage}: {before:.3f}s -> {after:.3f}s ({ratio:.2f}x)")
+    return lines
+
+
+def main(arguments: List[str]) -> Dict[str, Any]:
+    """
+    Runs the benchmarks.
+    :param arguments: The command line arguments.
+    :return: The results, as they are written to the results file.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark importing and exporting synthetic 3MF archives.")
+    parser.add_argument("--vertices", type=int, nargs="+", default=[10000, 100000], help="Vertices per object.")
+    parser.add_argument("--objects", type=int, nargs="+", default=[1], help="Number of different objects.")
+    parser.add_argument("--instances", type=int, nargs="+", default=[1], help="Build items per object.")
+    parser.add_argument("--materials", type=int, nargs="+", default=[1], help="Materials used by each object.")
+    parser.add_argument("--metadata-size", type=int, nargs="+", default=[0], help="Bytes of metadata.")
+    parser.add_argument("--repeat", type=int, default=3, help="How often to run each stage. The fastest run counts.")
+    parser.add_argument("--trace-memory", action="store_true", help="Trace the memory allocated by each stage.")
+    parser.add_argument("--output", default="benchmark_results.json", help="The file to write the results to.")
+    parser.add_argument("--compare", help="The results of an earlier run to compare with.")
+    options = parser.parse_args(arguments)
+
+    results = {
+        "format": RESULTS_FORMAT,
+        "commit": current_commit(),
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "blender": bpy.app.version_string if bpy is not None else None,
+        "platform": platform.platform(),
+        "repeat": options.repeat,
+        "cases": [],
+    }
+    if bpy is not None:
+        import io_mesh_3mf
+        try:
+            io_mesh_3mf.register()
+        except ValueError:  # Already registered.
+            pass
+
+    with tempfile.TemporaryDirectory(prefix="3mf_benchmark_") as directory:
+        for values in itertools.product(
+                options.vertices, options.objects, options.instances, options.materials, options.metadata_size):
+            parameters = Parameters(*values)
+            path = os.path.join(directory, "input.3mf")
+            output_path = os.path.join(directory, "output.3mf")
+            stages = {"generate": measure(lambda: generate_3mf(path, parameters), 1, False)}
+            if bpy is None:
+                stages.update(benchmark_mocked(path, output_path, parameters, options.repeat, options.trace_memory))
+            else:
+                stages.update(benchmark_blender(path, output_path, options.repeat, options.trace_memory))
+            results["cases"].append({"parameters": parameters._asdict(), "stages": stages})
+            for stage, measurement in stages.items():
+                print(f"{dict(parameters._asdict())} {stage}: {measurement['seconds']:.3f}s")
+
+    with open(options.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {options.output}")
+
+    if options.compare:
+        with open(options.compare) as f:
+            baseline = json.load(f)
+        for line in compare(results, baseline):
+            print(line)
+    return results
+
+
+if __name__ == "__main__":
+    # Blender passes the arguments for the script after a double dash.
+    main(sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else sys.argv[1:])
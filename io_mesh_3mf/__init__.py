@@ -9,34 +9,40 @@
 # You should have received a copy of the GNU General Public License along with this program; if not, write to the Free
 # Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 
+"""
+Import and export 3MF files in Blender.
+
+Outside of Blender, the modules that don't need Blender can still be used to read and write 3MF files, such as
+`model_reader` and `model_writer`.
+"""
+
 # Reload functionality.
-if "bpy" in locals():
+if "bpy" in locals() and bpy is not None:
     import importlib
     from . import import_3mf, export_3mf
 
     importlib.reload(import_3mf)
     importlib.reload(export_3mf)
-else:
-    from . import import_3mf, export_3mf
 
-import bpy.types  # To (un)register the add-on as an import/export function.
-import bpy.utils  # To (un)register the add-on.
+try:
+    import bpy.types  # To (un)register the add-on as an import/export function.
+    import bpy.utils  # To (un)register the add-on.
+except ImportError:  # Not running in Blender. Only the modules that don't need Blender can be used then.
+    bpy = None
 
-from .export_3mf import Export3MF  # Exports 3MF files.
-from .import_3mf import Import3MF  # Imports 3MF files.
+if bpy is not None:
+    from .export_3mf import Export3MF  # Exports 3MF files.
+    from .import_3mf import Import3MF, Load3MFGeometry  # Imports 3MF files, and the meshes of proxies later.
 
 # IDE and Documentation support.
 __all__ = [
     "Export3MF",
     "Import3MF",
+    "Load3MFGeometry",
     "register",
     "unregister",
 ]
 
-"""
-Import and export 3MF files in Blender.
-"""
-
 
 def menu_import(self, _) -> None:
     """
@@ -52,7 +58,14 @@ def menu_export(self, _) -> None:
     self.layout.operator(Export3MF.bl_idname, text="3D Manufacturing Format (.3mf)")
 
 
-classes = (Import3MF, Export3MF)
+def menu_load_geometry(self, _) -> None:
+    """
+    Calls the operator to load the meshes of 3MF proxies from the menu item.
+    """
+    self.layout.operator(Load3MFGeometry.bl_idname)
+
+
+classes = (Import3MF, Load3MFGeometry, Export3MF) if bpy is not None else ()
 
 
 def register() -> None:
@@ -61,6 +74,7 @@ def register() -> None:
 
     bpy.types.TOPBAR_MT_file_import.append(menu_import)
     bpy.types.TOPBAR_MT_file_export.append(menu_export)
+    bpy.types.VIEW3D_MT_object.append(menu_load_geometry)
 
 
 def unregister() -> None:
@@ -69,6 +83,7 @@ def unregister() -> None:
 
     bpy.types.TOPBAR_MT_file_import.remove(menu_import)
     bpy.types.TOPBAR_MT_file_export.remove(menu_export)
+    bpy.types.VIEW3D_MT_object.remove(menu_load_geometry)
 
 
 # Allow the add-on to be ran directly without installation.
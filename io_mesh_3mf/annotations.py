@@ -18,7 +18,10 @@ import xml.etree.ElementTree  # To parse the relationships files.
 from typing import Dict, Set, IO
 import zipfile
 
-import bpy  # To store the annotations long-term in the Blender context.
+try:
+    import bpy  # To store the annotations long-term in the Blender context.
+except ImportError:  # Not running in Blender. The annotations can only be read from and written to archives then.
+    bpy = None
 
 from .constants import (
     RELS_FOLDER,
@@ -0,0 +1,172 @@
+# Blender add-on to import and export 3MF files.
+# Copyright (C) 2020 Ghostkeeper
+# Copyright (C) 2025 Jack (modernization for Blender 4.2+)
+# This add-on is free software; you can redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation; either version 2 of the License, or (at your option) any later
+# version.
+# This add-on is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this program; if not, write to the Free
+# Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+# <pep8 compliant>
+
+"""
+Converts whole directories of 3MF files in one Blender session, without the user interface.
+
+Each file is imported, and then exported again with the export options, for instance to recompress it. Run it from the
+command line with:
+
+    blender --background --python-expr "import sys; from io_mesh_3mf import batch; sys.exit(batch.main())" -- in out
+
+Use `--help` after the `--` for the options.
+"""
+
+import argparse  # To parse the command line.
+import fnmatch  # To select the files to convert.
+import logging  # To report on the progress.
+import os  # To find the files to convert.
+import os.path  # To construct the paths of the output files.
+import sys  # To get the command line.
+from typing import Any, Dict, List, Optional, Tuple
+
+import bpy  # To clear the scene between files.
+
+from .annotations import ANNOTATION_FILE  # To clear the annotations between files.
+from .compression import DEFAULT_COMPRESSION_LEVEL  # The default of the command line option.
+from .diagnostics import MeshDataError  # To continue with the next file when a file is broken in strict mode.
+from .export_3mf import create_exporter  # To write the files.
+from .import_3mf import create_importer  # To read the files.
+from .metadata import Metadata  # To clear the scene metadata between files.
+from .preservation import PRESERVED_FILE  # To clear the preserved files between files.
+
+# IDE and Documentation support.
+__all__ = [
+    "clear_imported_data",
+    "convert_directory",
+    "main",
+]
+
+log = logging.getLogger(__name__)
+
+
+def clear_imported_data(blender_objects: List[bpy.types.Object]) -> None:
+    """
+    Removes the objects of an imported file from the Blender data, along with the metadata, annotations and preserved
+    files of the file, so that the next file starts from a clean scene.
+
+    The materials are kept, so that the next file can reuse them.
+    :param blender_objects: The objects that were imported.
+    """
+    meshes = {blender_object.data for blender_object in blender_objects if blender_object.data is not None}
+    bpy.data.batch_remove(list(blender_objects) + list(meshes))
+
+    for text_name in (ANNOTATION_FILE, PRESERVED_FILE):
+        if text_name in bpy.data.texts:
+            bpy.data.texts.remove(bpy.data.texts[text_name])
+
+    scene = bpy.context.scene
+    scene_metadata = Metadata()
+    scene_metadata.retrieve(scene)
+    for entry in scene_metadata.values():
+        if entry.name != "Title" and entry.name in scene:  # The title is the name of the scene, not a property.
+            del scene[entry.name]
+
+
+def convert_directory(input_directory: str, output_directory: str, pattern: str = "*.3mf",
+                      import_options: Optional[Dict[str, Any]] = None,
+                      export_options: Optional[Dict[str, Any]] = None) -> List[Tuple[str, Optional[str]]]:
+    """
+    Converts all 3MF files in a directory, one by one.
+
+    The same importer and exporter are used for all files, so that the materials created for one file are reused by
+    the next. The scene is cleared of each file after it is converted. Files that can't be converted are reported and
+    skipped.
+    :param input_directory: The directory with the files to convert.
+    :param output_directory: The directory to write the converted files to, with the same file names. It is created if
+    it doesn't exist.
+    :param pattern: The pattern of the names of the files to convert.
+    :param import_options: The options to import with. See `create_importer`.
+    :param export_options: The options to export with. See `create_exporter`.
+    :return: For each file, its path and `None` if it was converted, or an error message if it wasn't.
+    """
+    importer = create_importer(**(import_options or {}))
+    exporter = create_exporter(**(export_options or {}))
+    os.makedirs(output_directory, exist_ok=True)
+
+    results = []
+    for filename in sorted(fnmatch.filter(os.listdir(input_directory), pattern)):
+        input_path = os.path.join(input_directory, filename)
+        output_path = os.path.join(output_directory, filename)
+        blender_objects = []
+        error = None
+        logged = False  # Whether the error was already logged, with its traceback.
+        try:
+            blender_objects = importer.import_files(bpy.context, [input_path])
+            if "FINISHED" not in exporter.export_objects(bpy.context, blender_objects, output_path):
+                error = f"Unable to write 3MF archive to {output_path}"
+        except MeshDataError as e:  # Strict mode, and the mesh data has a problem.
+            error = f"Import aborted: {e}"
+            blender_objects = importer.imported_objects  # Some objects may be complete already.
+        except Exception as e:  # Anything else, like a broken archive or an output path that can't be written.
+            error = f"{type(e).__name__}: {e}"
+            log.exception(f"Unable to convert {input_path}: {error}")
+            logged = True
+            blender_objects = importer.imported_objects
+        finally:
+            clear_imported_data(blender_objects)
+
+        if error is None:
+            log.info(f"Converted {input_path} to {output_path}.")
+        elif not logged:
+            log.error(f"Unable to convert {input_path}: {error}")
+        results.append((input_path, error))
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Converts a directory of 3MF files as specified on the command line.
+
+    When running in Blender, only the arguments after `--` are used, since the rest are Blender's own.
+    :param argv: The command line arguments. Defaults to the arguments of this process.
+    :return: The exit code: 0 if all files were converted, or 1 if some failed.
+    """
+    if argv is None:
+        argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+    parser = argparse.ArgumentParser(description="Convert a directory of 3MF files in one Blender session.")
+    parser.add_argument("input_directory", help="Directory with the 3MF files to convert.")
+    parser.add_argument("output_directory", help="Directory to write the converted files to.")
+    parser.add_argument("--pattern", default="*.3mf", help="Pattern of the names of the files to convert.")
+    parser.add_argument("--scale", type=float, default=1.0, help="Scale to import with.")
+    parser.add_argument("--strict", action="store_true", help="Skip files with broken vertices or triangles.")
+    parser.add_argument("--precision", type=int, default=4, help="Number of decimals of the coordinates to write.")
+    parser.add_argument("--compression", choices=["DEFLATED", "STORED"], default="DEFLATED",
+                        help="How to compress the files in the archives.")
+    parser.add_argument("--compression-level", type=int, default=DEFAULT_COMPRESSION_LEVEL,
+                        help="How strongly to compress, from 0 to 9.")
+    parser.add_argument("--instrumentation", choices=["OFF", "TIME", "MEMORY"], default="OFF",
+                        help="What to measure of each import and export.")
+    arguments = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    results = convert_directory(
+        arguments.input_directory,
+        arguments.output_directory,
+        arguments.pattern,
+        import_options={
+            "global_scale": arguments.scale,
+            "processes": 1,  # One file at a time.
+            "use_strict": arguments.strict,
+            "instrumentation_level": arguments.instrumentation,
+        },
+        export_options={
+            "coordinate_precision": arguments.precision,
+            "compression_method": arguments.compression,
+            "compression_level": arguments.compression_level,
+            "instrumentation_level": arguments.instrumentation,
+        },
+    )
+    failed = [path for path, error in results if error is not None]
+    log.info(f"Converted {len(results) - len(failed)} of {len(results)} files.")
+    return 1 if failed else 0
@@ -0,0 +1,389 @@
+# Blender add-on to import and export 3MF files.
+# Copyright (C) 2020 Ghostkeeper
+# Copyright (C) 2025 Jack (modernization for Blender 4.2+)
+# This add-on is free software; you can redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation; either version 2 of the License, or (at your option) any later
+# version.
+# This add-on is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this program; if not, write to the Free
+# Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+# <pep8 compliant>
+
+"""
+This module decides how each file in a 3MF archive gets compressed.
+"""
+
+import collections  # A queue of blocks that are being compressed.
+import concurrent.futures  # To compress blocks in parallel.
+import fnmatch  # To match file names in the archive against the patterns of the policy.
+import io  # To close the parallel compressor along with the file that it compresses.
+import logging  # To report when parallel compression is not available.
+import os  # To find the number of processors.
+import struct  # To find the compressed data of files in archives.
+import sys  # To check if the zipfile module of this version of Python can copy compressed files.
+import zipfile  # The compression methods, and the archives to write files into.
+import zlib  # To compress blocks of data.
+from typing import Dict, IO, Iterable, Optional, Tuple
+
+# IDE and Documentation support.
+__all__ = [
+    "COMPRESSION_METHODS",
+    "DEFAULT_COMPRESSION_LEVEL",
+    "DEFAULT_STORED_PARTS",
+    "CompressionPolicy",
+    "ParallelDeflateStream",
+    "ParallelDeflater",
+    "copy_compressed",
+]
+
+log = logging.getLogger(__name__)
+
+COMPRESSION_METHODS: Dict[str, int] = {  # The compression methods that 3MF archives can use, by name.
+    "DEFLATED": zipfile.ZIP_DEFLATED,
+    "STORED": zipfile.ZIP_STORED,
+}
+DEFAULT_COMPRESSION_LEVEL: int = 6  # Almost as small as level 9 for 3MF documents, but much faster.
+# File types that are compressed already. Deflating them again costs time, but hardly makes them smaller.
+DEFAULT_STORED_PARTS: str = "*.png, *.jpg, *.jpeg, *.gif, *.webp, *.zip, *.gz"
+ZLIB_COMPRESSOR_TYPE = type(zlib.compressobj())  # What the zipfile module compresses files with.
+PARALLEL_BLOCK_SIZE: int = 1 << 20  # Size of the blocks of data that are compressed independently, in bytes.
+DEFLATE_WINDOW_SIZE: int = 1 << 15  # Deflate may refer back this many bytes, so that's what a block needs to know.
+ENCRYPTED_FLAG: int = 0x1  # Flag of files in zip archives that are encrypted.
+# The zipfile module has no public way to write data that is compressed already, so copying compressed files relies on
+# its internals. These are the versions of Python whose internals were checked, and the internals that are needed.
+RAW_COPY_PYTHON_VERSIONS: Tuple[Tuple[int, int], Tuple[int, int]] = ((3, 8), (3, 13))
+RAW_COPY_ATTRIBUTES: Tuple[str, ...] = (
+    "_writing", "_seekable", "_lock", "_writecheck", "_didModify", "start_dir", "_allowZip64", "fp"
+)
+
+
+class CompressionPolicy:
+    """
+    Determines the compression method and level for each file in a 3MF archive.
+
+    All files get the same compression method and level, except files that match one of the patterns of files to store.
+    Those are stored without compression, for instance because they are compressed already.
+    """
+
+    def __init__(self, method: str = "DEFLATED", level: int = DEFAULT_COMPRESSION_LEVEL,
+                 stored_parts: Iterable[str] = (), threads: int = 1):
+        """
+        Creates a new compression policy.
+        :param method: The name of the compression method to use for most files, one of `COMPRESSION_METHODS`.
+        :param level: The compression level to use for deflated files, from 0 (fastest) to 9 (smallest).
+        :param stored_parts: Patterns of file names in the archive (such as `"*.png"` or `"Metadata/*"`) that need to be
+        stored without compression.
+        :param threads: The number of threads to deflate large files with, or 0 to use one thread per processor.
+        """
+        if method not in COMPRESSION_METHODS:
+            raise ValueError(f"Unknown compression method: {method}")
+        if not 0 <= level <= 9:
+            raise ValueError(f"Compression level must be between 0 and 9, but is {level}")
+        self.method = COMPRESSION_METHODS[method]
+        self.level = level
+        self.stored_parts = [pattern.strip() for pattern in stored_parts if pattern.strip()]
+        self.threads = threads if threads > 0 else (os.cpu_count() or 1)
+
+    @classmethod
+    def from_string(cls, method: str, level: int, stored_parts: str, threads: int = 1) -> "CompressionPolicy":
+        """
+        Creates a compression policy with the patterns of files to store given as one comma-separated string.
+
+        This is how the patterns are given in the export options.
+        :param method: The name of the compression method to use for most files, one of `COMPRESSION_METHODS`.
+        :param level: The compression level to use for deflated files, from 0 (fastest) to 9 (smallest).
+        :param stored_parts: Comma-separated patterns of file names that need to be stored without compression.
+        :param threads: The number of threads to deflate large files with, or 0 to use one thread per processor.
+        :return: A compression policy.
+        """
+        return cls(method, level, stored_parts.split(","), threads)
+
+    def settings(self, filename: str) -> Tuple[int, Optional[int]]:
+        """
+        Get the compression settings for a file in the archive.
+        :param filename: The path to the file within the archive.
+        :return: The compression method, and the compression level or `None` if the file doesn't get deflated.
+        """
+        for pattern in self.stored_parts:
+            if fnmatch.fnmatchcase(filename.lower(), pattern.lower()):
+                return zipfile.ZIP_STORED, None
+        if self.method == zipfile.ZIP_STORED:
+            return zipfile.ZIP_STORED, None
+        return self.method, self.level
+
+    def configure(self, archive: zipfile.ZipFile) -> None:
+        """
+        Set the default compression of an archive to the compression of this policy.
+
+        Files opened in the archive without going through this policy will get this compression.
+        :param archive: The archive to configure.
+        """
+        archive.compression = self.method
+        archive.compresslevel = None if self.method == zipfile.ZIP_STORED else self.level
+
+    def open(self, archive: zipfile.ZipFile, filename: str, force_zip64: bool = False,
+             parallel: bool = False) -> IO[bytes]:
+        """
+        Opens a new file in an archive for writing, with the compression that this policy prescribes for it.
+        :param archive: The archive to write the file into.
+        :param filename: The path to the file within the archive.
+        :param force_zip64: Whether the file may become larger than 2GiB.
+        :param parallel: Whether to deflate the file with multiple threads, if the policy has multiple threads. Only
+        worthwhile for large files.
+        :return: A binary stream to write the contents of the file into.
+        """
+        method, level = self.settings(filename)
+        archive.compression = method
+        archive.compresslevel = level
+        try:
+            stream = archive.open(filename, "w", force_zip64=force_zip64)
+        finally:
+            self.configure(archive)  # Restore the defaults for files that are written without this policy.
+
+        if parallel and method == zipfile.ZIP_DEFLATED and self.threads > 1:
+            # The zip file stream compresses everything written to it with its compressor. Substitute one that
+            # compresses in parallel. The stream still computes the checksum and sizes as usual. This relies on how the
+            # zipfile module writes files, so only substitute the compressor if it is the zlib compressor we expect.
+            if isinstance(getattr(stream, "_compressor", None), ZLIB_COMPRESSOR_TYPE):
+                deflater = ParallelDeflater(level, self.threads)
+                stream._compressor = deflater
+                return ParallelDeflateStream(stream, deflater)
+            log.warning("Parallel compression is not available in this version of Python. Compressing serially.")
+        return stream
+
+
+class ParallelDeflateStream(io.BufferedIOBase):
+    """
+    A file in an archive that is being written with a parallel compressor.
+
+    This closes the compressor along with the file, so that its threads are stopped even if writing the file fails.
+    """
+
+    def __init__(self, stream: IO[bytes], deflater: "ParallelDeflater"):
+        """
+        Wraps a file in an archive.
+        :param stream: The file in the archive, which compresses with the parallel compressor.
+        :param deflater: The parallel compressor of the file.
+        """
+        super().__init__()
+        self.stream = stream
+        self.deflater = deflater
+
+    def writable(self) -> bool:
+        """
+        Tells that this stream can be written to.
+        :return: Always `True`.
+        """
+        return True
+
+    def write(self, data: bytes) -> int:
+        """
+        Writes data into the file in the archive.
+        :param data: The data to write.
+        :return: The number of bytes written.
+        """
+        return self.stream.write(data)
+
+    def close(self) -> None:
+        """
+        Completes the file in the archive, and stops the threads of the compressor.
+        """
+        if self.closed:
+            return
+        try:
+            self.stream.close()
+        finally:
+            self.deflater.close()
+            super().close()
+
+
+class ParallelDeflater:
+    """
+    Compresses data with deflate, using multiple threads.
+
+    The data is split into blocks, which are compressed independently in a pool of threads. Each block gets the last
+    32kB of the block before it as dictionary, so the compression is almost as good as compressing all data at once.
+    Each block but the last ends at a byte boundary without ending the deflate stream. The compressed blocks can then
+    simply be concatenated into one deflate stream.
+
+    This has the same interface as the compressor objects from `zlib.compressobj`, which is what zip file streams use
+    to compress their data.
+    """
+
+    def __init__(self, level: int, threads: int, block_size: int = PARALLEL_BLOCK_SIZE):
+        """
+        Creates a compressor that compresses in parallel.
+        :param level: The compression level, from 0 (fastest) to 9 (smallest).
+        :param threads: The number of threads to compress with.
+        :param block_size: The size of the blocks that are compressed independently, in bytes.
+        """
+        self.level = level
+        self.threads = threads
+        self.block_size = block_size
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=threads)
+        self.pending = collections.deque()  # Blocks that are being compressed, in order.
+        self.buffer = bytearray()  # Data that is not yet enough to fill a block.
+        self.dictionary = b""  # The end of the previous block.
+
+    def compress(self, data: bytes) -> bytes:
+        """
+        Adds data to compress.
+        :param data: The data to compress.
+        :return: Compressed data of blocks that have been completed so far, if any.
+        """
+        self.buffer += data
+        while len(self.buffer) >= self.block_size:
+            self.submit(bytes(self.buffer[:self.block_size]), final=False)
+            del self.buffer[:self.block_size]
+        return self.collect(wait=False)
+
+    def flush(self) -> bytes:
+        """
+        Compresses the remaining data and ends the deflate stream.
+        :return: The compressed data that was not returned yet.
+        """
+        try:
+            self.submit(bytes(self.buffer), final=True)
+            self.buffer = bytearray()
+            return self.collect(wait=True)
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        """
+        Stops the threads, cancelling the blocks that were not compressed yet.
+
+        This is done when the data is flushed, but must also be done if compressing is abandoned halfway.
+        """
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        self.pending.clear()
+
+    def __enter__(self) -> "ParallelDeflater":
+        """
+        Uses the compressor in a `with` block, which stops its threads at the end.
+        :return: This compressor.
+        """
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        """
+        Stops the threads of the compressor at the end of a `with` block.
+        """
+        self.close()
+
+    def submit(self, block: bytes, final: bool) -> None:
+        """
+        Starts compressing a block of data in the thread pool.
+
+        To keep the memory usage bounded, this waits for the oldest block to complete if too many blocks are pending.
+        :param block: The data to compress.
+        :param final: Whether this is the last block of the data.
+        """
+        self.pending.append(self.executor.submit(self.deflate_block, block, self.dictionary, final))
+        self.dictionary = block[-DEFLATE_WINDOW_SIZE:]
+        if len(self.pending) > self.threads * 2:
+            concurrent.futures.wait([self.pending[0]])
+
+    def collect(self, wait: bool) -> bytes:
+        """
+        Get the compressed data of the blocks that are done, in order.
+        :param wait: Whether to wait for all pending blocks to complete.
+        :return: The compressed data of the blocks that are done.
+        """
+        result = []
+        while self.pending and (wait or self.pending[0].done()):
+            result.append(self.pending.popleft().result())
+        return b"".join(result)
+
+    def deflate_block(self, block: bytes, dictionary: bytes, final: bool) -> bytes:
+        """
+        Compresses one block of data.
+
+        This is executed in the thread pool. The zlib module releases the GIL while compressing, so the blocks really
+        are compressed in parallel.
+        :param block: The data to compress.
+        :param dictionary: The data preceding this block, which the compressed data may refer to.
+        :param final: Whether this is the last block of the data, which ends the deflate stream.
+        :return: The compressed block.
+        """
+        if dictionary:
+            compressor = zlib.compressobj(self.level, zlib.DEFLATED, -15, zdict=dictionary)
+        else:
+            compressor = zlib.compressobj(self.level, zlib.DEFLATED, -15)
+        return compressor.compress(block) + compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+def copy_compressed(source: zipfile.ZipFile, member: str, archive: zipfile.ZipFile, filename: str,
+                    contents: bytes) -> bool:
+    """
+    Copies a file from one archive to another without decompressing and compressing it again.
+
+    The compressed data and checksum are copied as they are, so the file keeps the compression it had in the source
+    archive. This is only done if the file in the source archive still has the given contents.
+
+    The zipfile module has no way to write compressed data directly, so this writes the file the same way that the
+    module itself does, using its internals. This is only done for the versions of Python in `RAW_COPY_PYTHON_VERSIONS`,
+    whose internals are known. Everything is checked before anything is written, so if the file can't be copied, the
+    archive is left as it was and the file can be written the normal way.
+    :param source: The archive to copy the file from.
+    :param member: The path to the file within the source archive.
+    :param archive: The archive to copy the file into.
+    :param filename: The path to the file within the archive to copy it into.
+    :param contents: The contents that the file must have.
+    :return: Whether the file was copied. If not, it must be written the normal way.
+    """
+    oldest, newest = RAW_COPY_PYTHON_VERSIONS
+    if not oldest <= sys.version_info[:2] <= newest:
+        return False  # This version of Python may write archives differently.
+    if not all(hasattr(archive, attribute) for attribute in RAW_COPY_ATTRIBUTES):
+        return False
+    if archive._writing or not archive._seekable:
+        return False  # Another file is being written, or the archive is written to a stream that can't seek.
+    try:
+        info = source.getinfo(member)
+    except KeyError:
+        return False  # The file is not in the source archive any more.
+    if info.flag_bits & ENCRYPTED_FLAG or info.compress_type not in COMPRESSION_METHODS.values():
+        return False  # Can't copy files that are encrypted, or compressed in a way that 3MF doesn't allow.
+    if info.file_size != len(contents) or info.CRC != zlib.crc32(contents):
+        return False  # The source archive changed since the file was read from it.
+    zip64 = max(info.file_size, info.compress_size) > zipfile.ZIP64_LIMIT
+    if zip64 and not archive._allowZip64:
+        return False
+
+    try:  # Find the compressed data, behind the local header of the file.
+        source.fp.seek(info.header_offset)
+        header = struct.unpack(zipfile.structFileHeader, source.fp.read(zipfile.sizeFileHeader))
+        if header[0] != zipfile.stringFileHeader:
+            return False
+        source.fp.seek(info.header_offset + zipfile.sizeFileHeader + header[10] + header[11])  # Name and extra field.
+        data = source.fp.read(info.compress_size)
+    except (EnvironmentError, struct.error):
+        return False
+    if len(data) != info.compress_size:
+        return False  # The source archive is truncated.
+
+    copy = zipfile.ZipInfo(filename, info.date_time)
+    copy.compress_type = info.compress_type
+    copy.CRC = info.CRC
+    copy.compress_size = info.compress_size
+    copy.file_size = info.file_size
+    copy.external_attr = info.external_attr or 0o600 << 16  # Same default permissions as the zipfile module.
+    with archive._lock:
+        try:  # Everything that can go wrong before writing. The archive is still unchanged then.
+            archive._writecheck(copy)
+            copy.header_offset = archive.start_dir
+            header = copy.FileHeader(zip64)
+        except (ValueError, TypeError, struct.error, zipfile.LargeZipFile) as e:
+            log.debug(f"Unable to copy {member} without compressing it again: {e}")
+            return False
+        archive.fp.seek(archive.start_dir)
+        archive._didModify = True
+        archive.fp.write(header)
+        archive.fp.write(data)
+        archive.start_dir = archive.fp.tell()
+        archive.filelist.append(copy)
+        archive.NameToInfo[filename] = copy
+    return True
@@ -0,0 +1,107 @@
+# Blender add-on to import and export 3MF files.
+# Copyright (C) 2020 Ghostkeeper
+# Copyright (C) 2025 Jack (modernization for Blender 4.2+)
+# This add-on is free software; you can redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation; either version 2 of the License, or (at your option) any later
+# version.
+# This add-on is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this program; if not, write to the Free
+# Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+# <pep8 compliant>
+
+"""
+This module collects the problems found in the mesh data of 3MF files, to report them together.
+"""
+
+import itertools  # To take only the first few examples of a problem.
+from typing import Dict, Iterable, List, Optional
+
+# IDE and Documentation support.
+__all__ = [
+    "DEFAULT_EXAMPLES",
+    "Diagnostics",
+    "MeshDataError",
+]
+
+DEFAULT_EXAMPLES: int = 3  # How many examples of each kind of problem to include in the report of an object.
+
+
+class MeshDataError(ValueError):
+    """
+    Raised in strict mode when the mesh data of a 3MF file has a problem.
+    """
+    pass
+
+
+class Diagnostics:
+    """
+    Collects problems with the vertices and triangles of an object, to report them once the object is complete.
+
+    A broken file may contain millions of broken vertices or triangles. Reporting each of them separately would flood
+    the reports and the log, and would take much longer than reading the file. Instead, the problems are counted by
+    kind, and only the first few examples of each kind are kept. Once the object is complete, all of its problems are
+    summarised in a single message.
+
+    In strict mode, the first problem raises a `MeshDataError` instead.
+    """
+
+    def __init__(self, strict: bool = False, examples: int = DEFAULT_EXAMPLES):
+        """
+        Creates a collector without any problems.
+        :param strict: Whether to raise an error at the first problem, rather than collecting them.
+        :param examples: How many examples of each kind of problem to keep.
+        """
+        self.strict = strict
+        self.examples = examples
+        self.counts: Dict[str, int] = {}  # How often each kind of problem occurred, in order of first occurrence.
+        self.found_examples: Dict[str, List[str]] = {}  # The first examples of each kind of problem.
+
+    def add(self, problem: str, example: str) -> None:
+        """
+        Records a problem.
+        :param problem: The kind of problem, as a plural noun phrase, such as "vertices with a broken coordinate".
+        :param example: Details of this occurrence of the problem, such as the value that was broken.
+        """
+        if self.strict:
+            raise MeshDataError(f"Found {problem}: {example}")
+        count = self.counts.get(problem, 0)
+        self.counts[problem] = count + 1
+        if count < self.examples:
+            self.found_examples.setdefault(problem, []).append(example)
+
+    def add_many(self, problem: str, count: int, examples: Iterable[str]) -> None:
+        """
+        Records many occurrences of the same problem at once, such as when they were found in bulk.
+        :param problem: The kind of problem, as a plural noun phrase, such as "vertices with a broken coordinate".
+        :param count: How often the problem occurred.
+        :param examples: Details of the first occurrences of the problem. Only as many as are kept are taken from it.
+        """
+        if count <= 0:
+            return
+        examples = iter(examples)
+        if self.strict:
+            raise MeshDataError(f"Found {problem}: {next(examples, '')}")
+        self.counts[problem] = self.counts.get(problem, 0) + count
+        found = self.found_examples.setdefault(problem, [])
+        found.extend(itertools.islice(examples, max(self.examples - len(found), 0)))
+
+    def summary(self, subject: str) -> Optional[str]:
+        """
+        Summarises the problems recorded so far in one message, and forgets them.
+        :param subject: What the problems were found in, such as "Object 3".
+        :return: A message with the number of each kind of problem and their first examples, or `None` if no problems
+        were recorded.
+        """
+        if not self.counts:
+            return None
+        parts = []
+        for problem, count in self.counts.items():
+            examples = ", ".join(self.found_examples[problem])
+            if count > len(self.found_examples[problem]):
+                examples += ", ..."
+            parts.append(f"{count} {problem} ({examples})")
+        self.counts = {}
+        self.found_examples = {}
+        return f"{subject} has " + "; ".join(parts)
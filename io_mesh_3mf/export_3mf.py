@@ -1,10 +1,10 @@
-﻿import base64  # To decode files that must be preserved.
-import collections  # Counter, to find the most common material of an object.
-import itertools
+﻿import io  # To write the 3MF document as text to the archive.
 import logging  # To debug and log progress.
 import xml.etree.ElementTree  # To write XML documents with the 3D model data.
 import zipfile  # To write zip archives, the shell of the 3MF file.
-from typing import Optional, Dict, Set, List, Tuple
+from typing import Optional, Dict, Set, List, Tuple, Iterable, TextIO
+
+import numpy  # To get mesh data from Blender in bulk.
 
 import bpy  # The Blender API.
 import bpy.props  # To define metadata properties for the operator.
@@ -14,15 +14,23 @@ import bpy_extras.node_shader_utils  # Converting material colors to sRGB.
 import mathutils  # For the transformation matrices.
 
 from .annotations import Annotations  # To store file annotations
+from .compression import (  # To decide how to compress each file in the archive.
+    CompressionPolicy,
+    DEFAULT_COMPRESSION_LEVEL,
+    DEFAULT_STORED_PARTS,
+    copy_compressed,
+)
 from .constants import (
     MODEL_LOCATION,
     MODEL_NAMESPACE,
     MODEL_DEFAULT_UNIT,
-    conflicting_mustpreserve_contents,
 )
+from .instrumentation import INSTRUMENTATION_LEVELS, Instrumentation, last_reports  # To measure each stage.
 from .metadata import (
     Metadata,  # To store metadata from the Blender scene into the 3MF file.
 )
+from .model_writer import ModelWriter  # To write the 3MF document.
+from .preservation import PreservedFiles  # To write the files that must be preserved.
 from .unit_conversions import blender_to_metre, threemf_to_metre
 
 # Blender add-on to import and export 3MF files.
@@ -39,44 +47,25 @@ from .unit_conversions import blender_to_metre, threemf_to_metre
 # <pep8 compliant>
 
 # IDE and Documentation support.
-__all__ = ["Export3MF"]
+__all__ = [
+    "Export3MF",
+    "Exporter",
+    "create_exporter",
+    "export_3mf",
+]
 
 log = logging.getLogger(__name__)
 
 
-class Export3MF(bpy.types.Operator, bpy_extras.io_utils.ExportHelper):
-    """
-    Operator that exports a 3MF file from Blender.
+class Exporter(ModelWriter):
     """
+    Writes Blender objects to a 3MF archive.
 
-    # Metadata.
-    bl_idname = "export_mesh.threemf"
-    bl_label = "Export 3MF"
-    bl_description = "Save the current scene to 3MF"
-    filename_ext = ".3mf"
+    The `Export3MF` operator runs this for the user, while scripts can call `export_3mf` to export objects without the
+    overhead of the operator.
 
-    # Options for the user.
-    filter_glob: bpy.props.StringProperty(default="*.3mf", options={"HIDDEN"})
-    use_selection: bpy.props.BoolProperty(
-        name="Selection Only",
-        description="Export selected objects only.",
-        default=False,
-    )
-    global_scale: bpy.props.FloatProperty(
-        name="Scale", default=1.0, soft_min=0.001, soft_max=1000.0, min=1e-6, max=1e6
-    )
-    use_mesh_modifiers: bpy.props.BoolProperty(
-        name="Apply Modifiers",
-        description="Apply the modifiers before saving.",
-        default=True,
-    )
-    coordinate_precision: bpy.props.IntProperty(
-        name="Precision",
-        description="The number of decimal digits to use in coordinates in the file.",
-        default=4,
-        min=0,
-        max=12,
-    )
+    The options of the export are taken from attributes with the same names as the properties of `Export3MF`.
+    """
 
     def safe_report(self, level: Set[str], message: str) -> None:
         """
@@ -89,28 +78,47 @@ class Export3MF(bpy.types.Operator, bpy_extras.io_utils.ExportHelper):
             self.report(level, message)
         # If report is not available, the message has already been logged via the log module
 
-    def execute(self, context: bpy.types.Context) -> Set[str]:
+    def export_objects(self, context: bpy.types.Context, blender_objects: Iterable[bpy.types.Object],
+                       filepath: str) -> Set[str]:
         """
-        The main routine that writes the 3MF archive.
-
-        This function serves as a high-level overview of the steps involved to write a 3MF file.
+        Writes objects to a 3MF archive.
         :param context: The Blender context.
+        :param blender_objects: The objects to write. Their children are written along with them.
+        :param filepath: The path to write the archive to.
         :return: A set of status flags to indicate whether the write succeeded or not.
         """
         # Reset state.
         self.next_resource_id = 1  # Starts counting at 1 for some inscrutable reason.
         self.material_resource_id = -1
         self.num_written = 0
+        self.shared_mesh_resources = {}
+        self.element_bodies = {}
+        self.instrumentation = Instrumentation(self.instrumentation_level)
+        self.instrumentation.start()
+        try:
+            return self.write_file(context, list(blender_objects), filepath)
+        finally:
+            self.instrumentation.stop()
+            if self.instrumentation.enabled:
+                log.info(f"Export instrumentation: {self.instrumentation.summary()}")
+                last_reports["export"] = self.instrumentation.report()
+
+    def write_file(self, context: bpy.types.Context, blender_objects: List[bpy.types.Object],
+                   filepath: str) -> Set[str]:
+        """
+        Writes the 3MF archive.
 
-        archive = self.create_archive(self.filepath)
+        This function serves as a high-level overview of the steps involved to write a 3MF file.
+        :param context: The Blender context.
+        :param blender_objects: The objects to write.
+        :param filepath: The path to write the archive to.
+        :return: A set of status flags to indicate whether the write succeeded or not.
+        """
+        with self.instrumentation.span("create_archive"):
+            archive = self.create_archive(filepath)
         if archive is None:
             return {"CANCELLED"}
 
-        if self.use_selection:
-            blender_objects = context.selected_objects
-        else:
-            blender_objects = context.scene.objects
-
         global_scale = self.unit_scale(context)
 
         # Due to an open bug in Python 3.7 (Blender's version) we need to prefix all elements with the namespace.
@@ -125,28 +133,27 @@ class Export3MF(bpy.types.Operator, bpy_extras.io_utils.ExportHelper):
         resources_element = xml.etree.ElementTree.SubElement(
             root, f"{{{MODEL_NAMESPACE}}}resources"
         )
-        self.material_name_to_index = self.write_materials(
-            resources_element, blender_objects
-        )
-        self.write_objects(root, resources_element, blender_objects, global_scale)
-
-        document = xml.etree.ElementTree.ElementTree(root)
-        with archive.open(MODEL_LOCATION, "w", force_zip64=True) as f:
-            document.write(
-                f,
-                xml_declaration=True,
-                encoding="UTF-8",
-                default_namespace=MODEL_NAMESPACE,
+        with self.instrumentation.span("write_materials"):
+            self.material_name_to_index = self.write_materials(
+                resources_element, blender_objects
             )
+
+        # Write the objects directly to the archive, so that the document never needs to be held in memory completely.
+        with self.instrumentation.span("write_model"):
+            with self.compression_policy.open(archive, MODEL_LOCATION, force_zip64=True, parallel=True) as f:
+                stream = io.TextIOWrapper(f, encoding="UTF-8", newline="")
+                self.write_model(stream, root, resources_element, blender_objects, global_scale)
+                stream.detach()  # Flushes the text, but leaves closing the file in the archive to the context manager.
         try:
-            archive.close()
+            with self.instrumentation.span("close_archive"):
+                archive.close()
         except EnvironmentError as e:
             log.error(f"Unable to complete writing to 3MF archive: {e}")
             self.safe_report({'ERROR'}, f"Unable to complete writing to 3MF archive: {e}")
             return {"CANCELLED"}
 
-        log.info(f"Exported {self.num_written} objects to 3MF archive {self.filepath}.")
-        self.safe_report({'INFO'}, f"Exported {self.num_written} objects to {self.filepath}")
+        log.info(f"Exported {self.num_written} objects to 3MF archive {filepath}.")
+        self.safe_report({'INFO'}, f"Exported {self.num_written} objects to {filepath}")
         return {"FINISHED"}
 
     # The rest of the functions are in order of when they are called.
@@ -160,16 +167,19 @@ class Export3MF(bpy.types.Operator, bpy_extras.io_utils.ExportHelper):
         :return: A zip archive that other functions can add things to.
         """
         try:
-            archive = zipfile.ZipFile(
-                filepath, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=9
+            self.compression_policy = CompressionPolicy.from_string(
+                self.compression_method, self.compression_level, self.stored_parts, self.compression_threads
             )
+            archive = zipfile.ZipFile(filepath, "w")
+            self.compression_policy.configure(archive)
 
             # Store the file annotations we got from imported 3MF files, and store them in the archive.
             annotations = Annotations()
             annotations.retrieve()
             annotations.write_rels(archive)
             annotations.write_content_types(archive)
-            self.must_preserve(archive)
+            with self.instrumentation.span("preserve"):
+                self.must_preserve(archive)
         except EnvironmentError as e:
             log.error(f"Unable to write 3MF archive to {filepath}: {e}")
             self.safe_report({'ERROR'}, f"Unable to write 3MF archive to {filepath}: {e}")
@@ -181,20 +191,32 @@ class Export3MF(bpy.types.Operator, bpy_extras.io_utils.ExportHelper):
         """
         Write files that must be preserved to the archive.
 
-        These files were stored in the Blender scene in a hidden location.
+        These files were stored in the Blender scene in a hidden location. Files that were in conflict are left out. If
+        the archive that a file was imported from still has the same file, its compressed data is copied from there
+        without compressing it again.
         :param archive: The archive to write files to.
         """
-        for textfile in bpy.data.texts:
-            filename = textfile.name
-            if not filename.startswith(".3mf_preserved/"):
-                continue  # Unrelated file. Not ours to read.
-            contents = textfile.as_string()
-            if contents == conflicting_mustpreserve_contents:
-                continue  # This file was in conflict. Don't preserve any copy of it then.
-            contents = base64.b85decode(contents.encode("UTF-8"))
-            filename = filename[len(".3mf_preserved/"):]
-            with archive.open(filename, "w") as f:
-                f.write(contents)
+        preserved = PreservedFiles()
+        preserved.retrieve()
+        sources = {}  # The archives that the files were imported from, by their path, or None if they can't be read.
+        try:
+            for filename, contents in preserved.items():
+                if filename in preserved.sources:
+                    source_path, member = preserved.sources[filename]
+                    if source_path not in sources:
+                        try:
+                            sources[source_path] = zipfile.ZipFile(source_path)
+                        except (zipfile.BadZipFile, EnvironmentError):  # Moved, deleted or overwritten since.
+                            sources[source_path] = None
+                    source = sources[source_path]
+                    if source is not None and copy_compressed(source, member, archive, filename, contents):
+                        continue
+                with self.compression_policy.open(archive, filename) as f:
+                    f.write(contents)
+        finally:
+            for source in sources.values():
+                if source is not None:
+                    source.close()
 
     def unit_scale(self, context: bpy.types.Context) -> float:
         """
@@ -236,11 +258,7 @@ class Export3MF(bpy.types.Operator, bpy_extras.io_utils.ExportHelper):
         :return: A mapping from material name to the index of that material in the <basematerials> tag.
         """
         name_to_index = {}  # The output list, mapping from material name to indexes in the <basematerials> tag.
-        next_index = 0
-
-        # Create an element lazily. We don't want to create an element if there are no materials to write.
-        basematerials_element = None
-
+        materials = []  # The name and color of each material to write, in order.
         for blender_object in blender_objects:
             for material_slot in blender_object.material_slots:
                 material = material_slot.material
@@ -259,48 +277,71 @@ class Export3MF(bpy.types.Operator, bpy_extras.io_utils.ExportHelper):
                 principled = bpy_extras.node_shader_utils.PrincipledBSDFWrapper(
                     material, is_readonly=True
                 )
-                color = principled.base_color
-                red = min(255, round(color[0] * 255))
-                green = min(255, round(color[1] * 255))
-                blue = min(255, round(color[2] * 255))
-                alpha = principled.alpha
-                if alpha >= 1.0:  # Completely opaque. Leave out the alpha component.
-                    color_hex = "#%0.2X%0.2X%0.2X" % (red, green, blue)
-                else:
-                    alpha = min(255, round(alpha * 255))
-                    color_hex = "#%0.2X%0.2X%0.2X%0.2X" % (red, green, blue, alpha)
-
-                if basematerials_element is None:
-                    self.material_resource_id = str(self.next_resource_id)
-                    self.next_resource_id += 1
-                    basematerials_element = xml.etree.ElementTree.SubElement(
-                        resources_element,
-                        f"{{{MODEL_NAMESPACE}}}basematerials",
-                        attrib={f"{{{MODEL_NAMESPACE}}}id": self.material_resource_id},
-                    )
-                xml.etree.ElementTree.SubElement(
-                    basematerials_element,
-                    f"{{{MODEL_NAMESPACE}}}base",
-                    attrib={
-                        f"{{{MODEL_NAMESPACE}}}name": material_name,
-                        f"{{{MODEL_NAMESPACE}}}displaycolor": color_hex,
-                    },
-                )
-                name_to_index[material_name] = next_index
-                next_index += 1
+                materials.append((material_name, (*principled.base_color[:3], principled.alpha)))
+                name_to_index[material_name] = len(name_to_index)
+
+        if materials:  # Don't create an element if there are no materials to write.
+            self.material_resource_id = str(self.next_resource_id)
+            self.next_resource_id += 1
+            self.write_basematerials(resources_element, self.material_resource_id, materials)
 
         return name_to_index
 
+    def write_model(self, stream: TextIO, root: xml.etree.ElementTree.Element,
+                    resources_element: xml.etree.ElementTree.Element,
+                    blender_objects: List[bpy.types.Object],
+                    global_scale: float) -> None:
+        """
+        Writes the 3MF document with the objects to a text stream, incrementally.
+
+        The metadata and materials that are already in the document are written first. Then the resources of each
+        object are written to the stream as soon as they are complete, and removed from the document again. This way
+        only the resources of one object are held in memory at a time. The build items are written last.
+        :param stream: The text stream to write the document to.
+        :param root: The root element of the document, which contains the metadata and the resources.
+        :param resources_element: The <resources> element of the document, which may already contain the materials.
+        :param blender_objects: A list of Blender objects that need to be written to the document.
+        :param global_scale: A scaling factor to apply to all objects to convert the units.
+        """
+        stream.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        self.write_start_tag(stream, root, f' xmlns="{MODEL_NAMESPACE}"')
+        for child in root:
+            if child is not resources_element:
+                self.write_element(stream, child)  # The metadata.
+        self.write_start_tag(stream, resources_element)
+        self.flush_resources(stream, resources_element)  # The materials.
+
+        build_element = self.write_objects(root, resources_element, blender_objects, global_scale, stream)
+
+        self.write_end_tag(stream, resources_element)
+        self.write_element(stream, build_element)
+        self.write_end_tag(stream, root)
+
+    def flush_resources(self, stream: TextIO, resources_element: xml.etree.ElementTree.Element) -> None:
+        """
+        Writes the resources that were added to the <resources> element to a text stream, and removes them from the
+        element.
+        :param stream: The text stream to write the resources to.
+        :param resources_element: The <resources> element of the document.
+        """
+        for resource_element in resources_element:
+            self.write_element(stream, resource_element)
+        del resources_element[:]
+
     def write_objects(self, root: xml.etree.ElementTree.Element,
                       resources_element: xml.etree.ElementTree.Element,
                       blender_objects: List[bpy.types.Object],
-                      global_scale: float) -> None:
+                      global_scale: float,
+                      stream: Optional[TextIO] = None) -> xml.etree.ElementTree.Element:
         """
         Writes a group of objects into the 3MF archive.
         :param root: An XML root element to write the objects into.
         :param resources_element: An XML element to write resources into.
         :param blender_objects: A list of Blender objects that need to be written to that XML element.
         :param global_scale: A scaling factor to apply to all objects to convert the units.
+        :param stream: If provided, the resources of each object are written to this text stream as soon as they are
+        complete, rather than kept in the resources element.
+        :return: The <build> element, containing an item for each object.
         """
         transformation = mathutils.Matrix.Scale(global_scale, 4)
 
@@ -313,14 +354,18 @@ class Export3MF(bpy.types.Operator, bpy_extras.io_utils.ExportHelper):
             if blender_object.type not in {"MESH", "EMPTY"}:
                 continue
 
-            objectid, mesh_transformation = self.write_object_resource(
-                resources_element, blender_object
-            )
+            with self.instrumentation.span("write_object"):
+                objectid, mesh_transformation = self.write_object_resource(
+                    resources_element, blender_object
+                )
+                if stream is not None:
+                    self.flush_resources(stream, resources_element)
 
             item_element = xml.etree.ElementTree.SubElement(
                 build_element, f"{{{MODEL_NAMESPACE}}}item"
             )
             self.num_written += 1
+            self.instrumentation.count("build_items")
             item_element.attrib[f"{{{MODEL_NAMESPACE}}}objectid"] = str(objectid)
             mesh_transformation = transformation @ mesh_transformation
             if mesh_transformation != mathutils.Matrix.Identity(4):
@@ -341,6 +386,8 @@ class Export3MF(bpy.types.Operator, bpy_extras.io_utils.ExportHelper):
                 )
                 self.write_metadata(metadatagroup_element, metadata)
 
+        return build_element
+
     def write_object_resource(self, resources_element: xml.etree.ElementTree.Element,
                               blender_object: bpy.types.Object) -> Tuple[int, mathutils.Matrix]:
         """
@@ -349,12 +396,25 @@ class Export3MF(bpy.types.Operator, bpy_extras.io_utils.ExportHelper):
         If the object contains a mesh it'll get written to the document as an object with a mesh resource. If the object
         contains children it'll get written to the document as an object with components. If the object contains both,
         two objects will be written; one with the mesh and another with the components. The mesh then gets added as a
-        component of the object with components.
+        component of the object with components. The objects of an instanced collection are written as components too.
+
+        If sharing mesh data is enabled and an equivalent object was written before, no new resource is written. The ID
+        of the resource written before is returned instead.
         :param resources_element: The <resources> element of the 3MF document to write into.
         :param blender_object: A Blender object to write to that XML element.
         :return: A tuple, containing the object ID of the newly written resource and a transformation matrix that this
         resource must be saved with.
         """
+        metadata = Metadata()
+        metadata.retrieve(blender_object)
+
+        shared_mesh_key = None
+        if self.use_instancing:
+            shared_mesh_key = self.shared_mesh_key(blender_object, metadata)
+            if shared_mesh_key in self.shared_mesh_resources:
+                # This mesh was written before. Only place it again, with this object's transformation.
+                return self.shared_mesh_resources[shared_mesh_key], blender_object.matrix_world
+
         new_resource_id = self.next_resource_id
         self.next_resource_id += 1
         object_element = xml.etree.ElementTree.SubElement(
@@ -362,8 +422,6 @@ class Export3MF(bpy.types.Operator, bpy_extras.io_utils.ExportHelper):
         )
         object_element.attrib[f"{{{MODEL_NAMESPACE}}}id"] = str(new_resource_id)
 
-        metadata = Metadata()
-        metadata.retrieve(blender_object)
         if "3mf:object_type" in metadata:
             object_type = metadata["3mf:object_type"].value
             if object_type != "model":  # Only write if not the default.
@@ -375,8 +433,9 @@ class Export3MF(bpy.types.Operator, bpy_extras.io_utils.ExportHelper):
         mesh_transformation = blender_object.matrix_world
 
         child_objects = blender_object.children
+        instanced_objects = self.instanced_objects(blender_object)
         if (
-            child_objects
+            child_objects or instanced_objects
         ):  # Only write the <components> tag if there are actually components.
             components_element = xml.etree.ElementTree.SubElement(
                 object_element, f"{{{MODEL_NAMESPACE}}}components"
@@ -393,17 +452,15 @@ class Export3MF(bpy.types.Operator, bpy_extras.io_utils.ExportHelper):
                 child_transformation = (
                     mesh_transformation.inverted_safe() @ child_transformation
                 )
-                component_element = xml.etree.ElementTree.SubElement(
-                    components_element, f"{{{MODEL_NAMESPACE}}}component"
-                )
-                self.num_written += 1
-                component_element.attrib[f"{{{MODEL_NAMESPACE}}}objectid"] = str(
-                    child_id
-                )
-                if child_transformation != mathutils.Matrix.Identity(4):
-                    component_element.attrib[f"{{{MODEL_NAMESPACE}}}transform"] = (
-                        self.format_transformation(child_transformation)
+                self.write_component(components_element, child_id, child_transformation)
+            if instanced_objects:
+                # The instanced collection is placed such that its instance offset ends up at the origin of this object.
+                offset = mathutils.Matrix.Translation(-blender_object.instance_collection.instance_offset)
+                for instanced_object in instanced_objects:
+                    instanced_id, instanced_transformation = self.write_object_resource(
+                        resources_element, instanced_object
                     )
+                    self.write_component(components_element, instanced_id, offset @ instanced_transformation)
 
         # In the tail recursion, get the vertex data.
         # This is necessary because we may need to apply the mesh modifiers, which causes these objects to lose their
@@ -448,17 +505,15 @@ class Export3MF(bpy.types.Operator, bpy_extras.io_utils.ExportHelper):
             )
 
             # Find the most common material for this mesh, for maximum compression.
-            material_indices = [
-                triangle.material_index for triangle in mesh.loop_triangles
-            ]
+            material_indices = numpy.zeros(len(mesh.loop_triangles), dtype=numpy.int32)
+            mesh.loop_triangles.foreach_get("material_index", material_indices)
             # If there are no triangles, we provide 0 as index, but it'll not get read by write_triangles either then.
             most_common_material_list_index = 0
 
-            if material_indices and blender_object.material_slots:
-                counter = collections.Counter(material_indices)
+            if len(material_indices) > 0 and blender_object.material_slots:
                 # most_common_material_object_index is an index from the MeshLoopTriangle, referring to the list of
                 # materials attached to the Blender object.
-                most_common_material_object_index = counter.most_common(1)[0][0]
+                most_common_material_object_index = int(numpy.bincount(material_indices).argmax())
                 most_common_material = blender_object.material_slots[
                     most_common_material_object_index
                 ].material
@@ -485,6 +540,8 @@ class Export3MF(bpy.types.Operator, bpy_extras.io_utils.ExportHelper):
                 most_common_material_list_index,
                 blender_object.material_slots,
             )
+            if shared_mesh_key is not None:
+                self.shared_mesh_resources[shared_mesh_key] = new_resource_id
 
             # If the object has metadata, write that to a metadata object.
             if "3mf:partnumber" in metadata:
@@ -508,42 +565,66 @@ class Export3MF(bpy.types.Operator, bpy_extras.io_utils.ExportHelper):
                 )
                 self.write_metadata(metadatagroup_element, metadata)
 
+        blender_object.to_mesh_clear()  # The mesh data was copied, so the temporary mesh is no longer necessary.
         return new_resource_id, mesh_transformation
 
-    def write_metadata(self, node: xml.etree.ElementTree.Element, metadata: Metadata) -> None:
+    def shared_mesh_key(self, blender_object: bpy.types.Object, metadata: Metadata) -> Optional[tuple]:
         """
-        Writes metadata from a metadata storage into an XML node.
-        :param node: The node to add <metadata> tags to.
-        :param metadata: The collection of metadata to write to that node.
+        Get a key that identifies the resource that a Blender object would be written as, if it may be shared.
+
+        Objects that use the same mesh data, with the same materials and the same metadata, would be written as exactly
+        the same resource. Only their transformation differs. The title of the object is not considered, since the
+        mesh data is shared under the title of the first object that used it. Objects with children or with modifiers
+        that get applied can't share their resource, since the resulting geometry may differ per object.
+        :param blender_object: The Blender object to get the key for.
+        :param metadata: The metadata of that Blender object.
+        :return: A key that is equal for objects that can share one resource, or `None` if this object can't share its
+        resource with any other object.
         """
-        for metadata_entry in metadata.values():
-            metadata_node = xml.etree.ElementTree.SubElement(
-                node, f"{{{MODEL_NAMESPACE}}}metadata"
-            )
-            metadata_node.attrib[f"{{{MODEL_NAMESPACE}}}name"] = metadata_entry.name
-            if metadata_entry.preserve:
-                metadata_node.attrib[f"{{{MODEL_NAMESPACE}}}preserve"] = "1"
-            if metadata_entry.datatype:
-                metadata_node.attrib[f"{{{MODEL_NAMESPACE}}}type"] = (
-                    metadata_entry.datatype
-                )
-            metadata_node.text = metadata_entry.value
+        if blender_object.type != "MESH" or blender_object.data is None or blender_object.children:
+            return None
+        if blender_object.mode == "EDIT":
+            return None  # The mesh data of the object is being edited, so it may not match what was written before.
+        if self.use_mesh_modifiers and len(blender_object.modifiers) > 0:
+            return None
+        materials = tuple(
+            None if slot.material is None else slot.material.name for slot in blender_object.material_slots
+        )
+        # The title is the name of the Blender object, which is unique per object. The build items still get their own.
+        metadata_entries = tuple(
+            sorted((entry for entry in metadata.values() if entry.name != "Title"), key=lambda entry: entry.name)
+        )
+        return blender_object.data, materials, metadata_entries
 
-    def format_transformation(self, transformation: mathutils.Matrix) -> str:
+    def instanced_objects(self, blender_object: bpy.types.Object) -> List[bpy.types.Object]:
         """
-        Formats a transformation matrix in 3MF's formatting.
+        Get the objects that a Blender object instances through a collection.
 
-        This transformation matrix can then be written to an attribute.
-        :param transformation: The transformation matrix to format.
-        :return: A serialisation of the transformation matrix.
+        Only the objects in that collection that have no parent in that collection are returned. Their children are
+        written along with them.
+        :param blender_object: The Blender object that may instance a collection.
+        :return: The objects to write as components of this Blender object.
         """
-        pieces = (
-            row[:3] for row in transformation.transposed()
-        )  # Don't convert the 4th column.
-        formatted_cells = [
-            self.format_number(cell, 6) for cell in itertools.chain.from_iterable(pieces)
+        if blender_object.instance_type != "COLLECTION" or blender_object.instance_collection is None:
+            return []
+        collection_objects = blender_object.instance_collection.all_objects
+        return [
+            instanced_object for instanced_object in collection_objects
+            if instanced_object.type in {"MESH", "EMPTY"}
+            and (instanced_object.parent is None or instanced_object.parent.name not in collection_objects)
         ]
-        return " ".join(formatted_cells)
+
+    def write_component(self, components_element: xml.etree.ElementTree.Element, objectid: int,
+                        transformation: mathutils.Matrix) -> xml.etree.ElementTree.Element:
+        """
+        Writes a single component, referring to an object resource, into a <components> element.
+        :param components_element: The <components> element of an object resource.
+        :param objectid: The ID of the object resource that this component places.
+        :param transformation: The transformation of the component, relative to the object that it is a component of.
+        :return: The new <component> element.
+        """
+        self.num_written += 1
+        return super().write_component(components_element, objectid, transformation)
 
     def write_vertices(self, mesh_element: xml.etree.ElementTree.Element,
                        vertices: List[bpy.types.MeshVertex]) -> None:
@@ -551,32 +632,21 @@ class Export3MF(bpy.types.Operator, bpy_extras.io_utils.ExportHelper):
         Writes a list of vertices into the specified mesh element.
 
         This then becomes a resource that can be used in a build.
+
+        The coordinates are retrieved from Blender in bulk. Rather than creating an element for each vertex, the
+        <vertex> elements are formatted as text in large chunks, which are written directly into the document by
+        `write_document`.
         :param mesh_element: The <mesh> element of the 3MF document.
-        :param vertices: A list of Blender vertices to add.
+        :param vertices: A collection of Blender vertices to add.
         """
         vertices_element = xml.etree.ElementTree.SubElement(
             mesh_element, f"{{{MODEL_NAMESPACE}}}vertices"
         )
 
-        # Precompute some names for better performance.
-        vertex_name = f"{{{MODEL_NAMESPACE}}}vertex"
-        x_name = f"{{{MODEL_NAMESPACE}}}x"
-        y_name = f"{{{MODEL_NAMESPACE}}}y"
-        z_name = f"{{{MODEL_NAMESPACE}}}z"
-
-        for vertex in vertices:  # Create the <vertex> elements.
-            vertex_element = xml.etree.ElementTree.SubElement(
-                vertices_element, vertex_name
-            )
-            vertex_element.attrib[x_name] = self.format_number(
-                vertex.co[0], self.coordinate_precision
-            )
-            vertex_element.attrib[y_name] = self.format_number(
-                vertex.co[1], self.coordinate_precision
-            )
-            vertex_element.attrib[z_name] = self.format_number(
-                vertex.co[2], self.coordinate_precision
-            )
+        coordinates = numpy.empty(len(vertices) * 3, dtype=numpy.float32)
+        vertices.foreach_get("co", coordinates)
+        self.instrumentation.count("vertices", len(vertices))
+        self.element_bodies[vertices_element] = self.format_vertices(coordinates.reshape(-1, 3))
 
     def write_triangles(
         self, mesh_element: xml.etree.ElementTree.Element,
@@ -588,8 +658,12 @@ class Export3MF(bpy.types.Operator, bpy_extras.io_utils.ExportHelper):
         Writes a list of triangles into the specified mesh element.
 
         This then becomes a resource that can be used in a build.
+
+        The vertex indices and materials are retrieved from Blender in bulk. Rather than creating an element for each
+        triangle, the <triangle> elements are formatted as text in large chunks, which are written directly into the
+        document by `write_document`.
         :param mesh_element: The <mesh> element of the 3MF document.
-        :param triangles: A list of triangles. Each list is a list of indices to the list of vertices.
+        :param triangles: A collection of triangles. Each triangle has the indices of its three vertices.
         :param object_material_list_index: The index of the material that the object was written with to which these
         triangles belong. If the triangle has a different index, we need to write the index with the triangle.
         :param material_slots: List of materials belonging to the object for which we write triangles. These are
@@ -599,44 +673,168 @@ class Export3MF(bpy.types.Operator, bpy_extras.io_utils.ExportHelper):
             mesh_element, f"{{{MODEL_NAMESPACE}}}triangles"
         )
 
-        # Precompute some names for better performance.
-        triangle_name = f"{{{MODEL_NAMESPACE}}}triangle"
-        v1_name = f"{{{MODEL_NAMESPACE}}}v1"
-        v2_name = f"{{{MODEL_NAMESPACE}}}v2"
-        v3_name = f"{{{MODEL_NAMESPACE}}}v3"
-        p1_name = f"{{{MODEL_NAMESPACE}}}p1"
+        vertex_indices = numpy.empty(len(triangles) * 3, dtype=numpy.int32)
+        triangles.foreach_get("vertices", vertex_indices)
+        slot_indices = numpy.empty(len(triangles), dtype=numpy.int32)
+        triangles.foreach_get("material_index", slot_indices)
+        self.instrumentation.count("triangles", len(triangles))
 
-        for triangle in triangles:
-            triangle_element = xml.etree.ElementTree.SubElement(
-                triangles_element, triangle_name
-            )
-            triangle_element.attrib[v1_name] = str(triangle.vertices[0])
-            triangle_element.attrib[v2_name] = str(triangle.vertices[1])
-            triangle_element.attrib[v3_name] = str(triangle.vertices[2])
-
-            if triangle.material_index < len(material_slots):
-                # Check if the material slot is not empty
-                triangle_material = material_slots[triangle.material_index].material
-                if triangle_material is not None:
-                    # Convert to index in our global list.
-                    material_index = self.material_name_to_index[
-                        triangle_material.name
-                    ]
-                    if material_index != object_material_list_index:
-                        # Not equal to the index that our parent object was written with, so we must override it here.
-                        triangle_element.attrib[p1_name] = str(material_index)
+        # For each material slot, the index in our global list of materials, or -1 if the triangle needs no override.
+        slot_to_material = numpy.full(len(material_slots), -1, dtype=numpy.int32)
+        for slot_index, material_slot in enumerate(material_slots):
+            if material_slot.material is None:  # Empty material slot.
+                continue
+            material_index = self.material_name_to_index[material_slot.material.name]
+            if material_index != object_material_list_index:
+                # Not equal to the index that our parent object was written with, so we must override it here.
+                slot_to_material[slot_index] = material_index
+        material_overrides = numpy.full(len(triangles), -1, dtype=numpy.int32)
+        in_range = slot_indices < len(material_slots)
+        material_overrides[in_range] = slot_to_material[slot_indices[in_range]]
+
+        self.element_bodies[triangles_element] = self.format_triangles(
+            vertex_indices.reshape(-1, 3), material_overrides
+        )
 
-    def format_number(self, number: float, decimals: int) -> str:
-        """
-        Properly formats a floating point number to a certain precision.
 
-        This format will never use scientific notation (no 3.14e-5 nonsense) and will have a fixed limit to the number
-        of decimals. It will not have a limit to the length of the integer part. Any trailing zeros are stripped.
-        :param number: A floating point number to format.
-        :param decimals: The maximum number of places after the radix to write.
-        :return: A string representing that number.
+class Export3MF(bpy.types.Operator, bpy_extras.io_utils.ExportHelper, Exporter):
+    """
+    Operator that exports a 3MF file from Blender.
+    """
+
+    # Metadata.
+    bl_idname = "export_mesh.threemf"
+    bl_label = "Export 3MF"
+    bl_description = "Save the current scene to 3MF"
+    filename_ext = ".3mf"
+
+    # Options for the user.
+    filter_glob: bpy.props.StringProperty(default="*.3mf", options={"HIDDEN"})
+    use_selection: bpy.props.BoolProperty(
+        name="Selection Only",
+        description="Export selected objects only.",
+        default=False,
+    )
+    global_scale: bpy.props.FloatProperty(
+        name="Scale", default=1.0, soft_min=0.001, soft_max=1000.0, min=1e-6, max=1e6
+    )
+    use_mesh_modifiers: bpy.props.BoolProperty(
+        name="Apply Modifiers",
+        description="Apply the modifiers before saving.",
+        default=True,
+    )
+    coordinate_precision: bpy.props.IntProperty(
+        name="Precision",
+        description="The number of decimal digits to use in coordinates in the file.",
+        default=4,
+        min=0,
+        max=12,
+    )
+    use_instancing: bpy.props.BoolProperty(
+        name="Share Mesh Data",
+        description="Write the mesh data of objects that share the same mesh only once, and refer to it from every "
+        "object that uses it.",
+        default=True,
+    )
+    compression_method: bpy.props.EnumProperty(
+        name="Compression",
+        description="How to compress the files in the 3MF archive.",
+        items=(
+            ("DEFLATED", "Deflate", "Compress the files in the archive"),
+            ("STORED", "Store", "Don't compress the files in the archive. Fastest, but results in the largest files"),
+        ),
+        default="DEFLATED",
+    )
+    compression_level: bpy.props.IntProperty(
+        name="Compression Level",
+        description="How strongly to compress the files in the archive. Higher levels result in slightly smaller "
+        "files, but take much longer to write.",
+        default=DEFAULT_COMPRESSION_LEVEL,
+        min=0,
+        max=9,
+    )
+    stored_parts: bpy.props.StringProperty(
+        name="Store Without Compression",
+        description="Comma-separated patterns of files in the archive to store without compression, such as files "
+        "that are compressed already.",
+        default=DEFAULT_STORED_PARTS,
+    )
+    compression_threads: bpy.props.IntProperty(
+        name="Compression Threads",
+        description="Number of threads to compress the 3D model with. Use 0 for one thread per processor, or 1 to "
+        "compress serially.",
+        default=0,
+        min=0,
+        max=256,
+    )
+    instrumentation_level: bpy.props.EnumProperty(
+        name="Instrumentation",
+        description="Measure the time and memory that each stage of the export takes, and log a summary. The "
+        "report is available from Python with io_mesh_3mf.instrumentation.last_report(\"export\").",
+        items=INSTRUMENTATION_LEVELS,
+        default="OFF",
+    )
+
+    def execute(self, context: bpy.types.Context) -> Set[str]:
         """
-        formatted = f"{number:.{decimals}f}".rstrip("0").rstrip(".")
-        if formatted == "":
-            return "0"
-        return formatted
+        The main routine that writes the 3MF archive.
+        :param context: The Blender context.
+        :return: A set of status flags to indicate whether the write succeeded or not.
+        """
+        if self.use_selection:
+            blender_objects = context.selected_objects
+        else:
+            blender_objects = context.scene.objects
+        return self.export_objects(context, blender_objects, self.filepath)
+
+
+def create_exporter(global_scale: float = 1.0, use_mesh_modifiers: bool = True, coordinate_precision: int = 4,
+                    use_instancing: bool = True, compression_method: str = "DEFLATED",
+                    compression_level: int = DEFAULT_COMPRESSION_LEVEL, stored_parts: str = DEFAULT_STORED_PARTS,
+                    compression_threads: int = 0, instrumentation_level: str = "OFF") -> Exporter:
+    """
+    Creates an exporter to export 3MF files with from scripts.
+
+    The exporter can be used for multiple exports.
+    :param global_scale: A scaling factor to apply to the models in the 3MF file.
+    :param use_mesh_modifiers: Whether to apply the modifiers before writing the meshes.
+    :param coordinate_precision: The number of decimals to write coordinates with.
+    :param use_instancing: Whether to write the mesh data of objects that share the same mesh only once.
+    :param compression_method: Either "DEFLATED" or "STORED".
+    :param compression_level: How strongly to compress the files in the archive, from 0 to 9.
+    :param stored_parts: Comma-separated patterns of files in the archive to store without compression.
+    :param compression_threads: Number of threads to compress the 3D model with, or 0 for one per processor.
+    :param instrumentation_level: What to measure of the export. See `INSTRUMENTATION_LEVELS`.
+    :return: An exporter with those options.
+    """
+    exporter = Exporter()
+    exporter.global_scale = global_scale
+    exporter.use_mesh_modifiers = use_mesh_modifiers
+    exporter.coordinate_precision = coordinate_precision
+    exporter.use_instancing = use_instancing
+    exporter.compression_method = compression_method
+    exporter.compression_level = compression_level
+    exporter.stored_parts = stored_parts
+    exporter.compression_threads = compression_threads
+    exporter.instrumentation_level = instrumentation_level
+    return exporter
+
+
+def export_3mf(blender_objects: Iterable[bpy.types.Object], filepath: str,
+               context: Optional[bpy.types.Context] = None, **options) -> int:
+    """
+    Exports objects to a 3MF file, without the overhead of the operator.
+
+    Raises `OSError` if the archive could not be written. The cause is logged.
+    :param blender_objects: The objects to write. Their children are written along with them.
+    :param filepath: The path to write the 3MF file to.
+    :param context: The Blender context to export from. Defaults to the current context.
+    :param options: The options of the export, with the same names as the properties of the operator. See
+    `create_exporter`.
+    :return: The number of objects that were written.
+    """
+    exporter = create_exporter(**options)
+    result = exporter.export_objects(context if context is not None else bpy.context, blender_objects, filepath)
+    if "FINISHED" not in result:
+        raise OSError(f"Unable to write 3MF archive to {filepath}")
+    return exporter.num_written
@@ -10,14 +10,15 @@
 # Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 
 
-import base64  # To encode MustPreserve files in the Blender scene.
 import collections  # For namedtuple.
 import logging  # To debug and log progress.
+import os  # To find the number of processors.
 import os.path  # To take file paths relative to the selected directory.
-import re  # To find files in the archive based on the content types.
+import re  # To ignore the numbered suffixes of material names.
 import xml.etree.ElementTree  # To parse the 3dmodel.model file.
+import xml.parsers.expat  # To parse the 3dmodel.model file incrementally, with the meshes straight into buffers.
 import zipfile  # To read the 3MF files which are secretly zip archives.
-from typing import Optional, Dict, Set, List, Tuple, Pattern, IO
+from typing import Optional, Dict, Set, List, IO, Iterable, Union
 
 import bpy  # The Blender API.
 import bpy.ops  # To adjust the camera to fit models.
@@ -25,7 +26,8 @@ import bpy.props  # To define metadata properties for the operator.
 import bpy.types  # This class is an operator in Blender.
 import bpy_extras.io_utils  # Helper functions to import meshes more easily.
 import bpy_extras.node_shader_utils  # Getting correct color spaces for materials.
-import mathutils  # For the transformation matrices.
+import mathutils  # To hand the transformation matrices to Blender.
+import numpy  # To hand mesh data to Blender in bulk, and for the transformation matrices.
 
 from .annotations import (  # To use annotations to decide on what to import.
     Annotations,
@@ -35,51 +37,68 @@ from .annotations import (  # To use annotations to decide on what to import.
 from .constants import (
     RELS_MIMETYPE,
     MODEL_MIMETYPE,
-    MODEL_NAMESPACES,
-    MODEL_DEFAULT_UNIT,
-    SUPPORTED_EXTENSIONS,
-    CONTENT_TYPES_LOCATION,
-    conflicting_mustpreserve_contents,
 )
-from .metadata import Metadata, MetadataEntry  # To store and serialize metadata.
-from .unit_conversions import (  # To convert to Blender's units.
-    blender_to_metre,
-    threemf_to_metre,
+from .diagnostics import Diagnostics, MeshDataError  # To report the problems in the mesh data per object.
+from .instrumentation import INSTRUMENTATION_LEVELS, Instrumentation, last_reports  # To measure each stage.
+from .metadata import Metadata  # To store and serialize metadata.
+from .model_reader import (  # To read the parts of the archive that don't need Blender.
+    ArchivePart,
+    BuildItem,
+    Component,
+    MeshBuffers,
+    ModelParser,
+    ModelReader,
+    PreparedArchive,
+    PreparedModel,
+    ResourceMaterial,
+    ResourceObject,
+    Selection,
+    compose_transformations,
+    filter_document,
+    index_archive,
+    parse_selectors,
+    prepare_archives,
+    scan_selection,
 )
+from .preservation import PreservedFiles  # To store the files that must be preserved.
+from .unit_conversions import blender_to_metre  # To convert to Blender's units.
 
 # IDE and Documentation support.
-__all__ = ["Import3MF"]
+__all__ = [
+    "Import3MF",
+    "Importer",
+    "Load3MFGeometry",
+    "create_importer",
+    "import_3mf",
+]
 
 log = logging.getLogger(__name__)
 
-ResourceObject = collections.namedtuple(
-    "ResourceObject", ["vertices", "triangles", "materials", "components", "metadata"]
+HierarchyNode = collections.namedtuple("HierarchyNode", ["resource_object", "objectid", "parent", "transformation"])
+
+# How to find the Blender materials for the materials in 3MF files.
+MATERIAL_REUSE_MODES = (
+    ("REUSE", "Reuse", "Use existing materials with the same name and color"),
+    ("COLOR", "Reuse by Color", "Use existing materials with the same color, regardless of their name"),
+    ("NEW", "Always New", "Create new materials for each import"),
 )
-Component = collections.namedtuple("Component", ["resource_object", "transformation"])
-ResourceMaterial = collections.namedtuple("ResourceMaterial", ["name", "color"])
 
+# Custom properties of proxy objects, telling where to load their real mesh from.
+PROXY_SOURCE = "3mf:source"  # The path to the 3MF archive.
+PROXY_DOCUMENT = "3mf:document"  # The path of the 3dmodel.model document in the archive.
+PROXY_OBJECTID = "3mf:objectid"  # The ID of the object in the document.
 
-class Import3MF(bpy.types.Operator, bpy_extras.io_utils.ImportHelper):
-    """
-    Operator that imports a 3MF file into Blender.
+
+class Importer(ModelReader):
     """
+    Reads 3MF files and builds their objects in the Blender scene.
 
-    # Metadata.
-    bl_idname = "import_mesh.threemf"
-    bl_label = "Import 3MF"
-    bl_description = "Load a 3MF scene"
-    bl_options = {"UNDO"}
-    filename_ext = ".3mf"
+    This doesn't touch the user interface: The new objects are not selected, the view is not zoomed to them and no
+    undo step is made. The `Import3MF` operator adds that for the user, while scripts can call `import_3mf` to import
+    files without that overhead.
 
-    # Options for the user.
-    filter_glob: bpy.props.StringProperty(default="*.3mf", options={"HIDDEN"})
-    files: bpy.props.CollectionProperty(
-        name="File Path", type=bpy.types.OperatorFileListElement
-    )
-    directory: bpy.props.StringProperty(subtype="DIR_PATH")
-    global_scale: bpy.props.FloatProperty(
-        name="Scale", default=1.0, soft_min=0.001, soft_max=1000.0, min=1e-6, max=1e6
-    )
+    The options of the import are taken from attributes with the same names as the properties of `Import3MF`.
+    """
 
     def safe_report(self, level: Set[str], message: str) -> None:
         """
@@ -92,19 +111,72 @@ class Import3MF(bpy.types.Operator, bpy_extras.io_utils.ImportHelper):
             self.report(level, message)
         # If report is not available, the message has already been logged via the log module
 
-    def execute(self, context: bpy.types.Context) -> Set[str]:
+    def reset(self) -> None:
         """
-        The main routine that reads out the 3MF file.
+        Forgets the Blender materials that previous imports created.
 
-        This function serves as a high-level overview of the steps involved to read the 3MF file.
-        :param context: The Blender context.
-        :return: A set of status flags to indicate whether the operation succeeded or not.
+        Materials are reused across all files that are imported until this is called, so that a batch of files with
+        the same materials gets only one copy of each material. Unless `material_reuse` is `"NEW"`, materials that
+        already exist in the Blender file are reused as well, even after a reset.
+        """
+        self.resource_to_material = {}
+
+    def reset_state(self) -> None:
+        """
+        Forgets the resources and objects of the previous import, to start a new one.
+
+        Unlike `reset`, this keeps the materials that previous imports created.
         """
-        # Reset state.
         self.resource_objects = {}
         self.resource_materials = {}
-        self.resource_to_material = {}
+        self.resource_to_mesh = {}
         self.num_loaded = 0
+        self.imported_objects = []
+        self.pending_objects = []  # Objects that still need to be linked into the collection of their file.
+        self.material_index = None  # Only indexed once the first material is needed.
+        self.proxy_source = None  # The archive and document that proxies are being created for, if any.
+        self.diagnostics = Diagnostics(self.use_strict)
+        self.instrumentation = Instrumentation(self.instrumentation_level)
+
+    @property
+    def bounds_only(self) -> bool:
+        """
+        Tells whether only the bounding boxes of the meshes are read, which is the case while creating proxies.
+        :return: `True` if proxies are being created, or `False` if the real meshes are read.
+        """
+        return self.proxy_source is not None
+
+    def import_files(self, context: bpy.types.Context, paths: List[str]) -> List[bpy.types.Object]:
+        """
+        Reads out 3MF files and builds their items in the scene.
+
+        This function serves as a high-level overview of the steps involved to read the 3MF files.
+
+        Raises `MeshDataError` in strict mode if the mesh data has a problem.
+        :param context: The Blender context.
+        :param paths: The paths to the 3MF files to import.
+        :return: The Blender objects that were created.
+        """
+        self.reset_state()
+        self.instrumentation.start()
+        try:
+            self.read_files(context, paths)
+            with self.instrumentation.span("update_interface"):
+                self.update_interface(context)
+        finally:
+            self.instrumentation.stop()
+            if self.instrumentation.enabled:
+                log.info(f"Import instrumentation: {self.instrumentation.summary()}")
+                last_reports["import"] = self.instrumentation.report()
+        return self.imported_objects
+
+    def read_files(self, context: bpy.types.Context, paths: List[str]) -> None:
+        """
+        Reads out the 3MF files and builds their items in the scene, along with the metadata, annotations and preserved
+        files.
+        :param context: The Blender context.
+        :param paths: The paths to the 3MF files to import.
+        """
         scene_metadata = Metadata()
         # If there was already metadata in the scene, combine that with this file.
         scene_metadata.retrieve(bpy.context.scene)
@@ -113,112 +185,81 @@ class Import3MF(bpy.types.Operator, bpy_extras.io_utils.ImportHelper):
         del scene_metadata["Title"]
         annotations = Annotations()
         annotations.retrieve()  # If there were already annotations in the scene, combine that with this file.
+        preserved = PreservedFiles()
+        preserved.retrieve()  # If files were already preserved in the scene, check this file against them.
+
+        processes = self.processes if self.processes > 0 else (os.cpu_count() or 1)
+        processes = min(processes, len(paths))
+        if processes > 1:  # Read the archives in worker processes, and build the objects here in order.
+            prepared_archives = prepare_archives(
+                paths, processes, self.use_strict, parse_selectors(self.item_filter), self.use_proxies
+            )
+        else:
+            prepared_archives = (None for _ in paths)
 
-        # Preparation of the input parameters.
-        paths = [os.path.join(self.directory, name.name) for name in self.files]
-        if not paths:
-            paths.append(self.filepath)
-
-        if bpy.ops.object.mode_set.poll():
-            bpy.ops.object.mode_set(
-                mode="OBJECT"
-            )  # Switch to object mode to view the new file.
-        if bpy.ops.object.select_all.poll():
-            bpy.ops.object.select_all(action="DESELECT")  # Deselect other files.
-
-        for path in paths:
-            files_by_content_type = self.read_archive(
-                path
-            )  # Get the files from the archive.
+        for path, prepared in zip(paths, prepared_archives):
+            with self.instrumentation.span("read_archive"):
+                if prepared is None:  # Not read by a worker process. Read it here.
+                    files_by_content_type = self.read_archive(path)  # Get the files from the archive.
+                else:
+                    files_by_content_type = self.read_prepared_archive(path, prepared)
 
-            # File metadata.
-            for rels_file in files_by_content_type.get(RELS_MIMETYPE, []):
-                annotations.add_rels(rels_file)
-            annotations.add_content_types(files_by_content_type)
-            self.must_preserve(files_by_content_type, annotations)
+                # File metadata.
+                for rels_file in files_by_content_type.get(RELS_MIMETYPE, []):
+                    annotations.add_rels(rels_file)
+                annotations.add_content_types(files_by_content_type)
+            with self.instrumentation.span("preserve"):
+                self.must_preserve(files_by_content_type, annotations, preserved)
 
             # Read the model data.
-            for model_file in files_by_content_type.get(MODEL_MIMETYPE, []):
-                try:
-                    document = xml.etree.ElementTree.ElementTree(file=model_file)
-                except xml.etree.ElementTree.ParseError as e:
-                    log.error(f"3MF document in {path} is malformed: {str(e)}")
-                    self.safe_report({'ERROR'}, f"3MF document in {path} is malformed: {str(e)}")
-                    continue
-                if document is None:
-                    # This file is corrupt or we can't read it. There is no error code to communicate this to Blender
-                    # though.
-                    continue  # Leave the scene empty / skip this file.
-                root = document.getroot()
-                if not self.is_supported(root.attrib.get("requiredextensions", "")):
-                    log.warning(f"3MF document in {path} requires unknown extensions.")
-                    self.safe_report({'WARNING'}, f"3MF document in {path} requires unknown extensions.")
-                    # Still continue processing even though the spec says not to. Our aim is to retrieve whatever
-                    # information we can.
-
-                scale_unit = self.unit_scale(context, root)
-                self.resource_objects = {}
-                self.resource_materials = {}
-                scene_metadata = self.read_metadata(root, scene_metadata)
-                self.read_materials(root)
-                self.read_objects(root)
-                self.build_items(root, scale_unit)
-
-        scene_metadata.store(bpy.context.scene)
-        annotations.store()
-
-        # Zoom the camera to view the imported objects.
-        for area in bpy.context.screen.areas:
-            if area.type == "VIEW_3D":
-                for region in area.regions:
-                    if region.type == "WINDOW":
-                        try:
-                            # Since Blender 3.2:
-                            context = bpy.context.copy()
-                            context["area"] = area
-                            context["region"] = region
-                            context["edit_object"] = bpy.context.edit_object
-                            with bpy.context.temp_override(**context):
-                                bpy.ops.view3d.view_selected()
-                        except (
-                            AttributeError
-                        ):  # temp_override doesn't exist before Blender 3.2.
-                            # Before Blender 3.2:
-                            override = {
-                                "area": area,
-                                "region": region,
-                                "edit_object": bpy.context.edit_object,
-                            }
-                            bpy.ops.view3d.view_selected(override)
+            try:
+                for model_file in files_by_content_type.get(MODEL_MIMETYPE, []):
+                    with self.instrumentation.span("read_model"):
+                        scene_metadata = self.read_model(context, path, model_file, prepared, scene_metadata)
+            finally:  # Also link the objects that were complete if the file turns out to be broken in strict mode.
+                with self.instrumentation.span("link_objects"):
+                    self.link_objects(path)
+
+        with self.instrumentation.span("store"):
+            scene_metadata.store(bpy.context.scene)
+            annotations.store()
+            preserved.store()
 
         log.info(f"Imported {self.num_loaded} objects from 3MF files.")
-        self.safe_report({'INFO'}, f"Imported {self.num_loaded} objects from 3MF files")
 
-        return {"FINISHED"}
+    def update_interface(self, context: bpy.types.Context) -> None:
+        """
+        Shows the imported objects in the user interface.
+
+        The importer leaves the user interface alone. The operator overrides this.
+        :param context: The Blender context.
+        """
+        pass
 
     # The rest of the functions are in order of when they are called.
 
-    def read_archive(self, path: str) -> Dict[str, List[IO[bytes]]]:
+    def read_archive(self, path: str, mime_types: Optional[Dict[str, str]] = None) -> Dict[str, List[ArchivePart]]:
         """
-        Creates file streams from all the files in the archive.
+        Lists all the files in the archive.
 
         The results are sorted by their content types. Consumers of this data can pick the content types that they know
-        from the file and process those.
+        from the file and process those. The files are only opened and decompressed when they are read, so files that
+        no consumer is interested in cost no time.
         :param path: The path to the archive to read.
+        :param mime_types: The content type of each file in the archive, if these are known already. If not, they are
+        read from the archive.
         :return: A dictionary with all of the resources in the archive by content type. The keys in this dictionary are
-        the different content types available in the file. The values in this dictionary are lists of input streams
-        referring to files in the archive.
+        the different content types available in the file. The values in this dictionary are lists of parts of the
+        archive, which can be read like streams.
         """
         result = {}
         try:
             archive = zipfile.ZipFile(path)
-            content_types = self.read_content_types(archive)
-            mime_types = self.assign_content_types(archive, content_types)
-            for path, mime_type in mime_types.items():
-                if mime_type not in result:
-                    result[mime_type] = []
-                # Zipfile can open an infinite number of streams at the same time. Don't worry about it.
-                result[mime_type].append(archive.open(path))
+            if mime_types is None:
+                content_types = self.read_content_types(archive)
+                mime_types = self.assign_content_types(archive, content_types)
+            # Zipfile can open an infinite number of streams at the same time. Don't worry about it.
+            result = index_archive(archive, mime_types)
         except (zipfile.BadZipFile, EnvironmentError) as e:
             # File is corrupt, or the OS prevents us from reading it (doesn't exist, no permissions, etc.)
             log.error(f"Unable to read archive: {e}")
@@ -226,133 +267,38 @@ class Import3MF(bpy.types.Operator, bpy_extras.io_utils.ImportHelper):
             return result
         return result
 
-    def read_content_types(self, archive: zipfile.ZipFile) -> List[Tuple[Pattern[str], str]]:
-        """
-        Read the content types from a 3MF archive.
-
-        The output of this reading is a list of MIME types that are each mapped to a regular expression that matches on
-        the file paths within the archive that could contain this content type. This encodes both types of descriptors
-        for the content types that can occur in the content types document: Extensions and full paths.
-
-        The output is ordered in priority. Matches that should be evaluated first will be put in the front of the output
-        list.
-        :param archive: The 3MF archive to read the contents from.
-        :return: A list of tuples, in order of importance, where the first element describes a regex of paths that
-        match, and the second element is the MIME type string of the content type.
-        """
-        namespaces = {
-            "ct": "http://schemas.openxmlformats.org/package/2006/content-types"
-        }
-        result = []
-
-        try:
-            with archive.open(CONTENT_TYPES_LOCATION) as f:
-                try:
-                    root = xml.etree.ElementTree.ElementTree(file=f)
-                except xml.etree.ElementTree.ParseError as e:
-                    log.warning(
-                        f"{CONTENT_TYPES_LOCATION} has malformed XML"
-                        f"(position {e.position[0]}:{e.position[1]})."
-                    )
-                    self.safe_report(
-                        {'WARNING'},
-                        f"{CONTENT_TYPES_LOCATION} has malformed XML at position {e.position[0]}:{e.position[1]}"
-                    )
-                    root = None
-
-                if root is not None:
-                    # Overrides are more important than defaults, so put those in front.
-                    for override_node in root.iterfind("ct:Override", namespaces):
-                        if (
-                            "PartName" not in override_node.attrib
-                            or "ContentType" not in override_node.attrib
-                        ):
-                            log.warning(
-                                "[Content_Types].xml malformed: Override node without path or MIME type."
-                            )
-                            self.safe_report(
-                                {'WARNING'},
-                                "[Content_Types].xml malformed: Override node without path or MIME type"
-                            )
-                            continue  # Ignore the broken one.
-                        match_regex = re.compile(
-                            re.escape(override_node.attrib["PartName"])
-                        )
-                        result.append(
-                            (match_regex, override_node.attrib["ContentType"])
-                        )
-
-                    for default_node in root.iterfind("ct:Default", namespaces):
-                        if (
-                            "Extension" not in default_node.attrib
-                            or "ContentType" not in default_node.attrib
-                        ):
-                            log.warning(
-                                "[Content_Types].xml malformed: Default node without extension or MIME type."
-                            )
-                            self.safe_report(
-                                {'WARNING'},
-                                "[Content_Types].xml malformed: Default node without extension or MIME type"
-                            )
-                            continue  # Ignore the broken one.
-                        match_regex = re.compile(
-                            rf".*\.{re.escape(default_node.attrib['Extension'])}"
-                        )
-                        result.append((match_regex, default_node.attrib["ContentType"]))
-        except KeyError:  # ZipFile reports that the content types file doesn't exist.
-            log.warning(f"{CONTENT_TYPES_LOCATION} file missing!")
-            self.safe_report({'WARNING'}, f"{CONTENT_TYPES_LOCATION} file missing")
-
-        # This parser should be robust to slightly broken files and retrieve what we can.
-        # In case the document is broken or missing, here we'll append the default ones for 3MF.
-        # If the content types file was fine, this gets least priority so the actual data still wins.
-        result.append((re.compile(r".*\.rels"), RELS_MIMETYPE))
-        result.append((re.compile(r".*\.model"), MODEL_MIMETYPE))
-
-        return result
-
-    def assign_content_types(self, archive: zipfile.ZipFile,
-                             content_types: List[Tuple[Pattern[str], str]]) -> Dict[str, str]:
+    def read_prepared_archive(self, path: str, prepared: PreparedArchive) -> Dict[str, List[ArchivePart]]:
         """
-        Assign a MIME type to each file in the archive.
+        Creates file streams from all the files in an archive that was read by a worker process.
 
-        The MIME types are obtained through the content types file from the archive. This content types file itself is
-        not in the result though.
-        :param archive: A 3MF archive with files to assign content types to.
-        :param content_types: The content types for files in that archive, in order of priority.
-        :return: A dictionary mapping all file paths in the archive to a content types. If the content type for a file
-        is unknown, the content type will be an empty string.
+        The messages that the worker process had to report are reported here, and the files are sorted by the content
+        types that the worker process found.
+        :param path: The path to the archive.
+        :param prepared: What the worker process read from the archive.
+        :return: A dictionary with all of the resources in the archive by content type, like `read_archive`.
         """
-        result = {}
-        for file_info in archive.filelist:
-            file_path = file_info.filename
-            if file_path == CONTENT_TYPES_LOCATION:  # Don't index this one.
-                continue
-            for pattern, content_type in content_types:  # Process in the correct order!
-                if pattern.fullmatch(file_path):
-                    result[file_path] = content_type
-                    break
-            else:  # None of the patterns matched.
-                result[file_path] = ""
-
-        return result
-
-    def must_preserve(self, files_by_content_type: Dict[str, List[IO[bytes]]],
-                      annotations: Annotations) -> None:
+        for level, message in prepared.reports:
+            log.log(logging.ERROR if "ERROR" in level else logging.WARNING, message)
+            self.safe_report(level, message)
+        if prepared.error is not None:
+            log.error(f"Unable to read archive: {prepared.error}")
+            self.safe_report({'ERROR'}, f"Unable to read archive: {prepared.error}")
+            return {}
+        return self.read_archive(path, prepared.content_types)
+
+    def must_preserve(self, files_by_content_type: Dict[str, List[ArchivePart]],
+                      annotations: Annotations, preserved: PreservedFiles) -> None:
         """
         Preserves files that are marked with the 'MustPreserve' relationship and PrintTickets.
 
-        These files are saved in the Blender context as text files in a hidden folder. If the preserved files are in
+        These files are kept as raw bytes, to be stored in the Blender context later. If the preserved files are in
         conflict with previously loaded 3MF archives (same file path, different content) then they will not be
         preserved.
-
-        Archived files are stored in Base85 encoding to allow storing arbitrary files, even binary files. This sadly
-        means that the file size will increase by about 25%, and that the files are not human-readable any more when
-        opened in Blender, even if they were originally human-readable.
         :param files_by_content_type: The files in this 3MF archive, by content type. They must be provided by content
         type because that is how the ``read_archive`` function stores them, which is not ideal. But this function will
         sort that out.
         :param annotations: Collection of annotations gathered so far.
+        :param preserved: Collection of files preserved so far, to add the files of this archive to.
         """
         preserved_files = (
             set()
@@ -375,41 +321,132 @@ class Import3MF(bpy.types.Operator, bpy_extras.io_utils.ImportHelper):
         for files in files_by_content_type.values():
             for file in files:
                 if file.name in preserved_files:
-                    filename = f".3mf_preserved/{file.name}"
-                    if filename in bpy.data.texts:
-                        if (
-                            bpy.data.texts[filename].as_string()
-                            == conflicting_mustpreserve_contents
-                        ):
-                            # This file was previously already in conflict. The new file will always be in conflict with
-                            # one of the previous files.
-                            continue
-                    # Encode as Base85 so that the file can be saved in Blender's Text objects.
-                    file_contents = base64.b85encode(file.read()).decode("UTF-8")
-                    if filename in bpy.data.texts:
-                        if bpy.data.texts[filename].as_string() == file_contents:
-                            # File contents are EXACTLY the same, so the file is not in conflict.
-                            continue  # But we also don't need to re-add the same file then.
-                        else:  # Same file exists with different contents, so they are in conflict.
-                            bpy.data.texts[filename].clear()
-                            bpy.data.texts[filename].write(
-                                conflicting_mustpreserve_contents
-                            )
-                            continue
-                    else:  # File doesn't exist yet.
-                        handle = bpy.data.texts.new(filename)
-                        handle.write(file_contents)
-
-    def is_supported(self, required_extensions: str) -> bool:
-        """
-        Determines if a document is supported by this add-on.
-        :param required_extensions: The value of the `requiredextensions` attribute of the root node of the XML
-        document.
-        :return: `True` if the document is supported, or `False` if it's not.
-        """
-        extensions = required_extensions.split(" ")
-        extensions = set(filter(lambda x: x != "", extensions))
-        return extensions <= SUPPORTED_EXTENSIONS
+                    if preserved.is_conflicting(file.name):
+                        # This file was previously already in conflict. The new file will always be in conflict with
+                        # one of the previous files, so don't bother reading it.
+                        continue
+                    # Remember where the file came from, so that exporting can copy it from there without recompressing.
+                    preserved.add(file.name, file.read(), (os.path.abspath(file.archive.filename), file.name))
+
+    def read_model(self, context: bpy.types.Context, path: str, model_file: ArchivePart,
+                   prepared: Optional[PreparedArchive], scene_metadata: Metadata) -> Metadata:
+        """
+        Reads a 3dmodel.model document and builds its items, in the way that the options ask for.
+        :param context: The Blender context.
+        :param path: The path to the archive that the document came from, for reporting.
+        :param model_file: The 3dmodel.model document in the archive.
+        :param prepared: What a worker process read from the archive, if it was read by a worker process.
+        :param scene_metadata: The metadata gathered so far from the scene and previously loaded documents.
+        :return: The scene metadata, combined with the metadata from this document.
+        """
+        self.proxy_source = (os.path.abspath(path), model_file.name) if self.use_proxies else None
+        if prepared is not None and model_file.name in prepared.models:
+            # The worker process already left out the items that are not selected.
+            return self.read_prepared_model(context, path, prepared.models[model_file.name], scene_metadata)
+        selection = self.select_model_items(path, model_file)
+        if self.use_streaming:
+            return self.read_model_streaming(context, path, model_file, scene_metadata, selection)
+        try:
+            document = xml.etree.ElementTree.ElementTree(file=model_file)
+        except xml.etree.ElementTree.ParseError as e:
+            log.error(f"3MF document in {path} is malformed: {str(e)}")
+            self.safe_report({'ERROR'}, f"3MF document in {path} is malformed: {str(e)}")
+            return scene_metadata
+        if document is None:
+            # This file is corrupt or we can't read it. There is no error code to communicate this to Blender though.
+            return scene_metadata  # Leave the scene empty / skip this file.
+        if selection is not None:
+            filter_document(document.getroot(), selection)
+        return self.read_model_document(context, path, document.getroot(), scene_metadata)
+
+    def select_model_items(self, path: str, model_file: ArchivePart) -> Optional[Selection]:
+        """
+        Selects the build items of a 3dmodel.model document to import, according to `item_filter`.
+
+        The document is scanned first, to find out which objects the selected items need. The objects and items that
+        are not selected can then be skipped while reading the document.
+        :param path: The path to the archive that the document came from, for reporting.
+        :param model_file: The 3dmodel.model document in the archive.
+        :return: The objects and build items to read, or `None` to read everything.
+        """
+        selectors = parse_selectors(self.item_filter)
+        if not selectors:
+            return None
+        with self.instrumentation.span("scan"):
+            selection = scan_selection(model_file, selectors)
+        if not selection.items:
+            log.warning(f"No build items in {path} match {self.item_filter}.")
+            self.safe_report({'WARNING'}, f"No build items in {path} match {self.item_filter}")
+        return selection
+
+    def read_model_streaming(self, context: bpy.types.Context, path: str, model_file: IO[bytes],
+                             scene_metadata: Metadata, selection: Optional[Selection] = None) -> Metadata:
+        """
+        Reads a 3dmodel.model document incrementally, without keeping the whole document in memory.
+
+        Each <object> element is converted into a resource object as soon as it has been parsed completely, after which
+        the element is discarded. This way the memory needed to read the document is bounded by the largest object in
+        it, rather than by the size of the entire document. The 3MF specification demands that resources are defined
+        before they are referred to, and that the <build> element comes after the resources. So the items can be built
+        as soon as the <build> element is complete.
+
+        The vertices and triangles of meshes are read straight from the parser into the buffers of the mesh, without
+        creating elements for them. See `ModelHandler`.
+        :param context: The Blender context.
+        :param path: The path to the archive that the document came from, for reporting.
+        :param model_file: A stream containing the 3dmodel.model document.
+        :param scene_metadata: The metadata gathered so far from the scene and previously loaded documents.
+        :param selection: The objects and build items to read, or `None` to read everything.
+        :return: The scene metadata, combined with the metadata from this document.
+        """
+        handler = ModelHandler(self, context, path, scene_metadata, selection)
+        try:
+            handler.parse(model_file)
+        except xml.parsers.expat.ExpatError as e:
+            log.error(f"3MF document in {path} is malformed: {str(e)}")
+            self.safe_report({'ERROR'}, f"3MF document in {path} is malformed: {str(e)}")
+        return handler.scene_metadata
+
+    def read_prepared_model(self, context: bpy.types.Context, path: str, prepared: PreparedModel,
+                            scene_metadata: Metadata) -> Metadata:
+        """
+        Reads a 3dmodel.model document that was parsed by a worker process.
+
+        The worker process already read the materials and meshes. What's left is to read the rest of the objects and
+        build the items.
+        :param context: The Blender context.
+        :param path: The path to the archive that the document came from, for reporting.
+        :param prepared: What the worker process read from the document.
+        :param scene_metadata: The metadata gathered so far from the scene and previously loaded documents.
+        :return: The scene metadata, combined with the metadata from this document.
+        """
+        if prepared.error is not None:
+            log.error(f"3MF document in {path} is malformed: {prepared.error}")
+            self.safe_report({'ERROR'}, f"3MF document in {path} is malformed: {prepared.error}")
+            return scene_metadata
+        return self.read_model_document(context, path, prepared.root, scene_metadata, prepared.meshes)
+
+    def read_model_document(self, context: bpy.types.Context, path: str, root: xml.etree.ElementTree.Element,
+                            scene_metadata: Metadata, meshes: Optional[List[MeshBuffers]] = None) -> Metadata:
+        """
+        Reads a complete 3dmodel.model document and builds its items.
+        :param context: The Blender context.
+        :param path: The path to the archive that the document came from, for reporting.
+        :param root: The root element of the document.
+        :param scene_metadata: The metadata gathered so far from the scene and previously loaded documents.
+        :param meshes: The meshes of the objects in the document, if they were read already. See `read_objects`.
+        :return: The scene metadata, combined with the metadata from this document.
+        """
+        if not self.is_supported(root.attrib.get("requiredextensions", "")):
+            log.warning(f"3MF document in {path} requires unknown extensions.")
+            self.safe_report({'WARNING'}, f"3MF document in {path} requires unknown extensions.")
+            # Still continue processing even though the spec says not to. Our aim is to retrieve whatever
+            # information we can.
+
+        self.resource_to_mesh = {}  # Object IDs are only unique within one document.
+        document = self.read_document(root, meshes, self.unit_scale(context, root), scene_metadata)
+        self.build_items(document.items)
+        return document.metadata
 
     def unit_scale(self, context: bpy.types.Context,
                    root: xml.etree.ElementTree.Element) -> float:
@@ -428,512 +465,682 @@ class Import3MF(bpy.types.Operator, bpy_extras.io_utils.ImportHelper):
                 context.scene.unit_settings.scale_length
             )  # Apply the global scale of the units in Blender.
 
-        threemf_unit = root.attrib.get("unit", MODEL_DEFAULT_UNIT)
         blender_unit = context.scene.unit_settings.length_unit
-        scale *= threemf_to_metre[threemf_unit]  # Convert 3MF units to metre.
+        scale *= self.metres_per_unit(root)  # Convert 3MF units to metre.
         scale /= blender_to_metre[blender_unit]  # Convert metre to Blender's units.
 
         return scale
 
-    def read_metadata(self, node: xml.etree.ElementTree.Element,
-                      original_metadata: Optional[Metadata] = None) -> Metadata:
+    def build_items(self, items: Iterable[BuildItem]) -> None:
         """
-        Reads the metadata tags from a metadata group.
-        :param node: A node in the 3MF document that contains <metadata> tags. This can be either a root node, or a
-        <metadatagroup> node.
-        :param original_metadata: If there was already metadata for this context from other documents, you can provide
-        that metadata here. The metadata of those documents will be combined then.
-        :return: A `Metadata` object.
+        Builds the scene. This places the objects of the build items with their transformations in the scene.
+        :param items: The build items of the document, as read by `read_build_items`. Their objects must be in the
+        `resource_objects` field.
         """
-        if original_metadata is not None:
-            metadata = original_metadata
-        else:
-            metadata = Metadata()  # Create a new Metadata object.
-
-        for metadata_node in node.iterfind("./3mf:metadata", MODEL_NAMESPACES):
-            if "name" not in metadata_node.attrib:
-                log.warning("Metadata entry without name is discarded.")
-                self.safe_report({'WARNING'}, "Metadata entry without name is discarded")
-                continue  # This attribute has no name, so there's no key by which I can save the metadata.
-            name = metadata_node.attrib["name"]
-            preserve_str = metadata_node.attrib.get("preserve", "0")
-            # We don't use this ourselves since we always preserve, but the preserve attribute itself will also be
-            # preserved.
-            preserve = preserve_str != "0" and preserve_str.lower() != "false"
-            datatype = metadata_node.attrib.get("type", "")
-            value = metadata_node.text
-
-            # Always store all metadata so that they are preserved.
-            metadata[name] = MetadataEntry(
-                name=name, preserve=preserve, datatype=datatype, value=value
-            )
+        for item in items:
+            self.instrumentation.count("build_items")
+            self.build_object(self.resource_objects[item.objectid], item.transformation, item.metadata, [item.objectid])
 
-        return metadata
+    def build_object(
+        self,
+        resource_object: ResourceObject,
+        transformation: numpy.ndarray,
+        metadata: Metadata,
+        objectid_stack_trace: List[int],
+        parent: Optional[bpy.types.Object] = None,
+    ) -> bpy.types.Object:
+        """
+        Converts a resource object into a Blender object.
 
-    def read_materials(self, root: xml.etree.ElementTree.Element) -> None:
+        This resource object may refer to components that need to be built along. These components may again have
+        subcomponents, and so on. The whole hierarchy is gathered first, so that the world transformations of all of
+        its objects can be computed at once. Only then are the Blender objects created.
+        :param resource_object: The resource object that needs to be converted.
+        :param transformation: A 4x4 transformation matrix to apply to this resource object.
+        :param metadata: A collection of metadata belonging to this build item.
+        :param objectid_stack_trace: A list of all object IDs that have been processed so far, including the object ID
+        we're processing now.
+        :param parent: The resulting object must be marked as a child of this Blender object.
+        :return: The Blender object of the resource object. The objects of its components are its children.
+        """
+        if not resource_object.components:  # Most objects are a plain mesh, which is placed as it is.
+            return self.create_object(resource_object, objectid_stack_trace[-1], transformation, metadata, parent)
+
+        hierarchy = []
+        self.gather_hierarchy(resource_object, transformation, objectid_stack_trace, -1, hierarchy)
+        world_transformations = compose_transformations(
+            numpy.stack([node.transformation for node in hierarchy]),
+            [node.parent for node in hierarchy],
+        )
+
+        blender_objects = []
+        for node, world_transformation in zip(hierarchy, world_transformations):
+            node_parent = parent if node.parent < 0 else blender_objects[node.parent]
+            blender_objects.append(
+                self.create_object(node.resource_object, node.objectid, world_transformation, metadata, node_parent)
+            )
+        return blender_objects[0]
+
+    def gather_hierarchy(
+        self,
+        resource_object: ResourceObject,
+        transformation: numpy.ndarray,
+        objectid_stack_trace: List[int],
+        parent: int,
+        hierarchy: List[HierarchyNode],
+    ) -> None:
         """
-        Read out all of the material resources from the 3MF document.
+        Lists a resource object and its components recursively, with their transformations relative to their parents.
 
-        The materials will be stored in `self.resource_materials` until it gets used to build the items.
-        :param root: The root of an XML document that may contain materials.
+        A "stack trace" will be traced in order to prevent going into an infinite recursion.
+        :param resource_object: The resource object to list.
+        :param transformation: The transformation of the resource object, relative to its parent.
+        :param objectid_stack_trace: A list of all object IDs that have been processed so far, including the object ID
+        we're processing now.
+        :param parent: The index of the parent in the hierarchy, or -1 if it's the root of the hierarchy.
+        :param hierarchy: The list to add the resource object and its components to, in depth-first order.
         """
-        for basematerials_item in root.iterfind(
-            "./3mf:resources/3mf:basematerials", MODEL_NAMESPACES
-        ):
+        index = len(hierarchy)
+        hierarchy.append(HierarchyNode(resource_object, objectid_stack_trace[-1], parent, transformation))
+
+        for component in resource_object.components:
+            if component.resource_object in objectid_stack_trace:
+                # These object IDs refer to each other in a loop. Don't go in there!
+                log.warning(
+                    f"Recursive components in object ID: {component.resource_object}"
+                )
+                continue
             try:
-                material_id = basematerials_item.attrib["id"]
-            except KeyError:
-                log.warning("Encountered a basematerials item without resource ID.")
-                self.safe_report({'WARNING'}, "Encountered a basematerials item without resource ID")
-                continue  # Need to have an ID, or no item can reference to the materials. Skip this one.
-            if material_id in self.resource_materials:
-                log.warning(f"Duplicate material ID: {material_id}")
-                self.safe_report({'WARNING'}, f"Duplicate material ID: {material_id}")
+                child_object = self.resource_objects[component.resource_object]
+            except KeyError:  # Invalid resource ID. Doesn't exist!
+                log.warning(
+                    f"Build item with unknown resource ID: {component.resource_object}"
+                )
                 continue
+            objectid_stack_trace.append(component.resource_object)
+            self.gather_hierarchy(child_object, component.transformation, objectid_stack_trace, index, hierarchy)
+            objectid_stack_trace.pop()
 
-            # Use a dictionary mapping indices to resources, because some indices may be skipped due to being invalid.
-            self.resource_materials[material_id] = {}
-            index = 0
-
-            # "Base" must be the stupidest name for a material resource. Oh well.
-            for base_item in basematerials_item.iterfind(
-                "./3mf:base", MODEL_NAMESPACES
-            ):
-                name = base_item.attrib.get("name", "3MF Material")
-                color = base_item.attrib.get("displaycolor")
-                if color is not None:
-                    # Parse the color. It's a hexadecimal number indicating RGB or RGBA.
-                    color = color.lstrip(
-                        "#"
-                    )  # Should start with a #. We'll be lenient if it's not.
-                    try:
-                        color_int = int(color, 16)
-                        # Separate out up to four bytes from this int, from right to left.
-                        b1 = (color_int & 0x000000FF) / 255
-                        b2 = ((color_int & 0x0000FF00) >> 8) / 255
-                        b3 = ((color_int & 0x00FF0000) >> 16) / 255
-                        b4 = ((color_int & 0xFF000000) >> 24) / 255
-                        if len(color) == 6:  # RGB format.
-                            color = (
-                                b3,
-                                b2,
-                                b1,
-                                1.0,
-                            )  # b1, b2 and b3 are B, G, R respectively. b4 is always 0.
-                        else:  # RGBA format, or invalid.
-                            color = (
-                                b4,
-                                b3,
-                                b2,
-                                b1,
-                            )  # b1, b2, b3 and b4 are A, B, G, R respectively.
-                    except ValueError:
-                        log.warning(
-                            f"Invalid color for material {name} of resource {material_id}: {color}"
-                        )
-                        self.safe_report({'WARNING'},
-                                         f"Invalid color for material {name} of resource {material_id}: {color}")
-                        color = None  # Don't add a color for this material.
-
-                # Input is valid. Create a resource.
-                self.resource_materials[material_id][index] = ResourceMaterial(
-                    name=name, color=color
-                )
-                index += 1
+    def create_object(
+        self,
+        resource_object: ResourceObject,
+        objectid: str,
+        transformation: numpy.ndarray,
+        metadata: Metadata,
+        parent: Optional[bpy.types.Object],
+    ) -> bpy.types.Object:
+        """
+        Creates the Blender object of a single resource object, without its components.
+        :param resource_object: The resource object that needs to be converted.
+        :param objectid: The ID of the resource object, to find the mesh that was built for it before.
+        :param transformation: The 4x4 world transformation of the object.
+        :param metadata: A collection of metadata belonging to this build item.
+        :param parent: The resulting object must be marked as a child of this Blender object, if any.
+        :return: The new Blender object.
+        """
+        # Create a mesh if there is mesh data here, or re-use the mesh if this object was built before.
+        mesh = None
+        if self.use_instancing and objectid in self.resource_to_mesh:
+            mesh = self.resource_to_mesh[objectid]  # Linked duplicate of the mesh that was built before.
+        elif len(resource_object.triangles) > 0:
+            with self.instrumentation.span("build_mesh"):
+                mesh = self.build_mesh(resource_object)
+            if self.use_instancing:
+                self.resource_to_mesh[objectid] = mesh
 
-            if len(self.resource_materials[material_id]) == 0:
-                del self.resource_materials[
-                    material_id
-                ]  # Don't leave empty material sets hanging.
+        # Create an object.
+        with self.instrumentation.span("link_object"):
+            blender_object = bpy.data.objects.new("3MF Object", mesh)
+            self.num_loaded += 1
+            if self.use_collection_per_file:  # Parent, transform and link all objects of the file at once later.
+                self.pending_objects.append((blender_object, parent, transformation))
+            else:
+                if parent is not None:
+                    blender_object.parent = parent
+                blender_object.matrix_world = mathutils.Matrix(transformation.tolist())
+                bpy.context.collection.objects.link(blender_object)
+            metadata.store(blender_object)
+            if self.proxy_source is not None and mesh is not None:  # Remember where to load the real mesh from.
+                blender_object[PROXY_SOURCE], blender_object[PROXY_DOCUMENT] = self.proxy_source
+                blender_object[PROXY_OBJECTID] = objectid
+            self.imported_objects.append(blender_object)
+        self.instrumentation.count("blender_objects")
+        if "3mf:object_type" in resource_object.metadata and resource_object.metadata[
+            "3mf:object_type"
+        ].value in {"solidsupport", "support"}:
+            # Don't render support meshes.
+            blender_object.hide_render = True
+        return blender_object
 
-    def read_objects(self, root: xml.etree.ElementTree.Element) -> None:
+    def link_objects(self, path: str) -> None:
         """
-        Reads all repeatable build objects from the resources of an XML root node.
+        Links the objects of a file into a new collection named after the file, all at once.
 
-        This stores them in the resource_objects field.
-        :param root: The root node of a 3dmodel.model XML file.
+        Linking objects into the scene one by one makes Blender update the scene each time, which gets slower the more
+        objects there are. Instead, the objects are first gathered in a collection that is not part of the scene yet,
+        and their world transformations are set in one call. Only then is the collection linked into the scene.
+
+        This only does something if `use_collection_per_file` is enabled.
+        :param path: The path to the file that the objects were read from.
         """
-        for object_node in root.iterfind(
-            "./3mf:resources/3mf:object", MODEL_NAMESPACES
-        ):
-            try:
-                objectid = object_node.attrib["id"]
-            except KeyError:
-                log.warning("Object resource without ID!")
-                self.safe_report({'WARNING'}, "Object resource without ID")
-                continue  # ID is required, otherwise the build can't refer to it.
-
-            pid = object_node.attrib.get("pid")  # Material ID.
-            pindex = object_node.attrib.get(
-                "pindex"
-            )  # Index within a collection of materials.
-            material = None
-            if pid is not None and pindex is not None:
-                try:
-                    index = int(pindex)
-                    material = self.resource_materials[pid][index]
-                except KeyError:
-                    log.warning(
-                        f"Object with ID {objectid} refers to material collection {pid} with index {pindex}"
-                        f" which doesn't exist."
-                    )
-                    self.safe_report(
-                        {'WARNING'},
-                        f"Object with ID {objectid} refers to material collection {pid} "
-                        f"with index {pindex} which doesn't exist"
-                    )
-                except ValueError:
-                    log.warning(
-                        f"Object with ID {objectid} specifies material index {pindex}, which is not integer."
-                    )
-                    self.safe_report(
-                        {'WARNING'},
-                        f"Object with ID {objectid} specifies material index {pindex}, which is not integer")
-
-            vertices = self.read_vertices(object_node)
-            triangles, materials = self.read_triangles(object_node, material, pid)
-            components = self.read_components(object_node)
-            metadata = Metadata()
-            for metadata_node in object_node.iterfind(
-                "./3mf:metadatagroup", MODEL_NAMESPACES
-            ):
-                metadata = self.read_metadata(metadata_node, metadata)
-            if "partnumber" in object_node.attrib:
-                # Blender has no way to ensure that custom properties get preserved if a mesh is split up, but for most
-                # operations this is retained properly.
-                metadata["3mf:partnumber"] = MetadataEntry(
-                    name="3mf:partnumber",
-                    preserve=True,
-                    datatype="xs:string",
-                    value=object_node.attrib["partnumber"],
-                )
-            metadata["3mf:object_type"] = MetadataEntry(
-                name="3mf:object_type",
-                preserve=True,
-                datatype="xs:string",
-                value=object_node.attrib.get("type", "model"),
-            )
+        if not self.pending_objects:
+            return
+        collection = bpy.data.collections.new(os.path.splitext(os.path.basename(path))[0])
+        for blender_object, parent, _ in self.pending_objects:  # Parents come before their children.
+            if parent is not None:
+                blender_object.parent = parent
+            collection.objects.link(blender_object)
+        world_transformations = numpy.stack([transformation for _, _, transformation in self.pending_objects])
+        # Blender stores matrices column by column.
+        world_transformations = world_transformations.transpose(0, 2, 1).astype(numpy.float32)
+        collection.objects.foreach_set("matrix_world", world_transformations.ravel())
+        bpy.context.collection.children.link(collection)
+        self.pending_objects = []
+
+    def load_geometry(self, context: bpy.types.Context, proxies: Iterable[bpy.types.Object]) -> List[bpy.types.Object]:
+        """
+        Replaces the boxes of proxies with the real meshes of their objects, read from the 3MF files they came from.
 
-            self.resource_objects[objectid] = ResourceObject(
-                vertices=vertices,
-                triangles=triangles,
-                materials=materials,
-                components=components,
-                metadata=metadata,
-            )
+        Only the objects of the proxies are read from each document. All other objects and the build items are skipped.
+        The proxies keep their names, transformations and place in the scene.
+
+        Raises `MeshDataError` in strict mode if the mesh data has a problem.
+        :param context: The Blender context.
+        :param proxies: Objects that were imported with `use_proxies`. Other objects are ignored.
+        :return: The proxies that got their real mesh.
+        """
+        proxies_by_document = {}
+        for proxy in proxies:
+            if PROXY_OBJECTID in proxy:
+                proxies_by_document.setdefault((proxy[PROXY_SOURCE], proxy[PROXY_DOCUMENT]), []).append(proxy)
+
+        self.reset_state()  # Without proxy source, so the real meshes are read.
+        self.instrumentation.start()
+        loaded = []
+        try:
+            for (path, document), document_proxies in proxies_by_document.items():
+                with self.instrumentation.span("read_archive"):
+                    model_files = {part.name: part for part in self.read_archive(path).get(MODEL_MIMETYPE, [])}
+                if document not in model_files:
+                    log.warning(f"Unable to find 3MF document {document} in {path}.")
+                    self.safe_report({'WARNING'}, f"Unable to find 3MF document {document} in {path}")
+                    continue
+                selection = Selection(objects={proxy[PROXY_OBJECTID] for proxy in document_proxies}, items=set())
+                with self.instrumentation.span("read_model"):
+                    self.read_model_streaming(context, path, model_files[document], Metadata(), selection)
+                for proxy in document_proxies:
+                    if self.load_proxy(proxy):
+                        loaded.append(proxy)
+        finally:
+            self.instrumentation.stop()
+            if self.instrumentation.enabled:
+                log.info(f"Load geometry instrumentation: {self.instrumentation.summary()}")
+                last_reports["load_geometry"] = self.instrumentation.report()
+        return loaded
+
+    def load_proxy(self, proxy: bpy.types.Object) -> bool:
+        """
+        Gives a proxy the real mesh of its object, once the object has been read.
 
-    def read_vertices(self, object_node: xml.etree.ElementTree.Element) -> List[Tuple[float, float, float]]:
+        The box that the proxy had is removed if no other proxy uses it.
+        :param proxy: An object that was imported with `use_proxies`.
+        :return: `True` if the proxy got its real mesh, or `False` if its object could not be read.
+        """
+        objectid = proxy[PROXY_OBJECTID]
+        resource_object = self.resource_objects.get(objectid)
+        if resource_object is None or len(resource_object.triangles) == 0:
+            log.warning(f"Unable to load object {objectid} from {proxy[PROXY_SOURCE]}.")
+            self.safe_report({'WARNING'}, f"Unable to load object {objectid} from {proxy[PROXY_SOURCE]}")
+            return False
+        if self.use_instancing and objectid in self.resource_to_mesh:
+            mesh = self.resource_to_mesh[objectid]
+        else:
+            with self.instrumentation.span("build_mesh"):
+                mesh = self.build_mesh(resource_object)
+            if self.use_instancing:
+                self.resource_to_mesh[objectid] = mesh
+
+        box = proxy.data
+        proxy.data = mesh
+        for key in (PROXY_SOURCE, PROXY_DOCUMENT, PROXY_OBJECTID):
+            del proxy[key]
+        if box is not None and box.users == 0:
+            bpy.data.meshes.remove(box)
+        self.instrumentation.count("loaded_proxies")
+        return True
+
+    def build_mesh(self, resource_object: ResourceObject) -> bpy.types.Mesh:
         """
-        Reads out the vertices from an XML node of an object.
+        Creates the Blender mesh of a resource object, with its materials.
+        :param resource_object: The resource object with the mesh data. It must have triangles.
+        :return: The new mesh.
+        """
+        mesh = bpy.data.meshes.new("3MF Mesh")
+        # Hand the buffers to Blender in bulk, rather than converting every vertex and triangle to Python objects.
+        num_triangles = len(resource_object.triangles)
+        mesh.vertices.add(len(resource_object.vertices))
+        mesh.vertices.foreach_set("co", resource_object.vertices.ravel())
+        mesh.loops.add(num_triangles * 3)
+        mesh.loops.foreach_set("vertex_index", resource_object.triangles.ravel())
+        mesh.polygons.add(num_triangles)
+        mesh.polygons.foreach_set("loop_start", numpy.arange(0, num_triangles * 3, 3, dtype=numpy.int32))
+        resource_object.metadata.store(mesh)
+
+        # Add the materials to the mesh, in the order of the indices that the triangles refer to.
+        if resource_object.material_indices is not None or resource_object.materials[0] is not None:
+            for triangle_material in resource_object.materials:
+                if triangle_material is None:
+                    mesh.materials.append(None)  # Empty slot for triangles without material.
+                    continue
+                # Find the Blender material the first time that this material is used.
+                if triangle_material not in self.resource_to_material:
+                    self.resource_to_material[triangle_material] = self.find_material(triangle_material)
+                mesh.materials.append(self.resource_to_material[triangle_material])
+        if resource_object.material_indices is not None:
+            # Assign the materials to all triangles at once. If all triangles use the default material, they already
+            # have material index 0.
+            mesh.polygons.foreach_set("material_index", resource_object.material_indices.astype(numpy.int32))
+
+        mesh.validate(clean_customdata=False)  # Removes what the triangles weren't checked for, like duplicates.
+        mesh.update(calc_edges=True)
+        return mesh
+
+    def find_material(self, triangle_material: ResourceMaterial) -> bpy.types.Material:
+        """
+        Gets a Blender material for a material from the 3MF file.
 
-        If any vertex is corrupt, like with a coordinate missing or not proper floats, then the 0 coordinate will be
-        used. This is to prevent messing up the list of indices.
-        :param object_node: An <object> element from the 3dmodel.model file.
-        :return: List of vertices in that object. Each vertex is a tuple of 3 floats for X, Y and Z.
+        Depending on `material_reuse`, a compatible material that already exists in Blender is used, or a new material
+        is created.
+        :param triangle_material: The material from the 3MF file.
+        :return: The Blender material to assign to the triangles with that material.
         """
-        result = []
-        for vertex in object_node.iterfind(
-            "./3mf:mesh/3mf:vertices/3mf:vertex", MODEL_NAMESPACES
-        ):
-            attrib = vertex.attrib
-            try:
-                x = float(attrib.get("x", 0))
-            except ValueError:  # Not a float.
-                log.warning("Vertex missing X coordinate.")
-                self.safe_report({'WARNING'}, "Vertex missing X coordinate")
-                x = 0
-            try:
-                y = float(attrib.get("y", 0))
-            except ValueError:
-                log.warning("Vertex missing Y coordinate.")
-                self.safe_report({'WARNING'}, "Vertex missing Y coordinate")
-                y = 0
-            try:
-                z = float(attrib.get("z", 0))
-            except ValueError:
-                log.warning("Vertex missing Z coordinate.")
-                self.safe_report({'WARNING'}, "Vertex missing Z coordinate")
-                z = 0
-            result.append((x, y, z))
+        if self.material_reuse == "NEW":
+            return self.create_material(triangle_material)
+
+        if self.material_index is None:
+            self.material_index = self.index_materials()
+        key = self.material_key(triangle_material.name, triangle_material.color)
+        if key not in self.material_index:
+            self.material_index[key] = self.create_material(triangle_material)
+        return self.material_index[key]
+
+    def index_materials(self) -> Dict[tuple, bpy.types.Material]:
+        """
+        Lists the materials that exist in Blender, by the name and color that they would be reused for.
+
+        Blender renames new materials with a numbered suffix if the name is taken, such as "PLA.001". That suffix is
+        ignored, so that those materials are found by the name they were created with.
+        :return: The materials by their key, as produced by `material_key`. If multiple materials have the same key,
+        the first one is used.
+        """
+        result = {}
+        for material in bpy.data.materials:
+            name = re.sub(r"\.\d{3}$", "", material.name)
+            if material.use_nodes:
+                principled = bpy_extras.node_shader_utils.PrincipledBSDFWrapper(material, is_readonly=True)
+                color = (*principled.base_color[:3], principled.alpha)
+            else:
+                color = tuple(material.diffuse_color)
+            result.setdefault(self.material_key(name, color), material)
         return result
 
-    def read_triangles(self, object_node: xml.etree.ElementTree.Element,
-                       default_material: Optional[int],
-                       material_pid: Optional[int]) -> Tuple[List[Tuple[int, int, int]], List[Optional[int]]]:
-        """
-        Reads out the triangles from an XML node of an object.
-
-        These triangles always consist of 3 vertices each. Each vertex is an index to the list of vertices read
-        previously. The triangle also contains an associated material, or None if the triangle gets no material.
-        :param object_node: An <object> element from the 3dmodel.model file.
-        :param default_material: If the triangle specifies no material, it should get this material. May be `None` if
-        the model specifies no material.
-        :param material_pid: Triangles that specify a material index will get their material from this material group.
-        :return: Two lists of equal length. The first lists the vertices of each triangle, which are 3-tuples of
-        integers referring to the first, second and third vertex of the triangle. The second list contains a material
-        for each triangle, or `None` if the triangle doesn't get a material.
-        """
-        vertices = []
-        materials = []
-        for triangle in object_node.iterfind(
-            "./3mf:mesh/3mf:triangles/3mf:triangle", MODEL_NAMESPACES
-        ):
-            attrib = triangle.attrib
-            try:
-                v1 = int(attrib["v1"])
-                v2 = int(attrib["v2"])
-                v3 = int(attrib["v3"])
-                if v1 < 0 or v2 < 0 or v3 < 0:  # Negative indices are not allowed.
-                    log.warning("Triangle containing negative index to vertex list.")
-                    self.safe_report({'WARNING'}, "Triangle containing negative index to vertex list")
-                    continue
+    def material_key(self, name: str, color: Optional[Iterable[float]]) -> tuple:
+        """
+        Gets the key to find a material with in the material index, according to `material_reuse`.
 
-                pid = attrib.get("pid", material_pid)
-                p1 = attrib.get("p1")
-                if p1 is None:
-                    material = default_material
-                else:
-                    try:
-                        material = self.resource_materials[pid][int(p1)]
-                    except KeyError as e:
-                        # Sorry. It's hard to give an exception more specific than this.
-                        log.warning(f"Material {e} is missing.")
-                        self.safe_report({'WARNING'}, f"Material {e} is missing")
-                        material = default_material
-                    except ValueError as e:
-                        log.warning(f"Material index is not an integer: {e}")
-                        self.safe_report({'WARNING'}, f"Material index is not an integer: {e}")
-                        material = default_material
-
-                vertices.append((v1, v2, v3))
-                materials.append(material)
-            except KeyError as e:
-                log.warning(f"Vertex {e} is missing.")
-                self.safe_report({'WARNING'}, f"Vertex {e} is missing")
-                continue
-            except ValueError as e:
-                log.warning(f"Vertex reference is not an integer: {e}")
-                self.safe_report({'WARNING'}, f"Vertex reference is not an integer: {e}")
-                continue  # No fallback this time. Leave out the entire triangle.
-        return vertices, materials
+        Colors are compared with the precision that 3MF files store them with, one byte per channel.
+        :param name: The name of the material.
+        :param color: The RGBA color of the material, with channels from 0 to 1, or `None` if it has no color.
+        :return: A key that is the same for all materials that can replace each other.
+        """
+        if color is not None:
+            color = tuple(round(channel * 255) for channel in color)
+        if self.material_reuse == "COLOR":
+            return None, color
+        return name, color
 
-    def read_components(self, object_node: xml.etree.ElementTree.Element) -> List[Component]:
+    def create_material(self, triangle_material: ResourceMaterial) -> bpy.types.Material:
+        """
+        Creates a new Blender material for a material from the 3MF file.
+        :param triangle_material: The material from the 3MF file.
+        :return: The new material.
         """
-        Reads out the components from an XML node of an object.
+        material = bpy.data.materials.new(triangle_material.name)
+        material.use_nodes = True
+        principled = bpy_extras.node_shader_utils.PrincipledBSDFWrapper(
+            material, is_readonly=False
+        )
+        principled.base_color = triangle_material.color[:3]
+        principled.alpha = triangle_material.color[3]
+        return material
+
+
+class Import3MF(bpy.types.Operator, bpy_extras.io_utils.ImportHelper, Importer):
+    """
+    Operator that imports a 3MF file into Blender.
+    """
+
+    # Metadata.
+    bl_idname = "import_mesh.threemf"
+    bl_label = "Import 3MF"
+    bl_description = "Load a 3MF scene"
+    bl_options = {"UNDO"}
+    filename_ext = ".3mf"
 
-        These components refer to other resource objects, with a transformation applied. They will eventually appear in
-        the scene as sub-objects.
-        :param object_node: An <object> element from the 3dmodel.model file.
-        :return: List of components in this object node.
+    # Options for the user.
+    filter_glob: bpy.props.StringProperty(default="*.3mf", options={"HIDDEN"})
+    files: bpy.props.CollectionProperty(
+        name="File Path", type=bpy.types.OperatorFileListElement
+    )
+    directory: bpy.props.StringProperty(subtype="DIR_PATH")
+    global_scale: bpy.props.FloatProperty(
+        name="Scale", default=1.0, soft_min=0.001, soft_max=1000.0, min=1e-6, max=1e6
+    )
+    use_streaming: bpy.props.BoolProperty(
+        name="Stream Model Data",
+        description="Read the model data incrementally, building each object as soon as it is read. This keeps the "
+        "memory usage low for large files.",
+        default=True,
+    )
+    use_instancing: bpy.props.BoolProperty(
+        name="Share Mesh Data",
+        description="Create the mesh of an object only once if the file places it multiple times. Every further "
+        "placement becomes a linked duplicate of the same mesh data.",
+        default=True,
+    )
+    processes: bpy.props.IntProperty(
+        name="Processes",
+        description="Number of processes to read multiple files with in parallel. Use 0 for one process per "
+        "processor, or 1 to read the files one by one.",
+        default=0,
+        min=0,
+        max=256,
+    )
+    use_strict: bpy.props.BoolProperty(
+        name="Strict",
+        description="Abort the import at the first broken vertex or triangle, instead of skipping it and reporting "
+        "a summary of the problems per object.",
+        default=False,
+    )
+    item_filter: bpy.props.StringProperty(
+        name="Only Items",
+        description="Comma-separated object IDs, part numbers or object names of the build items to import, or #N "
+        "for the Nth build item. The other objects are skipped without reading their mesh data. Leave empty to import "
+        "all items.",
+        default="",
+    )
+    use_proxies: bpy.props.BoolProperty(
+        name="Bounding Box Proxies",
+        description="Import each object as a box around its mesh, without reading its triangles. The real meshes of "
+        "the selected proxies can be loaded later with Object > Load 3MF Geometry.",
+        default=False,
+    )
+    use_collection_per_file: bpy.props.BoolProperty(
+        name="Collection per File",
+        description="Put the objects of each file in a new collection named after the file. The objects are then "
+        "linked into the scene all at once, which is much faster for files with many objects.",
+        default=False,
+    )
+    material_reuse: bpy.props.EnumProperty(
+        name="Materials",
+        description="Whether to use existing materials of the Blender file for the materials of the 3MF file, "
+        "rather than creating duplicates of them.",
+        items=MATERIAL_REUSE_MODES,
+        default="REUSE",
+    )
+    instrumentation_level: bpy.props.EnumProperty(
+        name="Instrumentation",
+        description="Measure the time and memory that each stage of the import takes, and log a summary. The "
+        "report is available from Python with io_mesh_3mf.instrumentation.last_report(\"import\").",
+        items=INSTRUMENTATION_LEVELS,
+        default="OFF",
+    )
+
+    def execute(self, context: bpy.types.Context) -> Set[str]:
         """
-        result = []
-        for component_node in object_node.iterfind(
-            "./3mf:components/3mf:component", MODEL_NAMESPACES
-        ):
-            try:
-                objectid = component_node.attrib["objectid"]
-            except KeyError:  # ID is required.
-                continue  # Ignore this invalid component.
-            transform = self.parse_transformation(
-                component_node.attrib.get("transform", "")
-            )
+        The main routine that reads out the 3MF file.
 
-            result.append(Component(resource_object=objectid, transformation=transform))
-        return result
+        This function serves as a high-level overview of the steps involved to read the 3MF file.
+        :param context: The Blender context.
+        :return: A set of status flags to indicate whether the operation succeeded or not.
+        """
+        # Preparation of the input parameters.
+        paths = [os.path.join(self.directory, name.name) for name in self.files]
+        if not paths:
+            paths.append(self.filepath)
 
-    def parse_transformation(self, transformation_str: str) -> mathutils.Matrix:
-        """
-        Parses a transformation matrix as written in the 3MF files.
-
-        Transformations in 3MF files are written in the form:
-        `m00 m01 m01 m10 m11 m12 m20 m21 m22 m30 m31 m32`
-
-        This would then result in a row-major matrix of the form:
-        ```
-        _                 _
-        | m00 m01 m02 0.0 |
-        | m10 m11 m12 0.0 |
-        | m20 m21 m22 0.0 |
-        | m30 m31 m32 1.0 |
-        -                 -
-        ```
-        :param transformation_str: A transformation as represented in 3MF.
-        :return: A `Matrix` object with the correct transformation.
-        """
-        components = transformation_str.split(" ")
-        result = mathutils.Matrix.Identity(4)
-        if (
-            transformation_str == ""
-        ):  # Early-out if transformation is missing. This is not malformed.
-            return result
-        row = -1
-        col = 0
-        for component in components:
-            row += 1
-            if row > 2:
-                col += 1
-                row = 0
-                if col > 3:
-                    log.warning(
-                        f"Transformation matrix contains too many components: {transformation_str}"
-                    )
-                    break  # Too many components. Ignore the rest.
-            try:
-                component_float = float(component)
-            except ValueError:  # Not a proper float. Skip this one.
-                log.warning(f"Transformation matrix malformed: {transformation_str}")
-                continue
-            result[row][col] = component_float
-        return result
+        if bpy.ops.object.mode_set.poll():
+            bpy.ops.object.mode_set(
+                mode="OBJECT"
+            )  # Switch to object mode to view the new file.
+        if bpy.ops.object.select_all.poll():
+            bpy.ops.object.select_all(action="DESELECT")  # Deselect other files.
 
-    def build_items(self, root, scale_unit):
+        self.reset()
+        try:
+            self.import_files(context, paths)
+        except MeshDataError as e:  # Strict mode, and the mesh data has a problem.
+            log.error(f"Import aborted: {e}")
+            self.safe_report({'ERROR'}, f"Import aborted: {e}")
+            return {"CANCELLED"}
+
+        self.safe_report({'INFO'}, f"Imported {self.num_loaded} objects from 3MF files")
+        return {"FINISHED"}
+
+    def update_interface(self, context: bpy.types.Context) -> None:
         """
-        Builds the scene. This places objects with certain transformations in
-        the scene.
-        :param root: The root node of the 3dmodel.model XML document.
-        :param scale_unit: The scale to apply for the units of the model to be
-        transformed to Blender's units, as a float ratio.
-        :return: A sequence of Blender Objects that need to be placed in the
-        scene. Each mesh gets transformed appropriately.
+        Selects the imported objects and zooms the camera to view them.
+        :param context: The Blender context.
         """
-        for build_item in root.iterfind("./3mf:build/3mf:item", MODEL_NAMESPACES):
-            try:
-                objectid = build_item.attrib["objectid"]
-                resource_object = self.resource_objects[objectid]
-            except (
-                KeyError
-            ):  # ID is required, and it must be in the available resource_objects.
-                log.warning("Encountered build item without object ID.")
-                continue  # Ignore this invalid item.
-
-            metadata = Metadata()
-            for metadata_node in build_item.iterfind(
-                "./3mf:metadatagroup", MODEL_NAMESPACES
-            ):
-                metadata = self.read_metadata(metadata_node, metadata)
-            if "partnumber" in build_item.attrib:
-                metadata["3mf:partnumber"] = MetadataEntry(
-                    name="3mf:partnumber",
-                    preserve=True,
-                    datatype="xs:string",
-                    value=build_item.attrib["partnumber"],
-                )
+        for blender_object in self.imported_objects:
+            blender_object.select_set(True)
+        if self.imported_objects:
+            bpy.context.view_layer.objects.active = self.imported_objects[-1]
 
-            transform = mathutils.Matrix.Scale(scale_unit, 4)
-            transform @= self.parse_transformation(
-                build_item.attrib.get("transform", "")
-            )
+        # Zoom the camera to view the imported objects.
+        for area in bpy.context.screen.areas:
+            if area.type == "VIEW_3D":
+                for region in area.regions:
+                    if region.type == "WINDOW":
+                        try:
+                            # Since Blender 3.2:
+                            context = bpy.context.copy()
+                            context["area"] = area
+                            context["region"] = region
+                            context["edit_object"] = bpy.context.edit_object
+                            with bpy.context.temp_override(**context):
+                                bpy.ops.view3d.view_selected()
+                        except (
+                            AttributeError
+                        ):  # temp_override doesn't exist before Blender 3.2.
+                            # Before Blender 3.2:
+                            override = {
+                                "area": area,
+                                "region": region,
+                                "edit_object": bpy.context.edit_object,
+                            }
+                            bpy.ops.view3d.view_selected(override)
 
-            self.build_object(resource_object, transform, metadata, [objectid])
 
-    def build_object(
-        self,
-        resource_object: ResourceObject,
-        transformation: mathutils.Matrix,
-        metadata: Metadata,
-        objectid_stack_trace: List[int],
-        parent: Optional[bpy.types.Object] = None,
-    ) -> Optional[bpy.types.Object]:
+class Load3MFGeometry(bpy.types.Operator, Importer):
+    """
+    Operator that loads the real meshes of proxies that were imported from 3MF files.
+    """
+
+    # Metadata.
+    bl_idname = "object.threemf_load_geometry"
+    bl_label = "Load 3MF Geometry"
+    bl_description = "Replace the selected 3MF proxies with the real meshes from their files"
+    bl_options = {"REGISTER", "UNDO"}
+
+    # Options for the user.
+    use_instancing: bpy.props.BoolProperty(
+        name="Share Mesh Data",
+        description="Create the mesh of an object only once if multiple proxies place it. Every further proxy "
+        "becomes a linked duplicate of the same mesh data.",
+        default=True,
+    )
+    use_strict: bpy.props.BoolProperty(
+        name="Strict",
+        description="Abort at the first broken vertex or triangle, instead of skipping it and reporting a summary of "
+        "the problems per object.",
+        default=False,
+    )
+    material_reuse: bpy.props.EnumProperty(
+        name="Materials",
+        description="Whether to use existing materials of the Blender file for the materials of the 3MF file, "
+        "rather than creating duplicates of them.",
+        items=MATERIAL_REUSE_MODES,
+        default="REUSE",
+    )
+    instrumentation_level: bpy.props.EnumProperty(
+        name="Instrumentation",
+        description="Measure the time and memory that each stage of loading takes, and log a summary. The report is "
+        "available from Python with io_mesh_3mf.instrumentation.last_report(\"load_geometry\").",
+        items=INSTRUMENTATION_LEVELS,
+        default="OFF",
+    )
+
+    @classmethod
+    def poll(cls, context: bpy.types.Context) -> bool:
         """
-        Converts a resource object into a Blender object.
+        Tells whether any of the selected objects is a proxy.
+        :param context: The Blender context.
+        :return: `True` if there is a proxy to load, or `False` otherwise.
+        """
+        return any(PROXY_OBJECTID in blender_object for blender_object in context.selected_objects)
 
-        This resource object may refer to components that need to be built along. These components may again have
-        subcomponents, and so on. These will be built recursively. A "stack trace" will be traced in order to prevent
-        going into an infinite recursion.
-        :param resource_object: The resource object that needs to be converted.
-        :param transformation: A transformation matrix to apply to this resource object.
-        :param metadata: A collection of metadata belonging to this build item.
-        :param objectid_stack_trace: A list of all object IDs that have been processed so far, including the object ID
-        we're processing now.
-        :param parent: The resulting object must be marked as a child of this Blender object.
-        :return: A sequence of Blender objects. These objects may be "nested" in the sense that they sometimes refer to
-        other objects as their parents.
+    def execute(self, context: bpy.types.Context) -> Set[str]:
         """
-        # Create a mesh if there is mesh data here.
-        mesh = None
-        if resource_object.triangles:
-            mesh = bpy.data.meshes.new("3MF Mesh")
-            mesh.from_pydata(resource_object.vertices, [], resource_object.triangles)
-            mesh.update()
-            resource_object.metadata.store(mesh)
-
-            # Mapping resource materials to indices in the list of materials for this specific mesh.
-            materials_to_index = {}
-            for triangle_index, triangle_material in enumerate(
-                resource_object.materials
-            ):
-                if triangle_material is None:
-                    continue
+        Loads the real meshes of the selected proxies.
+        :param context: The Blender context.
+        :return: A set of status flags to indicate whether the operation succeeded or not.
+        """
+        self.reset()
+        try:
+            loaded = self.load_geometry(context, context.selected_objects)
+        except MeshDataError as e:  # Strict mode, and the mesh data has a problem.
+            log.error(f"Loading aborted: {e}")
+            self.safe_report({'ERROR'}, f"Loading aborted: {e}")
+            return {"CANCELLED"}
 
-                # Add the material to Blender if it doesn't exist yet. Otherwise create a new material in Blender.
-                if triangle_material not in self.resource_to_material:
-                    material = bpy.data.materials.new(triangle_material.name)
-                    material.use_nodes = True
-                    principled = bpy_extras.node_shader_utils.PrincipledBSDFWrapper(
-                        material, is_readonly=False
-                    )
-                    principled.base_color = triangle_material.color[:3]
-                    principled.alpha = triangle_material.color[3]
-                    self.resource_to_material[triangle_material] = material
-                else:
-                    material = self.resource_to_material[triangle_material]
-
-                # Add the material to this mesh if it doesn't have it yet. Otherwise re-use previous index.
-                if triangle_material not in materials_to_index:
-                    new_index = len(mesh.materials.items())
-                    if new_index > 32767:
-                        log.warning(
-                            "Blender doesn't support more than 32768 different materials per mesh."
-                        )
-                        continue
-                    mesh.materials.append(material)
-                    materials_to_index[triangle_material] = new_index
+        self.safe_report({'INFO'}, f"Loaded the geometry of {len(loaded)} objects from 3MF files")
+        return {"FINISHED"}
 
-                # Assign the material to the correct triangle.
-                mesh.polygons[triangle_index].material_index = materials_to_index[
-                    triangle_material
-                ]
 
-        # Create an object.
-        blender_object = bpy.data.objects.new("3MF Object", mesh)
-        self.num_loaded += 1
-        if parent is not None:
-            blender_object.parent = parent
-        blender_object.matrix_world = transformation
-        bpy.context.collection.objects.link(blender_object)
-        bpy.context.view_layer.objects.active = blender_object
-        blender_object.select_set(True)
-        metadata.store(blender_object)
-        if "3mf:object_type" in resource_object.metadata and resource_object.metadata[
-            "3mf:object_type"
-        ].value in {"solidsupport", "support"}:
-            # Don't render support meshes.
-            blender_object.hide_render = True
+class ModelHandler(ModelParser):
+    """
+    Reads a 3dmodel.model document incrementally into the importer.
 
-        # Recurse for all components.
-        for component in resource_object.components:
-            if component.resource_object in objectid_stack_trace:
-                # These object IDs refer to each other in a loop. Don't go in there!
-                log.warning(
-                    f"Recursive components in object ID: {component.resource_object}"
-                )
-                continue
-            try:
-                child_object = self.resource_objects[component.resource_object]
-            except KeyError:  # Invalid resource ID. Doesn't exist!
-                log.warning(
-                    f"Build item with unknown resource ID: {component.resource_object}"
-                )
-                continue
-            transform = (
-                transformation @ component.transformation
-            )  # Apply the child's transformation and pass it on.
-            objectid_stack_trace.append(component.resource_object)
-            self.build_object(
-                child_object,
-                transform,
-                metadata,
-                objectid_stack_trace,
-                parent=blender_object,
-            )
-            objectid_stack_trace.pop()
+    Materials and objects are read into resources as soon as their elements are complete, after which the elements are
+    discarded. Once the build is complete, its items are built.
+    """
+
+    def __init__(self, importer: Importer, context: bpy.types.Context, path: str, scene_metadata: Metadata,
+                 selection: Optional[Selection] = None):
+        """
+        Prepares to read a document.
+        :param importer: The operator that stores the resources of the document and builds its items.
+        :param context: The Blender context.
+        :param path: The path to the archive that the document came from, for reporting.
+        :param scene_metadata: The metadata gathered so far from the scene and previously loaded documents.
+        :param selection: The objects and build items to read, or `None` to read everything.
+        """
+        super().__init__(importer, selection, importer.proxy_source is not None)
+        self.importer = importer
+        self.context = context
+        self.path = path
+        self.scene_metadata = scene_metadata
+        self.scale_unit = 1.0
+
+    def start_root(self, root: xml.etree.ElementTree.Element) -> None:
+        """
+        Prepares the importer for the resources of the document, when its root element starts.
+        :param root: The root element, with its attributes but without children yet.
+        """
+        if not self.importer.is_supported(root.attrib.get("requiredextensions", "")):
+            log.warning(f"3MF document in {self.path} requires unknown extensions.")
+            self.importer.safe_report({'WARNING'}, f"3MF document in {self.path} requires unknown extensions.")
+        if self.selection is None or self.selection.items:  # The scale is only needed to build items.
+            self.scale_unit = self.importer.unit_scale(self.context, root)
+        self.importer.resource_objects = {}
+        self.importer.resource_materials = {}
+        self.importer.resource_to_mesh = {}  # Object IDs are only unique within one document.
+
+    def end_element(self, element: xml.etree.ElementTree.Element, depth: int) -> None:
+        """
+        Reads complete materials and objects into resources, and builds the items once the build is complete.
+        :param element: The element that is complete.
+        :param depth: How many elements the element is nested in. The root has depth 0.
+        """
+        if depth == 0:  # The root element is complete. Its metadata children are still attached.
+            self.scene_metadata = self.importer.read_metadata(self.root, self.scene_metadata)
+        elif depth == 1 and element.tag == self.BUILD_TAG:
+            self.importer.build_items(self.importer.read_build_items(self.root, self.scale_unit))
+            self.root.remove(element)
+        elif depth == 2 and self.open_elements[-1].tag == self.RESOURCES_TAG:
+            if element.tag == self.BASEMATERIALS_TAG:
+                self.importer.read_basematerials(element)
+                self.open_elements[-1].remove(element)
+            elif element.tag == self.OBJECT_TAG:
+                self.importer.read_object(element, self.mesh)
+                self.mesh = None
+                self.open_elements[-1].remove(element)  # Release the data of this object.
+
+
+def create_importer(global_scale: float = 1.0, use_streaming: bool = True, use_instancing: bool = True,
+                    processes: int = 0, use_strict: bool = False, item_filter: str = "", use_proxies: bool = False,
+                    use_collection_per_file: bool = False, material_reuse: str = "REUSE",
+                    instrumentation_level: str = "OFF") -> Importer:
+    """
+    Creates an importer to import 3MF files with from scripts.
+
+    The importer can be used for multiple imports. The materials that it creates are then reused by later imports.
+    :param global_scale: A scaling factor to apply to the scene after importing.
+    :param use_streaming: Whether to read the model data incrementally.
+    :param use_instancing: Whether to create the mesh of an object only once if it's placed multiple times.
+    :param processes: Number of processes to read multiple files with in parallel, or 0 for one per processor.
+    :param use_strict: Whether to abort at the first broken vertex or triangle.
+    :param item_filter: Comma-separated selectors of the build items to import, or empty to import all of them. See
+    `select_items` in `model_reader`.
+    :param use_proxies: Whether to import boxes around the objects, whose real meshes can be loaded later. See
+    `Importer.load_geometry`.
+    :param use_collection_per_file: Whether to link the objects of each file into a new collection, all at once.
+    :param material_reuse: Whether to use existing materials of the Blender file. See `MATERIAL_REUSE_MODES`.
+    :param instrumentation_level: What to measure of the import. See `INSTRUMENTATION_LEVELS`.
+    :return: An importer with those options.
+    """
+    importer = Importer()
+    importer.global_scale = global_scale
+    importer.use_streaming = use_streaming
+    importer.use_instancing = use_instancing
+    importer.processes = processes
+    importer.use_strict = use_strict
+    importer.item_filter = item_filter
+    importer.use_proxies = use_proxies
+    importer.use_collection_per_file = use_collection_per_file
+    importer.material_reuse = material_reuse
+    importer.instrumentation_level = instrumentation_level
+    importer.reset()
+    return importer
+
+
+def import_3mf(paths: Union[str, Iterable[str]], context: Optional[bpy.types.Context] = None,
+               **options) -> List[bpy.types.Object]:
+    """
+    Imports 3MF files into the scene, without the overhead of the operator.
+
+    Unlike `bpy.ops.import_mesh.threemf`, this doesn't make an undo step, doesn't change the selection and doesn't zoom
+    the view to the new objects.
+
+    Raises `MeshDataError` in strict mode if the mesh data has a problem.
+    :param paths: The path to a 3MF file, or a sequence of paths to import together.
+    :param context: The Blender context to import into. Defaults to the current context.
+    :param options: The options of the import, with the same names as the properties of the operator. See
+    `create_importer`.
+    :return: The Blender objects that were created.
+    """
+    if isinstance(paths, str):
+        paths = [paths]
+    importer = create_importer(**options)
+    return importer.import_files(context if context is not None else bpy.context, list(paths))
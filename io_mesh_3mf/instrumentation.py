@@ -0,0 +1,183 @@
+# Blender add-on to import and export 3MF files.
+# Copyright (C) 2020 Ghostkeeper
+# Copyright (C) 2025 Jack (modernization for Blender 4.2+)
+# This add-on is free software; you can redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation; either version 2 of the License, or (at your option) any later
+# version.
+# This add-on is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this program; if not, write to the Free
+# Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+# <pep8 compliant>
+
+"""
+This module measures how long each stage of an import or export takes, and how much memory it needs.
+"""
+
+import contextlib  # To measure nothing when instrumentation is disabled.
+import time  # To measure how long each stage takes.
+import tracemalloc  # To measure how much memory each stage needs.
+from typing import Any, ContextManager, Dict, List, Optional
+
+# IDE and Documentation support.
+__all__ = [
+    "INSTRUMENTATION_LEVELS",
+    "Instrumentation",
+    "last_report",
+]
+
+# The levels of detail of the instrumentation, as (identifier, name, description) for the operator options.
+INSTRUMENTATION_LEVELS = [
+    ("OFF", "Off", "Don't measure anything"),
+    ("TIME", "Time", "Measure the time of each stage, and count the objects, vertices and triangles"),
+    ("MEMORY", "Time and Memory", "Also measure the peak memory allocated by each stage. This slows everything down"),
+]
+
+last_reports: Dict[str, Dict[str, Any]] = {}  # The report of the last import and export, by operation.
+
+
+def last_report(operation: str) -> Optional[Dict[str, Any]]:
+    """
+    Get the report of the last instrumented import or export.
+    :param operation: Either "import" or "export".
+    :return: The report, as made by `Instrumentation.report`, or `None` if no import or export was instrumented yet.
+    """
+    return last_reports.get(operation)
+
+
+class Span:
+    """
+    Measures one run of a stage, as a context manager.
+    """
+
+    def __init__(self, instrumentation: "Instrumentation", name: str):
+        """
+        Prepares to measure a stage.
+        :param instrumentation: The instrumentation to add the measurements to.
+        :param name: The name of the stage.
+        """
+        self.instrumentation = instrumentation
+        self.name = name
+        self.start = 0.0
+        self.start_memory = 0
+        self.peak_memory = 0  # The highest amount of traced memory while this span is open.
+
+    def __enter__(self) -> "Span":
+        """
+        Starts measuring the stage.
+        :return: This span.
+        """
+        if self.instrumentation.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            for span in self.instrumentation.open_spans:  # The peak is about to be reset, so remember it in those.
+                span.peak_memory = max(span.peak_memory, peak)
+            tracemalloc.reset_peak()
+            self.start_memory = current
+            self.peak_memory = current
+        self.instrumentation.open_spans.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        """
+        Stops measuring the stage, and adds the measurements to the instrumentation.
+        """
+        seconds = time.perf_counter() - self.start
+        self.instrumentation.open_spans.pop()
+        stage = self.instrumentation.stages.setdefault(self.name, {"seconds": 0.0, "calls": 0, "traced_peak": None})
+        stage["seconds"] += seconds
+        stage["calls"] += 1
+        if self.instrumentation.trace_memory:
+            peak = tracemalloc.get_traced_memory()[1]
+            for span in self.instrumentation.open_spans:
+                span.peak_memory = max(span.peak_memory, peak)
+            traced_peak = max(self.peak_memory, peak) - self.start_memory
+            stage["traced_peak"] = max(stage["traced_peak"] or 0, traced_peak)
+
+
+class Instrumentation:
+    """
+    Collects the time and memory of each stage of an import or export, and counts what was read or written.
+
+    Stages are measured by wrapping them in a span:
+        with self.instrumentation.span("parse"):
+            ...
+    Spans may be nested. A stage that runs multiple times, such as reading an object, adds up the time of each run. For
+    the memory, the highest peak of any run counts, relative to the memory in use when the run started.
+
+    When the instrumentation is disabled, spans and counters do nothing, so that they can stay in place at no cost.
+    """
+
+    def __init__(self, level: str = "OFF"):
+        """
+        Creates an empty collection of measurements.
+        :param level: What to measure. One of the identifiers of `INSTRUMENTATION_LEVELS`.
+        """
+        self.enabled = level != "OFF"
+        self.trace_memory = level == "MEMORY"
+        self.stages: Dict[str, Dict[str, Any]] = {}  # The measurements of each stage, in order of first occurrence.
+        self.counters: Dict[str, int] = {}
+        self.open_spans: List[Span] = []  # The spans that are being measured now, from outer to inner.
+        self.started_tracing = False  # Whether tracemalloc was started for this instrumentation.
+
+    def start(self) -> None:
+        """
+        Starts the instrumentation, before the first stage.
+        """
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracing = True
+
+    def stop(self) -> None:
+        """
+        Stops the instrumentation, after the last stage.
+        """
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
+
+    def span(self, name: str) -> ContextManager:
+        """
+        Measures a stage.
+        :param name: The name of the stage.
+        :return: A context manager that measures the stage while it's active.
+        """
+        if not self.enabled:
+            return contextlib.nullcontext()
+        return Span(self, name)
+
+    def count(self, name: str, amount: int = 1) -> None:
+        """
+        Counts something that was read or written.
+        :param name: What was read or written, such as "vertices".
+        :param amount: How many of those were read or written.
+        """
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Get the measurements, in a structure that can be serialized to JSON.
+        :return: A dictionary with the time, number of runs and peak memory of each stage, and the counters.
+        """
+        return {
+            "stages": {name: dict(stage) for name, stage in self.stages.items()},
+            "counters": dict(self.counters),
+        }
+
+    def summary(self) -> str:
+        """
+        Get the measurements as a short text, to log.
+        :return: A line with the time and peak memory of each stage, followed by the counters.
+        """
+        parts = []
+        for name, stage in self.stages.items():
+            part = f"{name} {stage['seconds']:.3f}s"
+            if stage["calls"] > 1:
+                part += f" ({stage['calls']}x)"
+            if stage["traced_peak"] is not None:
+                part += f" {stage['traced_peak'] / 1048576:.1f}MiB"
+            parts.append(part)
+        parts.extend(f"{count} {name}" for name, count in self.counters.items())
+        return ", ".join(parts)
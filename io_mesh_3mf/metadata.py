@@ -13,10 +13,15 @@
 # <pep8 compliant>
 
 import collections  # For named tuples.
-from typing import Iterator, Union
+from typing import TYPE_CHECKING, Iterator, Union
 
-import bpy.types  # For type hints
-import idprop.types  # To interpret property groups as metadata entries.
+try:
+    from idprop.types import IDPropertyGroup  # To interpret property groups as metadata entries.
+except ImportError:  # Not running in Blender. Property groups can only be dictionaries then.
+    IDPropertyGroup = dict
+
+if TYPE_CHECKING:
+    import bpy.types  # For type hints.
 
 MetadataEntry = collections.namedtuple(
     "MetadataEntry", ["name", "preserve", "datatype", "value"]
@@ -151,7 +156,7 @@ class Metadata:
         """
         return self.metadata == other.metadata
 
-    def store(self, blender_object: Union[bpy.types.Object, bpy.types.Scene]) -> None:
+    def store(self, blender_object: "Union[bpy.types.Object, bpy.types.Scene]") -> None:
         """
         Store this metadata in a Blender object.
 
@@ -177,7 +182,7 @@ class Metadata:
                     "value": value,
                 }
 
-    def retrieve(self, blender_object: Union[bpy.types.Object, bpy.types.Scene]) -> None:
+    def retrieve(self, blender_object: "Union[bpy.types.Object, bpy.types.Scene]") -> None:
         """
         Retrieve metadata from a Blender object.
 
@@ -195,7 +200,7 @@ class Metadata:
                 )
                 continue
             if (
-                isinstance(entry, idprop.types.IDPropertyGroup)
+                isinstance(entry, IDPropertyGroup)
                 and "datatype" in entry.keys()
                 and "preserve" in entry.keys()
                 and "value" in entry.keys()
@@ -0,0 +1,1622 @@
+# Blender add-on to import and export 3MF files.
+# Copyright (C) 2020 Ghostkeeper
+# Copyright (C) 2025 Jack (modernization for Blender 4.2+)
+# This add-on is free software; you can redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation; either version 2 of the License, or (at your option) any later
+# version.
+# This add-on is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this program; if not, write to the Free
+# Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+# <pep8 compliant>
+
+"""
+This module reads the contents of 3MF archives into compact buffers, without needing Blender.
+
+Since it doesn't need Blender, it can also run in separate processes, so that multiple archives can be read in parallel.
+The importer builds the Blender objects from the results. Other scripts can read archives with `read_model`.
+"""
+
+import array  # To store mesh data compactly while reading it.
+import collections  # For namedtuple, and a queue of archives that are being read.
+import concurrent.futures  # To read archives in worker processes.
+import concurrent.futures.process  # To detect when the worker processes can't run.
+import functools  # To parse each distinct transformation only once.
+import logging  # To debug and log progress.
+import multiprocessing  # To start worker processes that don't share the state of Blender.
+import re  # To find files in the archive based on the content types.
+import sys  # To find the packages that the worker processes need to import this module from.
+import xml.etree.ElementTree  # To parse the small parts of 3dmodel.model files and the content types.
+import xml.parsers.expat  # To parse the 3dmodel.model file incrementally, with the meshes straight into buffers.
+import zipfile  # To read the 3MF files which are secretly zip archives.
+from typing import Dict, IO, Iterable, Iterator, List, Optional, Pattern, Set, Tuple
+
+import numpy  # To hand mesh data to Blender in bulk.
+
+from .diagnostics import Diagnostics, MeshDataError  # To collect the problems in the mesh data.
+from .constants import (
+    RELS_MIMETYPE,
+    MODEL_DEFAULT_UNIT,
+    MODEL_MIMETYPE,
+    MODEL_NAMESPACE,
+    MODEL_NAMESPACES,
+    CONTENT_TYPES_LOCATION,
+    SUPPORTED_EXTENSIONS,
+)
+from .instrumentation import Instrumentation  # To measure the stages of reading.
+from .metadata import Metadata, MetadataEntry  # To store the metadata of the document, its objects and build items.
+from .unit_conversions import threemf_to_metre  # To convert the unit of the document.
+
+# IDE and Documentation support.
+__all__ = [
+    "ArchivePart",
+    "BuildItem",
+    "Component",
+    "MeshBuffers",
+    "ModelDocument",
+    "ModelIndex",
+    "ModelParser",
+    "ModelReader",
+    "ModelScanner",
+    "PreparedArchive",
+    "PreparedModel",
+    "ResourceMaterial",
+    "ResourceObject",
+    "ScannedItem",
+    "ScannedObject",
+    "Selection",
+    "bounding_box",
+    "compose_transformations",
+    "filter_document",
+    "index_archive",
+    "parse_selectors",
+    "prepare_archive",
+    "prepare_archives",
+    "read_model",
+    "scan_archive",
+    "scan_selection",
+    "select_items",
+]
+
+log = logging.getLogger(__name__)
+
+ResourceMaterial = collections.namedtuple("ResourceMaterial", ["name", "color"])
+Component = collections.namedtuple("Component", ["resource_object", "transformation"])
+ResourceObject = collections.namedtuple(
+    "ResourceObject", ["vertices", "triangles", "materials", "material_indices", "components", "metadata"]
+)
+BuildItem = collections.namedtuple("BuildItem", ["objectid", "transformation", "metadata"])
+ModelDocument = collections.namedtuple("ModelDocument", ["metadata", "objects", "items"])
+PreparedModel = collections.namedtuple("PreparedModel", ["root", "meshes", "error"])
+PreparedArchive = collections.namedtuple("PreparedArchive", ["content_types", "models", "reports", "error"])
+ScannedObject = collections.namedtuple(
+    "ScannedObject", ["objectid", "name", "partnumber", "type", "vertex_count", "triangle_count", "components"]
+)
+ScannedItem = collections.namedtuple("ScannedItem", ["objectid", "partnumber", "transform"])
+ModelIndex = collections.namedtuple("ModelIndex", ["objects", "items"])
+Selection = collections.namedtuple("Selection", ["objects", "items"])
+
+READ_CHUNK_SIZE = 1 << 16  # Number of bytes of the 3dmodel.model document to hand to the parser at a time.
+TRANSFORMATION_CACHE_SIZE = 4096  # Number of distinct transformation strings to keep the parsed matrix of.
+
+# The corners of a box, where corner i is on the high side of axis k if bit k of i is set.
+BOX_CORNERS = numpy.array([[(corner >> axis) & 1 for axis in range(3)] for corner in range(8)], dtype=bool)
+# The triangles of the box between those corners, facing outwards.
+BOX_TRIANGLES = numpy.array([
+    [0, 2, 1], [1, 2, 3],  # Bottom.
+    [4, 5, 6], [5, 7, 6],  # Top.
+    [0, 1, 5], [0, 5, 4],  # Front.
+    [2, 6, 7], [2, 7, 3],  # Back.
+    [0, 4, 6], [0, 6, 2],  # Left.
+    [1, 3, 7], [1, 7, 5],  # Right.
+], dtype=numpy.int32)
+
+
+class MeshBuffers:
+    """
+    The mesh data of a single object, gathered while the object is being read.
+
+    The buffers grow as vertices and triangles are read. They are only converted to the arrays that Blender takes once
+    the object is complete.
+    """
+
+    def __init__(self, default_material: Optional[ResourceMaterial], material_pid: Optional[str]):
+        """
+        Creates empty buffers for the mesh of an object.
+        :param default_material: The material of triangles that specify no material, or `None` if the object specifies
+        no material.
+        :param material_pid: Triangles that specify a material index will get their material from this material group.
+        """
+        self.vertices = array.array("f")  # Growable buffer of 32-bit floats, far more compact than a list of tuples.
+        self.triangles = array.array("i")  # Growable buffer of 32-bit vertex indices.
+        self.default_material = default_material
+        self.material_pid = material_pid
+        self.materials = [default_material]  # The distinct materials used by the triangles. The default is always 0.
+        self.material_to_index = {default_material: 0}
+        self.material_indices = None  # Only created once a triangle uses something other than the default material.
+
+    def vertex_array(self) -> numpy.ndarray:
+        """
+        Get the vertices read so far.
+        :return: Array with 32-bit floats for X, Y and Z in each of its rows.
+        """
+        return numpy.frombuffer(self.vertices, dtype=numpy.float32).reshape(-1, 3)
+
+    def triangle_array(self) -> numpy.ndarray:
+        """
+        Get the triangles read so far.
+        :return: Array with 32-bit integers referring to the first, second and third vertex of a triangle in each row.
+        """
+        return numpy.frombuffer(self.triangles, dtype=numpy.int32).reshape(-1, 3)
+
+    def material_index_array(self) -> Optional[numpy.ndarray]:
+        """
+        Get the index in the list of materials for each triangle read so far.
+        :return: Array of 16-bit integers, or `None` if every triangle uses the default material.
+        """
+        if self.material_indices is None:
+            return None
+        return numpy.frombuffer(self.material_indices, dtype=numpy.int16)
+
+    def reduce_to_bounds(self) -> None:
+        """
+        Replaces the vertices read so far with the corners of their bounding box, to keep only what a proxy needs.
+        """
+        corners, _ = bounding_box(self.vertex_array())
+        self.vertices = array.array("f", corners.tobytes())
+
+
+class ArchivePart:
+    """
+    A file in a 3MF archive, which is only opened and decompressed once something reads from it.
+
+    Archives may carry large thumbnails, textures and other attachments that the importer never reads. Listing them
+    costs nothing but the entry in the central directory of the archive, which is already read when opening it.
+
+    The part can be read like a stream. It can also be opened separately, to get a stream of its own.
+    """
+
+    def __init__(self, archive: zipfile.ZipFile, info: zipfile.ZipInfo, content_type: str):
+        """
+        Lists a file in an archive, without opening it.
+        :param archive: The archive that the file is in.
+        :param info: The entry of the file in the central directory of the archive.
+        :param content_type: The MIME type of the file.
+        """
+        self.archive = archive
+        self.info = info
+        self.name = info.filename
+        self.content_type = content_type
+        self.compress_size = info.compress_size  # Size of the file in the archive, in bytes.
+        self.file_size = info.file_size  # Size of the file once decompressed, in bytes.
+        self.stream = None  # Only opened once something reads from this part.
+
+    def open(self) -> IO[bytes]:
+        """
+        Opens a new stream to read the file from the archive.
+        :return: A stream that decompresses the file as it is read.
+        """
+        return self.archive.open(self.info)
+
+    def read(self, size: int = -1) -> bytes:
+        """
+        Reads from the file, opening it on the first read.
+        :param size: The maximum number of bytes to read, or -1 to read the rest of the file.
+        :return: The bytes that were read. Empty at the end of the file.
+        """
+        if self.stream is None:
+            self.stream = self.open()
+        return self.stream.read(size)
+
+    def close(self) -> None:
+        """
+        Closes the stream of this part, if it was opened.
+        """
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+
+    def __repr__(self) -> str:
+        """
+        Gives a description of this part for debugging.
+        :return: The name, content type and sizes of the file.
+        """
+        return f"<ArchivePart {self.name} ({self.content_type}, {self.compress_size}/{self.file_size} bytes)>"
+
+
+def index_archive(archive: zipfile.ZipFile, mime_types: Dict[str, str]) -> Dict[str, List[ArchivePart]]:
+    """
+    Lists the files in an archive by their content type, without opening any of them.
+    :param archive: The archive to list the files of.
+    :param mime_types: The content type of each file in the archive.
+    :return: The files of each content type in the archive.
+    """
+    result = {}
+    for path, mime_type in mime_types.items():
+        result.setdefault(mime_type, []).append(ArchivePart(archive, archive.getinfo(path), mime_type))
+    return result
+
+
+class ModelReader:
+    """
+    Reads the parts of 3MF archives that don't need Blender.
+
+    The importer reads archives with these functions. Since they don't need Blender, they can also read archives in
+    worker processes. The material groups that triangles may refer to must be stored in the `resource_materials` field,
+    which is filled by `read_basematerials`. The objects that were read are stored in the `resource_objects` field, so
+    that components and build items can refer to them. Problems with vertices and triangles are collected in the
+    `diagnostics` field, and reported per object with `report_diagnostics`. The stages of reading are measured with the
+    `instrumentation` field.
+    """
+
+    bounds_only = False  # Whether to read only the bounding boxes of the meshes, without their triangles.
+
+    def safe_report(self, level: Set[str], message: str) -> None:
+        """
+        Report a message to the user.
+
+        The message has already been logged. Readers that can tell the user in other ways, like the importer through
+        Blender's report system, override this.
+        :param level: The report level (e.g., {'ERROR'}, {'WARNING'}, {'INFO'})
+        :param message: The message to report
+        """
+        pass
+
+    def report_diagnostics(self, objectid: Optional[str]) -> None:
+        """
+        Reports the problems found in the mesh of an object, if any, in a single message.
+
+        The problems are collected in the `diagnostics` field while reading the vertices and triangles.
+        :param objectid: The ID of the object that was read, or `None` if it has no ID.
+        """
+        subject = f"Object {objectid}" if objectid is not None else "Object without ID"
+        summary = self.diagnostics.summary(subject)
+        if summary is not None:
+            log.warning(summary)
+            self.safe_report({'WARNING'}, summary)
+
+    def read_content_types(self, archive: zipfile.ZipFile) -> List[Tuple[Pattern[str], str]]:
+        """
+        Read the content types from a 3MF archive.
+
+        The output of this reading is a list of MIME types that are each mapped to a regular expression that matches on
+        the file paths within the archive that could contain this content type. This encodes both types of descriptors
+        for the content types that can occur in the content types document: Extensions and full paths.
+
+        The output is ordered in priority. Matches that should be evaluated first will be put in the front of the output
+        list.
+        :param archive: The 3MF archive to read the contents from.
+        :return: A list of tuples, in order of importance, where the first element describes a regex of paths that
+        match, and the second element is the MIME type string of the content type.
+        """
+        namespaces = {
+            "ct": "http://schemas.openxmlformats.org/package/2006/content-types"
+        }
+        result = []
+
+        try:
+            with archive.open(CONTENT_TYPES_LOCATION) as f:
+                try:
+                    root = xml.etree.ElementTree.ElementTree(file=f)
+                except xml.etree.ElementTree.ParseError as e:
+                    log.warning(
+                        f"{CONTENT_TYPES_LOCATION} has malformed XML"
+                        f"(position {e.position[0]}:{e.position[1]})."
+                    )
+                    self.safe_report(
+                        {'WARNING'},
+                        f"{CONTENT_TYPES_LOCATION} has malformed XML at position {e.position[0]}:{e.position[1]}"
+                    )
+                    root = None
+
+                if root is not None:
+                    # Overrides are more important than defaults, so put those in front.
+                    for override_node in root.iterfind("ct:Override", namespaces):
+                        if (
+                            "PartName" not in override_node.attrib
+                            or "ContentType" not in override_node.attrib
+                        ):
+                            log.warning(
+                                "[Content_Types].xml malformed: Override node without path or MIME type."
+                            )
+                            self.safe_report(
+                                {'WARNING'},
+                                "[Content_Types].xml malformed: Override node without path or MIME type"
+                            )
+                            continue  # Ignore the broken one.
+                        match_regex = re.compile(
+                            re.escape(override_node.attrib["PartName"])
+                        )
+                        result.append(
+                            (match_regex, override_node.attrib["ContentType"])
+                        )
+
+                    for default_node in root.iterfind("ct:Default", namespaces):
+                        if (
+                            "Extension" not in default_node.attrib
+                            or "ContentType" not in default_node.attrib
+                        ):
+                            log.warning(
+                                "[Content_Types].xml malformed: Default node without extension or MIME type."
+                            )
+                            self.safe_report(
+                                {'WARNING'},
+                                "[Content_Types].xml malformed: Default node without extension or MIME type"
+                            )
+                            continue  # Ignore the broken one.
+                        match_regex = re.compile(
+                            rf".*\.{re.escape(default_node.attrib['Extension'])}"
+                        )
+                        result.append((match_regex, default_node.attrib["ContentType"]))
+        except KeyError:  # ZipFile reports that the content types file doesn't exist.
+            log.warning(f"{CONTENT_TYPES_LOCATION} file missing!")
+            self.safe_report({'WARNING'}, f"{CONTENT_TYPES_LOCATION} file missing")
+
+        # This parser should be robust to slightly broken files and retrieve what we can.
+        # In case the document is broken or missing, here we'll append the default ones for 3MF.
+        # If the content types file was fine, this gets least priority so the actual data still wins.
+        result.append((re.compile(r".*\.rels"), RELS_MIMETYPE))
+        result.append((re.compile(r".*\.model"), MODEL_MIMETYPE))
+
+        return result
+
+    def assign_content_types(self, archive: zipfile.ZipFile,
+                             content_types: List[Tuple[Pattern[str], str]]) -> Dict[str, str]:
+        """
+        Assign a MIME type to each file in the archive.
+
+        The MIME types are obtained through the content types file from the archive. This content types file itself is
+        not in the result though.
+        :param archive: A 3MF archive with files to assign content types to.
+        :param content_types: The content types for files in that archive, in order of priority.
+        :return: A dictionary mapping all file paths in the archive to a content types. If the content type for a file
+        is unknown, the content type will be an empty string.
+        """
+        result = {}
+        for file_info in archive.filelist:
+            file_path = file_info.filename
+            if file_path == CONTENT_TYPES_LOCATION:  # Don't index this one.
+                continue
+            for pattern, content_type in content_types:  # Process in the correct order!
+                if pattern.fullmatch(file_path):
+                    result[file_path] = content_type
+                    break
+            else:  # None of the patterns matched.
+                result[file_path] = ""
+
+        return result
+
+    def is_supported(self, required_extensions: str) -> bool:
+        """
+        Determines if a document is supported by this add-on.
+        :param required_extensions: The value of the `requiredextensions` attribute of the root node of the XML
+        document.
+        :return: `True` if the document is supported, or `False` if it's not.
+        """
+        extensions = required_extensions.split(" ")
+        extensions = set(filter(lambda x: x != "", extensions))
+        return extensions <= SUPPORTED_EXTENSIONS
+
+    def read_document(self, root: xml.etree.ElementTree.Element, meshes: Optional[List[MeshBuffers]] = None,
+                      scale_unit: float = 1.0, metadata: Optional[Metadata] = None) -> ModelDocument:
+        """
+        Reads the metadata, materials, objects and build items of a complete 3dmodel.model document.
+
+        The objects are also stored in the `resource_objects` field, by their ID.
+        :param root: The root element of the document.
+        :param meshes: The meshes of the objects in the document, if they were read already. See `read_objects`.
+        :param scale_unit: The scale to apply to the build items, to convert the unit of the document to the unit that
+        the coordinates are needed in. See `metres_per_unit`.
+        :param metadata: Metadata of other documents to combine the metadata of this document with, if any.
+        :return: The metadata of the document, its objects by their ID and its build items in order.
+        """
+        self.resource_objects = {}
+        self.resource_materials = {}  # Resource IDs are only unique within one document.
+        metadata = self.read_metadata(root, metadata)
+        self.read_materials(root)
+        self.read_objects(root, meshes)
+        items = self.read_build_items(root, scale_unit)
+        return ModelDocument(metadata=metadata, objects=self.resource_objects, items=items)
+
+    def metres_per_unit(self, root: xml.etree.ElementTree.Element) -> float:
+        """
+        Get the size of the unit of a document, to convert its coordinates to other units.
+        :param root: The root element of the document.
+        :return: The number of metres in one unit of the coordinates in the document.
+        """
+        return threemf_to_metre[root.attrib.get("unit", MODEL_DEFAULT_UNIT)]
+
+    def read_metadata(self, node: xml.etree.ElementTree.Element,
+                      original_metadata: Optional[Metadata] = None) -> Metadata:
+        """
+        Reads the metadata tags from a metadata group.
+        :param node: A node in the 3MF document that contains <metadata> tags. This can be either a root node, or a
+        <metadatagroup> node.
+        :param original_metadata: If there was already metadata for this context from other documents, you can provide
+        that metadata here. The metadata of those documents will be combined then.
+        :return: A `Metadata` object.
+        """
+        if original_metadata is not None:
+            metadata = original_metadata
+        else:
+            metadata = Metadata()  # Create a new Metadata object.
+
+        for metadata_node in node.iterfind("./3mf:metadata", MODEL_NAMESPACES):
+            if "name" not in metadata_node.attrib:
+                log.warning("Metadata entry without name is discarded.")
+                self.safe_report({'WARNING'}, "Metadata entry without name is discarded")
+                continue  # This attribute has no name, so there's no key by which I can save the metadata.
+            name = metadata_node.attrib["name"]
+            preserve_str = metadata_node.attrib.get("preserve", "0")
+            # We don't use this ourselves since we always preserve, but the preserve attribute itself will also be
+            # preserved.
+            preserve = preserve_str != "0" and preserve_str.lower() != "false"
+            datatype = metadata_node.attrib.get("type", "")
+            value = metadata_node.text
+
+            # Always store all metadata so that they are preserved.
+            metadata[name] = MetadataEntry(
+                name=name, preserve=preserve, datatype=datatype, value=value
+            )
+
+        return metadata
+
+    def read_materials(self, root: xml.etree.ElementTree.Element) -> None:
+        """
+        Read out all of the material resources from the 3MF document.
+
+        The materials will be stored in `self.resource_materials` until it gets used to build the items.
+        :param root: The root of an XML document that may contain materials.
+        """
+        for basematerials_item in root.iterfind(
+            "./3mf:resources/3mf:basematerials", MODEL_NAMESPACES
+        ):
+            self.read_basematerials(basematerials_item)
+
+    def read_basematerials(self, basematerials_item: xml.etree.ElementTree.Element) -> None:
+        """
+        Read out a single group of material resources from a <basematerials> element.
+
+        The materials will be stored in `self.resource_materials` until it gets used to build the items.
+        :param basematerials_item: A <basematerials> element from the 3dmodel.model file.
+        """
+        try:
+            material_id = basematerials_item.attrib["id"]
+        except KeyError:
+            log.warning("Encountered a basematerials item without resource ID.")
+            self.safe_report({'WARNING'}, "Encountered a basematerials item without resource ID")
+            return  # Need to have an ID, or no item can reference to the materials. Skip this one.
+        if material_id in self.resource_materials:
+            log.warning(f"Duplicate material ID: {material_id}")
+            self.safe_report({'WARNING'}, f"Duplicate material ID: {material_id}")
+            return
+
+        # Use a dictionary mapping indices to resources, because some indices may be skipped due to being invalid.
+        self.resource_materials[material_id] = {}
+        index = 0
+
+        # "Base" must be the stupidest name for a material resource. Oh well.
+        for base_item in basematerials_item.iterfind(
+            "./3mf:base", MODEL_NAMESPACES
+        ):
+            name = base_item.attrib.get("name", "3MF Material")
+            color = base_item.attrib.get("displaycolor")
+            if color is not None:
+                # Parse the color. It's a hexadecimal number indicating RGB or RGBA.
+                color = color.lstrip(
+                    "#"
+                )  # Should start with a #. We'll be lenient if it's not.
+                try:
+                    color_int = int(color, 16)
+                    # Separate out up to four bytes from this int, from right to left.
+                    b1 = (color_int & 0x000000FF) / 255
+                    b2 = ((color_int & 0x0000FF00) >> 8) / 255
+                    b3 = ((color_int & 0x00FF0000) >> 16) / 255
+                    b4 = ((color_int & 0xFF000000) >> 24) / 255
+                    if len(color) == 6:  # RGB format.
+                        color = (
+                            b3,
+                            b2,
+                            b1,
+                            1.0,
+                        )  # b1, b2 and b3 are B, G, R respectively. b4 is always 0.
+                    else:  # RGBA format, or invalid.
+                        color = (
+                            b4,
+                            b3,
+                            b2,
+                            b1,
+                        )  # b1, b2, b3 and b4 are A, B, G, R respectively.
+                except ValueError:
+                    log.warning(
+                        f"Invalid color for material {name} of resource {material_id}: {color}"
+                    )
+                    self.safe_report({'WARNING'},
+                                     f"Invalid color for material {name} of resource {material_id}: {color}")
+                    color = None  # Don't add a color for this material.
+
+            # Input is valid. Create a resource.
+            self.resource_materials[material_id][index] = ResourceMaterial(
+                name=name, color=color
+            )
+            index += 1
+
+        if len(self.resource_materials[material_id]) == 0:
+            del self.resource_materials[
+                material_id
+            ]  # Don't leave empty material sets hanging.
+
+    def read_objects(self, root: xml.etree.ElementTree.Element, meshes: Optional[List[MeshBuffers]] = None) -> None:
+        """
+        Reads all repeatable build objects from the resources of an XML root node.
+
+        This stores them in the resource_objects field.
+        :param root: The root node of a 3dmodel.model XML file.
+        :param meshes: The meshes of the objects, in the same order as the objects, if they were read already. See
+        `ModelParser`. If `None`, the meshes are read from the objects.
+        """
+        object_nodes = root.iterfind("./3mf:resources/3mf:object", MODEL_NAMESPACES)
+        if meshes is None:
+            for object_node in object_nodes:
+                self.read_object(object_node)
+        else:
+            for object_node, mesh in zip(object_nodes, meshes):
+                self.read_object(object_node, mesh)
+
+    def read_object(self, object_node: xml.etree.ElementTree.Element, mesh: Optional[MeshBuffers] = None) -> None:
+        """
+        Reads a single repeatable build object from an <object> element.
+
+        This stores it in the resource_objects field.
+        :param object_node: An <object> element from the 3dmodel.model file.
+        :param mesh: The mesh data of the object, if it was already read while parsing the document. If `None`, the
+        mesh is read from the <mesh> element inside the object.
+        """
+        try:
+            objectid = object_node.attrib["id"]
+        except KeyError:
+            log.warning("Object resource without ID!")
+            self.safe_report({'WARNING'}, "Object resource without ID")
+            self.report_diagnostics(None)  # The mesh may have been read already while streaming.
+            return  # ID is required, otherwise the build can't refer to it.
+
+        with self.instrumentation.span("read_object"):
+            if mesh is None:
+                pid = object_node.attrib.get("pid")  # Material ID.
+                material = self.read_object_material(object_node.attrib)
+                vertices = self.read_vertices(object_node)
+                if not self.bounds_only:
+                    triangles, materials, material_indices = self.read_triangles(object_node, material, pid)
+                else:  # Only the bounds of the mesh are needed.
+                    triangles, materials, material_indices = None, [material], None
+            else:
+                vertices = mesh.vertex_array()
+                triangles = mesh.triangle_array()
+                materials = mesh.materials
+                material_indices = mesh.material_index_array()
+            if not self.bounds_only:
+                triangles, material_indices = self.validate_triangles(len(vertices), triangles, material_indices)
+            else:  # Stand in for the mesh with its bounding box. The triangles of the mesh were not read.
+                vertices, triangles = bounding_box(vertices)
+        self.report_diagnostics(objectid)
+        self.instrumentation.count("resource_objects")
+        self.instrumentation.count("vertices", len(vertices))
+        self.instrumentation.count("triangles", len(triangles))
+        components = self.read_components(object_node)
+        metadata = Metadata()
+        for metadata_node in object_node.iterfind(
+            "./3mf:metadatagroup", MODEL_NAMESPACES
+        ):
+            metadata = self.read_metadata(metadata_node, metadata)
+        if "partnumber" in object_node.attrib:
+            # Blender has no way to ensure that custom properties get preserved if a mesh is split up, but for most
+            # operations this is retained properly.
+            metadata["3mf:partnumber"] = MetadataEntry(
+                name="3mf:partnumber",
+                preserve=True,
+                datatype="xs:string",
+                value=object_node.attrib["partnumber"],
+            )
+        metadata["3mf:object_type"] = MetadataEntry(
+            name="3mf:object_type",
+            preserve=True,
+            datatype="xs:string",
+            value=object_node.attrib.get("type", "model"),
+        )
+
+        self.resource_objects[objectid] = ResourceObject(
+            vertices=vertices,
+            triangles=triangles,
+            materials=materials,
+            material_indices=material_indices,
+            components=components,
+            metadata=metadata,
+        )
+
+    def read_object_material(self, object_attributes: Dict[str, str]) -> Optional[ResourceMaterial]:
+        """
+        Reads out the default material of an object, from the attributes of its <object> element.
+        :param object_attributes: The attributes of an <object> element from the 3dmodel.model file.
+        :return: The material that triangles of the object get if they specify no material themselves, or `None` if the
+        object specifies no material.
+        """
+        objectid = object_attributes.get("id")
+        pid = object_attributes.get("pid")  # Material ID.
+        pindex = object_attributes.get(
+            "pindex"
+        )  # Index within a collection of materials.
+        material = None
+        if pid is not None and pindex is not None:
+            try:
+                index = int(pindex)
+                material = self.resource_materials[pid][index]
+            except KeyError:
+                log.warning(
+                    f"Object with ID {objectid} refers to material collection {pid} with index {pindex}"
+                    f" which doesn't exist."
+                )
+                self.safe_report(
+                    {'WARNING'},
+                    f"Object with ID {objectid} refers to material collection {pid} "
+                    f"with index {pindex} which doesn't exist"
+                )
+            except ValueError:
+                log.warning(
+                    f"Object with ID {objectid} specifies material index {pindex}, which is not integer."
+                )
+                self.safe_report(
+                    {'WARNING'},
+                    f"Object with ID {objectid} specifies material index {pindex}, which is not integer")
+        return material
+
+    def read_vertices(self, object_node: xml.etree.ElementTree.Element) -> numpy.ndarray:
+        """
+        Reads out the vertices from an XML node of an object.
+
+        If any vertex is corrupt, like with a coordinate missing or not proper floats, then the 0 coordinate will be
+        used. This is to prevent messing up the list of indices.
+        :param object_node: An <object> element from the 3dmodel.model file.
+        :return: Array of vertices in that object, with 32-bit floats for X, Y and Z in each of its rows.
+        """
+        mesh = MeshBuffers(None, None)
+        for vertex in object_node.iterfind(
+            "./3mf:mesh/3mf:vertices/3mf:vertex", MODEL_NAMESPACES
+        ):
+            self.read_vertex(vertex.attrib, mesh)
+        return mesh.vertex_array()
+
+    def read_vertex(self, attrib: Dict[str, str], mesh: MeshBuffers) -> None:
+        """
+        Reads out a single vertex from the attributes of a <vertex> element, and adds it to the buffers of a mesh.
+
+        If a coordinate is missing or not a proper float, the 0 coordinate will be used.
+        :param attrib: The attributes of the <vertex> element.
+        :param mesh: The buffers of the mesh that the vertex belongs to.
+        """
+        try:
+            mesh.vertices.extend((float(attrib["x"]), float(attrib["y"]), float(attrib["z"])))
+            return
+        except (KeyError, ValueError):
+            pass  # Some coordinate is missing or broken. Read them one by one below to find out which.
+        for axis in ("x", "y", "z"):
+            try:
+                coordinate = float(attrib.get(axis, 0))
+            except ValueError:  # Not a float.
+                self.diagnostics.add("vertices with a coordinate that is not a number", f'{axis}="{attrib[axis]}"')
+                coordinate = 0
+            mesh.vertices.append(coordinate)
+
+    def read_triangles(self, object_node: xml.etree.ElementTree.Element,
+                       default_material: Optional[int],
+                       material_pid: Optional[int]) -> Tuple[numpy.ndarray, List[Optional[ResourceMaterial]],
+                                                             Optional[numpy.ndarray]]:
+        """
+        Reads out the triangles from an XML node of an object.
+
+        These triangles always consist of 3 vertices each. Each vertex is an index to the list of vertices read
+        previously. The triangle also contains an associated material, or None if the triangle gets no material.
+
+        The materials are resolved while reading. Each distinct material gets an index in a small list of materials,
+        where the default material always gets index 0. The triangles then only store the index of their material, as a
+        16-bit integer, which is what Blender can hand to its polygons in bulk. As long as all triangles use the default
+        material, the array of indices is not created at all.
+        :param object_node: An <object> element from the 3dmodel.model file.
+        :param default_material: If the triangle specifies no material, it should get this material. May be `None` if
+        the model specifies no material.
+        :param material_pid: Triangles that specify a material index will get their material from this material group.
+        :return: A tuple of three items. The first is an array with the vertices of each triangle, with 32-bit integers
+        referring to the first, second and third vertex of the triangle in each of its rows. The second is the list of
+        distinct materials used by the triangles, starting with the default material (which may be `None`). The third
+        is an array with the index in that list of materials for each triangle, or `None` if every triangle uses the
+        default material.
+        """
+        mesh = MeshBuffers(default_material, material_pid)
+        for triangle in object_node.iterfind(
+            "./3mf:mesh/3mf:triangles/3mf:triangle", MODEL_NAMESPACES
+        ):
+            self.read_triangle(triangle.attrib, mesh)
+        return mesh.triangle_array(), mesh.materials, mesh.material_index_array()
+
+    def read_triangle(self, attrib: Dict[str, str], mesh: MeshBuffers) -> None:
+        """
+        Reads out a single triangle from the attributes of a <triangle> element, and adds it to the buffers of a mesh.
+
+        If a vertex of the triangle is missing or not an integer, the entire triangle is left out. If its material is
+        missing or broken, it gets the default material of the mesh. Whether the vertices of the triangle exist is only
+        checked once all triangles are read, by `validate_triangles`.
+        :param attrib: The attributes of the <triangle> element.
+        :param mesh: The buffers of the mesh that the triangle belongs to.
+        """
+        try:
+            v1 = int(attrib["v1"])
+            v2 = int(attrib["v2"])
+            v3 = int(attrib["v3"])
+        except KeyError as e:
+            self.diagnostics.add("triangles with a missing vertex", f"{e.args[0]} missing")
+            return
+        except ValueError:
+            vertices = " ".join(f'{key}="{attrib.get(key, "")}"' for key in ("v1", "v2", "v3"))
+            self.diagnostics.add("triangles with a vertex index that is not an integer", vertices)
+            return  # No fallback this time. Leave out the entire triangle.
+        if not (-2 ** 31 <= v1 < 2 ** 31 and -2 ** 31 <= v2 < 2 ** 31 and -2 ** 31 <= v3 < 2 ** 31):
+            self.diagnostics.add("triangles with a vertex index out of range", f"{v1} {v2} {v3}")
+            return  # Doesn't even fit in the buffer.
+
+        p1 = attrib.get("p1")
+        if p1 is None:
+            material_index = 0  # The default material.
+        else:
+            pid = attrib.get("pid", mesh.material_pid)
+            try:
+                material = self.resource_materials[pid][int(p1)]
+            except KeyError:
+                self.diagnostics.add("triangles with a material that doesn't exist", f'pid="{pid}" p1="{p1}"')
+                material = mesh.default_material
+            except ValueError:
+                self.diagnostics.add("triangles with a material index that is not an integer", f'p1="{p1}"')
+                material = mesh.default_material
+
+            material_index = mesh.material_to_index.get(material)
+            if material_index is None:
+                if len(mesh.materials) > 32767:
+                    self.diagnostics.add(
+                        "materials more than the 32768 that Blender supports per mesh",
+                        material.name if material is not None else "None")
+                    mesh.material_to_index[material] = 0  # Don't warn again for this material.
+                    material_index = 0
+                else:
+                    material_index = len(mesh.materials)
+                    mesh.materials.append(material)
+                    mesh.material_to_index[material] = material_index
+            if material_index != 0 and mesh.material_indices is None:
+                # First triangle that deviates from the default. All triangles before it used the default.
+                mesh.material_indices = array.array("h", bytes(2 * (len(mesh.triangles) // 3)))
+
+        mesh.triangles.extend((v1, v2, v3))
+        if mesh.material_indices is not None:
+            mesh.material_indices.append(material_index)
+
+    def validate_triangles(self, vertex_count: int, triangles: numpy.ndarray,
+                           material_indices: Optional[numpy.ndarray]) -> Tuple[numpy.ndarray, Optional[numpy.ndarray]]:
+        """
+        Leaves out the triangles that refer to vertices that don't exist, or that refer to the same vertex twice.
+
+        All triangles of an object are checked at once, after they are read. Checking them one by one while reading
+        would cost more than reading them for large meshes.
+        :param vertex_count: The number of vertices of the object.
+        :param triangles: The triangles of the object, with the indices of their three vertices in each row.
+        :param material_indices: The index of the material of each triangle, or `None` if every triangle uses the
+        default material.
+        :return: The triangles that can be built, and the material indices of only those triangles.
+        """
+        negative = (triangles < 0).any(axis=1)
+        out_of_range = (triangles >= vertex_count).any(axis=1) & ~negative
+        degenerate = (
+            (triangles[:, 0] == triangles[:, 1])
+            | (triangles[:, 1] == triangles[:, 2])
+            | (triangles[:, 2] == triangles[:, 0])
+        ) & ~negative & ~out_of_range
+        broken = negative | out_of_range | degenerate
+        if not broken.any():
+            return triangles, material_indices
+
+        for problem, mask in (
+            ("triangles with a negative vertex index", negative),
+            ("triangles with a vertex index out of range", out_of_range),
+            ("degenerate triangles", degenerate),
+        ):
+            count = int(numpy.count_nonzero(mask))
+            # Only format the triangles that can be shown. Strict mode shows the first one.
+            example_rows = numpy.flatnonzero(mask)[:max(self.diagnostics.examples, 1)]
+            examples = [" ".join(str(index) for index in triangle) for triangle in triangles[example_rows].tolist()]
+            self.diagnostics.add_many(problem, count, examples)
+
+        keep = ~broken
+        if material_indices is not None:
+            material_indices = material_indices[keep]
+        return triangles[keep], material_indices
+
+    def read_components(self, object_node: xml.etree.ElementTree.Element) -> List[Component]:
+        """
+        Reads out the components from an XML node of an object.
+
+        These components refer to other resource objects, with a transformation applied. They will eventually appear in
+        the scene as sub-objects.
+        :param object_node: An <object> element from the 3dmodel.model file.
+        :return: List of components in this object node.
+        """
+        result = []
+        for component_node in object_node.iterfind(
+            "./3mf:components/3mf:component", MODEL_NAMESPACES
+        ):
+            try:
+                objectid = component_node.attrib["objectid"]
+            except KeyError:  # ID is required.
+                continue  # Ignore this invalid component.
+            transform = self.parse_transformation(
+                component_node.attrib.get("transform", "")
+            )
+
+            result.append(Component(resource_object=objectid, transformation=transform))
+        return result
+
+    def read_build_items(self, root: xml.etree.ElementTree.Element, scale_unit: float = 1.0) -> List[BuildItem]:
+        """
+        Reads the build items of a document, which place the objects.
+
+        Items that refer to an object that was not read are left out. The objects must be in the `resource_objects`
+        field by then.
+        :param root: The root element of the document.
+        :param scale_unit: The scale to apply to the items, to convert the unit of the document to the unit that the
+        coordinates are needed in.
+        :return: The build items, in order, each with its object ID, its 4x4 transformation including the scale, and its
+        metadata.
+        """
+        result = []
+        scale = numpy.diag([scale_unit, scale_unit, scale_unit, 1.0])
+        for build_item in root.iterfind("./3mf:build/3mf:item", MODEL_NAMESPACES):
+            objectid = build_item.attrib.get("objectid")
+            if objectid not in self.resource_objects:  # ID is required, and it must be in the available objects.
+                log.warning("Encountered build item without object ID.")
+                continue  # Ignore this invalid item.
+
+            metadata = Metadata()
+            for metadata_node in build_item.iterfind(
+                "./3mf:metadatagroup", MODEL_NAMESPACES
+            ):
+                metadata = self.read_metadata(metadata_node, metadata)
+            if "partnumber" in build_item.attrib:
+                metadata["3mf:partnumber"] = MetadataEntry(
+                    name="3mf:partnumber",
+                    preserve=True,
+                    datatype="xs:string",
+                    value=build_item.attrib["partnumber"],
+                )
+
+            transformation = scale @ self.parse_transformation(build_item.attrib.get("transform", ""))
+            result.append(BuildItem(objectid=objectid, transformation=transformation, metadata=metadata))
+        return result
+
+    def parse_transformation(self, transformation_str: str) -> numpy.ndarray:
+        """
+        Parses a transformation matrix as written in the 3MF files.
+
+        Transformations in 3MF files are written in the form:
+        `m00 m01 m01 m10 m11 m12 m20 m21 m22 m30 m31 m32`
+
+        This would then result in a row-major matrix of the form:
+        ```
+        _                 _
+        | m00 m01 m02 0.0 |
+        | m10 m11 m12 0.0 |
+        | m20 m21 m22 0.0 |
+        | m30 m31 m32 1.0 |
+        -                 -
+        ```
+        The 3MF specification multiplies row vectors with this matrix, while Blender multiplies the matrix with column
+        vectors. The result is therefore the transpose of that matrix, with the translation in the last column.
+
+        Files with many build items and components tend to repeat the same few transformations, so each distinct
+        transformation is only parsed once. The same read-only array is returned for it every time.
+        :param transformation_str: A transformation as represented in 3MF.
+        :return: A read-only 4x4 array with the correct transformation.
+        """
+        return parse_transformation_string(transformation_str)
+
+
+@functools.lru_cache(maxsize=TRANSFORMATION_CACHE_SIZE)
+def parse_transformation_string(transformation_str: str) -> numpy.ndarray:
+    """
+    Parses a transformation matrix as written in the 3MF files, and keeps the result for the next time.
+
+    Problems with the transformation are only logged the first time it is parsed.
+    :param transformation_str: A transformation as represented in 3MF.
+    :return: A read-only 4x4 array with the correct transformation. See `ModelReader.parse_transformation`.
+    """
+    result = numpy.identity(4)
+    if transformation_str != "":  # A missing transformation is not malformed. It's the identity then.
+        components = transformation_str.split(" ")
+        if len(components) > 12:
+            log.warning(
+                f"Transformation matrix contains too many components: {transformation_str}"
+            )
+            components = components[:12]  # Ignore the rest.
+        for index, component in enumerate(components):
+            try:
+                component_float = float(component)
+            except ValueError:  # Not a proper float. Skip this one.
+                log.warning(f"Transformation matrix malformed: {transformation_str}")
+                continue
+            result[index % 3, index // 3] = component_float
+    result.flags.writeable = False  # The same array is handed out every time, so nobody may change it.
+    return result
+
+
+def compose_transformations(transformations: numpy.ndarray, parents: List[int]) -> numpy.ndarray:
+    """
+    Computes the world transformations of a hierarchy of objects, in one pass per level of the hierarchy.
+
+    Each object is transformed relative to its parent. Rather than multiplying the matrices one by one while walking
+    through the hierarchy, the objects at the same depth are multiplied with their parents all at once.
+    :param transformations: An N x 4 x 4 array with the transformation of each object relative to its parent.
+    :param parents: For each object, the index of its parent, or -1 if it has no parent. Parents must be listed before
+    their children.
+    :return: An N x 4 x 4 array with the world transformation of each object.
+    """
+    result = numpy.array(transformations, dtype=numpy.float64).reshape(-1, 4, 4)
+    parents = numpy.asarray(parents, dtype=numpy.intp)
+    depths = numpy.zeros(len(parents), dtype=numpy.intp)
+    for index, parent in enumerate(parents.tolist()):
+        if parent >= 0:
+            depths[index] = depths[parent] + 1
+    for depth in range(1, int(depths.max(initial=0)) + 1):
+        level = numpy.flatnonzero(depths == depth)
+        result[level] = result[parents[level]] @ result[level]
+    return result
+
+
+def bounding_box(vertices: numpy.ndarray) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    """
+    Creates a box around the vertices of a mesh, to stand in for the mesh.
+    :param vertices: An N x 3 array with the coordinates of the vertices.
+    :return: The 8 corners of the box as 32-bit floats, and its 12 triangles. If there are no vertices, both are empty.
+    """
+    if len(vertices) == 0:
+        return numpy.zeros((0, 3), dtype=numpy.float32), numpy.zeros((0, 3), dtype=numpy.int32)
+    corners = numpy.where(BOX_CORNERS, vertices.max(axis=0), vertices.min(axis=0))
+    return corners.astype(numpy.float32), BOX_TRIANGLES
+
+
+class ModelParser:
+    """
+    Reads a 3dmodel.model document with an expat parser.
+
+    Most parts of the document are small: Metadata, materials, components and build items. Those parts are built into
+    ElementTree elements, so that they are read the same way as when the whole document is parsed at once. The vertices
+    and triangles of the meshes make up nearly all of the document though. Creating an element for each of them would
+    be slow and take lots of memory, so their attributes are read straight into the buffers of the mesh instead. While
+    the parser is inside a list of vertices or triangles, it calls dedicated handlers that do as little as possible for
+    the common case of a well-formed vertex or triangle. Anything else is left to the reader.
+
+    By default, the <object> elements are kept in the tree without their mesh, and the buffers of their meshes are
+    collected in `meshes` in the same order. Subclasses can process resources as soon as they are complete instead, by
+    overriding `start_root` and `end_element`.
+
+    If only some of the build items are selected, the objects and items that are not selected are skipped entirely,
+    without reading their meshes. If only the bounds of the meshes are needed, their triangles are skipped.
+    """
+
+    # Element names as reported by the parser, which separates the namespace from the local name with a brace.
+    MESH_NAME = f"{MODEL_NAMESPACE}}}mesh"
+    VERTICES_NAME = f"{MODEL_NAMESPACE}}}vertices"
+    VERTEX_NAME = f"{MODEL_NAMESPACE}}}vertex"
+    TRIANGLES_NAME = f"{MODEL_NAMESPACE}}}triangles"
+    TRIANGLE_NAME = f"{MODEL_NAMESPACE}}}triangle"
+    OBJECT_NAME = f"{MODEL_NAMESPACE}}}object"
+    ITEM_NAME = f"{MODEL_NAMESPACE}}}item"
+    # Element tags as ElementTree writes them.
+    RESOURCES_TAG = f"{{{MODEL_NAMESPACE}}}resources"
+    BASEMATERIALS_TAG = f"{{{MODEL_NAMESPACE}}}basematerials"
+    OBJECT_TAG = f"{{{MODEL_NAMESPACE}}}object"
+    BUILD_TAG = f"{{{MODEL_NAMESPACE}}}build"
+
+    def __init__(self, reader: ModelReader, selection: Optional[Selection] = None, bounds_only: bool = False):
+        """
+        Prepares to read a document.
+        :param reader: The reader that reads the materials, vertices and triangles of the document.
+        :param selection: The objects and build items to read, or `None` to read everything. See `select_items`.
+        :param bounds_only: Whether to read only the vertices of the meshes, to find their bounds.
+        """
+        self.reader = reader
+        self.selection = selection
+        self.bounds_only = bounds_only
+
+        self.parser = xml.parsers.expat.ParserCreate(namespace_separator="}")
+        self.parser.buffer_text = True  # Report text in one piece, rather than in a separate call for each line.
+        self.parser.StartElementHandler = self.start
+        self.parser.EndElementHandler = self.end
+        self.parser.CharacterDataHandler = self.data
+        self.builder = xml.etree.ElementTree.TreeBuilder()
+
+        self.root = None
+        self.meshes = []  # The buffers of the meshes of the objects that were kept in the tree, in order.
+        self.open_elements = []  # Stack of elements that have been started but not ended yet, to know where we are.
+        self.mesh = None  # The buffers of the object being read, if any.
+        self.mesh_depth = 0  # How many elements deep the parser is inside of a <mesh> element, or 0 if not in a mesh.
+        self.tags = {}  # The ElementTree tag for each name reported by the parser.
+        self.item_count = 0  # How many build items have started so far.
+        self.skip_depth = 0  # How many elements deep the parser is inside of an element that is skipped.
+
+    def parse(self, model_file: IO[bytes]) -> None:
+        """
+        Reads the entire document.
+
+        Raises `xml.parsers.expat.ExpatError` if the document is malformed. Everything that was complete before the
+        error has been read by then.
+        :param model_file: A stream containing the 3dmodel.model document.
+        """
+        while True:
+            chunk = model_file.read(READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            self.parser.Parse(chunk, False)
+        self.parser.Parse(b"", True)
+
+    def start_root(self, root: xml.etree.ElementTree.Element) -> None:
+        """
+        Called when the root element of the document starts, before any resources are read.
+        :param root: The root element, with its attributes but without children yet.
+        """
+        self.reader.resource_materials = {}  # Resource IDs are only unique within one document.
+
+    def end_element(self, element: xml.etree.ElementTree.Element, depth: int) -> None:
+        """
+        Called when an element outside of meshes is complete.
+        :param element: The element that is complete.
+        :param depth: How many elements the element is nested in. The root has depth 0.
+        """
+        if depth == 2 and self.open_elements[-1].tag == self.RESOURCES_TAG:
+            if element.tag == self.BASEMATERIALS_TAG:
+                self.reader.read_basematerials(element)
+                self.open_elements[-1].remove(element)  # The materials have been read into the reader.
+            elif element.tag == self.OBJECT_TAG:
+                self.meshes.append(self.mesh)
+                self.mesh = None
+                self.reader.report_diagnostics(element.attrib.get("id"))
+
+    def tag(self, name: str) -> str:
+        """
+        Converts a name reported by the parser to an ElementTree tag.
+        :param name: The name of an element or attribute, with the namespace separated by a brace.
+        :return: The same name, in the `{namespace}local` format of ElementTree.
+        """
+        try:
+            return self.tags[name]
+        except KeyError:
+            tag = "{" + name if "}" in name else name
+            self.tags[name] = tag
+            return tag
+
+    def start(self, name: str, attributes: Dict[str, str]) -> None:
+        """
+        Handles the start of an element outside of meshes.
+        :param name: The name of the element.
+        :param attributes: The attributes of the element.
+        """
+        depth = len(self.open_elements)
+        if depth == 3 and name == self.MESH_NAME and self.mesh is not None:  # The mesh of an object starts.
+            self.mesh_depth = 1
+            self.parser.StartElementHandler = self.start_mesh
+            self.parser.EndElementHandler = self.end_mesh
+            return
+        if depth == 2 and self.selection is not None and not self.is_selected(name, attributes):
+            self.skip_depth = 1
+            self.parser.StartElementHandler = self.start_skipped
+            self.parser.EndElementHandler = self.end_skipped
+            return
+
+        if any("}" in key for key in attributes):  # Some attributes are in a namespace.
+            attributes = {self.tag(key): value for key, value in attributes.items()}
+        element = self.builder.start(self.tag(name), attributes)
+        if depth == 0:  # The first element to start is the root of the document.
+            self.root = element
+            self.start_root(element)
+        elif depth == 2 and element.tag == self.OBJECT_TAG and self.open_elements[-1].tag == self.RESOURCES_TAG:
+            material = self.reader.read_object_material(attributes) if "id" in attributes else None
+            self.mesh = MeshBuffers(material, attributes.get("pid"))
+        self.open_elements.append(element)
+
+    def end(self, name: str) -> None:
+        """
+        Handles the end of an element outside of meshes.
+        :param name: The name of the element.
+        """
+        element = self.builder.end(self.tag(name))
+        self.open_elements.pop()
+        self.end_element(element, len(self.open_elements))
+
+    def is_selected(self, name: str, attributes: Dict[str, str]) -> bool:
+        """
+        Tells whether an element in the <resources> or <build> element must be read, according to the selection.
+        :param name: The name of the element.
+        :param attributes: The attributes of the element.
+        :return: `False` if the element is an object or build item that is not selected, or `True` otherwise.
+        """
+        parent = self.open_elements[-1].tag
+        if name == self.OBJECT_NAME and parent == self.RESOURCES_TAG:
+            return attributes.get("id") in self.selection.objects
+        if name == self.ITEM_NAME and parent == self.BUILD_TAG:
+            self.item_count += 1
+            return self.item_count - 1 in self.selection.items
+        return True
+
+    def start_skipped(self, name: str, attributes: Dict[str, str]) -> None:
+        """
+        Handles the start of an element inside of an element that is skipped.
+        :param name: The name of the element.
+        :param attributes: The attributes of the element.
+        """
+        self.skip_depth += 1
+
+    def end_skipped(self, name: str) -> None:
+        """
+        Handles the end of an element that is skipped, or of an element inside of it.
+        :param name: The name of the element.
+        """
+        self.skip_depth -= 1
+        if self.skip_depth == 0:  # The skipped element is complete.
+            self.parser.StartElementHandler = self.start
+            self.parser.EndElementHandler = self.end
+
+    def start_mesh(self, name: str, attributes: Dict[str, str]) -> None:
+        """
+        Handles the start of an element inside of a mesh, but not inside of a list of vertices or triangles.
+        :param name: The name of the element.
+        :param attributes: The attributes of the element.
+        """
+        self.mesh_depth += 1
+        if self.mesh_depth == 2:
+            if name == self.VERTICES_NAME:
+                self.parser.StartElementHandler = self.start_vertex
+            elif name == self.TRIANGLES_NAME and not self.bounds_only:
+                self.parser.StartElementHandler = self.start_triangle
+
+    def end_mesh(self, name: str) -> None:
+        """
+        Handles the end of an element inside of a mesh, or of the mesh itself.
+        :param name: The name of the element.
+        """
+        self.mesh_depth -= 1
+        if self.mesh_depth == 1:  # A list of vertices or triangles is complete.
+            self.parser.StartElementHandler = self.start_mesh
+        elif self.mesh_depth == 0:  # The mesh is complete.
+            self.parser.StartElementHandler = self.start
+            self.parser.EndElementHandler = self.end
+
+    def start_vertex(self, name: str, attributes: Dict[str, str]) -> None:
+        """
+        Handles the start of an element inside of a list of vertices.
+        :param name: The name of the element.
+        :param attributes: The attributes of the element.
+        """
+        self.mesh_depth += 1
+        if self.mesh_depth != 3 or name != self.VERTEX_NAME:
+            return
+        try:
+            self.mesh.vertices.extend((float(attributes["x"]), float(attributes["y"]), float(attributes["z"])))
+        except (KeyError, ValueError):
+            self.reader.read_vertex(attributes, self.mesh)  # Let the reader deal with broken vertices.
+
+    def start_triangle(self, name: str, attributes: Dict[str, str]) -> None:
+        """
+        Handles the start of an element inside of a list of triangles.
+        :param name: The name of the element.
+        :param attributes: The attributes of the element.
+        """
+        self.mesh_depth += 1
+        if self.mesh_depth != 3 or name != self.TRIANGLE_NAME:
+            return
+        mesh = self.mesh
+        if "p1" not in attributes and mesh.material_indices is None:  # Triangle with the default material.
+            try:
+                v1 = int(attributes["v1"])
+                v2 = int(attributes["v2"])
+                v3 = int(attributes["v3"])
+                mesh.triangles.extend((v1, v2, v3))
+                return
+            except (KeyError, ValueError):
+                pass
+            except OverflowError:  # Doesn't fit in the buffer, which may have taken some of the vertices already.
+                del mesh.triangles[len(mesh.triangles) - len(mesh.triangles) % 3:]
+        self.reader.read_triangle(attributes, mesh)  # Let the reader deal with materials and broken triangles.
+
+    def data(self, text: str) -> None:
+        """
+        Handles the text content of elements.
+
+        The text inside of meshes and of skipped elements is left out, like the elements themselves.
+        :param text: A piece of text.
+        """
+        if not self.mesh_depth and not self.skip_depth:
+            self.builder.data(text)
+
+
+class ModelScanner:
+    """
+    Lists the objects and build items of a 3dmodel.model document, without reading their meshes.
+
+    The vertices and triangles are only counted. This is much faster than reading the document, so it can be used to
+    decide what to read before reading it.
+    """
+
+    # Element names as reported by the parser, which separates the namespace from the local name with a brace.
+    RESOURCES_NAME = f"{MODEL_NAMESPACE}}}resources"
+    OBJECT_NAME = f"{MODEL_NAMESPACE}}}object"
+    VERTEX_NAME = f"{MODEL_NAMESPACE}}}vertex"
+    TRIANGLE_NAME = f"{MODEL_NAMESPACE}}}triangle"
+    COMPONENT_NAME = f"{MODEL_NAMESPACE}}}component"
+    BUILD_NAME = f"{MODEL_NAMESPACE}}}build"
+    ITEM_NAME = f"{MODEL_NAMESPACE}}}item"
+
+    def __init__(self):
+        """
+        Prepares to scan a document.
+        """
+        self.parser = xml.parsers.expat.ParserCreate(namespace_separator="}")
+        self.parser.StartElementHandler = self.start
+        self.parser.EndElementHandler = self.end
+
+        self.objects = {}  # The objects that are complete, by their ID.
+        self.items = []  # The build items, in order.
+        self.open_names = []  # The names of the elements that have been started but not ended yet.
+        self.object_attributes = None  # The attributes of the object being scanned, if any.
+        self.vertex_count = 0  # The number of vertices of the object being scanned.
+        self.triangle_count = 0  # The number of triangles of the object being scanned.
+        self.components = []  # The object IDs of the components of the object being scanned.
+
+    def parse(self, model_file: IO[bytes]) -> None:
+        """
+        Scans the entire document.
+
+        Raises `xml.parsers.expat.ExpatError` if the document is malformed. Everything that was complete before the
+        error has been listed by then.
+        :param model_file: A stream containing the 3dmodel.model document.
+        """
+        while True:
+            chunk = model_file.read(READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            self.parser.Parse(chunk, False)
+        self.parser.Parse(b"", True)
+
+    def index(self) -> ModelIndex:
+        """
+        Get what was found in the document.
+        :return: The objects by their ID, and the build items in order.
+        """
+        return ModelIndex(objects=self.objects, items=self.items)
+
+    def start(self, name: str, attributes: Dict[str, str]) -> None:
+        """
+        Handles the start of an element.
+        :param name: The name of the element.
+        :param attributes: The attributes of the element.
+        """
+        depth = len(self.open_names)
+        self.open_names.append(name)
+        if self.object_attributes is not None:
+            if depth == 5 and name == self.VERTEX_NAME:
+                self.vertex_count += 1
+            elif depth == 5 and name == self.TRIANGLE_NAME:
+                self.triangle_count += 1
+            elif depth == 4 and name == self.COMPONENT_NAME and "objectid" in attributes:
+                self.components.append(attributes["objectid"])
+        elif depth == 2 and name == self.OBJECT_NAME and self.open_names[1] == self.RESOURCES_NAME:
+            self.object_attributes = attributes
+            self.vertex_count = 0
+            self.triangle_count = 0
+            self.components = []
+        elif depth == 2 and name == self.ITEM_NAME and self.open_names[1] == self.BUILD_NAME:
+            self.items.append(ScannedItem(
+                objectid=attributes.get("objectid"),
+                partnumber=attributes.get("partnumber"),
+                transform=attributes.get("transform", ""),
+            ))
+
+    def end(self, name: str) -> None:
+        """
+        Handles the end of an element.
+        :param name: The name of the element.
+        """
+        self.open_names.pop()
+        if len(self.open_names) == 2 and self.object_attributes is not None:  # The object is complete.
+            if "id" in self.object_attributes:
+                objectid = self.object_attributes["id"]
+                self.objects[objectid] = ScannedObject(
+                    objectid=objectid,
+                    name=self.object_attributes.get("name"),
+                    partnumber=self.object_attributes.get("partnumber"),
+                    type=self.object_attributes.get("type", "model"),
+                    vertex_count=self.vertex_count,
+                    triangle_count=self.triangle_count,
+                    components=self.components,
+                )
+            self.object_attributes = None
+
+
+def scan_archive(path: str) -> Dict[str, ModelIndex]:
+    """
+    Lists the objects and build items of the model documents of a 3MF archive, without reading their meshes.
+
+    Raises `zipfile.BadZipFile` or `OSError` if the archive can't be read, and `xml.parsers.expat.ExpatError` if a
+    model document is malformed.
+    :param path: The path to the archive to scan.
+    :return: The objects and build items of each model document, by its path in the archive.
+    """
+    reader = ArchiveReader()
+    result = {}
+    with zipfile.ZipFile(path) as archive:
+        content_types = reader.assign_content_types(archive, reader.read_content_types(archive))
+        for part in index_archive(archive, content_types).get(MODEL_MIMETYPE, []):
+            scanner = ModelScanner()
+            with part.open() as model_file:
+                scanner.parse(model_file)
+            result[part.name] = scanner.index()
+    return result
+
+
+def parse_selectors(selection: str) -> List[str]:
+    """
+    Splits a comma-separated list of build items to select.
+    :param selection: The build items to select, such as `"3, Bracket, #2"`. See `select_items`.
+    :return: The selectors of the items, without surrounding whitespace.
+    """
+    return [selector.strip() for selector in selection.split(",") if selector.strip()]
+
+
+def select_items(index: ModelIndex, selectors: Iterable[str]) -> Selection:
+    """
+    Selects build items of a document, along with the objects they need, including the objects of their components.
+
+    A build item is selected if one of the selectors is the ID of its object, the part number of the item or of its
+    object, the name of its object, or `#N` where N is the position of the item in the build, starting from 1.
+    :param index: The objects and build items of the document.
+    :param selectors: The build items to select.
+    :return: The IDs of the objects to read, and the positions of the build items to build, starting from 0.
+    """
+    selectors = set(selectors)
+    items = set()
+    objects = set()
+    for position, item in enumerate(index.items):
+        scanned_object = index.objects.get(item.objectid)
+        keys = {f"#{position + 1}", item.objectid, item.partnumber}
+        if scanned_object is not None:
+            keys.update((scanned_object.name, scanned_object.partnumber))
+        if keys & selectors:
+            items.add(position)
+            objects.add(item.objectid)
+
+    to_visit = list(objects)
+    while to_visit:  # Also select the objects that the selected objects use as components, recursively.
+        scanned_object = index.objects.get(to_visit.pop())
+        if scanned_object is None:
+            continue
+        for component in scanned_object.components:
+            if component not in objects:
+                objects.add(component)
+                to_visit.append(component)
+    return Selection(objects=objects, items=items)
+
+
+def scan_selection(model_file: ArchivePart, selectors: Iterable[str]) -> Selection:
+    """
+    Scans a model document in an archive, and selects build items from it.
+
+    The document is scanned from a stream of its own, so that it can still be read from the start afterwards.
+    :param model_file: The 3dmodel.model document in the archive.
+    :param selectors: The build items to select. See `select_items`.
+    :return: The IDs of the objects to read, and the positions of the build items to build.
+    """
+    scanner = ModelScanner()
+    try:
+        with model_file.open() as stream:
+            scanner.parse(stream)
+    except xml.parsers.expat.ExpatError:
+        pass  # Select from what could be scanned. The error is reported when the document is read.
+    return select_items(scanner.index(), selectors)
+
+
+def filter_document(root: xml.etree.ElementTree.Element, selection: Selection) -> None:
+    """
+    Removes the objects and build items that are not selected from a complete 3dmodel.model document.
+    :param root: The root element of the document.
+    :param selection: The objects and build items to keep.
+    """
+    for resources in root.iterfind("./3mf:resources", MODEL_NAMESPACES):
+        for object_node in resources.findall("./3mf:object", MODEL_NAMESPACES):
+            if object_node.attrib.get("id") not in selection.objects:
+                resources.remove(object_node)
+    for build in root.iterfind("./3mf:build", MODEL_NAMESPACES):
+        for position, item in enumerate(build.findall("./3mf:item", MODEL_NAMESPACES)):
+            if position not in selection.items:
+                build.remove(item)
+
+
+class ArchiveReader(ModelReader):
+    """
+    Reads archives without Blender, keeping the messages to report so that the importer can report them later.
+    """
+
+    def __init__(self, strict: bool = False):
+        """
+        Creates a reader without any resources.
+        :param strict: Whether to raise a `MeshDataError` at the first problem in the mesh data.
+        """
+        self.resource_materials = {}
+        self.resource_objects = {}
+        self.diagnostics = Diagnostics(strict)
+        self.instrumentation = Instrumentation()
+        self.reports = []  # The level and message of each report, in order.
+
+    def safe_report(self, level: Set[str], message: str) -> None:
+        """
+        Keeps a message to report later.
+        :param level: The report level (e.g., {'ERROR'}, {'WARNING'}, {'INFO'})
+        :param message: The message to report
+        """
+        self.reports.append((level, message))
+
+
+def prepare_archive(path: str, strict: bool = False, selectors: Iterable[str] = (),
+                    bounds_only: bool = False) -> PreparedArchive:
+    """
+    Reads the content types and model documents of a 3MF archive, as far as that is possible without Blender.
+
+    This is what the worker processes do. The result is small enough to send back to the importer, which then only needs
+    to read the metadata, components and build items, and create the Blender objects.
+    :param path: The path to the archive to read.
+    :param strict: Whether to raise a `MeshDataError` at the first problem in the mesh data.
+    :param selectors: The build items to read, or nothing to read all of them. See `select_items`.
+    :param bounds_only: Whether to read only the bounding boxes of the meshes. Their vertices are reduced to the
+    corners of the box then.
+    :return: The content type of each file in the archive, the model documents by their path in the archive, the
+    messages to report, and the error that prevented reading the archive if any.
+    """
+    selectors = list(selectors)
+    reader = ArchiveReader(strict)
+    models = {}
+    try:
+        with zipfile.ZipFile(path) as archive:
+            content_types = reader.assign_content_types(archive, reader.read_content_types(archive))
+            for part in index_archive(archive, content_types).get(MODEL_MIMETYPE, []):
+                parser = ModelParser(reader, scan_selection(part, selectors) if selectors else None, bounds_only)
+                try:
+                    with part.open() as model_file:
+                        parser.parse(model_file)
+                except xml.parsers.expat.ExpatError as e:
+                    models[part.name] = PreparedModel(root=None, meshes=[], error=str(e))
+                    continue
+                if bounds_only:  # Send back only the corners, not all vertices.
+                    for mesh in parser.meshes:
+                        mesh.reduce_to_bounds()
+                models[part.name] = PreparedModel(root=parser.root, meshes=parser.meshes, error=None)
+    except (zipfile.BadZipFile, EnvironmentError) as e:
+        return PreparedArchive(content_types={}, models={}, reports=reader.reports, error=str(e))
+    return PreparedArchive(content_types=content_types, models=models, reports=reader.reports, error=None)
+
+
+def read_model(path: str, unit: Optional[str] = None, strict: bool = False) -> Dict[str, ModelDocument]:
+    """
+    Reads the metadata, objects and build items of the model documents of a 3MF archive, without Blender.
+
+    The vertices and triangles of the objects are NumPy arrays, and the transformations of their components and of the
+    build items are 4x4 NumPy arrays with the translation in the last column.
+
+    Raises `zipfile.BadZipFile` or `OSError` if the archive can't be read, `xml.parsers.expat.ExpatError` if a model
+    document is malformed, and `MeshDataError` in strict mode if the mesh data has a problem.
+    :param path: The path to the archive to read.
+    :param unit: The unit to convert the build items to, such as `"millimeter"`, or `None` to keep the unit of each
+    document.
+    :param strict: Whether to raise a `MeshDataError` at the first problem in the mesh data.
+    :return: The contents of each model document, by its path in the archive.
+    """
+    reader = ArchiveReader(strict)
+    result = {}
+    with zipfile.ZipFile(path) as archive:
+        content_types = reader.assign_content_types(archive, reader.read_content_types(archive))
+        for part in index_archive(archive, content_types).get(MODEL_MIMETYPE, []):
+            parser = ModelParser(reader)
+            with part.open() as model_file:
+                parser.parse(model_file)
+            scale_unit = 1.0
+            if unit is not None:
+                scale_unit = reader.metres_per_unit(parser.root) / threemf_to_metre[unit]
+            result[part.name] = reader.read_document(parser.root, parser.meshes, scale_unit)
+    return result
+
+
+# The worker processes run this code before anything else. The package that this module is in also registers the add-on
+# with Blender, which is not available in the workers. So instead of importing the package, the workers get stand-ins
+# for it that only tell where to find its modules. This keeps the names of the modules the same as in Blender, which is
+# needed to send the results back.
+WORKER_BOOTSTRAP = """
+import logging
+import sys
+import types
+logging.disable(logging.WARNING)  # The importer logs the messages of the workers when it reports them.
+for name, path in packages:
+    package = types.ModuleType(name)
+    package.__path__ = path
+    sys.modules.setdefault(name, package)
+"""
+
+
+def worker_packages() -> List[Tuple[str, List[str]]]:
+    """
+    Finds the packages that this module is in, for the worker processes to create stand-ins for.
+    :return: The name of each package, from the outermost inwards, with the directories that its modules are in.
+    """
+    result = []
+    parts = __name__.split(".")[:-1]
+    for length in range(1, len(parts) + 1):
+        name = ".".join(parts[:length])
+        path = getattr(sys.modules.get(name), "__path__", None)
+        if path is not None:
+            result.append((name, list(path)))
+    return result
+
+
+def prepare_archives(paths: Iterable[str], processes: int, strict: bool = False, selectors: Iterable[str] = (),
+                     bounds_only: bool = False) -> Iterator[Optional[PreparedArchive]]:
+    """
+    Reads archives in worker processes.
+
+    The archives are read in parallel, but the results are given in the same order as the paths. To keep the memory
+    usage bounded, the workers read at most two archives per process ahead of the one that is being consumed.
+
+    If the worker processes can't be started or stop working, or an archive can't be read in a worker, the result for
+    that archive is `None`. The importer should then read that archive itself.
+    :param paths: The paths to the archives to read.
+    :param processes: The number of worker processes to use.
+    :param strict: Whether to raise a `MeshDataError` at the first problem in the mesh data.
+    :param selectors: The build items to read, or nothing to read all of them. See `select_items`.
+    :param bounds_only: Whether to read only the bounding boxes of the meshes.
+    :return: For each path in order, the prepared archive or `None`.
+    """
+    paths = list(paths)
+    selectors = list(selectors)
+    try:
+        executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context("spawn"),  # Don't copy the state of Blender into the workers.
+            initializer=exec,
+            initargs=(WORKER_BOOTSTRAP, {"packages": worker_packages()}))
+    except (OSError, ValueError, NotImplementedError) as e:
+        log.warning(f"Unable to start worker processes: {e}. Reading the archives one by one.")
+        for _ in paths:
+            yield None
+        return
+
+    with executor:
+        pending = collections.deque()  # Archives that are being read, in order.
+        next_index = 0  # The index of the next path to submit.
+        broken = False
+        for path in paths:
+            result = None
+            if not broken:
+                try:
+                    while next_index < len(paths) and len(pending) < processes * 2:
+                        pending.append(
+                            executor.submit(prepare_archive, paths[next_index], strict, selectors, bounds_only)
+                        )
+                        next_index += 1
+                    result = pending.popleft().result()
+                except concurrent.futures.process.BrokenProcessPool as e:
+                    log.warning(f"The worker processes stopped: {e}. Reading the remaining archives one by one.")
+                    broken = True
+                except MeshDataError:  # In strict mode, the entire import must stop.
+                    raise
+                except Exception as e:  # Reading the archive itself failed. Let the importer try it and report that.
+                    log.warning(f"Unable to read {path} in a worker process: {e}")
+            yield result
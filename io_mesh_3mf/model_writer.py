@@ -0,0 +1,371 @@
+# Blender add-on to import and export 3MF files.
+# Copyright (C) 2020 Ghostkeeper
+# Copyright (C) 2025 Jack (modernization for Blender 4.2+)
+# This add-on is free software; you can redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation; either version 2 of the License, or (at your option) any later
+# version.
+# This add-on is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this program; if not, write to the Free
+# Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+# <pep8 compliant>
+
+"""
+This module writes the 3dmodel.model documents of 3MF archives without needing Blender.
+
+The exporter gathers the data from Blender and writes it with these functions. Other tools can use them to write
+documents with data from elsewhere, such as in worker processes that don't run Blender.
+"""
+
+import collections  # For namedtuple.
+import xml.etree.ElementTree  # The elements of the document to write.
+import xml.sax.saxutils  # To escape text and attributes while writing the XML document.
+from typing import Dict, Iterable, Iterator, Optional, Sequence, TextIO, Tuple
+
+import numpy  # To format mesh data in bulk.
+
+from .constants import MODEL_NAMESPACE
+from .metadata import Metadata  # To write the metadata of documents, objects and build items.
+
+# IDE and Documentation support.
+__all__ = [
+    "MESH_CHUNK_SIZE",
+    "MeshObject",
+    "ModelWriter",
+    "write_mesh_document",
+]
+
+MESH_CHUNK_SIZE = 16384  # Number of vertices or triangles to format at once when writing mesh data.
+IDENTITY = numpy.identity(4)  # Components with this transformation don't need to write it.
+
+# An object to write, with the coordinates of its vertices, the vertex indices of its triangles, and optionally the 4x4
+# transformation to place it with.
+MeshObject = collections.namedtuple("MeshObject", ["vertices", "triangles", "transformation"], defaults=[None])
+
+
+class ModelWriter:
+    """
+    Writes the parts of 3MF documents that don't need Blender.
+
+    The document is built as an ElementTree, except for the vertices and triangles of the meshes. Those make up nearly
+    all of the document, so creating an element for each of them would be slow and take lots of memory. Instead, the
+    <vertices> and <triangles> elements get a body of pre-formatted text, in the `element_bodies` field. That text is
+    written as-is by `write_document`. The number of decimals to write coordinates with is taken from the
+    `coordinate_precision` field.
+    """
+
+    element_bodies: Dict[xml.etree.ElementTree.Element, Iterable[str]]
+    coordinate_precision: int
+
+    def format_transformation(self, transformation: numpy.ndarray) -> str:
+        """
+        Formats a transformation matrix in 3MF's formatting.
+
+        This transformation matrix can then be written to an attribute.
+        :param transformation: The 4x4 transformation matrix to format, with the translation in the last column. This
+        can be an array, or anything that converts to one like a Blender matrix.
+        :return: A serialisation of the transformation matrix.
+        """
+        cells = numpy.asarray(transformation, dtype=numpy.float64)[:3].T.ravel()  # Don't convert the 4th row.
+        return " ".join(self.format_number(cell, 6) for cell in cells.tolist())
+
+    def format_vertices(self, coordinates: numpy.ndarray) -> Iterator[str]:
+        """
+        Formats the <vertex> elements for an array of vertex coordinates.
+
+        The vertices are formatted in chunks, using one formatting template for all vertices in a chunk.
+        :param coordinates: An array with the X, Y and Z coordinates of each vertex in its rows.
+        :return: A sequence of pieces of XML text, which together contain all vertices.
+        """
+        decimals = self.coordinate_precision
+        template = f'<vertex x="%.{decimals}f" y="%.{decimals}f" z="%.{decimals}f" />'
+        for start in range(0, len(coordinates), MESH_CHUNK_SIZE):
+            chunk = coordinates[start:start + MESH_CHUNK_SIZE]
+            formatted = (template * len(chunk)) % tuple(chunk.ravel().tolist())
+            if decimals > 0:  # Without decimals there is no radix, so the zeros are significant.
+                # Every number has exactly this many decimals, so this can only strip zeros after the radix.
+                for _ in range(decimals):
+                    formatted = formatted.replace('0"', '"')
+                formatted = formatted.replace('."', '"')
+            yield formatted.replace('"-0"', '"0"')  # Negative numbers that got rounded to 0.
+
+    def format_triangles(self, vertex_indices: numpy.ndarray, material_overrides: numpy.ndarray) -> Iterator[str]:
+        """
+        Formats the <triangle> elements for an array of triangles.
+
+        The triangles are formatted in chunks, using one formatting template for all triangles in a chunk.
+        :param vertex_indices: An array with the indices of the three vertices of each triangle in its rows.
+        :param material_overrides: An array with the material index to write for each triangle, or -1 if the triangle
+        uses the material of its object.
+        :return: A sequence of pieces of XML text, which together contain all triangles.
+        """
+        template = '<triangle v1="%d" v2="%d" v3="%d" />'
+        template_material = '<triangle v1="%d" v2="%d" v3="%d"%s />'
+        if len(material_overrides) > 0:
+            # The p1 attribute to write for each override, shifted by one so that -1 indexes the empty string.
+            p1_attributes = numpy.array(
+                [""] + [f' p1="{index}"' for index in range(material_overrides.max() + 1)], dtype=object
+            )
+        for start in range(0, len(vertex_indices), MESH_CHUNK_SIZE):
+            chunk = vertex_indices[start:start + MESH_CHUNK_SIZE]
+            chunk_overrides = material_overrides[start:start + MESH_CHUNK_SIZE]
+            if (chunk_overrides < 0).all():  # No triangle in this chunk needs to write its material.
+                yield (template * len(chunk)) % tuple(chunk.ravel().tolist())
+                continue
+            values = numpy.empty((len(chunk), 4), dtype=object)
+            values[:, :3] = chunk.tolist()
+            values[:, 3] = p1_attributes[chunk_overrides + 1]
+            yield (template_material * len(chunk)) % tuple(values.ravel().tolist())
+
+    def write_mesh_object(self, resources_element: xml.etree.ElementTree.Element, objectid: int,
+                          vertices: numpy.ndarray, triangles: numpy.ndarray,
+                          material_overrides: Optional[numpy.ndarray] = None) -> xml.etree.ElementTree.Element:
+        """
+        Adds an object with a mesh to the resources of a document.
+        :param resources_element: The <resources> element of the document.
+        :param objectid: The ID of the new object.
+        :param vertices: An array with the X, Y and Z coordinates of each vertex in its rows.
+        :param triangles: An array with the indices of the three vertices of each triangle in its rows.
+        :param material_overrides: An array with the material index to write for each triangle, or -1 if the triangle
+        uses the material of its object. If `None`, all triangles use the material of the object.
+        :return: The new <object> element, to which attributes such as its material can still be added.
+        """
+        object_element = xml.etree.ElementTree.SubElement(
+            resources_element, f"{{{MODEL_NAMESPACE}}}object", attrib={"id": str(objectid), "type": "model"}
+        )
+        self.write_mesh(object_element, vertices, triangles, material_overrides)
+        return object_element
+
+    def write_mesh(self, object_element: xml.etree.ElementTree.Element, vertices: numpy.ndarray,
+                   triangles: numpy.ndarray, material_overrides: Optional[numpy.ndarray] = None) -> None:
+        """
+        Adds a mesh to an object.
+
+        The vertices and triangles are formatted while the document is written, as the bodies of their elements.
+        :param object_element: The <object> element to add the mesh to.
+        :param vertices: An array with the X, Y and Z coordinates of each vertex in its rows.
+        :param triangles: An array with the indices of the three vertices of each triangle in its rows.
+        :param material_overrides: An array with the material index to write for each triangle, or -1 if the triangle
+        uses the material of its object. If `None`, all triangles use the material of the object.
+        """
+        triangles = numpy.asarray(triangles).reshape(-1, 3)
+        if material_overrides is None:
+            material_overrides = numpy.full(len(triangles), -1, dtype=numpy.int32)
+        mesh_element = xml.etree.ElementTree.SubElement(object_element, f"{{{MODEL_NAMESPACE}}}mesh")
+        vertices_element = xml.etree.ElementTree.SubElement(mesh_element, f"{{{MODEL_NAMESPACE}}}vertices")
+        self.element_bodies[vertices_element] = self.format_vertices(numpy.asarray(vertices).reshape(-1, 3))
+        triangles_element = xml.etree.ElementTree.SubElement(mesh_element, f"{{{MODEL_NAMESPACE}}}triangles")
+        self.element_bodies[triangles_element] = self.format_triangles(triangles, material_overrides)
+
+    def write_build_item(self, build_element: xml.etree.ElementTree.Element, objectid: int,
+                         transformation: Optional[numpy.ndarray] = None) -> xml.etree.ElementTree.Element:
+        """
+        Adds a build item to the build of a document, placing an object.
+        :param build_element: The <build> element of the document.
+        :param objectid: The ID of the object to place.
+        :param transformation: The 4x4 transformation to place the object with, or `None` to place it as it is.
+        :return: The new <item> element.
+        """
+        item_element = xml.etree.ElementTree.SubElement(
+            build_element, f"{{{MODEL_NAMESPACE}}}item", attrib={"objectid": str(objectid)}
+        )
+        if transformation is not None:
+            item_element.attrib["transform"] = self.format_transformation(transformation)
+        return item_element
+
+    def write_component(self, components_element: xml.etree.ElementTree.Element, objectid: int,
+                        transformation: Optional[numpy.ndarray] = None) -> xml.etree.ElementTree.Element:
+        """
+        Adds a component to an object, placing another object in it.
+        :param components_element: The <components> element of the object.
+        :param objectid: The ID of the object that the component places.
+        :param transformation: The 4x4 transformation of the component, relative to the object that it is a component
+        of, or `None` to place it as it is. This can be an array, or anything that converts to one.
+        :return: The new <component> element.
+        """
+        component_element = xml.etree.ElementTree.SubElement(
+            components_element, f"{{{MODEL_NAMESPACE}}}component",
+            attrib={f"{{{MODEL_NAMESPACE}}}objectid": str(objectid)}
+        )
+        if transformation is not None and not numpy.array_equal(transformation, IDENTITY):
+            component_element.attrib[f"{{{MODEL_NAMESPACE}}}transform"] = self.format_transformation(transformation)
+        return component_element
+
+    def write_metadata(self, node: xml.etree.ElementTree.Element, metadata: Metadata) -> None:
+        """
+        Writes metadata from a metadata storage into an XML node.
+        :param node: The node to add <metadata> tags to.
+        :param metadata: The collection of metadata to write to that node.
+        """
+        for metadata_entry in metadata.values():
+            metadata_node = xml.etree.ElementTree.SubElement(
+                node, f"{{{MODEL_NAMESPACE}}}metadata"
+            )
+            metadata_node.attrib[f"{{{MODEL_NAMESPACE}}}name"] = metadata_entry.name
+            if metadata_entry.preserve:
+                metadata_node.attrib[f"{{{MODEL_NAMESPACE}}}preserve"] = "1"
+            if metadata_entry.datatype:
+                metadata_node.attrib[f"{{{MODEL_NAMESPACE}}}type"] = (
+                    metadata_entry.datatype
+                )
+            metadata_node.text = metadata_entry.value
+
+    def write_basematerials(self, resources_element: xml.etree.ElementTree.Element, resource_id: str,
+                            materials: Iterable[Tuple[str, Sequence[float]]]) -> xml.etree.ElementTree.Element:
+        """
+        Adds a group of materials to the resources of a document.
+
+        Triangles and objects refer to these materials by the ID of the group and their index in it.
+        :param resources_element: The <resources> element of the document.
+        :param resource_id: The ID of the group of materials.
+        :param materials: The name and RGBA color of each material, with channels from 0 to 1. These are the same as
+        the `ResourceMaterial`s that are read from documents.
+        :return: The new <basematerials> element.
+        """
+        basematerials_element = xml.etree.ElementTree.SubElement(
+            resources_element,
+            f"{{{MODEL_NAMESPACE}}}basematerials",
+            attrib={f"{{{MODEL_NAMESPACE}}}id": resource_id},
+        )
+        for name, color in materials:
+            xml.etree.ElementTree.SubElement(
+                basematerials_element,
+                f"{{{MODEL_NAMESPACE}}}base",
+                attrib={
+                    f"{{{MODEL_NAMESPACE}}}name": name,
+                    f"{{{MODEL_NAMESPACE}}}displaycolor": self.format_color(color),
+                },
+            )
+        return basematerials_element
+
+    def format_color(self, color: Sequence[float]) -> str:
+        """
+        Formats a color in 3MF's hexadecimal formatting.
+        :param color: The red, green, blue and alpha channels of the color, from 0 to 1.
+        :return: The color as `#RRGGBB`, or as `#RRGGBBAA` if it is not completely opaque.
+        """
+        red = min(255, round(color[0] * 255))
+        green = min(255, round(color[1] * 255))
+        blue = min(255, round(color[2] * 255))
+        alpha = color[3]
+        if alpha >= 1.0:  # Completely opaque. Leave out the alpha component.
+            return "#%0.2X%0.2X%0.2X" % (red, green, blue)
+        alpha = min(255, round(alpha * 255))
+        return "#%0.2X%0.2X%0.2X%0.2X" % (red, green, blue, alpha)
+
+    def format_number(self, number: float, decimals: int) -> str:
+        """
+        Properly formats a floating point number to a certain precision.
+
+        This format will never use scientific notation (no 3.14e-5 nonsense) and will have a fixed limit to the number
+        of decimals. It will not have a limit to the length of the integer part. Any trailing zeros are stripped.
+        :param number: A floating point number to format.
+        :param decimals: The maximum number of places after the radix to write.
+        :return: A string representing that number.
+        """
+        formatted = f"{number:.{decimals}f}"
+        if "." in formatted:  # Only strip zeros after the radix. Zeros in the integer part are significant.
+            formatted = formatted.rstrip("0").rstrip(".")
+        if formatted == "-0":  # Negative number that got rounded to 0.
+            return "0"
+        return formatted
+
+    def write_document(self, stream: TextIO, root: xml.etree.ElementTree.Element) -> None:
+        """
+        Writes an XML document with the 3D model data to a text stream.
+
+        All elements must be in the 3MF model namespace, which is written as the default namespace. Elements that have
+        a pre-formatted body, such as the vertices and triangles of a mesh, get that body written as-is.
+        :param stream: The text stream to write the document to.
+        :param root: The root element of the document.
+        """
+        stream.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        self.write_element(stream, root, f' xmlns="{MODEL_NAMESPACE}"')
+
+    def write_element(self, stream: TextIO, element: xml.etree.ElementTree.Element, extra_attributes: str = "") -> None:
+        """
+        Writes a single XML element, including all of its children, to a text stream.
+        :param stream: The text stream to write the element to.
+        :param element: The element to write.
+        :param extra_attributes: Additional attributes to write in the start tag, already formatted.
+        """
+        body = self.element_bodies.pop(element, None)
+        if body is None and not element.text and len(element) == 0:
+            stream.write(f"<{self.local_name(element.tag)}{self.format_attributes(element)}{extra_attributes} />")
+        else:
+            self.write_start_tag(stream, element, extra_attributes)
+            if element.text:
+                stream.write(xml.sax.saxutils.escape(element.text))
+            if body is not None:
+                for piece in body:
+                    stream.write(piece)
+            for child in element:
+                self.write_element(stream, child)
+            self.write_end_tag(stream, element)
+        if element.tail:
+            stream.write(xml.sax.saxutils.escape(element.tail))
+
+    def write_start_tag(self, stream: TextIO, element: xml.etree.ElementTree.Element,
+                        extra_attributes: str = "") -> None:
+        """
+        Writes the start tag of an XML element to a text stream, with its attributes.
+        :param stream: The text stream to write the tag to.
+        :param element: The element to write the start tag of.
+        :param extra_attributes: Additional attributes to write in the start tag, already formatted.
+        """
+        stream.write(f"<{self.local_name(element.tag)}{self.format_attributes(element)}{extra_attributes}>")
+
+    def write_end_tag(self, stream: TextIO, element: xml.etree.ElementTree.Element) -> None:
+        """
+        Writes the end tag of an XML element to a text stream.
+        :param stream: The text stream to write the tag to.
+        :param element: The element to write the end tag of.
+        """
+        stream.write(f"</{self.local_name(element.tag)}>")
+
+    def format_attributes(self, element: xml.etree.ElementTree.Element) -> str:
+        """
+        Formats the attributes of an XML element, as they need to appear in its start tag.
+        :param element: The element to format the attributes of.
+        :return: The attributes, each preceded by a space.
+        """
+        return "".join(
+            f" {self.local_name(name)}={xml.sax.saxutils.quoteattr(value)}" for name, value in element.attrib.items()
+        )
+
+    def local_name(self, name: str) -> str:
+        """
+        Get the name to write for an element or attribute in the 3MF model namespace.
+        :param name: The qualified name of an element or attribute, like ElementTree uses it.
+        :return: The name to write in the document, without namespace.
+        """
+        if name.startswith("{"):
+            namespace, local = name[1:].split("}", 1)
+            if namespace != MODEL_NAMESPACE:
+                raise ValueError(f"Can't write {name} outside of the 3MF model namespace.")
+            return local
+        return name
+
+
+def write_mesh_document(stream: TextIO, objects: Iterable[MeshObject], coordinate_precision: int = 4,
+                        unit: str = "millimeter") -> None:
+    """
+    Writes a complete 3dmodel.model document with meshes from arrays, without Blender.
+
+    Each object is written as an object resource with its mesh, and placed once in the build.
+    :param stream: The text stream to write the document to.
+    :param objects: The objects to write.
+    :param coordinate_precision: The number of decimals to write the coordinates with.
+    :param unit: The unit of the coordinates, one of the units of 3MF.
+    """
+    writer = ModelWriter()
+    writer.element_bodies = {}
+    writer.coordinate_precision = coordinate_precision
+    root = xml.etree.ElementTree.Element(f"{{{MODEL_NAMESPACE}}}model", attrib={"unit": unit})
+    resources_element = xml.etree.ElementTree.SubElement(root, f"{{{MODEL_NAMESPACE}}}resources")
+    build_element = xml.etree.ElementTree.SubElement(root, f"{{{MODEL_NAMESPACE}}}build")
+    for objectid, mesh_object in enumerate(objects, start=1):
+        writer.write_mesh_object(resources_element, objectid, mesh_object.vertices, mesh_object.triangles)
+        writer.write_build_item(build_element, objectid, mesh_object.transformation)
+    writer.write_document(stream, root)
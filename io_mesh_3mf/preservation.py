@@ -0,0 +1,192 @@
+# Blender add-on to import and export 3MF files.
+# Copyright (C) 2020 Ghostkeeper
+# Copyright (C) 2025 Jack (modernization for Blender 4.2+)
+# This add-on is free software; you can redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation; either version 2 of the License, or (at your option) any later
+# version.
+# This add-on is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this program; if not, write to the Free
+# Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+# <pep8 compliant>
+
+"""
+This module keeps the files of 3MF archives that must be preserved, so that they can be written again when exporting.
+"""
+
+import base64  # To read files that were preserved by older versions of this add-on.
+import hashlib  # To recognise files with the same contents.
+import json  # To serialize the list of preserved files for long-term storage in the Blender scene.
+import logging  # To report problems with the stored files.
+from typing import Dict, Iterator, Optional, Tuple
+
+try:
+    import bpy  # To store the preserved files long-term in the Blender context.
+except ImportError:  # Not running in Blender. The preserved files can only be read from and written to archives then.
+    bpy = None
+
+from .constants import conflicting_mustpreserve_contents
+
+# IDE and Documentation support.
+__all__ = [
+    "PreservedFiles",
+]
+
+log = logging.getLogger(__name__)
+
+PRESERVED_FILE = ".3mf_preserved"  # Name of the text block in the Blender data that holds the preserved files.
+LEGACY_PREFIX = ".3mf_preserved/"  # Older versions stored each file as Base85 in a text block with this prefix.
+
+
+class PreservedFiles:
+    """
+    The files that must be preserved when a 3MF archive is written again, as raw bytes.
+
+    Files are kept by the hash of their contents, so that recognising the same file from another archive only takes a
+    comparison of the hashes, and files with the same contents are only kept once. If two archives have a file with the
+    same path but different contents, the file is in conflict, and no copy of it is preserved.
+
+    For each file, the archive that it was first read from is remembered too. When exporting, the compressed file can
+    then be copied straight from that archive, as long as it still contains the same file.
+
+    In the Blender data, the list of files and their sources is stored as a JSON document in a hidden text block. The
+    contents of the files are stored as they are, in byte properties of that same text block, keyed by their hash.
+    """
+
+    def __init__(self):
+        """
+        Creates an empty collection of preserved files.
+        """
+        self.files: Dict[str, Optional[str]] = {}  # The hash of each file by its path, or `None` if it's in conflict.
+        self.contents: Dict[str, bytes] = {}  # The contents of the files by their hash.
+        self.sources: Dict[str, Tuple[str, str]] = {}  # The archive and path in it that each file was read from.
+
+    @staticmethod
+    def content_hash(contents: bytes) -> str:
+        """
+        Computes the hash to identify the contents of a file with.
+
+        The hash is short enough to be used as the name of a property in Blender.
+        :param contents: The contents of a file.
+        :return: A hexadecimal digest of the contents.
+        """
+        return hashlib.blake2b(contents, digest_size=16).hexdigest()
+
+    def is_conflicting(self, filename: str) -> bool:
+        """
+        Checks whether archives had different files at a path, so that nothing needs to be read for that path any more.
+        :param filename: The path of the file in the archive.
+        :return: `True` if that file is in conflict, or `False` if it isn't or if there is no such file yet.
+        """
+        return filename in self.files and self.files[filename] is None
+
+    def add(self, filename: str, contents: bytes, source: Optional[Tuple[str, str]] = None) -> None:
+        """
+        Preserves a file.
+
+        If a file with different contents was already preserved at the same path, the file becomes in conflict.
+        :param filename: The path of the file in the archive.
+        :param contents: The contents of the file.
+        :param source: The path to the archive that the file was read from, and the path of the file within it, if
+        known.
+        """
+        if self.is_conflicting(filename):
+            return  # Will always be in conflict with one of the previous files.
+        content_hash = self.content_hash(contents)
+        if filename not in self.files:
+            self.files[filename] = content_hash
+            self.contents.setdefault(content_hash, contents)
+            if source is not None:
+                self.sources[filename] = source
+        elif self.files[filename] != content_hash:  # Same path, different contents.
+            self.mark_conflicting(filename)
+
+    def mark_conflicting(self, filename: str) -> None:
+        """
+        Marks a file as being in conflict, so that no copy of it is preserved.
+        :param filename: The path of the file in the archive.
+        """
+        previous_hash = self.files.get(filename)
+        self.files[filename] = None
+        self.sources.pop(filename, None)
+        if previous_hash is not None and previous_hash not in self.files.values():  # No other file has these contents.
+            del self.contents[previous_hash]
+
+    def items(self) -> Iterator[Tuple[str, bytes]]:
+        """
+        Lists the files to write, leaving out the files that are in conflict.
+        :return: The path and contents of each file.
+        """
+        for filename, content_hash in self.files.items():
+            if content_hash is not None:
+                yield filename, self.contents[content_hash]
+
+    def store(self) -> None:
+        """
+        Stores the preserved files in the Blender scene.
+
+        Files that were preserved by older versions of this add-on are removed from the scene, since they are now stored
+        along with the rest.
+        """
+        if PRESERVED_FILE in bpy.data.texts:
+            text_file = bpy.data.texts[PRESERVED_FILE]
+            text_file.clear()
+        else:
+            text_file = bpy.data.texts.new(PRESERVED_FILE)
+        text_file.write(json.dumps({"files": self.files, "sources": self.sources}))
+        for content_hash in list(text_file.keys()):
+            if content_hash not in self.contents:
+                del text_file[content_hash]
+        for content_hash, contents in self.contents.items():
+            if content_hash not in text_file:  # Contents that are stored already can't have changed.
+                text_file[content_hash] = contents
+
+        for legacy_file in [text for text in bpy.data.texts if text.name.startswith(LEGACY_PREFIX)]:
+            bpy.data.texts.remove(legacy_file)
+
+    def retrieve(self) -> None:
+        """
+        Retrieves the preserved files from the Blender scene.
+
+        This includes the files that were preserved by older versions of this add-on.
+        """
+        self.files.clear()
+        self.contents.clear()
+        self.sources.clear()
+
+        if PRESERVED_FILE in bpy.data.texts:
+            text_file = bpy.data.texts[PRESERVED_FILE]
+            try:
+                document = json.loads(text_file.as_string())
+                files = dict(document["files"])
+                sources = {filename: (source[0], source[1]) for filename, source in document["sources"].items()}
+            except (json.JSONDecodeError, LookupError, TypeError, ValueError, AttributeError):
+                log.warning("Preserved files exist, but their list is not properly formatted.")
+                files = {}
+                sources = {}
+            for filename, content_hash in files.items():
+                if content_hash is None:
+                    self.mark_conflicting(filename)
+                    continue
+                contents = text_file.get(content_hash)
+                if not isinstance(contents, bytes):
+                    log.warning(f"Contents of preserved file {filename} are missing.")
+                    continue
+                self.files[filename] = content_hash
+                self.contents[content_hash] = contents
+                if filename in sources:
+                    self.sources[filename] = sources[filename]
+
+        for text in bpy.data.texts:
+            if not text.name.startswith(LEGACY_PREFIX):
+                continue
+            filename = text.name[len(LEGACY_PREFIX):]
+            contents = text.as_string()
+            if contents == conflicting_mustpreserve_contents:
+                self.mark_conflicting(filename)
+                continue
+            try:
+                self.add(filename, base64.b85decode(contents.encode("UTF-8")))
+            except ValueError:
+                log.warning(f"Preserved file {filename} is not properly encoded.")
@@ -34,3 +34,11 @@ from .import_3mf import TestImport3MF
 from .export_3mf import TestExport3MF
 from .metadata import TestMetadata
 from .annotations import TestAnnotations
+from .batch import TestBatch
+from .compression import TestCompressionPolicy, TestCopyCompressed, TestParallelDeflater
+from .model_reader import TestArchivePart, TestBounds, TestPrepareArchive, TestSelection, TestTransformations
+from .model_writer import TestModelWriter
+from .diagnostics import TestDiagnostics
+from .instrumentation import TestInstrumentation
+from .preservation import TestPreservedFiles
+from .benchmarks import TestGenerate, TestRunBenchmarks
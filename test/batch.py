@@ -0,0 +1,133 @@
+# Blender add-on to import and export 3MF files.
+# Copyright (C) 2020 Ghostkeeper
+# This add-on is free software; you can redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation; either version 2 of the License, or (at your option) any later
+# version.
+# This add-on is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this program; if not, write to the Free
+# Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+# <pep8 compliant>
+
+import os  # To create the directories to convert.
+import os.path  # To create the files to convert.
+import tempfile  # To create the directories to convert.
+import unittest  # To run the tests.
+import unittest.mock  # To mock away the Blender API, the importer and the exporter.
+
+import bpy  # To check what was removed from the Blender data.
+
+import io_mesh_3mf.batch  # The unit under test.
+import io_mesh_3mf.diagnostics  # To simulate broken files in strict mode.
+
+
+class TestBatch(unittest.TestCase):
+    """
+    Tests converting directories of 3MF files.
+    """
+
+    def setUp(self):
+        """
+        Creates a directory with files to convert, and resets the Blender API.
+        """
+        self.directory = tempfile.TemporaryDirectory()
+        self.input_directory = os.path.join(self.directory.name, "input")
+        self.output_directory = os.path.join(self.directory.name, "output")
+        os.mkdir(self.input_directory)
+        for filename in ["b.3mf", "a.3mf", "notes.txt"]:
+            with open(os.path.join(self.input_directory, filename), "wb"):
+                pass
+
+        bpy.context = unittest.mock.MagicMock()
+        bpy.context.scene.keys.return_value = []
+        bpy.data = unittest.mock.MagicMock()
+
+        self.importer = unittest.mock.MagicMock()
+        self.importer.import_files.side_effect = lambda context, paths: [unittest.mock.MagicMock()]
+        self.exporter = unittest.mock.MagicMock()
+        self.exporter.export_objects.return_value = {"FINISHED"}
+        patches = [
+            unittest.mock.patch("io_mesh_3mf.batch.create_importer", return_value=self.importer),
+            unittest.mock.patch("io_mesh_3mf.batch.create_exporter", return_value=self.exporter),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        """
+        Removes the files that were created.
+        """
+        self.directory.cleanup()
+
+    def test_convert_directory(self):
+        """
+        Tests converting all 3MF files in a directory, with one importer and exporter for all files.
+        """
+        results = io_mesh_3mf.batch.convert_directory(self.input_directory, self.output_directory)
+
+        self.assertEqual(results, [
+            (os.path.join(self.input_directory, "a.3mf"), None),
+            (os.path.join(self.input_directory, "b.3mf"), None),
+        ], "Only the 3MF files must be converted, in order of their names.")
+        self.assertTrue(os.path.isdir(self.output_directory), "The output directory must be created.")
+        exported_paths = [call.args[2] for call in self.exporter.export_objects.call_args_list]
+        self.assertEqual(exported_paths, [
+            os.path.join(self.output_directory, "a.3mf"),
+            os.path.join(self.output_directory, "b.3mf"),
+        ])
+        self.assertEqual(bpy.data.batch_remove.call_count, 2, "The scene must be cleared after each file.")
+
+    def test_convert_directory_broken(self):
+        """
+        Tests converting a directory where one of the files is broken, in strict mode.
+
+        The broken file must be reported, and the other files must still be converted.
+        """
+        def import_files(context, paths):
+            if paths[0].endswith("a.3mf"):
+                raise io_mesh_3mf.diagnostics.MeshDataError("Found triangles with a missing vertex: v3 missing")
+            return [unittest.mock.MagicMock()]
+        self.importer.import_files.side_effect = import_files
+
+        results = io_mesh_3mf.batch.convert_directory(self.input_directory, self.output_directory)
+
+        self.assertEqual(results[0][1], "Import aborted: Found triangles with a missing vertex: v3 missing")
+        self.assertIsNone(results[1][1], "The next file must still be converted.")
+        self.assertEqual(bpy.data.batch_remove.call_count, 2, "The partially imported file must be cleared too.")
+
+    def test_convert_directory_unexpected_error(self):
+        """
+        Tests converting a directory where one of the files raises an error that the converter doesn't know about.
+
+        The error must be reported, and the other files must still be converted.
+        """
+        def export_objects(context, blender_objects, path):
+            if path.endswith("a.3mf"):
+                raise PermissionError("Permission denied")
+            return {"FINISHED"}
+        self.exporter.export_objects.side_effect = export_objects
+
+        with self.assertLogs(io_mesh_3mf.batch.log, level="ERROR") as logs:
+            results = io_mesh_3mf.batch.convert_directory(self.input_directory, self.output_directory)
+
+        self.assertEqual(results[0][1], "PermissionError: Permission denied")
+        self.assertIsNone(results[1][1], "The next file must still be converted.")
+        self.assertEqual(len(logs.records), 1, "The error must be logged once.")
+        self.assertIsNotNone(logs.records[0].exc_info, "The traceback of the error must be logged.")
+        self.assertEqual(bpy.data.batch_remove.call_count, 2, "The file that failed must be cleared too.")
+
+    def test_clear_imported_data(self):
+        """
+        Tests clearing the data of an imported file from the scene.
+        """
+        mesh = unittest.mock.MagicMock()
+        first = unittest.mock.MagicMock(data=mesh)
+        second = unittest.mock.MagicMock(data=mesh)  # A linked duplicate.
+        empty = unittest.mock.MagicMock(data=None)
+
+        io_mesh_3mf.batch.clear_imported_data([first, second, empty])
+
+        removed = bpy.data.batch_remove.call_args.args[0]
+        self.assertEqual(removed, [first, second, empty, mesh], "The objects and their mesh must be removed once.")
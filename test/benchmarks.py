@@ -0,0 +1,94 @@
+# Blender add-on to import and export 3MF files.
+# Copyright (C) 2020 Ghostkeeper
+# This add-on is free software; you can redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation; either version 2 of the License, or (at your option) any later
+# version.
+# This add-on is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this program; if not, write to the Free
+# Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+# <pep8 compliant>
+
+import os.path  # To write archives to a temporary directory.
+import tempfile  # To write archives to a temporary directory.
+import unittest  # To run the tests.
+
+import benchmarks.generate  # The unit under test.
+import benchmarks.run_benchmarks  # The unit under test.
+import io_mesh_3mf.model_reader  # To read the generated archives.
+
+
+class TestGenerate(unittest.TestCase):
+    """
+    Tests generating synthetic 3MF archives for the benchmarks.
+    """
+
+    def test_grid_mesh(self):
+        """
+        Tests that the triangles of the grid only refer to vertices that exist.
+        """
+        for vertex_count in [1, 3, 10, 1000]:
+            with self.subTest(vertex_count=vertex_count):
+                vertices, triangles = benchmarks.generate.grid_mesh(vertex_count)
+                self.assertEqual(len(vertices), vertex_count)
+                if len(triangles) > 0:
+                    self.assertLess(triangles.max(), vertex_count)
+        _, triangles = benchmarks.generate.grid_mesh(1000)
+        self.assertGreater(len(triangles), 1800, "There are about twice as many triangles as vertices.")
+
+    def test_generate_3mf(self):
+        """
+        Tests that the generated archives can be read, and have the requested dimensions.
+        """
+        parameters = benchmarks.generate.Parameters(vertices=100, objects=3, instances=2, materials=4, metadata_size=50)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "benchmark.3mf")
+            size = benchmarks.generate.generate_3mf(path, parameters)
+            prepared = io_mesh_3mf.model_reader.prepare_archive(path)
+
+        self.assertGreater(size, 0)
+        self.assertIsNone(prepared.error)
+        self.assertListEqual(prepared.reports, [], "The generated archive must not have any problems.")
+        model = prepared.models["3D/3dmodel.model"]
+        self.assertEqual(len(model.meshes), 3)
+        self.assertEqual(len(model.meshes[0].vertex_array()), 100)
+        self.assertEqual(len(model.meshes[0].materials), 4, "The triangles cycle through all materials.")
+        self.assertEqual(len(model.root.find("{*}build")), 6, "Every object is placed twice.")
+
+
+class TestRunBenchmarks(unittest.TestCase):
+    """
+    Tests running the benchmarks.
+    """
+
+    def test_benchmark_mocked(self):
+        """
+        Tests running the benchmarks that don't need Blender once, on a small archive.
+        """
+        parameters = benchmarks.generate.Parameters(vertices=100, objects=2, instances=2, materials=2, metadata_size=0)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "input.3mf")
+            benchmarks.generate.generate_3mf(path, parameters)
+            stages = benchmarks.run_benchmarks.benchmark_mocked(
+                path, os.path.join(directory, "output.3mf"), parameters, repeat=1, trace_memory=False)
+
+        self.assertListEqual(
+            list(stages.keys()), ["read_archive", "parse_streaming", "read_objects", "format_model", "write_model"])
+        for stage, measurement in stages.items():
+            self.assertGreaterEqual(measurement["seconds"], 0, f"Stage {stage} must be measured.")
+            if measurement["rss_growth"] is not None:  # Not available on Windows.
+                self.assertGreaterEqual(measurement["rss_growth"], 0, "The peak memory usage can only grow.")
+        self.assertGreater(stages["write_model"]["output_size"], 0, "The exported archive must have been written.")
+        self.assertGreater(
+            stages["format_model"]["output_size"], stages["write_model"]["output_size"],
+            "The formatted document is compressed into the archive, so the archive must be smaller.")
+
+    def test_measure_traced(self):
+        """
+        Tests measuring the memory that a stage allocates by tracing it.
+        """
+        result = benchmarks.run_benchmarks.measure(lambda: len(bytearray(1000000)), repeat=1, trace_memory=True)
+
+        self.assertEqual(result["output_size"], 1000000, "The output size is what the stage returned.")
+        self.assertGreaterEqual(result["traced_peak"], 1000000, "The stage allocated a megabyte while traced.")
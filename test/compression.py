@@ -0,0 +1,250 @@
+# Blender add-on to import and export 3MF files.
+# Copyright (C) 2020 Ghostkeeper
+# This add-on is free software; you can redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation; either version 2 of the License, or (at your option) any later
+# version.
+# This add-on is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this program; if not, write to the Free
+# Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+# <pep8 compliant>
+
+import io  # To write archives to memory.
+import os  # To generate random data to compress.
+import unittest  # To run the tests.
+import unittest.mock  # To simulate other versions of Python.
+import zipfile  # To check the compression of the files in the archives.
+import zlib  # To decompress the output of the parallel compressor.
+
+import io_mesh_3mf.compression  # The unit under test.
+
+
+class TestCompressionPolicy(unittest.TestCase):
+    """
+    Tests the policy that decides how to compress each file in a 3MF archive.
+    """
+
+    def test_settings_default(self):
+        """
+        Tests the compression of a file that doesn't match any pattern of files to store.
+        """
+        policy = io_mesh_3mf.compression.CompressionPolicy("DEFLATED", 4, ["*.png"])
+        self.assertEqual(
+            policy.settings("3D/3dmodel.model"),
+            (zipfile.ZIP_DEFLATED, 4),
+            "The model doesn't match the pattern, so it must get the compression of the policy.")
+
+    def test_settings_stored_parts(self):
+        """
+        Tests the compression of files that match a pattern of files to store.
+        """
+        policy = io_mesh_3mf.compression.CompressionPolicy("DEFLATED", 9, ["*.png", "Metadata/*"])
+        for filename in ["Metadata/thumbnail.png", "Textures/WOOD.PNG", "Metadata/Slic3r_PE.config"]:
+            with self.subTest(filename=filename):
+                self.assertEqual(
+                    policy.settings(filename),
+                    (zipfile.ZIP_STORED, None),
+                    "These files match one of the patterns, so they must be stored without compression.")
+
+    def test_settings_stored_method(self):
+        """
+        Tests the compression of files when the policy is to store all files.
+        """
+        policy = io_mesh_3mf.compression.CompressionPolicy("STORED", 9)
+        self.assertEqual(policy.settings("3D/3dmodel.model"), (zipfile.ZIP_STORED, None))
+
+    def test_from_string(self):
+        """
+        Tests creating a policy from a comma-separated list of patterns, as given in the export options.
+        """
+        policy = io_mesh_3mf.compression.CompressionPolicy.from_string("DEFLATED", 6, " *.png ,, *.jpg")
+        self.assertListEqual(policy.stored_parts, ["*.png", "*.jpg"], "Whitespace and empty patterns are removed.")
+
+    def test_invalid(self):
+        """
+        Tests creating a policy with an unknown method or a compression level out of range.
+        """
+        with self.assertRaises(ValueError):
+            io_mesh_3mf.compression.CompressionPolicy("LZMA", 6)
+        with self.assertRaises(ValueError):
+            io_mesh_3mf.compression.CompressionPolicy("DEFLATED", 10)
+
+    def test_open(self):
+        """
+        Tests writing files into an archive with a policy.
+        """
+        policy = io_mesh_3mf.compression.CompressionPolicy("DEFLATED", 1, ["*.png"])
+        stream = io.BytesIO()
+        with zipfile.ZipFile(stream, "w") as archive:
+            policy.configure(archive)
+            with policy.open(archive, "3D/3dmodel.model", force_zip64=True) as f:
+                f.write(b"<model />" * 100)
+            with policy.open(archive, "Metadata/thumbnail.png") as f:
+                f.write(b"PNG")
+            with archive.open("[Content_Types].xml", "w") as f:  # Not through the policy.
+                f.write(b"<Types />")
+
+        with zipfile.ZipFile(stream) as archive:
+            self.assertEqual(archive.getinfo("3D/3dmodel.model").compress_type, zipfile.ZIP_DEFLATED)
+            self.assertEqual(archive.getinfo("Metadata/thumbnail.png").compress_type, zipfile.ZIP_STORED)
+            self.assertEqual(
+                archive.getinfo("[Content_Types].xml").compress_type,
+                zipfile.ZIP_DEFLATED,
+                "Files written without the policy get the default compression of the policy.")
+            self.assertEqual(archive.read("3D/3dmodel.model"), b"<model />" * 100)
+
+    def test_open_parallel(self):
+        """
+        Tests writing a file into an archive with multiple threads.
+
+        The archive must be valid, and contain the same data as what was written.
+        """
+        policy = io_mesh_3mf.compression.CompressionPolicy("DEFLATED", 6, threads=4)
+        contents = b"<vertex x=\"1.5\" y=\"2\" z=\"3\" />" * 200000 + os.urandom(100000)
+        stream = io.BytesIO()
+        with zipfile.ZipFile(stream, "w") as archive:
+            with policy.open(archive, "3D/3dmodel.model", force_zip64=True, parallel=True) as f:
+                self.assertIsInstance(f.deflater, io_mesh_3mf.compression.ParallelDeflater)
+                for start in range(0, len(contents), 100000):  # Write in pieces, like the exporter does.
+                    f.write(contents[start:start + 100000])
+        self.assertTrue(f.deflater.executor._shutdown, "The threads must be stopped once the file is complete.")
+
+        with zipfile.ZipFile(stream) as archive:
+            self.assertIsNone(archive.testzip(), "The checksum of the file must be correct.")
+            self.assertEqual(archive.read("3D/3dmodel.model"), contents)
+
+    def test_open_parallel_error(self):
+        """
+        Tests that the threads of the parallel compressor are stopped if writing the file fails halfway.
+        """
+        policy = io_mesh_3mf.compression.CompressionPolicy("DEFLATED", 6, threads=2)
+        with zipfile.ZipFile(io.BytesIO(), "w") as archive:
+            with self.assertRaises(RuntimeError):
+                with policy.open(archive, "3D/3dmodel.model", parallel=True) as f:
+                    f.write(b"<model>")
+                    raise RuntimeError("Writing the model failed.")
+        self.assertTrue(f.deflater.executor._shutdown)
+
+    def test_open_parallel_unavailable(self):
+        """
+        Tests writing a file with multiple threads when the zipfile module doesn't compress the way that is expected.
+
+        The file must then be compressed serially, with the compressor of the zipfile module.
+        """
+        policy = io_mesh_3mf.compression.CompressionPolicy("DEFLATED", 6, threads=2)
+        stream = io.BytesIO()
+        with unittest.mock.patch("io_mesh_3mf.compression.ZLIB_COMPRESSOR_TYPE", type(None)):
+            with zipfile.ZipFile(stream, "w") as archive:
+                with policy.open(archive, "3D/3dmodel.model", parallel=True) as f:
+                    self.assertNotIsInstance(f, io_mesh_3mf.compression.ParallelDeflateStream)
+                    f.write(b"<model />" * 100)
+
+        with zipfile.ZipFile(stream) as archive:
+            self.assertIsNone(archive.testzip())
+            self.assertEqual(archive.read("3D/3dmodel.model"), b"<model />" * 100)
+
+
+class TestParallelDeflater(unittest.TestCase):
+    """
+    Tests compressing data in parallel.
+    """
+
+    def test_blocks(self):
+        """
+        Tests compressing data of several blocks, where the blocks refer to data in the previous block.
+        """
+        deflater = io_mesh_3mf.compression.ParallelDeflater(level=9, threads=3, block_size=1000)
+        contents = (b"All work and no play makes Jack a dull boy. " + os.urandom(8)) * 100
+        compressed = deflater.compress(contents[:2500]) + deflater.compress(contents[2500:]) + deflater.flush()
+
+        self.assertEqual(zlib.decompress(compressed, -15), contents, "The blocks must form one deflate stream.")
+        self.assertLess(len(compressed), len(contents) / 2, "Repetitions in earlier blocks must be compressed.")
+
+    def test_empty(self):
+        """
+        Tests compressing no data at all.
+        """
+        deflater = io_mesh_3mf.compression.ParallelDeflater(level=6, threads=2)
+        self.assertEqual(zlib.decompress(deflater.compress(b"") + deflater.flush(), -15), b"")
+
+
+class TestCopyCompressed(unittest.TestCase):
+    """
+    Tests copying files between archives without compressing them again.
+    """
+
+    def setUp(self):
+        """
+        Creates an archive to copy files from.
+        """
+        self.contents = b"layer_height = 0.2\n" * 1000
+        self.source_stream = io.BytesIO()
+        with zipfile.ZipFile(self.source_stream, "w") as archive:
+            archive.writestr("Metadata/print.config", self.contents, compress_type=zipfile.ZIP_DEFLATED)
+        self.source = zipfile.ZipFile(self.source_stream)
+
+    def tearDown(self):
+        """
+        Closes the archive to copy files from.
+        """
+        self.source.close()
+
+    def test_copy(self):
+        """
+        Tests copying a file, between other files that are written normally.
+        """
+        stream = io.BytesIO()
+        with zipfile.ZipFile(stream, "w") as archive:
+            archive.writestr("3D/3dmodel.model", b"<model />")
+            copied = io_mesh_3mf.compression.copy_compressed(
+                self.source, "Metadata/print.config", archive, "Metadata/print.config", self.contents)
+            archive.writestr("[Content_Types].xml", b"<Types />")
+        self.assertTrue(copied)
+
+        with zipfile.ZipFile(stream) as archive:
+            self.assertIsNone(archive.testzip(), "The checksums of all files must be correct.")
+            self.assertEqual(archive.read("Metadata/print.config"), self.contents)
+            self.assertEqual(archive.read("[Content_Types].xml"), b"<Types />")
+            info = archive.getinfo("Metadata/print.config")
+            source_info = self.source.getinfo("Metadata/print.config")
+            self.assertEqual(info.compress_type, zipfile.ZIP_DEFLATED, "The file keeps its original compression.")
+            self.assertEqual(info.compress_size, source_info.compress_size)
+
+        with zipfile.ZipFile(io.BytesIO(stream.getvalue())) as archive:  # An independent reader of the same data.
+            self.assertIsNone(archive.testzip())
+            for info in archive.infolist():
+                self.assertEqual(info.CRC, zlib.crc32(archive.read(info)), f"The checksum of {info.filename} is wrong.")
+
+    def test_copy_changed(self):
+        """
+        Tests copying a file when the source archive has different contents for it.
+
+        Nothing may be written then, so that the file can be written the normal way.
+        """
+        stream = io.BytesIO()
+        with zipfile.ZipFile(stream, "w") as archive:
+            self.assertFalse(io_mesh_3mf.compression.copy_compressed(
+                self.source, "Metadata/print.config", archive, "Metadata/print.config", b"layer_height = 0.1"))
+            self.assertFalse(io_mesh_3mf.compression.copy_compressed(
+                self.source, "Metadata/missing.config", archive, "Metadata/missing.config", self.contents))
+            self.assertListEqual(archive.namelist(), [])
+
+    def test_copy_unknown_python(self):
+        """
+        Tests copying a file with a version of Python whose zipfile internals are not known.
+
+        Nothing may be written then, so that the file can be written the normal way.
+        """
+        stream = io.BytesIO()
+        with unittest.mock.patch("io_mesh_3mf.compression.RAW_COPY_PYTHON_VERSIONS", ((2, 0), (2, 7))):
+            with zipfile.ZipFile(stream, "w") as archive:
+                copied = io_mesh_3mf.compression.copy_compressed(
+                    self.source, "Metadata/print.config", archive, "Metadata/print.config", self.contents)
+                self.assertListEqual(archive.namelist(), [])
+                archive.writestr("Metadata/print.config", self.contents)
+        self.assertFalse(copied)
+
+        with zipfile.ZipFile(stream) as archive:
+            self.assertIsNone(archive.testzip())
+            self.assertEqual(archive.read("Metadata/print.config"), self.contents)
@@ -0,0 +1,104 @@
+# Blender add-on to import and export 3MF files.
+# Copyright (C) 2020 Ghostkeeper
+# This add-on is free software; you can redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation; either version 2 of the License, or (at your option) any later
+# version.
+# This add-on is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this program; if not, write to the Free
+# Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+# <pep8 compliant>
+
+import unittest  # To run the tests.
+
+import io_mesh_3mf.diagnostics  # The unit under test.
+
+
+class TestDiagnostics(unittest.TestCase):
+    """
+    Tests collecting the problems in the mesh data.
+    """
+
+    def test_summary_empty(self):
+        """
+        Tests summarising when there were no problems.
+        """
+        diagnostics = io_mesh_3mf.diagnostics.Diagnostics()
+        self.assertIsNone(diagnostics.summary("Object 1"), "There is nothing to report.")
+
+    def test_summary(self):
+        """
+        Tests summarising multiple kinds of problems.
+
+        Each kind must be counted separately, in the order in which they were first found.
+        """
+        diagnostics = io_mesh_3mf.diagnostics.Diagnostics()
+        diagnostics.add("triangles with a missing vertex", "v3 missing")
+        diagnostics.add("vertices with a coordinate that is not a number", 'x="one"')
+        diagnostics.add("triangles with a missing vertex", "v1 missing")
+
+        self.assertEqual(
+            diagnostics.summary("Object 1"),
+            "Object 1 has 2 triangles with a missing vertex (v3 missing, v1 missing); "
+            "1 vertices with a coordinate that is not a number (x=\"one\")")
+
+    def test_summary_examples(self):
+        """
+        Tests that only the first few examples of each kind of problem are kept.
+        """
+        diagnostics = io_mesh_3mf.diagnostics.Diagnostics(examples=2)
+        for index in range(1000):
+            diagnostics.add("triangles with a negative vertex index", str(index))
+
+        self.assertEqual(len(diagnostics.found_examples["triangles with a negative vertex index"]), 2)
+        self.assertEqual(
+            diagnostics.summary("Object 1"),
+            "Object 1 has 1000 triangles with a negative vertex index (0, 1, ...)")
+
+    def test_add_many(self):
+        """
+        Tests recording many occurrences of a problem at once.
+
+        Only the examples that are kept may be taken from the examples, since creating them may be costly.
+        """
+        diagnostics = io_mesh_3mf.diagnostics.Diagnostics(examples=2)
+        diagnostics.add("degenerate triangles", "0 0 1")
+        taken = []
+
+        def examples():
+            for index in range(1000):
+                taken.append(index)
+                yield str(index)
+        diagnostics.add_many("degenerate triangles", 1000, examples())
+        diagnostics.add_many("triangles with a vertex index out of range", 0, [])  # Nothing to record.
+
+        self.assertEqual(taken, [0], "Only one more example could be kept.")
+        self.assertEqual(diagnostics.summary("Object 1"), "Object 1 has 1001 degenerate triangles (0 0 1, 0, ...)")
+
+    def test_summary_reset(self):
+        """
+        Tests that the problems are forgotten once they are summarised, so that they are reported for one object only.
+        """
+        diagnostics = io_mesh_3mf.diagnostics.Diagnostics()
+        diagnostics.add("triangles with a missing vertex", "v3 missing")
+        diagnostics.summary("Object 1")
+
+        self.assertIsNone(diagnostics.summary("Object 2"))
+
+    def test_strict(self):
+        """
+        Tests that the first problem raises an error in strict mode.
+        """
+        diagnostics = io_mesh_3mf.diagnostics.Diagnostics(strict=True)
+        with self.assertRaises(io_mesh_3mf.diagnostics.MeshDataError):
+            diagnostics.add("triangles with a missing vertex", "v3 missing")
+
+    def test_strict_many(self):
+        """
+        Tests that problems found in bulk raise an error in strict mode too, with the first example.
+        """
+        diagnostics = io_mesh_3mf.diagnostics.Diagnostics(strict=True)
+        with self.assertRaises(io_mesh_3mf.diagnostics.MeshDataError) as context:
+            diagnostics.add_many("degenerate triangles", 2, ["0 0 1", "1 1 2"])
+        self.assertEqual(str(context.exception), "Found degenerate triangles: 0 0 1")
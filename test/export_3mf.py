@@ -10,14 +10,17 @@
 
 # <pep8 compliant>
 
+import io  # To write documents to memory.
 import os  # To save archives to a temporary file.
 import mathutils  # To mock parameters and return values that are transformations.
+import numpy  # To format transformations that were read by the importer.
 import tempfile  # To save archives to a temporary file.
 import unittest  # To run the tests.
 import unittest.mock  # To mock away the Blender API.
 import xml.etree.ElementTree  # To construct empty documents for the functions to build elements in.
+import zipfile  # To write the preserved files to.
 
-from .mock.bpy import MockOperator, MockExportHelper, MockImportHelper, MockPrincipledBSDFWrapper
+from .mock.bpy import MockOperator, MockExportHelper, MockImportHelper, MockPrincipledBSDFWrapper, MockPropCollection
 
 # The import and export classes inherit from classes from the Blender API. These classes would be MagicMocks as well.
 # However their metaclasses are then also MagicMocks, but different instances of MagicMock.
@@ -31,10 +34,14 @@ bpy_extras.io_utils.ImportHelper = MockImportHelper
 bpy_extras.io_utils.ExportHelper = MockExportHelper
 bpy_extras.node_shader_utils.PrincipledBSDFWrapper = MockPrincipledBSDFWrapper
 import io_mesh_3mf.export_3mf  # Now we may safely import the unit under test.
+import io_mesh_3mf.compression  # To write the preserved files with.
+import io_mesh_3mf.instrumentation  # To measure the stages of the export.
+import io_mesh_3mf.preservation  # To provide preserved files to write.
 # from io_mesh_3mf.constants import * ## Annotated out to use explicict imports below
 from io_mesh_3mf.constants import (
     RELS_FOLDER,
     CONTENT_TYPES_LOCATION,
+    MODEL_LOCATION,
     MODEL_NAMESPACE,
     MODEL_NAMESPACES
 )
@@ -53,15 +60,36 @@ class TestExport3MF(unittest.TestCase):
         self.exporter = io_mesh_3mf.export_3mf.Export3MF()  # An exporter class.
         self.exporter.use_mesh_modifiers = False
         self.exporter.coordinate_precision = 4
+        self.exporter.use_instancing = True
+        self.exporter.compression_method = "DEFLATED"
+        self.exporter.compression_level = 6
+        self.exporter.stored_parts = "*.png"
+        self.exporter.compression_threads = 1
 
         # Initialize state variables that are normally set in execute()
         self.exporter.next_resource_id = 1
         self.exporter.material_resource_id = -1
         self.exporter.num_written = 0
         self.exporter.material_name_to_index = {}
+        self.exporter.shared_mesh_resources = {}
+        self.exporter.element_bodies = {}
+        self.exporter.instrumentation = io_mesh_3mf.instrumentation.Instrumentation()
 
         self.mock_triangle_loop = unittest.mock.MagicMock()
         self.mock_triangle_loop.material_index = 0
+        self.mock_triangle_loop.vertices = [0, 1, 0]
+
+    def serialize(self, element: xml.etree.ElementTree.Element) -> xml.etree.ElementTree.Element:
+        """
+        Writes an element with the document writer of the exporter, and parses it back.
+
+        This includes the mesh data that the exporter doesn't store in the element tree itself.
+        :param element: The element to write.
+        :return: The element as it would be read from the resulting document.
+        """
+        stream = io.StringIO()
+        self.exporter.write_document(stream, element)
+        return xml.etree.ElementTree.fromstring(stream.getvalue().encode("UTF-8"))
 
     def test_create_archive(self):
         """
@@ -103,6 +131,41 @@ class TestExport3MF(unittest.TestCase):
                 if file_path is not None:
                     os.remove(file_path)
 
+    def test_must_preserve(self):
+        """
+        Tests writing the files that must be preserved.
+
+        Files that are still in the archive they were imported from must be copied from there as they are. Other files
+        are compressed again.
+        """
+        contents = b"".join(f"setting_{index} = {index * 7 % 13}\n".encode("UTF-8") for index in range(1000))
+        source_handle, source_path = tempfile.mkstemp()
+        os.close(source_handle)
+        try:
+            with zipfile.ZipFile(source_path, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=1) as source:
+                source.writestr("Metadata/print.config", contents)
+            preserved = io_mesh_3mf.preservation.PreservedFiles()
+            preserved.add("Metadata/print.config", contents, (source_path, "Metadata/print.config"))
+            preserved.add("Metadata/moved.config", b"moved", ("/nonexistent/moved.3mf", "Metadata/moved.config"))
+            self.exporter.compression_policy = io_mesh_3mf.compression.CompressionPolicy("DEFLATED", 9)
+
+            stream = io.BytesIO()
+            with unittest.mock.patch.object(preserved, "retrieve"):
+                with unittest.mock.patch("io_mesh_3mf.export_3mf.PreservedFiles", return_value=preserved):
+                    with zipfile.ZipFile(stream, "w") as archive:
+                        self.exporter.must_preserve(archive)
+
+            with zipfile.ZipFile(stream) as archive, zipfile.ZipFile(source_path) as source:
+                self.assertIsNone(archive.testzip())
+                self.assertEqual(archive.read("Metadata/print.config"), contents)
+                self.assertEqual(
+                    archive.getinfo("Metadata/print.config").compress_size,
+                    source.getinfo("Metadata/print.config").compress_size,
+                    "The file was copied with the compression of the source, not compressed again at level 9.")
+                self.assertEqual(archive.read("Metadata/moved.config"), b"moved", "The source is gone, so compress.")
+        finally:
+            os.remove(source_path)
+
     def test_unit_scale_global(self):
         """
         Tests whether the global scaling factor is taken into account with the scale.
@@ -544,6 +607,62 @@ class TestExport3MF(unittest.TestCase):
                 self.assertFalse("We only had 'Title' and 'Description' metadata, not {name}".format(
                     name=metadata_element.attrib["name"]))
 
+    def test_write_objects_stream(self):
+        """
+        Tests writing objects to a stream, where the resources of each object are written as soon as they're complete.
+        """
+        root = xml.etree.ElementTree.Element(f"{{{MODEL_NAMESPACE}}}model")
+        resources_element = xml.etree.ElementTree.SubElement(root, f"{{{MODEL_NAMESPACE}}}resources")
+        stream = io.StringIO()
+        written_before = []  # For each object, how much was written to the stream before its resource was added.
+
+        def write_object_resource(resources_element, blender_object):
+            written_before.append(stream.getvalue())
+            xml.etree.ElementTree.SubElement(resources_element, f"{{{MODEL_NAMESPACE}}}object")
+            return len(written_before), mathutils.Matrix.Identity(4)
+        self.exporter.write_object_resource = write_object_resource
+
+        object1 = unittest.mock.MagicMock(type="MESH")
+        object1.parent = None  # Can't be passed to the constructor, since mocks use that for their own parent.
+        object1.name = "Object 1"
+        object2 = unittest.mock.MagicMock(type="MESH")
+        object2.parent = None  # Can't be passed to the constructor, since mocks use that for their own parent.
+        object2.name = "Object 2"
+        build_element = self.exporter.write_objects(root, resources_element, [object1, object2], 1.0, stream)
+
+        self.assertEqual(written_before[0], "", "Nothing was written before the first object.")
+        self.assertEqual(written_before[1].count("<object"), 1, "The first object must be written before the second.")
+        self.assertEqual(stream.getvalue().count("<object"), 2, "Both objects must be written to the stream.")
+        self.assertEqual(len(resources_element), 0, "Written resources must not be retained in the document.")
+        self.assertEqual(len(build_element), 2, "There must be build items for both objects.")
+
+    def test_write_model(self):
+        """
+        Tests writing a complete document to a stream.
+        """
+        root = xml.etree.ElementTree.Element(f"{{{MODEL_NAMESPACE}}}model")
+        metadata_element = xml.etree.ElementTree.SubElement(root, f"{{{MODEL_NAMESPACE}}}metadata")
+        metadata_element.attrib[f"{{{MODEL_NAMESPACE}}}name"] = "Title"
+        metadata_element.text = "Fish & chips"
+        resources_element = xml.etree.ElementTree.SubElement(root, f"{{{MODEL_NAMESPACE}}}resources")
+        xml.etree.ElementTree.SubElement(resources_element, f"{{{MODEL_NAMESPACE}}}basematerials")
+        self.exporter.write_object_resource = unittest.mock.MagicMock(return_value=(2, mathutils.Matrix.Identity(4)))
+        the_object = unittest.mock.MagicMock(type="MESH")
+        the_object.parent = None  # Can't be passed to the constructor, since mocks use that for their own parent.
+        the_object.name = "Object"
+        stream = io.StringIO()
+
+        self.exporter.write_model(stream, root, resources_element, [the_object], 1.0)
+
+        document = xml.etree.ElementTree.fromstring(stream.getvalue().encode("UTF-8"))
+        self.assertListEqual(
+            [child.tag for child in document],
+            [f"{{{MODEL_NAMESPACE}}}metadata", f"{{{MODEL_NAMESPACE}}}resources", f"{{{MODEL_NAMESPACE}}}build"],
+            "The metadata must come first, then the resources, then the build.")
+        self.assertEqual(document[0].text, "Fish & chips", "The metadata must retain special characters.")
+        self.assertEqual(len(document[1]), 1, "The materials must be written in the resources.")
+        self.assertEqual(document[2][0].attrib["objectid"], "2", "The build item must refer to the object.")
+
     def test_write_object_resource_id(self):
         """
         Ensures that the resource IDs given to the resources are unique positive integers.
@@ -599,7 +718,7 @@ class TestExport3MF(unittest.TestCase):
 
         # Prepare a mock for the mesh.
         original_vertices = [(1, 2, 3), (4, 5, 6)]
-        original_triangles = [self.mock_triangle_loop, self.mock_triangle_loop]
+        original_triangles = MockPropCollection([self.mock_triangle_loop, self.mock_triangle_loop])
         blender_object.to_mesh().vertices = original_vertices
         blender_object.to_mesh().loop_triangles = original_triangles
 
@@ -673,7 +792,7 @@ class TestExport3MF(unittest.TestCase):
 
         # Give the object a (pretend-)mesh.
         original_vertices = [(1, 2, 3), (4, 5, 6)]
-        original_triangles = [self.mock_triangle_loop, self.mock_triangle_loop]
+        original_triangles = MockPropCollection([self.mock_triangle_loop, self.mock_triangle_loop])
         blender_object.to_mesh().vertices = original_vertices
         blender_object.to_mesh().loop_triangles = original_triangles
 
@@ -705,6 +824,118 @@ class TestExport3MF(unittest.TestCase):
             0,
             blender_object.material_slots)
 
+    def mesh_object(self, mesh_data: unittest.mock.MagicMock) -> unittest.mock.MagicMock:
+        """
+        Creates a mock Blender object with a mesh, without children, modifiers or materials.
+        :param mesh_data: The mesh datablock that the object uses.
+        :return: A mock Blender object.
+        """
+        blender_object = unittest.mock.MagicMock()
+        blender_object.type = "MESH"
+        blender_object.mode = "OBJECT"
+        blender_object.data = mesh_data
+        blender_object.children = []
+        blender_object.modifiers = []
+        blender_object.material_slots = []
+        blender_object.matrix_world = mathutils.Matrix.Identity(4)
+        blender_object.to_mesh().vertices = [(1, 2, 3), (4, 5, 6)]
+        blender_object.to_mesh().loop_triangles = MockPropCollection([self.mock_triangle_loop])
+        return blender_object
+
+    def test_write_object_resource_shared_mesh(self):
+        """
+        Tests writing two objects that share the same mesh data.
+
+        The mesh must only be written once, and both objects must refer to the same resource.
+        """
+        self.exporter.write_vertices = unittest.mock.MagicMock()
+        self.exporter.write_triangles = unittest.mock.MagicMock()
+        resources_element = xml.etree.ElementTree.Element(f"{{{MODEL_NAMESPACE}}}resources")
+        mesh_data = unittest.mock.MagicMock()
+        object1 = self.mesh_object(mesh_data)
+        object2 = self.mesh_object(mesh_data)
+        object2.matrix_world = mathutils.Matrix.Translation(mathutils.Vector([10, 0, 0]))
+
+        id1, _ = self.exporter.write_object_resource(resources_element, object1)
+        id2, transformation2 = self.exporter.write_object_resource(resources_element, object2)
+
+        self.assertEqual(id1, id2, "Both objects share the same mesh, so they must refer to the same resource.")
+        self.assertEqual(transformation2, object2.matrix_world, "The second object still gets its own placement.")
+        object_elements = resources_element.findall("3mf:object", namespaces=MODEL_NAMESPACES)
+        self.assertEqual(len(object_elements), 1, "The shared mesh may only be written once.")
+        self.exporter.write_vertices.assert_called_once()
+
+    def test_write_object_resource_shared_mesh_disabled(self):
+        """
+        Tests writing two objects that share the same mesh data, when sharing mesh data is disabled.
+        """
+        self.exporter.use_instancing = False
+        self.exporter.write_vertices = unittest.mock.MagicMock()
+        self.exporter.write_triangles = unittest.mock.MagicMock()
+        resources_element = xml.etree.ElementTree.Element(f"{{{MODEL_NAMESPACE}}}resources")
+        mesh_data = unittest.mock.MagicMock()
+
+        id1, _ = self.exporter.write_object_resource(resources_element, self.mesh_object(mesh_data))
+        id2, _ = self.exporter.write_object_resource(resources_element, self.mesh_object(mesh_data))
+
+        self.assertNotEqual(id1, id2, "Every object must get a resource of its own.")
+        self.assertEqual(self.exporter.write_vertices.call_count, 2, "The mesh must be written for every object.")
+
+    def test_write_object_resource_shared_mesh_modifiers(self):
+        """
+        Tests writing two objects that share the same mesh data, but have modifiers that get applied.
+
+        The modifiers may change the geometry per object, so these may not share their resource.
+        """
+        self.exporter.use_mesh_modifiers = True
+        self.exporter.write_vertices = unittest.mock.MagicMock()
+        self.exporter.write_triangles = unittest.mock.MagicMock()
+        resources_element = xml.etree.ElementTree.Element(f"{{{MODEL_NAMESPACE}}}resources")
+        mesh_data = unittest.mock.MagicMock()
+        object1 = self.mesh_object(mesh_data)
+        object1.modifiers = [unittest.mock.MagicMock()]
+        object1.evaluated_get.return_value = object1
+        object2 = self.mesh_object(mesh_data)
+        object2.modifiers = [unittest.mock.MagicMock()]
+        object2.evaluated_get.return_value = object2
+
+        id1, _ = self.exporter.write_object_resource(resources_element, object1)
+        id2, _ = self.exporter.write_object_resource(resources_element, object2)
+
+        self.assertNotEqual(id1, id2, "Objects with modifiers can't share their resource.")
+
+    def test_write_object_resource_collection_instance(self):
+        """
+        Tests writing an empty that instances a collection.
+
+        The objects in the collection must become components, offset by the instance offset of the collection.
+        """
+        self.exporter.write_vertices = unittest.mock.MagicMock()
+        self.exporter.write_triangles = unittest.mock.MagicMock()
+        resources_element = xml.etree.ElementTree.Element(f"{{{MODEL_NAMESPACE}}}resources")
+        instanced_object = self.mesh_object(unittest.mock.MagicMock())
+        instanced_object.parent = None
+        instancer = unittest.mock.MagicMock()
+        instancer.type = "EMPTY"
+        instancer.children = []
+        instancer.matrix_world = mathutils.Matrix.Identity(4)
+        instancer.instance_type = "COLLECTION"
+        instancer.instance_collection.all_objects = [instanced_object]
+        instancer.instance_collection.instance_offset = mathutils.Vector([1, 2, 3])
+        instancer.to_mesh.return_value = None  # An empty has no mesh of its own.
+
+        self.exporter.write_object_resource(resources_element, instancer)
+
+        component_elements = resources_element.findall(
+            "3mf:object/3mf:components/3mf:component",
+            namespaces=MODEL_NAMESPACES)
+        self.assertEqual(len(component_elements), 1, "The collection has one object, so there is one component.")
+        self.assertEqual(
+            component_elements[0].attrib[f"{{{MODEL_NAMESPACE}}}transform"],
+            "1 0 0 0 1 0 0 0 1 -1 -2 -3",
+            "The component must be moved by the instance offset of the collection.")
+        self.exporter.write_vertices.assert_called_once()
+
     def test_write_object_resource_metadata(self):
         """
         Tests writing an object resource that has metadata.
@@ -723,7 +954,7 @@ class TestExport3MF(unittest.TestCase):
 
         # Give the object a (pretend-)mesh.
         original_vertices = [(1, 2, 3), (4, 5, 6)]
-        original_triangles = [self.mock_triangle_loop, self.mock_triangle_loop]
+        original_triangles = MockPropCollection([self.mock_triangle_loop, self.mock_triangle_loop])
         blender_object.to_mesh().vertices = original_vertices
         blender_object.to_mesh().loop_triangles = original_triangles
 
@@ -801,7 +1032,7 @@ class TestExport3MF(unittest.TestCase):
 
         # Give the object a (pretend-)mesh.
         original_vertices = [(1, 2, 3), (4, 5, 6)]
-        original_triangles = [self.mock_triangle_loop, self.mock_triangle_loop]
+        original_triangles = MockPropCollection([self.mock_triangle_loop, self.mock_triangle_loop])
         blender_object.to_mesh().vertices = original_vertices
         blender_object.to_mesh().loop_triangles = original_triangles
 
@@ -832,6 +1063,7 @@ class TestExport3MF(unittest.TestCase):
         blender_object = unittest.mock.MagicMock()
         blender_object.matrix_world = mathutils.Matrix.Identity(4)
         blender_object.children = []
+        blender_object.name = "Object"
         material1 = unittest.mock.MagicMock()
         material1.name = "PLA"
         material2 = unittest.mock.MagicMock()
@@ -845,11 +1077,11 @@ class TestExport3MF(unittest.TestCase):
 
         # Give the object a (pretend-)mesh.
         original_vertices = [(1, 2, 3), (4, 5, 6)]
-        original_triangles = [
-            unittest.mock.MagicMock(material_index=1),  # Index 1 is the most common one.
-            unittest.mock.MagicMock(material_index=0),
-            unittest.mock.MagicMock(material_index=1)
-        ]
+        original_triangles = MockPropCollection([
+            unittest.mock.MagicMock(material_index=1, vertices=[0, 1, 0]),  # Index 1 is the most common one.
+            unittest.mock.MagicMock(material_index=0, vertices=[0, 1, 0]),
+            unittest.mock.MagicMock(material_index=1, vertices=[0, 1, 0])
+        ])
         blender_object.to_mesh().vertices = original_vertices
         blender_object.to_mesh().loop_triangles = original_triangles
 
@@ -866,21 +1098,21 @@ class TestExport3MF(unittest.TestCase):
             object_element.attrib[f"{{{MODEL_NAMESPACE}}}pindex"],
             "1",
             "Material with index 1 was the most common one for this object.")
-        triangles = resources_element.findall(
+        triangles = self.serialize(resources_element).findall(
             "3mf:object/3mf:mesh/3mf:triangles/3mf:triangle",
             namespaces=MODEL_NAMESPACES)
         self.assertNotIn(
-            f"{{{MODEL_NAMESPACE}}}p1",
+            "p1",
             triangles[0].attrib,
             "The first triangle had the index of the most common material, "
             "so it shouldn't override the material index.")
         self.assertNotIn(
-            f"{{{MODEL_NAMESPACE}}}p1",
+            "p1",
             triangles[2].attrib,
             "The third triangle had the index of the most common material, "
             "so it shouldn't override the material index.")
         self.assertEqual(
-            triangles[1].attrib[f"{{{MODEL_NAMESPACE}}}p1"],
+            triangles[1].attrib["p1"],
             "0",
             "This triangle had material index 0, which is not the most common material, "
             "so it must override the material index to 0.")
@@ -904,6 +1136,14 @@ class TestExport3MF(unittest.TestCase):
             (3.0, 3.1, 3.2, 3.3)))
         self.assertEqual(self.exporter.format_transformation(matrix), "0 1 2 0.1 1.1 2.1 0.2 1.2 2.2 0.3 1.3 2.3")
 
+    def test_format_transformation_array(self):
+        """
+        Tests formatting a matrix that is an array rather than a Blender matrix, as read by the importer.
+        """
+        matrix = numpy.identity(4)
+        matrix[:3, 3] = [30, 40, 0.5]  # Translated.
+        self.assertEqual(self.exporter.format_transformation(matrix), "1 0 0 0 1 0 0 0 1 30 40 0.5")
+
     def test_write_vertices_empty(self):
         """
         Tests writing vertices when there are no vertices.
@@ -913,12 +1153,12 @@ class TestExport3MF(unittest.TestCase):
         reliable as a stand-alone routine regardless of input.
         """
         mesh_element = xml.etree.ElementTree.Element(f"{{{MODEL_NAMESPACE}}}mesh")
-        vertices = []
+        vertices = MockPropCollection()
 
         self.exporter.write_vertices(mesh_element, vertices)
 
         self.assertListEqual(
-            mesh_element.findall("3mf:vertices/3mf:vertex", namespaces=MODEL_NAMESPACES),
+            self.serialize(mesh_element).findall("3mf:vertices/3mf:vertex", namespaces=MODEL_NAMESPACES),
             [],
             "There may not be any vertices in the file, because there were no vertices to write.")
 
@@ -932,27 +1172,44 @@ class TestExport3MF(unittest.TestCase):
         vertex1 = unittest.mock.MagicMock(co=(0.0, 1.1, 2.2))
         vertex2 = unittest.mock.MagicMock(co=(3.3, 4.4, 5.5))
         vertex3 = unittest.mock.MagicMock(co=(6.6, 7.7, 8.8))
-        vertices = [vertex1, vertex2, vertex3]
+        vertices = MockPropCollection([vertex1, vertex2, vertex3])
 
         self.exporter.write_vertices(mesh_element, vertices)
 
-        vertex_elements = mesh_element.findall("3mf:vertices/3mf:vertex", namespaces=MODEL_NAMESPACES)
+        vertex_elements = self.serialize(mesh_element).findall("3mf:vertices/3mf:vertex", namespaces=MODEL_NAMESPACES)
         self.assertEqual(len(vertex_elements), 3, "There were 3 vertices to write.")
         self.assertEqual(
-            vertex_elements[0].attrib[f"{{{MODEL_NAMESPACE}}}x"],
+            vertex_elements[0].attrib["x"],
             "0",
             "Formatting must format as integers if possible.")
         self.assertEqual(
-            vertex_elements[0].attrib[f"{{{MODEL_NAMESPACE}}}y"],
+            vertex_elements[0].attrib["y"],
             "1.1",
             "Formatting must format as floats if necessary.")
-        self.assertEqual(vertex_elements[0].attrib[f"{{{MODEL_NAMESPACE}}}z"], "2.2")
-        self.assertEqual(vertex_elements[1].attrib[f"{{{MODEL_NAMESPACE}}}x"], "3.3")
-        self.assertEqual(vertex_elements[1].attrib[f"{{{MODEL_NAMESPACE}}}y"], "4.4")
-        self.assertEqual(vertex_elements[1].attrib[f"{{{MODEL_NAMESPACE}}}z"], "5.5")
-        self.assertEqual(vertex_elements[2].attrib[f"{{{MODEL_NAMESPACE}}}x"], "6.6")
-        self.assertEqual(vertex_elements[2].attrib[f"{{{MODEL_NAMESPACE}}}y"], "7.7")
-        self.assertEqual(vertex_elements[2].attrib[f"{{{MODEL_NAMESPACE}}}z"], "8.8")
+        self.assertEqual(vertex_elements[0].attrib["z"], "2.2")
+        self.assertEqual(vertex_elements[1].attrib["x"], "3.3")
+        self.assertEqual(vertex_elements[1].attrib["y"], "4.4")
+        self.assertEqual(vertex_elements[1].attrib["z"], "5.5")
+        self.assertEqual(vertex_elements[2].attrib["x"], "6.6")
+        self.assertEqual(vertex_elements[2].attrib["y"], "7.7")
+        self.assertEqual(vertex_elements[2].attrib["z"], "8.8")
+
+    def test_write_vertices_precision(self):
+        """
+        Tests writing vertices with a precision of 0 decimals.
+
+        Zeros in the integer part of the coordinates must be retained then.
+        """
+        self.exporter.coordinate_precision = 0
+        mesh_element = xml.etree.ElementTree.Element(f"{{{MODEL_NAMESPACE}}}mesh")
+        vertices = MockPropCollection([unittest.mock.MagicMock(co=(10.0, -0.2, 100.4))])
+
+        self.exporter.write_vertices(mesh_element, vertices)
+
+        vertex_element = self.serialize(mesh_element).find("3mf:vertices/3mf:vertex", namespaces=MODEL_NAMESPACES)
+        self.assertEqual(vertex_element.attrib["x"], "10", "The zero in the integer part is significant.")
+        self.assertEqual(vertex_element.attrib["y"], "0", "Negative numbers rounded to 0 don't get a sign.")
+        self.assertEqual(vertex_element.attrib["z"], "100")
 
     def test_write_triangles_empty(self):
         """
@@ -962,12 +1219,12 @@ class TestExport3MF(unittest.TestCase):
         only vertices or edges.
         """
         mesh_element = xml.etree.ElementTree.Element(f"{{{MODEL_NAMESPACE}}}mesh")
-        triangles = []
+        triangles = MockPropCollection()
 
         self.exporter.write_triangles(mesh_element, triangles, 0, [])
 
         self.assertListEqual(
-            mesh_element.findall("3mf:triangles/3mf:triangle", namespaces=MODEL_NAMESPACES),
+            self.serialize(mesh_element).findall("3mf:triangles/3mf:triangle", namespaces=MODEL_NAMESPACES),
             [],
             "There may not be any triangles in the file, because there were no triangles to write.")
 
@@ -979,7 +1236,7 @@ class TestExport3MF(unittest.TestCase):
         triangle1 = unittest.mock.MagicMock(vertices=[0, 1, 2], material_index=0)
         triangle2 = unittest.mock.MagicMock(vertices=[3, 4, 5], material_index=0)
         triangle3 = unittest.mock.MagicMock(vertices=[4, 2, 0], material_index=0)
-        triangles = [triangle1, triangle2, triangle3]
+        triangles = MockPropCollection([triangle1, triangle2, triangle3])
         self.exporter.material_name_to_index["BLA"] = 0
         material_mock = unittest.mock.MagicMock()
         material_mock.name = "BLA"
@@ -987,17 +1244,19 @@ class TestExport3MF(unittest.TestCase):
 
         self.exporter.write_triangles(mesh_element, triangles, 0, material_slots)
 
-        triangle_elements = mesh_element.findall("3mf:triangles/3mf:triangle", namespaces=MODEL_NAMESPACES)
+        triangle_elements = self.serialize(mesh_element).findall(
+            "3mf:triangles/3mf:triangle",
+            namespaces=MODEL_NAMESPACES)
         self.assertEqual(len(triangle_elements), 3, "There were 3 triangles to write.")
-        self.assertEqual(triangle_elements[0].attrib[f"{{{MODEL_NAMESPACE}}}v1"], "0")
-        self.assertEqual(triangle_elements[0].attrib[f"{{{MODEL_NAMESPACE}}}v2"], "1")
-        self.assertEqual(triangle_elements[0].attrib[f"{{{MODEL_NAMESPACE}}}v3"], "2")
-        self.assertEqual(triangle_elements[1].attrib[f"{{{MODEL_NAMESPACE}}}v1"], "3")
-        self.assertEqual(triangle_elements[1].attrib[f"{{{MODEL_NAMESPACE}}}v2"], "4")
-        self.assertEqual(triangle_elements[1].attrib[f"{{{MODEL_NAMESPACE}}}v3"], "5")
-        self.assertEqual(triangle_elements[2].attrib[f"{{{MODEL_NAMESPACE}}}v1"], "4")
-        self.assertEqual(triangle_elements[2].attrib[f"{{{MODEL_NAMESPACE}}}v2"], "2")
-        self.assertEqual(triangle_elements[2].attrib[f"{{{MODEL_NAMESPACE}}}v3"], "0")
+        self.assertEqual(triangle_elements[0].attrib["v1"], "0")
+        self.assertEqual(triangle_elements[0].attrib["v2"], "1")
+        self.assertEqual(triangle_elements[0].attrib["v3"], "2")
+        self.assertEqual(triangle_elements[1].attrib["v1"], "3")
+        self.assertEqual(triangle_elements[1].attrib["v2"], "4")
+        self.assertEqual(triangle_elements[1].attrib["v3"], "5")
+        self.assertEqual(triangle_elements[2].attrib["v1"], "4")
+        self.assertEqual(triangle_elements[2].attrib["v2"], "2")
+        self.assertEqual(triangle_elements[2].attrib["v3"], "0")
 
     def test_format_number(self):
         """
@@ -1010,8 +1269,41 @@ class TestExport3MF(unittest.TestCase):
             (30.12, 1, "30.1"),
             (3.14159, 10, "3.14159"),
             (0, 0, "0"),
-            (0.1, 0, "0")
+            (0.1, 0, "0"),
+            (10, 0, "10"),  # Zeros in the integer part must not be stripped.
+            (100.001, 2, "100"),
+            (-0.001, 2, "0")  # Negative numbers that get rounded to 0 don't get a sign.
         ]
         for number, precision, result in tests:
             with self.subTest(number=number, precision=precision, result=result):
                 self.assertEqual(self.exporter.format_number(number, precision), result)
+
+    def test_export_3mf(self):
+        """
+        Tests exporting through the scripting function, without the operator.
+
+        The archive must be complete, with a model document.
+        """
+        context = unittest.mock.MagicMock()
+        context.scene.unit_settings.scale_length = 0
+        context.scene.unit_settings.length_unit = "MILLIMETERS"
+        bpy.context.scene.name = "Scene"
+        bpy.context.scene.keys.return_value = []
+        file_handle, file_path = tempfile.mkstemp()
+        os.close(file_handle)
+        try:
+            num_written = io_mesh_3mf.export_3mf.export_3mf([], file_path, context, compression_threads=1)
+            with zipfile.ZipFile(file_path) as archive:
+                self.assertIn(MODEL_LOCATION, archive.namelist(), "The model document must be written.")
+        finally:
+            os.remove(file_path)
+        self.assertEqual(num_written, 0, "There were no objects to write.")
+
+    def test_export_3mf_no_rights(self):
+        """
+        Tests exporting through the scripting function to a spot where there are no access rights.
+        """
+        mock_open = unittest.mock.MagicMock(side_effect=PermissionError("Simulated permission error!"))
+        with unittest.mock.patch("io.open", mock_open):
+            with self.assertRaises(OSError):
+                io_mesh_3mf.export_3mf.export_3mf([], "/no/rights.3mf", unittest.mock.MagicMock())
@@ -11,9 +11,10 @@
 # <pep8 compliant>
 
 import io  # To simulate output streams to create input archives to test with.
-import mathutils  # To compare transformation matrices.
+import numpy  # To compare the mesh data and transformation matrices that were read.
 import os.path  # To find the test resources.
 import re  # To test matching with content types.
+import tempfile  # To import archives from a file.
 import unittest  # To run the tests.
 import unittest.mock  # To mock away the Blender API.
 import xml.etree.ElementTree  # To construct 3MF documents as input for the importer functions.
@@ -32,17 +33,54 @@ bpy.types.Operator = MockOperator
 bpy_extras.io_utils.ImportHelper = MockImportHelper
 bpy_extras.io_utils.ExportHelper = MockExportHelper
 import io_mesh_3mf.import_3mf  # Now we may safely import the unit under test.
+import io_mesh_3mf.diagnostics  # To collect the problems in the mesh data.
+import io_mesh_3mf.instrumentation  # To measure the stages of the import.
+import io_mesh_3mf.model_reader  # To simulate what worker processes read.
 # from io_mesh_3mf.constants import * ## Annotated out to use explicict imports below
 from io_mesh_3mf.constants import (
     RELS_MIMETYPE,
     MODEL_MIMETYPE,
     MODEL_NAMESPACE,
+    MODEL_LOCATION,
     CONTENT_TYPES_LOCATION
 )
 # To compare the metadata objects created by the code under test.
 from io_mesh_3mf.metadata import Metadata, MetadataEntry
 
 
+# A document with an object that has a mesh, and an assembly of it.
+ASSEMBLY_DOCUMENT = f"""<?xml version="1.0" encoding="UTF-8"?>
+<model xmlns="{MODEL_NAMESPACE}" unit="millimeter">
+    <resources>
+        <object id="1">
+            <mesh>
+                <vertices>
+                    <vertex x="0" y="0" z="0" /><vertex x="4" y="0" z="0" /><vertex x="0" y="2" z="1" />
+                </vertices>
+                <triangles><triangle v1="0" v2="1" v3="2" /></triangles>
+            </mesh>
+        </object>
+        <object id="2"><components><component objectid="1" /></components></object>
+    </resources>
+    <build><item objectid="2" /></build>
+</model>"""
+
+
+class BlenderObject(dict):
+    """
+    An object that keeps its custom properties, like Blender objects do.
+    """
+
+    def __init__(self, properties=(), data=None):
+        """
+        Creates an object with some custom properties.
+        :param properties: The custom properties of the object.
+        :param data: The mesh of the object.
+        """
+        super().__init__(properties)
+        self.data = data
+
+
 class TestImport3MF(unittest.TestCase):
     """
     Unit tests for importing 3MF files.
@@ -67,12 +105,25 @@ class TestImport3MF(unittest.TestCase):
         self.importer.resource_objects = {}
         self.importer.resource_materials = {}
         self.importer.resource_to_material = {}
+        self.importer.resource_to_mesh = {}
         self.importer.num_loaded = 0
+        self.importer.imported_objects = []
+        self.importer.use_instancing = True
+        self.importer.item_filter = ""
+        self.importer.use_proxies = False
+        self.importer.proxy_source = None
+        self.importer.use_collection_per_file = False
+        self.importer.pending_objects = []
+        self.importer.material_reuse = "REUSE"
+        self.importer.material_index = None
+        self.importer.diagnostics = io_mesh_3mf.diagnostics.Diagnostics()
+        self.importer.instrumentation = io_mesh_3mf.instrumentation.Instrumentation()
 
         self.single_triangle = io_mesh_3mf.import_3mf.ResourceObject(  # A model with just a single triangle.
-            vertices=[(0.0, 0.0, 0.0), (5.0, 0.0, 1.0), (0.0, 5.0, 1.0)],
-            triangles=[(0, 1, 2)],
+            vertices=numpy.array([(0.0, 0.0, 0.0), (5.0, 0.0, 1.0), (0.0, 5.0, 1.0)], dtype=numpy.float32),
+            triangles=numpy.array([(0, 1, 2)], dtype=numpy.int32),
             materials=[None],
+            material_indices=None,
             components=[],
             metadata=Metadata()
         )
@@ -365,6 +416,244 @@ class TestImport3MF(unittest.TestCase):
             {"some_directory/file.txt": "Second type"},
             "Now that the priority is reversed, the second type has highest priority.")
 
+    def streaming_context(self):
+        """
+        Creates a Blender context to read documents with, in which the units of the scene equal the units of 3MF.
+        :return: A mock Blender context.
+        """
+        self.importer.global_scale = 1.0
+        context = unittest.mock.MagicMock()
+        context.scene.unit_settings.scale_length = 0
+        context.scene.unit_settings.length_unit = 'MILLIMETERS'
+        return context
+
+    def test_read_model_streaming(self):
+        """
+        Tests reading a document incrementally.
+
+        The result must be the same as when reading the whole document at once: Materials and objects are read as
+        resources, the items in the build are built and the metadata is returned.
+        """
+        self.importer.build_object = unittest.mock.MagicMock()  # Record how this gets called.
+        document = f"""<?xml version="1.0" encoding="UTF-8"?>
+<model xmlns="{MODEL_NAMESPACE}" unit="millimeter">
+    <metadata name="Title">Streamed</metadata>
+    <resources>
+        <basematerials id="1"><base name="PLA" displaycolor="#FF0000" /></basematerials>
+        <object id="2" pid="1" pindex="0">
+            <mesh>
+                <vertices>
+                    <vertex x="0" y="0" z="0" /><vertex x="1" y="0" z="0" /><vertex x="0" y="1" z="0" />
+                </vertices>
+                <triangles><triangle v1="0" v2="1" v3="2" /></triangles>
+            </mesh>
+        </object>
+    </resources>
+    <build><item objectid="2" /></build>
+</model>"""
+
+        metadata = self.importer.read_model_streaming(
+            self.streaming_context(),
+            "streamed.3mf",
+            io.BytesIO(document.encode("UTF-8")),
+            Metadata())
+
+        self.assertIn("1", self.importer.resource_materials, "The material group must have been read.")
+        self.assertIn("2", self.importer.resource_objects, "The object must have been read.")
+        self.importer.build_object.assert_called_once()  # The only build item must have been built.
+        self.assertIs(
+            self.importer.build_object.call_args[0][0],
+            self.importer.resource_objects["2"],
+            "The build item refers to the only object.")
+        self.assertEqual(metadata["Title"].value, "Streamed", "The metadata of the document must have been read.")
+
+    def test_read_model_streaming_mesh(self):
+        """
+        Tests reading meshes incrementally, where the vertices and triangles are read straight from the parser.
+
+        The resulting mesh must be the same as when the object is read from a complete element, including materials and
+        the handling of broken vertices and triangles.
+        """
+        self.importer.build_object = unittest.mock.MagicMock()  # Don't build anything.
+        object_xml = """<object id="2" pid="1" pindex="0">
+            <mesh>
+                <vertices>
+                    <vertex x="0" y="0" z="0" /><vertex x="1.5" y="0" z="0" /><vertex x="0" y="broken" />
+                </vertices>
+                <triangles>
+                    <triangle v1="0" v2="1" v3="2" />
+                    <triangle v1="2" v2="1" v3="0" p1="1" />
+                    <triangle v1="0" v2="-1" v3="2" />
+                    <triangle v1="0" v2="2" />
+                    <triangle v1="1" v2="2" v3="0" />
+                </triangles>
+            </mesh>
+        </object>"""
+        document = f"""<?xml version="1.0" encoding="UTF-8"?>
+<model xmlns="{MODEL_NAMESPACE}" unit="millimeter">
+    <resources>
+        <basematerials id="1">
+            <base name="PLA" displaycolor="#FF0000" /><base name="PETG" displaycolor="#00FF00" />
+        </basematerials>
+        {object_xml}
+    </resources>
+    <build />
+</model>"""
+
+        self.importer.read_model_streaming(
+            self.streaming_context(),
+            "streamed.3mf",
+            io.BytesIO(document.encode("UTF-8")),
+            Metadata())
+        streamed = self.importer.resource_objects["2"]
+        self.importer.read_object(xml.etree.ElementTree.fromstring(
+            f"<object xmlns=\"{MODEL_NAMESPACE}\"" + object_xml[len("<object"):]))
+        complete = self.importer.resource_objects["2"]
+
+        self.assertListEqual(streamed.vertices.tolist(), [[0, 0, 0], [1.5, 0, 0], [0, 0, 0]])
+        self.assertListEqual(
+            streamed.triangles.tolist(),
+            [[0, 1, 2], [2, 1, 0], [1, 2, 0]],
+            "The triangles with a negative or missing vertex must be left out.")
+        self.assertListEqual(
+            [material.name for material in streamed.materials],
+            ["PLA", "PETG"],
+            "The default material of the object comes first, then the overriding material.")
+        self.assertListEqual(streamed.material_indices.tolist(), [0, 1, 0])
+        self.assertListEqual(streamed.vertices.tolist(), complete.vertices.tolist())
+        self.assertListEqual(streamed.triangles.tolist(), complete.triangles.tolist())
+        self.assertListEqual(streamed.materials, complete.materials)
+        self.assertListEqual(streamed.material_indices.tolist(), complete.material_indices.tolist())
+
+    def test_read_model_streaming_mesh_foreign_elements(self):
+        """
+        Tests reading meshes incrementally that contain elements the importer doesn't know.
+
+        Those elements must be skipped, without being mistaken for vertices or triangles.
+        """
+        self.importer.build_object = unittest.mock.MagicMock()  # Don't build anything.
+        document = f"""<?xml version="1.0" encoding="UTF-8"?>
+<model xmlns="{MODEL_NAMESPACE}" xmlns:x="http://example.com/extension" unit="millimeter">
+    <resources>
+        <object id="1" x:note="kept">
+            <mesh>
+                <vertices><vertex x="1" y="2" z="3"><vertex x="4" y="5" z="6" /></vertex></vertices>
+                <x:vertices><vertex x="7" y="8" z="9" /></x:vertices>
+                <triangles><x:triangle v1="0" v2="0" v3="0" /></triangles>
+            </mesh>
+            <metadatagroup><metadata name="Description">Still read</metadata></metadatagroup>
+        </object>
+    </resources>
+    <build />
+</model>"""
+
+        self.importer.read_model_streaming(
+            self.streaming_context(),
+            "foreign.3mf",
+            io.BytesIO(document.encode("UTF-8")),
+            Metadata())
+
+        resource_object = self.importer.resource_objects["1"]
+        self.assertListEqual(resource_object.vertices.tolist(), [[1, 2, 3]], "Only the direct vertex counts.")
+        self.assertEqual(len(resource_object.triangles), 0, "The triangle is in a foreign namespace.")
+        self.assertEqual(
+            resource_object.metadata["Description"].value,
+            "Still read",
+            "Elements after the mesh must be read as usual.")
+
+    def test_read_prepared_model(self):
+        """
+        Tests reading a document that was parsed by a worker process.
+
+        The result must be the same as when reading the document in this process.
+        """
+        self.importer.build_object = unittest.mock.MagicMock()  # Record how this gets called.
+        document = f"""<?xml version="1.0" encoding="UTF-8"?>
+<model xmlns="{MODEL_NAMESPACE}" unit="millimeter">
+    <metadata name="Title">Prepared</metadata>
+    <resources>
+        <basematerials id="1"><base name="PLA" displaycolor="#FF0000" /></basematerials>
+        <object id="2" pid="1" pindex="0">
+            <mesh>
+                <vertices>
+                    <vertex x="0" y="0" z="0" /><vertex x="1" y="0" z="0" /><vertex x="0" y="1" z="0" />
+                </vertices>
+                <triangles><triangle v1="0" v2="1" v3="2" /></triangles>
+            </mesh>
+        </object>
+    </resources>
+    <build><item objectid="2" /></build>
+</model>"""
+        parser = io_mesh_3mf.model_reader.ModelParser(io_mesh_3mf.model_reader.ArchiveReader())
+        parser.parse(io.BytesIO(document.encode("UTF-8")))
+        prepared = io_mesh_3mf.model_reader.PreparedModel(root=parser.root, meshes=parser.meshes, error=None)
+
+        metadata = self.importer.read_prepared_model(self.streaming_context(), "prepared.3mf", prepared, Metadata())
+
+        resource_object = self.importer.resource_objects["2"]
+        self.assertListEqual(resource_object.vertices.tolist(), [[0, 0, 0], [1, 0, 0], [0, 1, 0]])
+        self.assertListEqual(resource_object.triangles.tolist(), [[0, 1, 2]])
+        self.assertEqual(resource_object.materials[0].name, "PLA", "The material was resolved by the worker.")
+        self.importer.build_object.assert_called_once()
+        self.assertEqual(metadata["Title"].value, "Prepared")
+
+    def test_read_prepared_model_malformed(self):
+        """
+        Tests reading a document that a worker process found to be malformed.
+        """
+        self.importer.build_object = unittest.mock.MagicMock()  # Record whether this gets called.
+        prepared = io_mesh_3mf.model_reader.PreparedModel(root=None, meshes=[], error="no element found")
+
+        metadata = Metadata()
+        self.assertIs(
+            self.importer.read_prepared_model(self.streaming_context(), "broken.3mf", prepared, metadata),
+            metadata,
+            "Nothing can be read from the document, so the metadata stays the same.")
+        self.importer.build_object.assert_not_called()
+
+    def test_read_prepared_archive(self):
+        """
+        Tests getting the files from an archive that was read by a worker process.
+
+        The messages of the worker must be reported, and the files must be sorted by the content types it found.
+        """
+        archive_path = os.path.join(self.resources_path, "only_3dmodel_file.3mf")
+        prepared = io_mesh_3mf.model_reader.PreparedArchive(
+            content_types={"3D/3dmodel.model": "Some type"},
+            models={},
+            reports=[({'WARNING'}, "Something is off")],
+            error=None)
+        self.importer.report = unittest.mock.MagicMock()
+
+        result = self.importer.read_prepared_archive(archive_path, prepared)
+
+        self.importer.report.assert_called_once_with({'WARNING'}, "Something is off")
+        self.assertListEqual(list(result.keys()), ["Some type"], "The content types of the worker must be used.")
+        self.assertEqual(result["Some type"][0].name, "3D/3dmodel.model")
+
+    def test_read_model_streaming_malformed(self):
+        """
+        Tests reading a document incrementally that turns out to be malformed halfway through.
+
+        The objects that were complete before the error must still be read, but the build can't be reached.
+        """
+        self.importer.build_object = unittest.mock.MagicMock()  # Record whether this gets called.
+        document = f"""<?xml version="1.0" encoding="UTF-8"?>
+<model xmlns="{MODEL_NAMESPACE}" unit="millimeter">
+    <resources>
+        <object id="1"><mesh><vertices><vertex x="0" y="0" z="0" /></vertices></mesh></object>
+        <object id="2"><mesh><vertices><vertex x="0" y="0" """  # Cut off in the middle of the second object.
+
+        self.importer.read_model_streaming(
+            self.streaming_context(),
+            "truncated.3mf",
+            io.BytesIO(document.encode("UTF-8")),
+            Metadata())
+
+        self.assertIn("1", self.importer.resource_objects, "The first object was complete, so it must be read.")
+        self.assertNotIn("2", self.importer.resource_objects, "The second object was never completed.")
+        self.importer.build_object.assert_not_called()  # The build was never reached.
+
     def test_is_supported_true(self):
         """
         Tests the detection of whether a document is supported.
@@ -379,7 +668,7 @@ class TestImport3MF(unittest.TestCase):
             "http://a http://a"  # Duplicates are ignored.
         ]
 
-        with unittest.mock.patch("io_mesh_3mf.import_3mf.SUPPORTED_EXTENSIONS", {"http://a", "http://b"}):
+        with unittest.mock.patch("io_mesh_3mf.model_reader.SUPPORTED_EXTENSIONS", {"http://a", "http://b"}):
             for document_requirements in supported_documents:
                 with self.subTest(document_requirements=document_requirements):
                     self.assertTrue(
@@ -397,7 +686,7 @@ class TestImport3MF(unittest.TestCase):
             "  http://c    http://a  http://d"  # Whitespace around them.
         ]
 
-        with unittest.mock.patch("io_mesh_3mf.import_3mf.SUPPORTED_EXTENSIONS", {"http://a", "http://b"}):
+        with unittest.mock.patch("io_mesh_3mf.model_reader.SUPPORTED_EXTENSIONS", {"http://a", "http://b"}):
             for document_requirements in not_supported_documents:
                 with self.subTest(document_requirements=document_requirements):
                     self.assertFalse(
@@ -924,9 +1213,9 @@ class TestImport3MF(unittest.TestCase):
         object_node = xml.etree.ElementTree.Element(f"{{{MODEL_NAMESPACE}}}object")
         xml.etree.ElementTree.SubElement(object_node, f"{{{MODEL_NAMESPACE}}}mesh")
 
-        self.assertListEqual(
-            self.importer.read_vertices(object_node),
-            [],
+        self.assertEqual(
+            len(self.importer.read_vertices(object_node)),
+            0,
             "There is no <vertices> element, so the resulting vertex list is empty.")
 
     def test_read_vertices_empty(self):
@@ -937,9 +1226,9 @@ class TestImport3MF(unittest.TestCase):
         mesh_node = xml.etree.ElementTree.SubElement(object_node, f"{{{MODEL_NAMESPACE}}}mesh")
         xml.etree.ElementTree.SubElement(mesh_node, f"{{{MODEL_NAMESPACE}}}vertices")
 
-        self.assertListEqual(
-            self.importer.read_vertices(object_node),
-            [],
+        self.assertEqual(
+            len(self.importer.read_vertices(object_node)),
+            0,
             "There are no vertices in the <vertices> element, so the resulting vertex list is empty.")
 
     def test_read_vertices_multiple(self):
@@ -961,8 +1250,8 @@ class TestImport3MF(unittest.TestCase):
             vertex_node.attrib["z"] = str(vertex[2])
 
         self.assertListEqual(
-            self.importer.read_vertices(object_node),
-            vertices,
+            self.importer.read_vertices(object_node).tolist(),
+            [list(vertex) for vertex in vertices],
             "The outcome must be the same vertices as what went into the XML document.")
 
     def test_read_vertices_missing_coordinates(self):
@@ -978,10 +1267,11 @@ class TestImport3MF(unittest.TestCase):
         # Don't write a Y value.
         vertex_node.attrib["z"] = "6.9"
 
-        self.assertListEqual(
+        numpy.testing.assert_allclose(
             self.importer.read_vertices(object_node),
             [(13.37, 0, 6.9)],
-            "The Y value must be defaulting to 0, since it was missing.")
+            rtol=1e-6,
+            err_msg="The Y value must be defaulting to 0, since it was missing.")
 
     def test_read_vertices_broken_coordinates(self):
         """
@@ -997,8 +1287,8 @@ class TestImport3MF(unittest.TestCase):
         vertex_node.attrib["z"] = "over there"  # Doesn't parse to a float either.
 
         self.assertListEqual(
-            self.importer.read_vertices(object_node),
-            [(42, 0, 0)],
+            self.importer.read_vertices(object_node).tolist(),
+            [[42, 0, 0]],
             "The Y value defaults to 0 due to using comma as decimal separator. "
             "The Z value defaults to 0 due to not being a float at all.")
 
@@ -1009,10 +1299,10 @@ class TestImport3MF(unittest.TestCase):
         object_node = xml.etree.ElementTree.Element(f"{{{MODEL_NAMESPACE}}}object")
         xml.etree.ElementTree.SubElement(object_node, f"{{{MODEL_NAMESPACE}}}mesh")
 
-        triangles, _ = self.importer.read_triangles(object_node, None, "")
-        self.assertListEqual(
-            triangles,
-            [],
+        triangles, _, _ = self.importer.read_triangles(object_node, None, "")
+        self.assertEqual(
+            len(triangles),
+            0,
             "There is no <triangles> element, so the resulting triangle list is empty.")
 
     def test_read_triangles_empty(self):
@@ -1023,10 +1313,10 @@ class TestImport3MF(unittest.TestCase):
         mesh_node = xml.etree.ElementTree.SubElement(object_node, f"{{{MODEL_NAMESPACE}}}mesh")
         xml.etree.ElementTree.SubElement(mesh_node, f"{{{MODEL_NAMESPACE}}}triangles")
 
-        triangles, _ = self.importer.read_triangles(object_node, None, "")
-        self.assertListEqual(
-            triangles,
-            [],
+        triangles, _, _ = self.importer.read_triangles(object_node, None, "")
+        self.assertEqual(
+            len(triangles),
+            0,
             "There are no triangles in the <triangles> element, so the resulting triangle list is empty.")
 
     def test_read_triangles_multiple(self):
@@ -1046,10 +1336,10 @@ class TestImport3MF(unittest.TestCase):
             triangle_node.attrib["v2"] = str(triangle[1])
             triangle_node.attrib["v3"] = str(triangle[2])
 
-        reconstructed_triangles, _ = self.importer.read_triangles(object_node, None, "")
+        reconstructed_triangles, _, _ = self.importer.read_triangles(object_node, None, "")
         self.assertListEqual(
-            reconstructed_triangles,
-            triangles,
+            reconstructed_triangles.tolist(),
+            [list(triangle) for triangle in triangles],
             "The outcome must be the same triangles as what we put in.")
 
     def test_read_triangles_missing_vertex(self):
@@ -1066,8 +1356,8 @@ class TestImport3MF(unittest.TestCase):
         triangle_node.attrib["v2"] = "2"
         # Leave out v3. It's missing then.
 
-        triangles, _ = self.importer.read_triangles(object_node, None, "")
-        self.assertListEqual(triangles, [], "The only triangle was invalid, so the output should have no triangles.")
+        triangles, _, _ = self.importer.read_triangles(object_node, None, "")
+        self.assertEqual(len(triangles), 0, "The only triangle was invalid, so the output should have no triangles.")
 
     def test_read_triangles_broken_vertex(self):
         """
@@ -1098,8 +1388,119 @@ class TestImport3MF(unittest.TestCase):
         # Doesn't parse as integer! Should make the triangle go missing.
         invalid_index_triangle_node.attrib["v3"] = "doodie"
 
-        triangles, _ = self.importer.read_triangles(object_node, None, "")
-        self.assertListEqual(triangles, [], "All triangles are invalid, so the output should have no triangles.")
+        triangles, _, material_indices = self.importer.read_triangles(object_node, None, "")
+        triangles, _ = self.importer.validate_triangles(10, triangles, material_indices)
+        self.assertEqual(len(triangles), 0, "All triangles are invalid, so the output should have no triangles.")
+
+    def test_read_triangles_huge_index(self):
+        """
+        Tests reading a triangle with a vertex index that is too big to store.
+        """
+        object_node = xml.etree.ElementTree.Element(f"{{{MODEL_NAMESPACE}}}object")
+        mesh_node = xml.etree.ElementTree.SubElement(object_node, f"{{{MODEL_NAMESPACE}}}mesh")
+        triangles_node = xml.etree.ElementTree.SubElement(mesh_node, f"{{{MODEL_NAMESPACE}}}triangles")
+        xml.etree.ElementTree.SubElement(
+            triangles_node,
+            f"{{{MODEL_NAMESPACE}}}triangle",
+            attrib={"v1": "0", "v2": "99999999999", "v3": "2"})
+
+        triangles, _, _ = self.importer.read_triangles(object_node, None, "")
+
+        self.assertEqual(len(triangles), 0, "The triangle must be left out.")
+        self.assertEqual(
+            self.importer.diagnostics.summary("Object 1"),
+            "Object 1 has 1 triangles with a vertex index out of range (0 99999999999 2)")
+
+    def test_validate_triangles(self):
+        """
+        Tests leaving out the triangles that refer to vertices that don't exist, or to the same vertex twice.
+
+        The material indices of the triangles that are left out must be left out as well.
+        """
+        triangles = numpy.array([
+            (0, 1, 2),
+            (0, -1, 2),  # Negative.
+            (1, 2, 3),
+            (2, 3, 4),  # Vertex 4 doesn't exist.
+            (3, 1, 3),  # Degenerate.
+        ], dtype=numpy.int32)
+        material_indices = numpy.array([0, 1, 2, 3, 4], dtype=numpy.int16)
+
+        triangles, material_indices = self.importer.validate_triangles(4, triangles, material_indices)
+
+        self.assertListEqual(triangles.tolist(), [[0, 1, 2], [1, 2, 3]])
+        self.assertListEqual(material_indices.tolist(), [0, 2])
+        self.assertEqual(self.importer.diagnostics.summary("Object 1"), "Object 1 has "
+                         "1 triangles with a negative vertex index (0 -1 2); "
+                         "1 triangles with a vertex index out of range (2 3 4); "
+                         "1 degenerate triangles (3 1 3)")
+
+    def test_validate_triangles_many_examples(self):
+        """
+        Tests validating many broken triangles, of which only the first few must be formatted as examples.
+        """
+        triangles = numpy.tile(numpy.array([(0, 1, 5)], dtype=numpy.int32), (1000, 1))  # Vertex 5 doesn't exist.
+        self.importer.diagnostics.add_many = unittest.mock.MagicMock()
+
+        result, _ = self.importer.validate_triangles(4, triangles, None)
+
+        self.assertEqual(len(result), 0, "All triangles are broken.")
+        calls = {call.args[0]: call.args[1:] for call in self.importer.diagnostics.add_many.call_args_list}
+        count, examples = calls["triangles with a vertex index out of range"]
+        self.assertEqual(count, 1000, "All broken triangles must be counted.")
+        self.assertListEqual(list(examples), ["0 1 5"] * self.importer.diagnostics.examples,
+                             "Only as many triangles as are shown must be formatted.")
+
+    def test_validate_triangles_valid(self):
+        """
+        Tests validating triangles that are all valid, which must not copy them.
+        """
+        triangles = numpy.array([(0, 1, 2), (2, 1, 0)], dtype=numpy.int32)
+
+        result, material_indices = self.importer.validate_triangles(3, triangles, None)
+
+        self.assertIs(result, triangles)
+        self.assertIsNone(material_indices)
+        self.assertIsNone(self.importer.diagnostics.summary("Object 1"), "There were no problems.")
+
+    def test_read_object_diagnostics(self):
+        """
+        Tests that the problems in the mesh of an object are reported in a single message per object.
+        """
+        object_node = xml.etree.ElementTree.Element(f"{{{MODEL_NAMESPACE}}}object", attrib={"id": "7"})
+        mesh_node = xml.etree.ElementTree.SubElement(object_node, f"{{{MODEL_NAMESPACE}}}mesh")
+        triangles_node = xml.etree.ElementTree.SubElement(mesh_node, f"{{{MODEL_NAMESPACE}}}triangles")
+        for index in range(5):
+            xml.etree.ElementTree.SubElement(
+                triangles_node,
+                f"{{{MODEL_NAMESPACE}}}triangle",
+                attrib={"v1": "0", "v2": str(-index - 1), "v3": "2"})
+        self.importer.report = unittest.mock.MagicMock()
+
+        self.importer.read_object(object_node)
+
+        self.importer.report.assert_called_once_with(
+            {'WARNING'},
+            "Object 7 has 5 triangles with a negative vertex index (0 -1 2, 0 -2 2, 0 -3 2, ...)")
+        self.assertIsNone(self.importer.diagnostics.summary("Object 8"), "The problems must be reported only once.")
+
+    def test_read_triangles_strict(self):
+        """
+        Tests reading a broken triangle in strict mode.
+
+        The import must be aborted, rather than the triangle being left out.
+        """
+        object_node = xml.etree.ElementTree.Element(f"{{{MODEL_NAMESPACE}}}object")
+        mesh_node = xml.etree.ElementTree.SubElement(object_node, f"{{{MODEL_NAMESPACE}}}mesh")
+        triangles_node = xml.etree.ElementTree.SubElement(mesh_node, f"{{{MODEL_NAMESPACE}}}triangles")
+        xml.etree.ElementTree.SubElement(
+            triangles_node,
+            f"{{{MODEL_NAMESPACE}}}triangle",
+            attrib={"v1": "0", "v2": "1"})
+        self.importer.diagnostics = io_mesh_3mf.diagnostics.Diagnostics(strict=True)
+
+        with self.assertRaises(io_mesh_3mf.diagnostics.MeshDataError):
+            self.importer.read_triangles(object_node, None, "")
 
     def test_read_triangles_default_material(self):
         """
@@ -1118,12 +1519,13 @@ class TestImport3MF(unittest.TestCase):
         default_material = io_mesh_3mf.import_3mf.ResourceMaterial(name="PLA", color=None)
         self.importer.resource_materials["material-set"] = {1: default_material}
 
-        _, materials = self.importer.read_triangles(object_node, default_material, "")
+        _, materials, material_indices = self.importer.read_triangles(object_node, default_material, "")
 
         self.assertListEqual(
             materials,
             [default_material],
             "Since the triangle doesn't specify any material or index, it should use the default material.")
+        self.assertIsNone(material_indices, "All triangles use the default material, so no indices are necessary.")
 
     def test_read_triangles_default_pindex(self):
         """
@@ -1146,13 +1548,14 @@ class TestImport3MF(unittest.TestCase):
             1: default_material
         }
 
-        _, materials = self.importer.read_triangles(object_node, default_material, "")
+        _, materials, material_indices = self.importer.read_triangles(object_node, default_material, "")
 
         self.assertListEqual(
             materials,
             [default_material],
             "It specifies a PID but not an index, so it should still use the default material "
             "(even if that material is not in the specified group.")
+        self.assertIsNone(material_indices, "All triangles use the default material, so no indices are necessary.")
 
     def test_read_triangles_default_pid(self):
         """
@@ -1177,12 +1580,13 @@ class TestImport3MF(unittest.TestCase):
         }
 
         # Supply a default PID. It should use the indices from the triangles to reference to this PID.
-        _, materials = self.importer.read_triangles(object_node, default_material, "material-set")
+        _, materials, material_indices = self.importer.read_triangles(object_node, default_material, "material-set")
 
         self.assertListEqual(
             materials,
-            [correct_material],
+            [default_material, correct_material],
             "It specifies an index but not a PID, so it should use the PID from the object.")
+        self.assertListEqual(material_indices.tolist(), [1], "The triangle must refer to the correct material.")
 
     def test_read_triangles_material_override(self):
         """
@@ -1210,12 +1614,48 @@ class TestImport3MF(unittest.TestCase):
         }
 
         # Supply a default PID. It should use the indices from the triangles to reference to this PID.
-        _, materials = self.importer.read_triangles(object_node, default_material, "material-set")
+        _, materials, material_indices = self.importer.read_triangles(object_node, default_material, "material-set")
 
         self.assertListEqual(
             materials,
-            [correct_material],
+            [default_material, correct_material],
             "The material PID is overridden so it should use a different group of materials now.")
+        self.assertListEqual(material_indices.tolist(), [1], "The triangle must refer to the correct material.")
+
+    def test_read_triangles_mixed_materials(self):
+        """
+        Tests reading triangles where only some of the triangles deviate from the default material.
+
+        The triangles before the first deviating triangle must still get the index of the default material.
+        """
+        object_node = xml.etree.ElementTree.Element(f"{{{MODEL_NAMESPACE}}}object")
+        mesh_node = xml.etree.ElementTree.SubElement(object_node, f"{{{MODEL_NAMESPACE}}}mesh")
+        triangles_node = xml.etree.ElementTree.SubElement(mesh_node, f"{{{MODEL_NAMESPACE}}}triangles")
+        for p1 in [None, None, "1", None, "2", "1"]:
+            attrib = {"v1": "1", "v2": "2", "v3": "3"}
+            if p1 is not None:
+                attrib["p1"] = p1
+            xml.etree.ElementTree.SubElement(triangles_node, f"{{{MODEL_NAMESPACE}}}triangle", attrib=attrib)
+        default_material = io_mesh_3mf.import_3mf.ResourceMaterial(name="PLA", color=None)
+        red_material = io_mesh_3mf.import_3mf.ResourceMaterial(name="Red", color=None)
+        blue_material = io_mesh_3mf.import_3mf.ResourceMaterial(name="Blue", color=None)
+        self.importer.resource_materials["material-set"] = {
+            0: default_material,
+            1: red_material,
+            2: blue_material
+        }
+
+        _, materials, material_indices = self.importer.read_triangles(object_node, default_material, "material-set")
+
+        self.assertListEqual(
+            materials,
+            [default_material, red_material, blue_material],
+            "Each distinct material must be listed once, with the default material first.")
+        self.assertEqual(material_indices.dtype, numpy.int16, "Material indices are stored as 16-bit integers.")
+        self.assertListEqual(
+            material_indices.tolist(),
+            [0, 0, 1, 0, 2, 1],
+            "Each triangle must refer to its material, including the triangles before the first deviating one.")
 
     def test_read_material_index_out_of_range(self):
         """
@@ -1238,13 +1678,14 @@ class TestImport3MF(unittest.TestCase):
         }
 
         # Supply a default PID. It should use the indices from the triangles to reference to this PID.
-        _, materials = self.importer.read_triangles(object_node, default_material, "material-set")
+        _, materials, material_indices = self.importer.read_triangles(object_node, default_material, "material-set")
 
         self.assertListEqual(
             materials,
             [default_material],
             "The material index in p1 was way out of range for the 'material-set' group of materials, "
             "so it should use the default instead.")
+        self.assertIsNone(material_indices, "All triangles use the default material, so no indices are necessary.")
 
     def test_read_material_index_malformed(self):
         """
@@ -1267,12 +1708,13 @@ class TestImport3MF(unittest.TestCase):
         }
 
         # Supply a default PID. It should use the indices from the triangles to reference to this PID.
-        _, materials = self.importer.read_triangles(object_node, default_material, "material-set")
+        _, materials, material_indices = self.importer.read_triangles(object_node, default_material, "material-set")
 
         self.assertListEqual(
             materials,
             [default_material],
             "The material index in p1 was not integer, so it should revert to the default.")
+        self.assertIsNone(material_indices, "All triangles use the default material, so no indices are necessary.")
 
     def test_read_components_missing(self):
         """
@@ -1356,13 +1798,13 @@ class TestImport3MF(unittest.TestCase):
 
         result = self.importer.read_components(object_node)
         self.assertEqual(len(result), 2, "We put two components in, both valid, so we must get two components out.")
-        self.assertEqual(
+        numpy.testing.assert_array_equal(
             result[0].transformation,
-            mathutils.Matrix.Identity(4),
+            numpy.identity(4),
             "The transformation of the first element is missing, so it must be the identity matrix.")
-        self.assertEqual(
+        numpy.testing.assert_array_equal(
             result[1].transformation,
-            mathutils.Matrix.Scale(2.0, 4),
+            numpy.diag([2.0, 2.0, 2.0, 1.0]),
             "The transformation of the second element was a factor-2 scale.")
 
     def test_parse_transformation_empty(self):
@@ -1371,9 +1813,9 @@ class TestImport3MF(unittest.TestCase):
 
         It should result in the identity matrix then.
         """
-        self.assertEqual(
+        numpy.testing.assert_array_equal(
             self.importer.parse_transformation(""),
-            mathutils.Matrix.Identity(4),
+            numpy.identity(4),
             "Any missing elements are filled from the identity matrix, "
             "so if everything is missing everything is identity.")
 
@@ -1384,8 +1826,8 @@ class TestImport3MF(unittest.TestCase):
         The missing parts should get filled in with the identity matrix then.
         """
         transform_str = "1.1 1.2 1.3 2.1 2.2"  # Fill in only 5 of the cells.
-        ground_truth = mathutils.Matrix([[1.1, 2.1, 0, 0], [1.2, 2.2, 0, 0], [1.3, 0, 1, 0], [0, 0, 0, 1]])
-        self.assertEqual(
+        ground_truth = numpy.array([[1.1, 2.1, 0, 0], [1.2, 2.2, 0, 0], [1.3, 0, 1, 0], [0, 0, 0, 1]])
+        numpy.testing.assert_array_equal(
             self.importer.parse_transformation(transform_str),
             ground_truth,
             "Any missing elements are filled from the identity matrix.")
@@ -1395,12 +1837,12 @@ class TestImport3MF(unittest.TestCase):
         Tests parsing a transformation matrix containing elements that are not proper floats.
         """
         transform_str = "1.1 1.2 1.3 2.1 lead 2.3 3.1 3.2 3.3 4.1 4.2 4.3"
-        ground_truth = mathutils.Matrix([
+        ground_truth = numpy.array([
             [1.1, 2.1, 3.1, 4.1],
             [1.2, 1.0, 3.2, 4.2],  # Cell 2,2 is replaced with the value in the Identity matrix there (1.0).
             [1.3, 2.3, 3.3, 4.3],
             [0, 0, 0, 1]])
-        self.assertEqual(
+        numpy.testing.assert_array_equal(
             self.importer.parse_transformation(transform_str),
             ground_truth,
             "Any invalid elements are filled from the identity matrix.")
@@ -1413,7 +1855,7 @@ class TestImport3MF(unittest.TestCase):
         self.importer.build_object = unittest.mock.MagicMock()
         root = xml.etree.ElementTree.Element(f"{{{MODEL_NAMESPACE}}}model")
 
-        self.importer.build_items(root, 1.0)
+        self.importer.build_items(self.importer.read_build_items(root, 1.0))
 
         # There are no items, so we shouldn't build any object resources.
         self.importer.build_object.assert_not_called()
@@ -1428,7 +1870,7 @@ class TestImport3MF(unittest.TestCase):
         xml.etree.ElementTree.SubElement(root, f"{{{MODEL_NAMESPACE}}}build")
         # <build> element left empty.
 
-        self.importer.build_items(root, 1.0)
+        self.importer.build_items(self.importer.read_build_items(root, 1.0))
 
         # There are no items, so we shouldn't build any object resources.
         self.importer.build_object.assert_not_called()
@@ -1454,21 +1896,16 @@ class TestImport3MF(unittest.TestCase):
         itemananas_element = xml.etree.ElementTree.SubElement(build_element, f"{{{MODEL_NAMESPACE}}}item")
         itemananas_element.attrib["objectid"] = "ananas"
 
-        self.importer.build_items(root, 1.0)
+        self.importer.build_items(self.importer.read_build_items(root, 1.0))
 
-        expected_args_list = [
-            unittest.mock.call(self.importer.resource_objects["1"], mathutils.Matrix.Identity(4), Metadata(), ["1"]),
-            unittest.mock.call(self.importer.resource_objects["2"], mathutils.Matrix.Identity(4), Metadata(), ["2"]),
-            unittest.mock.call(
-                self.importer.resource_objects["ananas"],
-                mathutils.Matrix.Identity(4),
-                Metadata(),
-                ["ananas"])
-        ]
-        self.assertListEqual(
-            self.importer.build_object.call_args_list,
-            expected_args_list,
-            "We must build these three objects with their correct transformations and object IDs.")
+        calls = self.importer.build_object.call_args_list
+        self.assertEqual(len(calls), 3, "We must build all three objects.")
+        for call, objectid in zip(calls, ["1", "2", "ananas"]):
+            resource_object, transformation, metadata, objectid_stack_trace = call.args
+            self.assertEqual(resource_object, self.importer.resource_objects[objectid])
+            numpy.testing.assert_array_equal(transformation, numpy.identity(4), "None of the items are transformed.")
+            self.assertEqual(metadata, Metadata())
+            self.assertEqual(objectid_stack_trace, [objectid])
 
     def test_build_items_nonexistent(self):
         """
@@ -1482,7 +1919,7 @@ class TestImport3MF(unittest.TestCase):
         item_element = xml.etree.ElementTree.SubElement(build_element, f"{{{MODEL_NAMESPACE}}}item")
         item_element.attrib["objectid"] = "bombosity"  # Object ID doesn't exist.
 
-        self.importer.build_items(root, 1.0)
+        self.importer.build_items(self.importer.read_build_items(root, 1.0))
 
         self.importer.build_object.assert_not_called()  # It was never called because the resource ID can't be found.
 
@@ -1499,13 +1936,14 @@ class TestImport3MF(unittest.TestCase):
         item_element = xml.etree.ElementTree.SubElement(build_element, f"{{{MODEL_NAMESPACE}}}item")
         item_element.attrib["objectid"] = "1"
 
-        self.importer.build_items(root, 2.5)  # Build with a unit scale of 250%.
+        self.importer.build_items(self.importer.read_build_items(root, 2.5))  # Build with a unit scale of 250%.
 
-        self.importer.build_object.assert_called_once_with(
-            self.single_triangle,
-            mathutils.Matrix.Scale(2.5, 4),
-            Metadata(),
-            ["1"])
+        self.importer.build_object.assert_called_once()
+        resource_object, transformation, metadata, objectid_stack_trace = self.importer.build_object.call_args.args
+        self.assertEqual(resource_object, self.single_triangle)
+        numpy.testing.assert_array_equal(transformation, numpy.diag([2.5, 2.5, 2.5, 1.0]))
+        self.assertEqual(metadata, Metadata())
+        self.assertEqual(objectid_stack_trace, ["1"])
 
     def test_build_items_transformed(self):
         """
@@ -1521,16 +1959,20 @@ class TestImport3MF(unittest.TestCase):
         item_element.attrib["objectid"] = "1"
         item_element.attrib["transform"] = "1 0 0 0 1 0 0 0 1 30 40 0"
 
-        self.importer.build_items(root, 0.5)  # Build with a unit scale of 50%.
+        self.importer.build_items(self.importer.read_build_items(root, 0.5))  # Build with a unit scale of 50%.
 
         # Both transformation must be applied (and in correct order).
-        expected_transformation = mathutils.Matrix.Scale(0.5, 4) @\
-            mathutils.Matrix.Translation(mathutils.Vector([30, 40, 0]))
-        self.importer.build_object.assert_called_once_with(
-            self.single_triangle,
-            expected_transformation,
-            Metadata(),
-            ["1"])
+        expected_transformation = numpy.array([
+            [0.5, 0, 0, 15],
+            [0, 0.5, 0, 20],
+            [0, 0, 0.5, 0],
+            [0, 0, 0, 1]])
+        self.importer.build_object.assert_called_once()
+        resource_object, transformation, metadata, objectid_stack_trace = self.importer.build_object.call_args.args
+        self.assertEqual(resource_object, self.single_triangle)
+        numpy.testing.assert_array_equal(transformation, expected_transformation)
+        self.assertEqual(metadata, Metadata())
+        self.assertEqual(objectid_stack_trace, ["1"])
 
     def test_build_items_metadata(self):
         """
@@ -1556,7 +1998,8 @@ class TestImport3MF(unittest.TestCase):
         title_element.attrib["name"] = "Title"
         title_element.text = "Lead Potato Engineer"
 
-        self.importer.build_items(root, 1.0)  # Build the item, executing the code under test.
+        # Build the item, executing the code under test.
+        self.importer.build_items(self.importer.read_build_items(root, 1.0))
 
         expected_metadata = Metadata()
         expected_metadata["3mf:partnumber"] = MetadataEntry(
@@ -1569,30 +2012,174 @@ class TestImport3MF(unittest.TestCase):
             preserve=False,
             datatype="",
             value="Lead Potato Engineer")
-        self.importer.build_object.assert_called_once_with(
-            self.single_triangle,
-            mathutils.Matrix.Identity(4),
-            expected_metadata, ["1"])
+        self.importer.build_object.assert_called_once()
+        resource_object, transformation, metadata, objectid_stack_trace = self.importer.build_object.call_args.args
+        self.assertEqual(resource_object, self.single_triangle)
+        numpy.testing.assert_array_equal(transformation, numpy.identity(4))
+        self.assertEqual(metadata, expected_metadata)
+        self.assertEqual(objectid_stack_trace, ["1"])
 
     def test_build_object_mesh_data(self):
         """
         Tests whether building a single object results in correct mesh data.
         """
-        transformation = mathutils.Matrix.Identity(4)
+        transformation = numpy.identity(4)
         objectid_stack_trace = ["1"]
         self.importer.build_object(self.single_triangle, transformation, Metadata(), objectid_stack_trace)
 
         # Now look whether the result is put correctly in the context.
         bpy.data.meshes.new.assert_called_once()  # Exactly one mesh must have been created.
         mesh_mock = bpy.data.meshes.new()  # This is the mock object that the code got back from the Blender API call.
-        # The mesh must be provided with correct vertex and triangle data.
-        mesh_mock.from_pydata.assert_called_once_with(self.single_triangle.vertices, [], self.single_triangle.triangles)
+        # The mesh must be provided with correct vertex and triangle data, in bulk.
+        mesh_mock.vertices.add.assert_called_once_with(3)
+        mesh_mock.loops.add.assert_called_once_with(3)
+        mesh_mock.polygons.add.assert_called_once_with(1)
+        attribute, coordinates = mesh_mock.vertices.foreach_set.call_args[0]
+        self.assertEqual(attribute, "co", "The coordinates of the vertices must be set.")
+        self.assertListEqual(coordinates.tolist(), [0.0, 0.0, 0.0, 5.0, 0.0, 1.0, 0.0, 5.0, 1.0])
+        attribute, indices = mesh_mock.loops.foreach_set.call_args[0]
+        self.assertEqual(attribute, "vertex_index", "The loops must refer to the vertices of the triangles.")
+        self.assertListEqual(indices.tolist(), [0, 1, 2])
+        attribute, loop_starts = mesh_mock.polygons.foreach_set.call_args[0]
+        self.assertEqual(attribute, "loop_start", "Each triangle must start at the correct loop.")
+        self.assertListEqual(loop_starts.tolist(), [0])
+
+    def test_build_object_default_material(self):
+        """
+        Tests building an object where all triangles use the default material of the object.
+
+        No material indices need to be assigned to the triangles then.
+        """
+        material = io_mesh_3mf.import_3mf.ResourceMaterial(name="PLA", color=(1.0, 0.5, 0.0, 1.0))
+        resource_object = self.single_triangle._replace(materials=[material])
+        self.importer.build_object(resource_object, numpy.identity(4), Metadata(), ["1"])
+
+        mesh_mock = bpy.data.meshes.new()
+        mesh_mock.materials.append.assert_called_once_with(self.importer.resource_to_material[material])
+        for call in mesh_mock.polygons.foreach_set.call_args_list:
+            self.assertNotEqual(call[0][0], "material_index", "All triangles already use material index 0.")
+
+    def test_build_object_material_indices(self):
+        """
+        Tests building an object where triangles use different materials.
+
+        The material indices must be assigned to all triangles at once.
+        """
+        red_material = io_mesh_3mf.import_3mf.ResourceMaterial(name="Red", color=(1.0, 0.0, 0.0, 1.0))
+        blue_material = io_mesh_3mf.import_3mf.ResourceMaterial(name="Blue", color=(0.0, 0.0, 1.0, 1.0))
+        resource_object = self.single_triangle._replace(
+            vertices=numpy.array([(0, 0, 0), (1, 0, 0), (0, 1, 0), (1, 1, 0)], dtype=numpy.float32),
+            triangles=numpy.array([(0, 1, 2), (1, 3, 2)], dtype=numpy.int32),
+            materials=[red_material, blue_material],
+            material_indices=numpy.array([1, 0], dtype=numpy.int16))
+        self.importer.build_object(resource_object, numpy.identity(4), Metadata(), ["1"])
+
+        mesh_mock = bpy.data.meshes.new()
+        self.assertEqual(mesh_mock.materials.append.call_count, 2, "Both materials must be added to the mesh.")
+        material_index_calls = [call[0] for call in mesh_mock.polygons.foreach_set.call_args_list
+                                if call[0][0] == "material_index"]
+        self.assertEqual(len(material_index_calls), 1, "The material indices must be set in a single call.")
+        self.assertListEqual(material_index_calls[0][1].tolist(), [1, 0])
+
+    def existing_material(self, name, color):
+        """
+        Adds a material to the Blender data, as if it existed before the import.
+        :param name: The name of the material.
+        :param color: The RGBA color of the material.
+        :return: The material.
+        """
+        material = unittest.mock.MagicMock(use_nodes=False, diffuse_color=color)
+        material.name = name  # The name of a mock can't be given to the constructor.
+        materials = list(bpy.data.materials) + [material]
+        bpy.data.materials.__iter__.side_effect = lambda: iter(materials)
+        return material
+
+    def test_find_material_reuse(self):
+        """
+        Tests finding an existing material with the same name and color.
+
+        The numbered suffix that Blender gives to materials with the same name must be ignored.
+        """
+        self.existing_material("PLA", (0.0, 0.0, 1.0, 1.0))  # Same name, different color.
+        existing = self.existing_material("PLA.001", (1.0, 0.0, 0.0, 1.0))
+
+        material = self.importer.find_material(io_mesh_3mf.import_3mf.ResourceMaterial("PLA", (1.0, 0.0, 0.0, 1.0)))
+
+        self.assertIs(material, existing)
+        bpy.data.materials.new.assert_not_called()
+
+    def test_find_material_reuse_new(self):
+        """
+        Tests finding a material that doesn't exist yet.
+
+        It must be created once, and reused by later files.
+        """
+        self.existing_material("PLA", (1.0, 0.0, 0.0, 1.0))
+        resource_material = io_mesh_3mf.import_3mf.ResourceMaterial("PETG", (1.0, 0.0, 0.0, 1.0))  # Different name.
+
+        first = self.importer.find_material(resource_material)
+        second = self.importer.find_material(resource_material)
+
+        self.assertIs(first, bpy.data.materials.new.return_value, "There was no material with the same name yet.")
+        self.assertIs(second, first)
+        bpy.data.materials.new.assert_called_once_with("PETG")
+
+    def test_find_material_color(self):
+        """
+        Tests finding an existing material with the same color, but a different name.
+        """
+        self.importer.material_reuse = "COLOR"
+        existing = self.existing_material("Red", (1.0, 0.0, 0.0, 1.0))
+
+        material = self.importer.find_material(io_mesh_3mf.import_3mf.ResourceMaterial("PLA", (1.0, 0.0, 0.0, 1.0)))
+
+        self.assertIs(material, existing)
+        bpy.data.materials.new.assert_not_called()
+
+    def test_find_material_new(self):
+        """
+        Tests always creating new materials, even if they exist already.
+        """
+        self.importer.material_reuse = "NEW"
+        self.existing_material("PLA", (1.0, 0.0, 0.0, 1.0))
+
+        material = self.importer.find_material(io_mesh_3mf.import_3mf.ResourceMaterial("PLA", (1.0, 0.0, 0.0, 1.0)))
+
+        self.assertIs(material, bpy.data.materials.new.return_value)
+        bpy.data.materials.new.assert_called_once_with("PLA")
+
+    def test_build_object_shared_mesh(self):
+        """
+        Tests building the same resource object multiple times.
+
+        The mesh must be created only once, and shared by all objects.
+        """
+        self.importer.build_object(self.single_triangle, numpy.identity(4), Metadata(), ["1"])
+        self.importer.build_object(self.single_triangle, numpy.identity(4), Metadata(), ["1"])
+
+        bpy.data.meshes.new.assert_called_once()  # Only one mesh for both objects.
+        mesh_mock = bpy.data.meshes.new()
+        for call in bpy.data.objects.new.call_args_list:
+            self.assertIs(call[0][1], mesh_mock, "Both objects must link to the same mesh.")
+        self.assertEqual(bpy.data.objects.new.call_count, 2, "Each build item still gets its own object.")
+
+    def test_build_object_shared_mesh_disabled(self):
+        """
+        Tests building the same resource object multiple times when sharing mesh data is disabled.
+
+        Each object must get a mesh of its own then.
+        """
+        self.importer.use_instancing = False
+        self.importer.build_object(self.single_triangle, numpy.identity(4), Metadata(), ["1"])
+        self.importer.build_object(self.single_triangle, numpy.identity(4), Metadata(), ["1"])
+
+        self.assertEqual(bpy.data.meshes.new.call_count, 2, "Each object must get a mesh of its own.")
 
     def test_build_object_blender_object(self):
         """
         Tests whether building a single object results in a correct Blender object.
         """
-        transformation = mathutils.Matrix.Identity(4)
+        transformation = numpy.identity(4)
         objectid_stack_trace = ["1"]
         self.importer.build_object(self.single_triangle, transformation, Metadata(), objectid_stack_trace)
 
@@ -1600,36 +2187,48 @@ class TestImport3MF(unittest.TestCase):
         bpy.data.objects.new.assert_called_once()  # Exactly one object must have been created.
         # This is the mock object that the code got back from the Blender API call.
         object_mock = bpy.data.objects.new()
-        self.assertEqual(
+        numpy.testing.assert_array_equal(
             object_mock.matrix_world,
             transformation,
             "The transformation must be stored in the Blender object.")
         # The object must be linked to the collection.
         bpy.context.collection.objects.link.assert_called_with(object_mock)
-        self.assertEqual(bpy.context.view_layer.objects.active, object_mock, "The object must be made active.")
-        object_mock.select_set.assert_called_with(True)  # The object must be selected.
+        self.assertEqual(self.importer.imported_objects, [object_mock], "The object must be listed as imported.")
+        object_mock.select_set.assert_not_called()  # Selecting is left to the operator.
 
     def test_build_object_transformation(self):
         """
         Tests whether the object is built with the correct transformation.
         """
-        transformation = mathutils.Matrix.Scale(2.0, 4)
+        transformation = numpy.diag([2.0, 2.0, 2.0, 1.0])
         objectid_stack_trace = ["1"]
         self.importer.build_object(self.single_triangle, transformation, Metadata(), objectid_stack_trace)
 
         # Now look whether the Blender object has the correct transformation.
         # This is the mock object that the code got back from the Blender API call.
         object_mock = bpy.data.objects.new()
-        self.assertEqual(
+        numpy.testing.assert_array_equal(
             object_mock.matrix_world,
             transformation,
             "The transformation must be stored in the world matrix of the Blender object.")
 
+    def test_build_object_without_components(self):
+        """
+        Tests building an object without components, which must be placed without composing a hierarchy.
+        """
+        transformation = numpy.diag([2.0, 2.0, 2.0, 1.0])
+
+        with unittest.mock.patch("io_mesh_3mf.import_3mf.compose_transformations") as compose_transformations:
+            self.importer.build_object(self.single_triangle, transformation, Metadata(), ["1"])
+
+        compose_transformations.assert_not_called()
+        numpy.testing.assert_array_equal(bpy.data.objects.new().matrix_world, transformation)
+
     def test_build_object_parent(self):
         """
         Tests building an object with a parent.
         """
-        transformation = mathutils.Matrix.Identity(4)
+        transformation = numpy.identity(4)
         objectid_stack_trace = ["1", "2"]
         parent = unittest.mock.MagicMock()
         self.importer.build_object(self.single_triangle, transformation, Metadata(), objectid_stack_trace, parent)
@@ -1645,12 +2244,13 @@ class TestImport3MF(unittest.TestCase):
         """
         # Set up two resource objects, one referring to the other.
         with_component = io_mesh_3mf.import_3mf.ResourceObject(  # A model with an extra component.
-            vertices=[(0.0, 0.0, 0.0), (10.0, 0.0, 2.0), (0.0, 10.0, 2.0)],
-            triangles=[(0, 1, 2)],
+            vertices=numpy.array([(0.0, 0.0, 0.0), (10.0, 0.0, 2.0), (0.0, 10.0, 2.0)], dtype=numpy.float32),
+            triangles=numpy.array([(0, 1, 2)], dtype=numpy.int32),
             materials=[None],
+            material_indices=None,
             components=[io_mesh_3mf.import_3mf.Component(
                 resource_object="1",
-                transformation=mathutils.Matrix.Identity(4)
+                transformation=numpy.identity(4)
             )],
             metadata=Metadata()
         )
@@ -1664,7 +2264,7 @@ class TestImport3MF(unittest.TestCase):
         bpy.data.objects.new.side_effect = [parent_mock, child_mock]
 
         # Call the function under test.
-        transformation = mathutils.Matrix.Identity(4)
+        transformation = numpy.identity(4)
         objectid_stack_trace = ["2"]
         self.importer.build_object(with_component, transformation, Metadata(), objectid_stack_trace)
 
@@ -1685,19 +2285,20 @@ class TestImport3MF(unittest.TestCase):
         This produces an infinite recursive loop, so the component should be ignored then.
         """
         resource_object = io_mesh_3mf.import_3mf.ResourceObject(  # A model with itself as component.
-            vertices=[(0.0, 0.0, 0.0), (10.0, 0.0, 2.0), (0.0, 10.0, 2.0)],
-            triangles=[(0, 1, 2)],
+            vertices=numpy.array([(0.0, 0.0, 0.0), (10.0, 0.0, 2.0), (0.0, 10.0, 2.0)], dtype=numpy.float32),
+            triangles=numpy.array([(0, 1, 2)], dtype=numpy.int32),
             materials=[None],
+            material_indices=None,
             components=[io_mesh_3mf.import_3mf.Component(
                 resource_object="1",
-                transformation=mathutils.Matrix.Identity(4)
+                transformation=numpy.identity(4)
             )],
             metadata=Metadata()
         )
         self.importer.resource_objects["1"] = resource_object
 
         # Call the function under test.
-        transformation = mathutils.Matrix.Identity(4)
+        transformation = numpy.identity(4)
         objectid_stack_trace = ["1"]
         self.importer.build_object(resource_object, transformation, Metadata(), objectid_stack_trace)
 
@@ -1709,19 +2310,20 @@ class TestImport3MF(unittest.TestCase):
         Tests building an object with a component referring to a non-existing ID.
         """
         resource_object = io_mesh_3mf.import_3mf.ResourceObject(  # A model with itself as component.
-            vertices=[(0.0, 0.0, 0.0), (10.0, 0.0, 2.0), (0.0, 10.0, 2.0)],
-            triangles=[(0, 1, 2)],
+            vertices=numpy.array([(0.0, 0.0, 0.0), (10.0, 0.0, 2.0), (0.0, 10.0, 2.0)], dtype=numpy.float32),
+            triangles=numpy.array([(0, 1, 2)], dtype=numpy.int32),
             materials=[None],
+            material_indices=None,
             components=[io_mesh_3mf.import_3mf.Component(
                 resource_object="2",  # This object ID doesn't exist!
-                transformation=mathutils.Matrix.Identity(4)
+                transformation=numpy.identity(4)
             )],
             metadata=Metadata()
         )
         self.importer.resource_objects["1"] = resource_object
 
         # Call the function under test.
-        transformation = mathutils.Matrix.Identity(4)
+        transformation = numpy.identity(4)
         objectid_stack_trace = ["1"]
         self.importer.build_object(resource_object, transformation, Metadata(), objectid_stack_trace)
 
@@ -1736,12 +2338,13 @@ class TestImport3MF(unittest.TestCase):
         """
         # A model with a component that got transformed.
         with_transformed_component = io_mesh_3mf.import_3mf.ResourceObject(
-            vertices=[(0.0, 0.0, 0.0), (10.0, 0.0, 2.0), (0.0, 10.0, 2.0)],
-            triangles=[(0, 1, 2)],
+            vertices=numpy.array([(0.0, 0.0, 0.0), (10.0, 0.0, 2.0), (0.0, 10.0, 2.0)], dtype=numpy.float32),
+            triangles=numpy.array([(0, 1, 2)], dtype=numpy.int32),
             materials=[None],
+            material_indices=None,
             components=[io_mesh_3mf.import_3mf.Component(
                 resource_object="1",
-                transformation=mathutils.Matrix.Scale(2.0, 4)
+                transformation=numpy.diag([2.0, 2.0, 2.0, 1.0])
             )],
             metadata=Metadata()
         )
@@ -1755,13 +2358,223 @@ class TestImport3MF(unittest.TestCase):
         bpy.data.objects.new.side_effect = [parent_mock, child_mock]
 
         # Call the function under test.
-        transformation = mathutils.Matrix.Translation(mathutils.Vector([100.0, 0.0, 0.0]))
+        transformation = numpy.identity(4)
+        transformation[0, 3] = 100.0  # Translated along X.
         objectid_stack_trace = ["2"]
         self.importer.build_object(with_transformed_component, transformation, Metadata(), objectid_stack_trace)
 
         # Test whether the objects have the correct transformations.
-        self.assertEqual(parent_mock.matrix_world, transformation, "Only the translation was applied to the parent.")
-        self.assertEqual(
+        numpy.testing.assert_array_equal(
+            parent_mock.matrix_world,
+            transformation,
+            "Only the translation was applied to the parent.")
+        numpy.testing.assert_array_equal(
             child_mock.matrix_world,
-            transformation @ mathutils.Matrix.Scale(2.0, 4),
+            transformation @ numpy.diag([2.0, 2.0, 2.0, 1.0]),
             "The child must be transformed with both the parent transform and the component's transformation.")
+
+    def test_link_objects(self):
+        """
+        Tests linking the objects of a file into a collection of their own, all at once.
+        """
+        self.importer.use_collection_per_file = True
+        with_component = self.single_triangle._replace(components=[
+            io_mesh_3mf.import_3mf.Component(resource_object="1", transformation=numpy.diag([2.0, 2.0, 2.0, 1.0]))
+        ])
+        self.importer.resource_objects["1"] = self.single_triangle
+        parent_mock = unittest.mock.MagicMock()
+        child_mock = unittest.mock.MagicMock()
+        bpy.data.objects.new.side_effect = [parent_mock, child_mock]
+        transformation = numpy.identity(4)
+        transformation[0, 3] = 100.0  # Translated along X.
+
+        self.importer.build_object(with_component, transformation, Metadata(), ["2"])
+        bpy.context.collection.objects.link.assert_not_called()  # Not linked until the whole file is built.
+
+        self.importer.link_objects(os.path.join("path", "plate.3mf"))
+
+        bpy.data.collections.new.assert_called_once_with("plate")
+        collection = bpy.data.collections.new()
+        self.assertListEqual(
+            collection.objects.link.call_args_list,
+            [unittest.mock.call(parent_mock), unittest.mock.call(child_mock)])
+        self.assertEqual(child_mock.parent, parent_mock, "The component's parent must be set to the parent object.")
+        attribute, matrices = collection.objects.foreach_set.call_args[0]
+        self.assertEqual(attribute, "matrix_world", "The world transformations must be set all at once.")
+        matrices = matrices.reshape(-1, 4, 4).transpose(0, 2, 1)  # Blender stores matrices column by column.
+        numpy.testing.assert_array_equal(matrices[0], transformation)
+        numpy.testing.assert_array_equal(matrices[1], transformation @ numpy.diag([2.0, 2.0, 2.0, 1.0]))
+        bpy.context.collection.children.link.assert_called_once_with(collection)
+        self.assertListEqual(self.importer.pending_objects, [], "All objects have been linked.")
+
+    def test_update_interface(self):
+        """
+        Tests showing the imported objects in the interface.
+
+        All imported objects must be selected, and the last one must become the active object.
+        """
+        first = unittest.mock.MagicMock()
+        last = unittest.mock.MagicMock()
+        self.importer.imported_objects = [first, last]
+        bpy.context.screen.areas = []  # No 3D views to zoom.
+
+        self.importer.update_interface(bpy.context)
+
+        first.select_set.assert_called_once_with(True)
+        last.select_set.assert_called_once_with(True)
+        self.assertEqual(bpy.context.view_layer.objects.active, last, "The last imported object must become active.")
+
+    def test_import_3mf(self):
+        """
+        Tests importing a file through the scripting function, without the operator.
+
+        The objects must be built, but not selected.
+        """
+        document = f"""<?xml version="1.0" encoding="UTF-8"?>
+<model xmlns="{MODEL_NAMESPACE}" unit="millimeter">
+    <resources>
+        <object id="1">
+            <mesh>
+                <vertices>
+                    <vertex x="0" y="0" z="0" /><vertex x="1" y="0" z="0" /><vertex x="0" y="1" z="0" />
+                </vertices>
+                <triangles><triangle v1="0" v2="1" v3="2" /></triangles>
+            </mesh>
+        </object>
+    </resources>
+    <build><item objectid="1" /></build>
+</model>"""
+        file_handle, path = tempfile.mkstemp(suffix=".3mf")
+        os.close(file_handle)
+        try:
+            with zipfile.ZipFile(path, "w") as archive:
+                archive.writestr(MODEL_LOCATION, document)
+            objects = io_mesh_3mf.import_3mf.import_3mf(path, self.streaming_context(), processes=1)
+        finally:
+            os.remove(path)
+
+        self.assertEqual(objects, [bpy.data.objects.new()], "The one build item must be imported.")
+        objects[0].select_set.assert_not_called()  # Selecting is left to the operator.
+
+    def test_import_3mf_selection(self):
+        """
+        Tests importing only some of the build items of a file.
+
+        The selected item must be built with its components. The meshes of the other objects must not be read.
+        """
+        document = f"""<?xml version="1.0" encoding="UTF-8"?>
+<model xmlns="{MODEL_NAMESPACE}" unit="millimeter">
+    <resources>
+        <object id="1">
+            <mesh>
+                <vertices>
+                    <vertex x="0" y="0" z="0" /><vertex x="1" y="0" z="0" /><vertex x="0" y="1" z="0" />
+                </vertices>
+                <triangles><triangle v1="0" v2="1" v3="2" /></triangles>
+            </mesh>
+        </object>
+        <object id="2" partnumber="Unwanted">
+            <mesh>
+                <vertices>
+                    <vertex x="0" y="0" z="0" /><vertex x="2" y="0" z="0" /><vertex x="0" y="2" z="0" />
+                </vertices>
+                <triangles><triangle v1="0" v2="1" v3="2" /></triangles>
+            </mesh>
+        </object>
+        <object id="3"><components><component objectid="1" /></components></object>
+    </resources>
+    <build><item objectid="1" /><item objectid="2" /><item objectid="3" /></build>
+</model>"""
+        file_handle, path = tempfile.mkstemp(suffix=".3mf")
+        os.close(file_handle)
+        try:
+            with zipfile.ZipFile(path, "w") as archive:
+                archive.writestr(MODEL_LOCATION, document)
+            for use_streaming in (True, False):
+                with self.subTest(use_streaming=use_streaming):
+                    bpy.data = unittest.mock.MagicMock()
+                    objects = io_mesh_3mf.import_3mf.import_3mf(
+                        path, self.streaming_context(), processes=1, use_streaming=use_streaming, item_filter="#3")
+
+                    self.assertEqual(len(objects), 2, "The third item and its component must be imported.")
+                    bpy.data.meshes.new.assert_called_once()  # Only the mesh of object 1 is needed.
+        finally:
+            os.remove(path)
+
+    def test_import_3mf_proxies(self):
+        """
+        Tests importing boxes as proxies for the objects of a file, and loading their real meshes later.
+
+        The proxies must remember where their object came from. Objects without mesh of their own get no proxy.
+        """
+        file_handle, path = tempfile.mkstemp(suffix=".3mf")
+        os.close(file_handle)
+        try:
+            with zipfile.ZipFile(path, "w") as archive:
+                archive.writestr(MODEL_LOCATION, ASSEMBLY_DOCUMENT)
+            for use_streaming in (True, False):
+                with self.subTest(use_streaming=use_streaming):
+                    bpy.data = unittest.mock.MagicMock()
+                    bpy.data.objects.new.side_effect = lambda name, mesh: BlenderObject(data=mesh)
+                    bpy.data.meshes.new.side_effect = lambda name: unittest.mock.MagicMock(users=0)
+
+                    objects = io_mesh_3mf.import_3mf.import_3mf(
+                        path, self.streaming_context(), processes=1, use_streaming=use_streaming, use_proxies=True)
+
+                    self.assertEqual(len(objects), 2)
+                    assembly, part = objects
+                    self.assertEqual(assembly, {}, "The assembly has no mesh to load.")
+                    self.assertEqual(part, {
+                        io_mesh_3mf.import_3mf.PROXY_SOURCE: os.path.abspath(path),
+                        io_mesh_3mf.import_3mf.PROXY_DOCUMENT: MODEL_LOCATION,
+                        io_mesh_3mf.import_3mf.PROXY_OBJECTID: "1",
+                    })
+                    box = part.data
+                    corners = box.vertices.foreach_set.call_args.args[1].reshape(-1, 3)
+                    numpy.testing.assert_array_equal(corners.min(axis=0), [0, 0, 0])
+                    numpy.testing.assert_array_equal(corners.max(axis=0), [4, 2, 1])
+
+                    importer = io_mesh_3mf.import_3mf.create_importer()
+                    loaded = importer.load_geometry(self.streaming_context(), objects)
+
+                    self.assertEqual(loaded, [part], "Only the proxy with a mesh is loaded.")
+                    self.assertEqual(part, {}, "A loaded object is no longer a proxy.")
+                    self.assertIsNot(part.data, box)
+                    numpy.testing.assert_array_equal(
+                        part.data.vertices.foreach_set.call_args.args[1], [0, 0, 0, 4, 0, 0, 0, 2, 1])
+                    bpy.data.meshes.remove.assert_called_once_with(box)  # Nothing else uses the box.
+        finally:
+            os.remove(path)
+
+    def test_load_geometry_operator(self):
+        """
+        Tests loading the real mesh of a proxy through the operator, which only has some of the options of the import.
+        """
+        file_handle, path = tempfile.mkstemp(suffix=".3mf")
+        os.close(file_handle)
+        try:
+            with zipfile.ZipFile(path, "w") as archive:
+                archive.writestr(MODEL_LOCATION, ASSEMBLY_DOCUMENT)
+            bpy.data = unittest.mock.MagicMock()
+            box = unittest.mock.MagicMock(users=0)
+            proxy = BlenderObject({
+                io_mesh_3mf.import_3mf.PROXY_SOURCE: path,
+                io_mesh_3mf.import_3mf.PROXY_DOCUMENT: MODEL_LOCATION,
+                io_mesh_3mf.import_3mf.PROXY_OBJECTID: "1",
+            }, data=box)
+            operator = io_mesh_3mf.import_3mf.Load3MFGeometry()
+            operator.use_instancing = True
+            operator.use_strict = False
+            operator.material_reuse = "REUSE"
+            operator.instrumentation_level = "OFF"
+            context = unittest.mock.MagicMock()
+            context.selected_objects = [proxy, BlenderObject(data=None)]  # Only the proxy is loaded.
+
+            result = operator.execute(context)
+        finally:
+            os.remove(path)
+
+        self.assertEqual(result, {"FINISHED"})
+        self.assertEqual(proxy, {}, "A loaded object is no longer a proxy.")
+        self.assertIs(proxy.data, bpy.data.meshes.new.return_value)
+        bpy.data.meshes.remove.assert_called_once_with(box)
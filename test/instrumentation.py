@@ -0,0 +1,104 @@
+# Blender add-on to import and export 3MF files.
+# Copyright (C) 2020 Ghostkeeper
+# This add-on is free software; you can redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation; either version 2 of the License, or (at your option) any later
+# version.
+# This add-on is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this program; if not, write to the Free
+# Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+# <pep8 compliant>
+
+import json  # To check that the report can be serialized.
+import tracemalloc  # To check that memory tracing is started and stopped.
+import unittest  # To run the tests.
+
+import io_mesh_3mf.instrumentation  # The unit under test.
+
+
+class TestInstrumentation(unittest.TestCase):
+    """
+    Tests measuring the stages of an import or export.
+    """
+
+    def test_disabled(self):
+        """
+        Tests that nothing is measured when the instrumentation is disabled.
+        """
+        instrumentation = io_mesh_3mf.instrumentation.Instrumentation("OFF")
+        instrumentation.start()
+        with instrumentation.span("parse"):
+            instrumentation.count("vertices", 3)
+        instrumentation.stop()
+
+        self.assertEqual(instrumentation.report(), {"stages": {}, "counters": {}}, "Nothing was measured.")
+
+    def test_time(self):
+        """
+        Tests measuring the time of stages that run multiple times.
+        """
+        instrumentation = io_mesh_3mf.instrumentation.Instrumentation("TIME")
+        instrumentation.start()
+        with instrumentation.span("read_model"):
+            for _ in range(3):
+                with instrumentation.span("read_object"):
+                    instrumentation.count("vertices", 4)
+            instrumentation.count("build_items")
+        instrumentation.stop()
+
+        report = instrumentation.report()
+        self.assertEqual(list(report["stages"].keys()), ["read_object", "read_model"], "In order of completion.")
+        self.assertEqual(report["stages"]["read_object"]["calls"], 3, "The object was read three times.")
+        self.assertEqual(report["stages"]["read_model"]["calls"], 1)
+        self.assertGreaterEqual(
+            report["stages"]["read_model"]["seconds"],
+            report["stages"]["read_object"]["seconds"],
+            "The outer stage includes the time of the inner stages.",
+        )
+        self.assertIsNone(report["stages"]["read_model"]["traced_peak"], "Memory was not measured.")
+        self.assertEqual(report["counters"], {"vertices": 12, "build_items": 1})
+        json.dumps(report)  # Must not raise.
+
+    def test_memory(self):
+        """
+        Tests measuring the peak memory of nested stages.
+
+        The peak of the inner stage must count for the outer stage too, even though the peak is reset when the inner
+        stage starts.
+        """
+        was_tracing = tracemalloc.is_tracing()
+        instrumentation = io_mesh_3mf.instrumentation.Instrumentation("MEMORY")
+        instrumentation.start()
+        self.assertTrue(tracemalloc.is_tracing(), "Memory must be traced while measuring.")
+        with instrumentation.span("outer"):
+            with instrumentation.span("inner"):
+                allocation = bytearray(1000000)
+                del allocation
+        instrumentation.stop()
+        self.assertEqual(tracemalloc.is_tracing(), was_tracing, "Tracing must be stopped if it was started for this.")
+
+        stages = instrumentation.report()["stages"]
+        self.assertGreaterEqual(stages["inner"]["traced_peak"], 1000000, "The allocation was within the inner stage.")
+        self.assertGreaterEqual(stages["outer"]["traced_peak"], 1000000, "The inner stage is part of the outer one.")
+
+    def test_summary(self):
+        """
+        Tests summarising the measurements in one line.
+        """
+        instrumentation = io_mesh_3mf.instrumentation.Instrumentation("TIME")
+        instrumentation.stages["parse"] = {"seconds": 1.5, "calls": 1, "traced_peak": None}
+        instrumentation.stages["build_mesh"] = {"seconds": 0.25, "calls": 2, "traced_peak": 2097152}
+        instrumentation.count("triangles", 12)
+
+        self.assertEqual(instrumentation.summary(), "parse 1.500s, build_mesh 0.250s (2x) 2.0MiB, 12 triangles")
+
+    def test_last_report(self):
+        """
+        Tests getting the report of the last operation.
+        """
+        io_mesh_3mf.instrumentation.last_reports.pop("export", None)
+        self.assertIsNone(io_mesh_3mf.instrumentation.last_report("export"), "Nothing was exported yet.")
+        report = {"stages": {}, "counters": {"build_items": 1}}
+        io_mesh_3mf.instrumentation.last_reports["export"] = report
+        self.assertEqual(io_mesh_3mf.instrumentation.last_report("export"), report)
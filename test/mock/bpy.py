@@ -51,3 +51,18 @@ class MockPrincipledBSDFWrapper:
         if item == "alpha":
             self.material.diffuse_color[3] = value
         super().__setattr__(item, value)
+
+
+class MockPropCollection(list):
+    """
+    List of Blender data, replacing Blender's bpy_prop_collection with support for getting attributes in bulk.
+    """
+    def foreach_get(self, attribute, buffer):
+        values = []
+        for item in self:
+            value = getattr(item, attribute)
+            if isinstance(value, (list, tuple)):
+                values.extend(value)
+            else:
+                values.append(value)
+        buffer[:] = values
@@ -0,0 +1,502 @@
+# Blender add-on to import and export 3MF files.
+# Copyright (C) 2020 Ghostkeeper
+# This add-on is free software; you can redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation; either version 2 of the License, or (at your option) any later
+# version.
+# This add-on is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this program; if not, write to the Free
+# Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+# <pep8 compliant>
+
+import io  # To create archives in memory.
+import os.path  # To find the test resources and to create archives to read.
+import subprocess  # To import the modules without the mocks of Blender.
+import sys  # To start Python without the mocks of Blender.
+import tempfile  # To create archives to read.
+import unittest  # To run the tests.
+import unittest.mock  # To simulate failing worker processes.
+import xml.etree.ElementTree  # To filter complete documents.
+import zipfile  # To create archives to read.
+
+import numpy  # To compare transformation matrices.
+
+import io_mesh_3mf.diagnostics  # To check for the error in strict mode.
+import io_mesh_3mf.model_reader  # The unit under test.
+from io_mesh_3mf.constants import (
+    CONTENT_TYPES_LOCATION,
+    MODEL_MIMETYPE,
+    MODEL_NAMESPACE,
+)
+
+CONTENT_TYPES = f"""<?xml version="1.0" encoding="UTF-8"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+    <Default Extension="model" ContentType="{MODEL_MIMETYPE}" />
+</Types>"""
+
+
+def model_document(vertices: str) -> str:
+    """
+    Creates a 3dmodel.model document with a material and an object that uses it.
+    :param vertices: The <vertex> elements of the object.
+    :return: The document.
+    """
+    return f"""<?xml version="1.0" encoding="UTF-8"?>
+<model xmlns="{MODEL_NAMESPACE}" unit="millimeter">
+    <metadata name="Title">Prepared</metadata>
+    <resources>
+        <basematerials id="1"><base name="PLA" displaycolor="#FF0000" /></basematerials>
+        <object id="2" pid="1" pindex="0">
+            <mesh>
+                <vertices>{vertices}</vertices>
+                <triangles><triangle v1="0" v2="1" v3="2" /></triangles>
+            </mesh>
+        </object>
+        <object id="3"><components><component objectid="2" /></components></object>
+    </resources>
+    <build><item objectid="3" /></build>
+</model>"""
+
+
+class TestPrepareArchive(unittest.TestCase):
+    """
+    Tests reading archives without Blender, as the worker processes do.
+    """
+
+    def setUp(self):
+        """
+        Creates a directory to write archives in.
+        """
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        """
+        Removes the archives.
+        """
+        self.directory.cleanup()
+
+    def archive(self, name: str, document: str) -> str:
+        """
+        Writes a 3MF archive with a single model document.
+        :param name: The file name of the archive.
+        :param document: The 3dmodel.model document to write in it.
+        :return: The path to the archive.
+        """
+        path = os.path.join(self.directory.name, name)
+        with zipfile.ZipFile(path, "w") as archive:
+            archive.writestr(CONTENT_TYPES_LOCATION, CONTENT_TYPES)
+            archive.writestr("3D/3dmodel.model", document)
+        return path
+
+    def test_prepare_archive(self):
+        """
+        Tests reading an archive.
+
+        The meshes must be read into buffers, while the rest of the objects are kept in the tree for the importer.
+        """
+        vertices = '<vertex x="0" y="0" z="0" /><vertex x="1" y="0" z="0" /><vertex x="0" y="1" z="0" />'
+        prepared = io_mesh_3mf.model_reader.prepare_archive(self.archive("test.3mf", model_document(vertices)))
+
+        self.assertIsNone(prepared.error)
+        self.assertListEqual(prepared.reports, [], "This archive is fine, so there is nothing to report.")
+        self.assertDictEqual(prepared.content_types, {"3D/3dmodel.model": MODEL_MIMETYPE})
+        model = prepared.models["3D/3dmodel.model"]
+        self.assertIsNone(model.error)
+        object_ids = [object_node.attrib["id"] for object_node in model.root.iter(f"{{{MODEL_NAMESPACE}}}object")]
+        self.assertListEqual(object_ids, ["2", "3"], "The objects are kept in the tree, for their components.")
+        self.assertIsNone(
+            model.root.find(f".//{{{MODEL_NAMESPACE}}}vertex"),
+            "The vertices are read into buffers, not into the tree.")
+        self.assertEqual(len(model.meshes), 2, "There is a mesh for each object, in order.")
+        self.assertListEqual(model.meshes[0].vertex_array().tolist(), [[0, 0, 0], [1, 0, 0], [0, 1, 0]])
+        self.assertListEqual(model.meshes[0].triangle_array().tolist(), [[0, 1, 2]])
+        self.assertListEqual(
+            model.meshes[0].materials,
+            [io_mesh_3mf.model_reader.ResourceMaterial(name="PLA", color=(1.0, 0.0, 0.0, 1.0))],
+            "The material of the object must be resolved while reading.")
+        self.assertEqual(len(model.meshes[1].vertices), 0, "The second object has no mesh.")
+
+    def test_prepare_archive_reports(self):
+        """
+        Tests that problems found while reading an archive are kept to report later.
+        """
+        vertices = '<vertex x="0" y="0" z="0" /><vertex x="one" y="0" z="0" /><vertex x="0" y="1" z="0" />'
+        prepared = io_mesh_3mf.model_reader.prepare_archive(self.archive("broken.3mf", model_document(vertices)))
+
+        self.assertListEqual(
+            prepared.reports,
+            [({'WARNING'}, 'Object 2 has 1 vertices with a coordinate that is not a number (x="one")')],
+            "The problems are summarised per object.")
+
+    def test_prepare_archive_strict(self):
+        """
+        Tests reading an archive with a problem in the mesh data, in strict mode.
+        """
+        vertices = '<vertex x="0" y="0" z="0" /><vertex x="one" y="0" z="0" /><vertex x="0" y="1" z="0" />'
+        path = self.archive("broken.3mf", model_document(vertices))
+
+        with self.assertRaises(io_mesh_3mf.diagnostics.MeshDataError):
+            io_mesh_3mf.model_reader.prepare_archive(path, strict=True)
+
+    def test_prepare_archive_malformed(self):
+        """
+        Tests reading an archive with a malformed model document.
+        """
+        path = self.archive("malformed.3mf", f"<model xmlns=\"{MODEL_NAMESPACE}\"><resources>")
+        prepared = io_mesh_3mf.model_reader.prepare_archive(path)
+
+        self.assertIsNone(prepared.error, "The archive itself is fine.")
+        self.assertIsNotNone(prepared.models["3D/3dmodel.model"].error, "The document is not.")
+
+    def test_prepare_archive_corrupt(self):
+        """
+        Tests reading an archive that is not a zip archive at all.
+        """
+        path = os.path.join(os.path.dirname(__file__), "resources", "corrupt_archive.3mf")
+        prepared = io_mesh_3mf.model_reader.prepare_archive(path)
+
+        self.assertIsNotNone(prepared.error)
+        self.assertDictEqual(prepared.models, {})
+
+    def test_prepare_archives(self):
+        """
+        Tests reading multiple archives in worker processes.
+
+        The results must be the same as when reading the archives in this process, in the original order.
+        """
+        paths = []
+        for index in range(3):
+            vertices = "".join(f'<vertex x="{index}" y="{vertex}" z="0" />' for vertex in range(index + 3))
+            paths.append(self.archive(f"test{index}.3mf", model_document(vertices)))
+
+        results = list(io_mesh_3mf.model_reader.prepare_archives(paths, 2))
+
+        self.assertEqual(len(results), len(paths))
+        for path, result in zip(paths, results):
+            self.assertIsNotNone(result, "The worker processes must be able to read the archive.")
+            expected = io_mesh_3mf.model_reader.prepare_archive(path)
+            self.assertListEqual(
+                result.models["3D/3dmodel.model"].meshes[0].vertex_array().tolist(),
+                expected.models["3D/3dmodel.model"].meshes[0].vertex_array().tolist())
+
+    def test_prepare_archives_unavailable(self):
+        """
+        Tests reading archives when worker processes can't be started.
+
+        The importer must then read every archive itself.
+        """
+        paths = [self.archive("test.3mf", model_document("")), self.archive("test2.3mf", model_document(""))]
+        with unittest.mock.patch("concurrent.futures.ProcessPoolExecutor", side_effect=OSError("No processes")):
+            results = list(io_mesh_3mf.model_reader.prepare_archives(paths, 2))
+
+        self.assertListEqual(results, [None, None])
+
+
+PLATE_DOCUMENT = f"""<?xml version="1.0" encoding="UTF-8"?>
+<model xmlns="{MODEL_NAMESPACE}" unit="millimeter">
+    <resources>
+        <object id="1" name="Bolt">
+            <mesh>
+                <vertices>
+                    <vertex x="0" y="0" z="0" /><vertex x="1" y="0" z="0" /><vertex x="0" y="1" z="0" />
+                </vertices>
+                <triangles><triangle v1="0" v2="1" v3="2" /></triangles>
+            </mesh>
+        </object>
+        <object id="2" name="Bracket" partnumber="BR-7">
+            <mesh>
+                <vertices>
+                    <vertex x="0" y="0" z="0" /><vertex x="2" y="0" z="0" /><vertex x="0" y="2" z="0" />
+                </vertices>
+                <triangles><triangle v1="0" v2="1" v3="2" /><triangle v1="2" v2="1" v3="0" /></triangles>
+            </mesh>
+        </object>
+        <object id="3" name="Assembly">
+            <components><component objectid="2" /><component objectid="1" /></components>
+        </object>
+    </resources>
+    <build>
+        <item objectid="1" />
+        <item objectid="3" partnumber="ASM-1" transform="1 0 0 0 1 0 0 0 1 10 0 0" />
+        <item objectid="2" />
+    </build>
+</model>"""
+
+
+class TestSelection(unittest.TestCase):
+    """
+    Tests scanning documents, and reading only some of their build items.
+    """
+
+    def setUp(self):
+        """
+        Creates an archive with a plate of several items.
+        """
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "plate.3mf")
+        with zipfile.ZipFile(self.path, "w") as archive:
+            archive.writestr(CONTENT_TYPES_LOCATION, CONTENT_TYPES)
+            archive.writestr("3D/3dmodel.model", PLATE_DOCUMENT)
+
+    def tearDown(self):
+        """
+        Removes the archive.
+        """
+        self.directory.cleanup()
+
+    def test_scan_archive(self):
+        """
+        Tests listing the objects and build items of an archive.
+        """
+        index = io_mesh_3mf.model_reader.scan_archive(self.path)["3D/3dmodel.model"]
+
+        self.assertListEqual(sorted(index.objects.keys()), ["1", "2", "3"])
+        bracket = index.objects["2"]
+        self.assertEqual(bracket.name, "Bracket")
+        self.assertEqual(bracket.partnumber, "BR-7")
+        self.assertEqual(bracket.vertex_count, 3)
+        self.assertEqual(bracket.triangle_count, 2)
+        self.assertListEqual(index.objects["3"].components, ["2", "1"])
+        self.assertListEqual([item.objectid for item in index.items], ["1", "3", "2"])
+        self.assertEqual(index.items[1].partnumber, "ASM-1")
+        self.assertEqual(index.items[1].transform, "1 0 0 0 1 0 0 0 1 10 0 0")
+
+    def test_select_items(self):
+        """
+        Tests selecting build items in the different ways.
+        """
+        index = io_mesh_3mf.model_reader.scan_archive(self.path)["3D/3dmodel.model"]
+
+        by_id = io_mesh_3mf.model_reader.select_items(index, ["1"])
+        self.assertEqual(by_id, io_mesh_3mf.model_reader.Selection(objects={"1"}, items={0}))
+        by_object_partnumber = io_mesh_3mf.model_reader.select_items(index, ["BR-7"])
+        self.assertEqual(by_object_partnumber.items, {2})
+        by_name = io_mesh_3mf.model_reader.select_items(index, ["Bolt"])
+        self.assertEqual(by_name.items, {0})
+        by_position = io_mesh_3mf.model_reader.select_items(index, ["#2"])
+        self.assertEqual(by_position.items, {1})
+        self.assertEqual(by_position.objects, {"1", "2", "3"}, "The components of the assembly are needed too.")
+        by_item_partnumber = io_mesh_3mf.model_reader.select_items(index, ["ASM-1", "nothing"])
+        self.assertEqual(by_item_partnumber.items, {1})
+
+    def test_parse_selectors(self):
+        """
+        Tests splitting the selectors that the user entered.
+        """
+        self.assertListEqual(io_mesh_3mf.model_reader.parse_selectors(" 3, Bracket ,,#2 "), ["3", "Bracket", "#2"])
+        self.assertListEqual(io_mesh_3mf.model_reader.parse_selectors(""), [])
+
+    def test_prepare_archive_selection(self):
+        """
+        Tests reading only the selected build items of an archive.
+
+        The objects that are not needed must be left out without reading their meshes.
+        """
+        prepared = io_mesh_3mf.model_reader.prepare_archive(self.path, selectors=["Bracket"])
+
+        model = prepared.models["3D/3dmodel.model"]
+        object_ids = [object_node.attrib["id"] for object_node in model.root.iter(f"{{{MODEL_NAMESPACE}}}object")]
+        self.assertListEqual(object_ids, ["2"])
+        self.assertEqual(len(model.meshes), 1, "Only the mesh of the selected object is read.")
+        self.assertListEqual(model.meshes[0].vertex_array().tolist(), [[0, 0, 0], [2, 0, 0], [0, 2, 0]])
+        items = [item.attrib["objectid"] for item in model.root.iter(f"{{{MODEL_NAMESPACE}}}item")]
+        self.assertListEqual(items, ["2"])
+
+    def test_read_model(self):
+        """
+        Tests reading the objects and build items of an archive without Blender.
+        """
+        document = io_mesh_3mf.model_reader.read_model(self.path, unit="meter")["3D/3dmodel.model"]
+
+        self.assertListEqual(sorted(document.objects.keys()), ["1", "2", "3"])
+        numpy.testing.assert_array_equal(document.objects["2"].vertices, [[0, 0, 0], [2, 0, 0], [0, 2, 0]])
+        self.assertListEqual(document.objects["2"].triangles.tolist(), [[0, 1, 2], [2, 1, 0]])
+        self.assertEqual(document.objects["2"].metadata["3mf:partnumber"].value, "BR-7")
+        components = document.objects["3"].components
+        self.assertListEqual([component.resource_object for component in components], ["2", "1"])
+        self.assertListEqual([item.objectid for item in document.items], ["1", "3", "2"])
+        self.assertEqual(document.items[1].metadata["3mf:partnumber"].value, "ASM-1")
+        expected = numpy.diag([0.001, 0.001, 0.001, 1.0])  # From millimetres to metres.
+        expected[0, 3] = 0.01  # Translated by 10 millimetres.
+        numpy.testing.assert_allclose(document.items[1].transformation, expected)
+
+    def test_read_model_without_blender(self):
+        """
+        Tests that the modules to read and write documents can be imported without Blender.
+        """
+        code = ("import sys; import io_mesh_3mf.model_reader, io_mesh_3mf.model_writer, io_mesh_3mf.annotations, "
+                "io_mesh_3mf.metadata, io_mesh_3mf.preservation; sys.exit('bpy' in sys.modules)")
+        project = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        result = subprocess.run([sys.executable, "-c", code], cwd=project, capture_output=True, text=True)
+
+        self.assertEqual(result.returncode, 0, result.stderr)
+
+    def test_parse_skipped_text(self):
+        """
+        Tests that the text inside of skipped objects is left out of the document, along with the objects.
+        """
+        document = f"""<model xmlns="{MODEL_NAMESPACE}"><resources>
+<object id="1"><metadatagroup><metadata name="Note">Skipped</metadata></metadatagroup></object>
+<object id="2"><metadatagroup><metadata name="Note">Kept</metadata></metadatagroup></object>
+</resources><build><item objectid="1" /><item objectid="2" /></build></model>"""
+        selection = io_mesh_3mf.model_reader.Selection(objects={"2"}, items={1})
+        parser = io_mesh_3mf.model_reader.ModelParser(io_mesh_3mf.model_reader.ArchiveReader(), selection)
+
+        parser.parse(io.BytesIO(document.encode("UTF-8")))
+
+        text = "".join(parser.root.itertext())
+        self.assertIn("Kept", text)
+        self.assertNotIn("Skipped", text, "The text of the skipped object must not end up in another element.")
+
+    def test_prepare_archive_bounds(self):
+        """
+        Tests reading only the bounding boxes of the meshes of an archive.
+
+        The triangles must not be read, and only the corners of the box must be sent back.
+        """
+        prepared = io_mesh_3mf.model_reader.prepare_archive(self.path, bounds_only=True)
+
+        bracket = prepared.models["3D/3dmodel.model"].meshes[1]
+        numpy.testing.assert_array_equal(
+            bracket.vertex_array(),
+            [[0, 0, 0], [2, 0, 0], [0, 2, 0], [2, 2, 0], [0, 0, 0], [2, 0, 0], [0, 2, 0], [2, 2, 0]],
+        )
+        self.assertEqual(len(bracket.triangle_array()), 0, "The triangles are not needed for the bounds.")
+
+    def test_filter_document(self):
+        """
+        Tests leaving out the objects and items that are not selected from a complete document.
+        """
+        root = xml.etree.ElementTree.fromstring(PLATE_DOCUMENT)
+        selection = io_mesh_3mf.model_reader.Selection(objects={"1", "2", "3"}, items={1})
+
+        io_mesh_3mf.model_reader.filter_document(root, selection)
+
+        object_ids = [object_node.attrib["id"] for object_node in root.iter(f"{{{MODEL_NAMESPACE}}}object")]
+        self.assertListEqual(object_ids, ["1", "2", "3"])
+        items = [item.attrib["objectid"] for item in root.iter(f"{{{MODEL_NAMESPACE}}}item")]
+        self.assertListEqual(items, ["3"])
+
+
+class TestArchivePart(unittest.TestCase):
+    """
+    Tests listing the files in an archive without reading them.
+    """
+
+    def setUp(self):
+        """
+        Creates an archive with a model and a large attachment.
+        """
+        self.stream = io.BytesIO()
+        with zipfile.ZipFile(self.stream, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr("3D/3dmodel.model", model_document(""))
+            archive.writestr("Metadata/thumbnail.png", b"\0" * 100000)
+        self.archive = zipfile.ZipFile(self.stream)
+        self.mime_types = {"3D/3dmodel.model": MODEL_MIMETYPE, "Metadata/thumbnail.png": "image/png"}
+
+    def tearDown(self):
+        """
+        Closes the archive.
+        """
+        self.archive.close()
+
+    def test_index_archive(self):
+        """
+        Tests listing the files by content type, with their sizes.
+        """
+        with unittest.mock.patch.object(self.archive, "open") as open_file:
+            parts = io_mesh_3mf.model_reader.index_archive(self.archive, self.mime_types)
+            open_file.assert_not_called()  # Listing the files must not open any of them.
+
+        self.assertListEqual(sorted(parts.keys()), sorted([MODEL_MIMETYPE, "image/png"]))
+        thumbnail = parts["image/png"][0]
+        self.assertEqual(thumbnail.name, "Metadata/thumbnail.png")
+        self.assertEqual(thumbnail.content_type, "image/png")
+        self.assertEqual(thumbnail.file_size, 100000)
+        self.assertLess(thumbnail.compress_size, thumbnail.file_size, "The sizes come from the archive's directory.")
+
+    def test_read(self):
+        """
+        Tests reading a part like a stream, which opens it on the first read.
+        """
+        part = io_mesh_3mf.model_reader.index_archive(self.archive, self.mime_types)[MODEL_MIMETYPE][0]
+        self.assertIsNone(part.stream, "Not opened until it is read.")
+
+        contents = part.read(10) + part.read()
+        part.close()
+
+        self.assertEqual(contents, model_document("").encode("UTF-8"))
+        self.assertIsNone(part.stream)
+
+
+class TestTransformations(unittest.TestCase):
+    """
+    Tests parsing and composing the transformations of build items and components.
+    """
+
+    def test_parse_transformation_cached(self):
+        """
+        Tests that each distinct transformation is only parsed once, and can't be changed by whoever gets it.
+        """
+        reader = io_mesh_3mf.model_reader.ModelReader()
+        first = reader.parse_transformation("1 0 0 0 1 0 0 0 1 30 40 50")
+        second = reader.parse_transformation("1 0 0 0 1 0 0 0 1 30 40 50")
+
+        self.assertIs(first, second, "The same transformation must be parsed only once.")
+        self.assertListEqual(first[:, 3].tolist(), [30, 40, 50, 1], "The translation is in the last column.")
+        with self.assertRaises(ValueError):
+            first[0, 3] = 0  # Read-only, because it is shared.
+
+    def test_compose_transformations(self):
+        """
+        Tests computing the world transformations of a hierarchy, with the children of different parents at the same
+        depth.
+        """
+        translation = numpy.identity(4)
+        translation[0, 3] = 10
+        scale = numpy.diag([2.0, 2.0, 2.0, 1.0])
+        transformations = numpy.stack([translation, scale, translation, scale])
+        parents = [-1, 0, 1, 0]  # Root, child, grandchild and a second child.
+
+        result = io_mesh_3mf.model_reader.compose_transformations(transformations, parents)
+
+        numpy.testing.assert_array_equal(result[0], translation)
+        numpy.testing.assert_array_equal(result[1], translation @ scale)
+        numpy.testing.assert_array_equal(result[2], translation @ scale @ translation)
+        numpy.testing.assert_array_equal(result[3], translation @ scale)
+        numpy.testing.assert_array_equal(transformations[1], scale, "The input must not be modified.")
+
+
+class TestBounds(unittest.TestCase):
+    """
+    Tests creating the boxes that stand in for meshes.
+    """
+
+    def test_bounding_box(self):
+        """
+        Tests creating a box around some vertices.
+
+        The box must enclose the vertices tightly, and all of its triangles must face outwards.
+        """
+        vertices = numpy.array([[1, 2, 3], [4, -1, 0], [2, 5, 1]], dtype=numpy.float32)
+
+        corners, triangles = io_mesh_3mf.model_reader.bounding_box(vertices)
+
+        numpy.testing.assert_array_equal(corners.min(axis=0), [1, -1, 0])
+        numpy.testing.assert_array_equal(corners.max(axis=0), [4, 5, 3])
+        self.assertEqual(len(numpy.unique(corners, axis=0)), 8, "Each corner of the box is different.")
+        self.assertEqual(triangles.shape, (12, 3))
+        points = corners[triangles]
+        normals = numpy.cross(points[:, 1] - points[:, 0], points[:, 2] - points[:, 0])
+        outwards = points.mean(axis=1) - corners.mean(axis=0)
+        self.assertTrue(((normals * outwards).sum(axis=1) > 0).all(), "All triangles must face outwards.")
+
+    def test_bounding_box_empty(self):
+        """
+        Tests creating a box around no vertices at all, for objects without mesh.
+        """
+        corners, triangles = io_mesh_3mf.model_reader.bounding_box(numpy.zeros((0, 3), dtype=numpy.float32))
+
+        self.assertEqual(corners.shape, (0, 3))
+        self.assertEqual(triangles.shape, (0, 3))
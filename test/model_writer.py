@@ -0,0 +1,100 @@
+# Blender add-on to import and export 3MF files.
+# Copyright (C) 2020 Ghostkeeper
+# This add-on is free software; you can redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation; either version 2 of the License, or (at your option) any later
+# version.
+# This add-on is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this program; if not, write to the Free
+# Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+# <pep8 compliant>
+
+import io  # To write documents to memory.
+import unittest  # To run the tests.
+import xml.etree.ElementTree  # To build documents to write.
+
+import numpy  # To create the mesh data to write.
+
+import io_mesh_3mf.model_reader  # To read the written documents back.
+import io_mesh_3mf.model_writer  # The unit under test.
+from io_mesh_3mf.constants import MODEL_NAMESPACE
+from io_mesh_3mf.metadata import Metadata, MetadataEntry  # To write metadata.
+
+
+class TestModelWriter(unittest.TestCase):
+    """
+    Tests writing 3dmodel.model documents without Blender.
+    """
+
+    def test_write_mesh_document(self):
+        """
+        Tests writing a document with meshes from arrays, and reading it back.
+        """
+        vertices = numpy.array([[0, 0, 0], [1.5, 0, 0], [0, 2.25, -1]], dtype=numpy.float32)
+        triangles = numpy.array([[0, 1, 2]], dtype=numpy.int32)
+        transformation = numpy.eye(4)
+        transformation[:3, 3] = [10, 20, 30]
+        stream = io.StringIO()
+
+        io_mesh_3mf.model_writer.write_mesh_document(stream, [
+            io_mesh_3mf.model_writer.MeshObject(vertices, triangles),
+            io_mesh_3mf.model_writer.MeshObject(vertices * 2, triangles, transformation),
+        ])
+
+        parser = io_mesh_3mf.model_reader.ModelParser(io_mesh_3mf.model_reader.ArchiveReader())
+        parser.parse(io.BytesIO(stream.getvalue().encode("UTF-8")))
+        self.assertEqual(len(parser.meshes), 2)
+        numpy.testing.assert_array_equal(parser.meshes[0].vertex_array(), vertices)
+        numpy.testing.assert_array_equal(parser.meshes[1].vertex_array(), vertices * 2)
+        numpy.testing.assert_array_equal(parser.meshes[1].triangle_array(), triangles)
+        items = parser.root.findall(f"{{{MODEL_NAMESPACE}}}build/{{{MODEL_NAMESPACE}}}item")
+        self.assertListEqual([item.attrib["objectid"] for item in items], ["1", "2"])
+        self.assertNotIn("transform", items[0].attrib, "Objects without transformation are placed as they are.")
+        numpy.testing.assert_array_equal(
+            io_mesh_3mf.model_reader.parse_transformation_string(items[1].attrib["transform"]), transformation)
+
+    def test_write_resources(self):
+        """
+        Tests writing metadata, materials and components without Blender, and reading them back.
+        """
+        writer = io_mesh_3mf.model_writer.ModelWriter()
+        writer.element_bodies = {}
+        writer.coordinate_precision = 4
+        root = xml.etree.ElementTree.Element(f"{{{MODEL_NAMESPACE}}}model")
+        metadata = Metadata()
+        metadata["Title"] = MetadataEntry(name="Title", preserve=True, datatype="xs:string", value="Plate")
+        writer.write_metadata(root, metadata)
+        resources_element = xml.etree.ElementTree.SubElement(root, f"{{{MODEL_NAMESPACE}}}resources")
+        writer.write_basematerials(resources_element, "1", [("PLA", (1.0, 0.0, 0.0, 1.0)), ("Glass", (0, 0, 1, 0.2))])
+        vertices = numpy.array([[0, 0, 0], [1, 0, 0], [0, 1, 0]], dtype=numpy.float32)
+        triangles = numpy.array([[0, 1, 2]], dtype=numpy.int32)
+        object_element = writer.write_mesh_object(resources_element, 2, vertices, triangles)
+        object_element.attrib.update({"pid": "1", "pindex": "1"})
+        assembly_element = xml.etree.ElementTree.SubElement(
+            resources_element, f"{{{MODEL_NAMESPACE}}}object", attrib={"id": "3"})
+        components_element = xml.etree.ElementTree.SubElement(assembly_element, f"{{{MODEL_NAMESPACE}}}components")
+        translation = numpy.identity(4)
+        translation[:3, 3] = [5, 0, 0]
+        writer.write_component(components_element, 2, translation)
+        identity_element = writer.write_component(components_element, 2, numpy.identity(4))
+        build_element = xml.etree.ElementTree.SubElement(root, f"{{{MODEL_NAMESPACE}}}build")
+        writer.write_build_item(build_element, 3)
+        stream = io.StringIO()
+        writer.write_document(stream, root)
+
+        reader = io_mesh_3mf.model_reader.ArchiveReader()
+        parser = io_mesh_3mf.model_reader.ModelParser(reader)
+        parser.parse(io.BytesIO(stream.getvalue().encode("UTF-8")))
+        document = reader.read_document(parser.root, parser.meshes)
+
+        self.assertEqual(document.metadata["Title"].value, "Plate")
+        glass = document.objects["2"].materials[0]
+        self.assertEqual(glass.name, "Glass")
+        numpy.testing.assert_allclose(glass.color, (0, 0, 1, 0.2), atol=1 / 255)
+        components = document.objects["3"].components
+        self.assertListEqual([component.resource_object for component in components], ["2", "2"])
+        numpy.testing.assert_array_equal(components[0].transformation, translation)
+        numpy.testing.assert_array_equal(components[1].transformation, numpy.identity(4))
+        self.assertEqual(len(identity_element.attrib), 1, "Components without transformation don't write it.")
+        self.assertListEqual([item.objectid for item in document.items], ["3"])
@@ -0,0 +1,197 @@
+# Blender add-on to import and export 3MF files.
+# Copyright (C) 2020 Ghostkeeper
+# This add-on is free software; you can redistribute it and/or modify it under the terms of the GNU General Public
+# License as published by the Free Software Foundation; either version 2 of the License, or (at your option) any later
+# version.
+# This add-on is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied
+# warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this program; if not, write to the Free
+# Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+# <pep8 compliant>
+
+import base64  # To simulate files preserved by older versions.
+import json  # To check the list of preserved files that gets stored.
+import unittest  # To run the tests.
+
+import bpy  # To mock the text blocks in the Blender data.
+
+import io_mesh_3mf.preservation  # The unit under test.
+from io_mesh_3mf.constants import conflicting_mustpreserve_contents
+
+
+class MockText(dict):
+    """
+    A text block in the Blender data, with its custom properties as the items of the dictionary.
+    """
+
+    def __init__(self, name: str, contents: str = ""):
+        """
+        Creates a text block.
+        :param name: The name of the text block.
+        :param contents: The text in the text block.
+        """
+        super().__init__()
+        self.name = name
+        self.contents = contents
+
+    def as_string(self) -> str:
+        """
+        Gets the text in the text block.
+        :return: The text.
+        """
+        return self.contents
+
+    def clear(self) -> None:
+        """
+        Removes the text in the text block. Like in Blender, this doesn't remove the custom properties.
+        """
+        self.contents = ""
+
+    def write(self, contents: str) -> None:
+        """
+        Adds text to the text block.
+        :param contents: The text to add.
+        """
+        self.contents += contents
+
+
+class MockTexts(dict):
+    """
+    The collection of text blocks in the Blender data.
+    """
+
+    def __iter__(self):
+        """
+        Iterates over the text blocks, like Blender's collections do, rather than over their names.
+        :return: An iterator over the text blocks.
+        """
+        return iter(list(self.values()))
+
+    def new(self, name: str) -> MockText:
+        """
+        Creates a new text block.
+        :param name: The name of the text block.
+        :return: The new text block.
+        """
+        self[name] = MockText(name)
+        return self[name]
+
+    def remove(self, text: MockText) -> None:
+        """
+        Removes a text block.
+        :param text: The text block to remove.
+        """
+        del self[text.name]
+
+
+class TestPreservedFiles(unittest.TestCase):
+    """
+    Tests keeping the files that must be preserved.
+    """
+
+    def setUp(self):
+        """
+        Creates an empty collection of preserved files, and an empty Blender scene to store them in.
+        """
+        self.preserved = io_mesh_3mf.preservation.PreservedFiles()
+        bpy.data.texts = MockTexts()
+
+    def test_add_same(self):
+        """
+        Tests preserving the same file from multiple archives.
+        """
+        self.preserved.add("Metadata/print.config", b"layer_height = 0.2")
+        self.preserved.add("Metadata/print.config", b"layer_height = 0.2")
+        self.preserved.add("Metadata/copy.config", b"layer_height = 0.2")
+
+        self.assertListEqual(
+            list(self.preserved.items()),
+            [("Metadata/print.config", b"layer_height = 0.2"), ("Metadata/copy.config", b"layer_height = 0.2")])
+        self.assertEqual(len(self.preserved.contents), 1, "Files with the same contents are only kept once.")
+
+    def test_add_conflict(self):
+        """
+        Tests preserving files with the same path but different contents.
+
+        Neither file may be preserved then, not even if a later archive has the same file as one of them.
+        """
+        self.preserved.add("Metadata/print.config", b"layer_height = 0.2")
+        self.preserved.add("Metadata/print.config", b"layer_height = 0.1")
+        self.assertTrue(self.preserved.is_conflicting("Metadata/print.config"))
+        self.preserved.add("Metadata/print.config", b"layer_height = 0.2")
+
+        self.assertListEqual(list(self.preserved.items()), [])
+        self.assertDictEqual(self.preserved.contents, {}, "The contents of files in conflict are not kept.")
+
+    def test_store(self):
+        """
+        Tests storing the preserved files in the Blender scene, as raw bytes.
+        """
+        self.preserved.add("Metadata/thumbnail.png", b"\x89PNG\0\1\2", ("/plates/a.3mf", "Metadata/thumbnail.png"))
+        self.preserved.add("Metadata/print.config", b"a", ("/plates/a.3mf", "Metadata/print.config"))
+        self.preserved.add("Metadata/print.config", b"b")
+        self.preserved.store()
+
+        text = bpy.data.texts[io_mesh_3mf.preservation.PRESERVED_FILE]
+        content_hash = io_mesh_3mf.preservation.PreservedFiles.content_hash(b"\x89PNG\0\1\2")
+        self.assertDictEqual(
+            json.loads(text.as_string()),
+            {
+                "files": {"Metadata/thumbnail.png": content_hash, "Metadata/print.config": None},
+                "sources": {"Metadata/thumbnail.png": ["/plates/a.3mf", "Metadata/thumbnail.png"]},
+            },
+            "Files in conflict have no source to copy them from.")
+        self.assertDictEqual(dict(text), {content_hash: b"\x89PNG\0\1\2"})
+
+    def test_store_retrieve(self):
+        """
+        Tests retrieving the preserved files that were stored before, and storing them again with more files.
+        """
+        self.preserved.add("Metadata/thumbnail.png", b"\x89PNG\0\1\2", ("/plates/a.3mf", "Metadata/thumbnail.png"))
+        self.preserved.store()
+        retrieved = io_mesh_3mf.preservation.PreservedFiles()
+        retrieved.retrieve()
+        self.assertListEqual(list(retrieved.items()), [("Metadata/thumbnail.png", b"\x89PNG\0\1\2")])
+        self.assertDictEqual(retrieved.sources, {"Metadata/thumbnail.png": ("/plates/a.3mf", "Metadata/thumbnail.png")})
+
+        retrieved.add("Metadata/thumbnail.png", b"Different")
+        retrieved.store()
+        self.assertDictEqual(
+            dict(bpy.data.texts[io_mesh_3mf.preservation.PRESERVED_FILE]),
+            {},
+            "The contents of the file in conflict are removed from the scene.")
+
+    def test_retrieve_legacy(self):
+        """
+        Tests retrieving files that were preserved by older versions, as Base85 in a text block per file.
+        """
+        bpy.data.texts[".3mf_preserved/Metadata/print.config"] = MockText(
+            ".3mf_preserved/Metadata/print.config",
+            base64.b85encode(b"layer_height = 0.2").decode("UTF-8"))
+        bpy.data.texts[".3mf_preserved/Metadata/other.config"] = MockText(
+            ".3mf_preserved/Metadata/other.config",
+            conflicting_mustpreserve_contents)
+        self.preserved.retrieve()
+
+        self.assertListEqual(list(self.preserved.items()), [("Metadata/print.config", b"layer_height = 0.2")])
+        self.assertTrue(self.preserved.is_conflicting("Metadata/other.config"))
+
+        self.preserved.store()
+        self.assertListEqual(
+            list(bpy.data.texts.keys()),
+            [io_mesh_3mf.preservation.PRESERVED_FILE],
+            "The old text blocks are replaced by the new storage.")
+
+    def test_retrieve_malformed(self):
+        """
+        Tests retrieving preserved files when the list of files is broken.
+        """
+        bpy.data.texts.new(io_mesh_3mf.preservation.PRESERVED_FILE).write("{bla")
+        self.preserved.retrieve()
+        self.assertDictEqual(self.preserved.files, {})
+
+        bpy.data.texts[io_mesh_3mf.preservation.PRESERVED_FILE].contents = json.dumps(
+            {"files": {"missing.bin": "0123"}, "sources": {}})
+        self.preserved.retrieve()
+        self.assertDictEqual(self.preserved.files, {}, "The contents of the file are missing, so it can't be kept.")